@@ -2,15 +2,41 @@ import gensim
 import re
 
 import logging
+import numpy as np
+from numpy import ndarray
 from gensim.models import KeyedVectors
-import sys
-
-# logging
-logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+from typing import List, Union, Tuple
+
+from kgvec2go_server.generic.ann_index import (
+    ExactIndex,
+    NearestNeighbourIndex,
+    QuantizedIndex,
+)
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.result_cache import ResultCache, RankedResultMemo
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.term_snapshot import Snapshot, TermTable
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class AlodQueryService:
-    def __init__(self, model_file="", vector_file=""):
+    SNAPSHOT_NAME = "alod"
+
+    def __init__(
+        self,
+        model_file="",
+        vector_file="",
+        cache: Union[None, ResultCache] = None,
+        use_snapshot: bool = True,
+        vector_store: Union[None, VectorStore] = None,
+        use_quantized: bool = True,
+        batch_window: Union[None, float] = None,
+    ):
+        vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
         if model_file == "" and vector_file == "":
             logging.error("ERROR - At least one file must be given.")
         elif model_file != "":
@@ -22,12 +48,52 @@ class AlodQueryService:
             # self.model.wv.save(vector_file)
             self.word_vectors = self.model.wv
         elif vector_file != "":
-            self.word_vectors: KeyedVectors = KeyedVectors.load(vector_file, mmap="r")
+            self.word_vectors: KeyedVectors = vector_store.load_vectors(vector_file)
+
+        snapshot = None
+        if use_snapshot and vector_file != "":
+            snapshot = Snapshot.load(vector_file, name=self.SNAPSHOT_NAME)
+        if snapshot is not None:
+            self.all_lemmas = TermTable.from_arrays(
+                snapshot.arrays,
+                prefix="term_mapping",
+                index_to_key=self.word_vectors.index_to_key,
+            )
+            logging.info("ALOD Classic snapshot loaded.")
+        else:
+            self.all_lemmas = self.__read_lemmas()
+
+        # closest concepts: scan of the quantized matrix if it has been built (scripts/quantize_vectors.py), else
+        # a sharded exact scan of the shared normalized matrix
+        self.vector_file = vector_file
+        self.vector_store = vector_store
+        self.closest_concepts_index: Union[None, NearestNeighbourIndex] = None
+        if use_quantized and vector_file != "":
+            quantized = QuantizedMatrix.load(vector_file)
+            if quantized is not None:
+                self.closest_concepts_index = QuantizedIndex(
+                    quantized=quantized,
+                    vectors=self.word_vectors.vectors,
+                    executor=ShardedScanExecutor.get_default(),
+                )
 
-        self.all_lemmas = self.__read_lemmas()
+        self.batch_scheduler: Union[None, MicroBatchScheduler] = None
+        if batch_window is not None and vector_file != "":
+            self.batch_scheduler = MicroBatchScheduler(
+                search=self.__search_closest_concepts, window=batch_window
+            )
 
-        # cache for closest concepts
-        self.closest_concepts_cache = {}
+        # cache for closest concepts (bounded, may be shared with other services, hence the namespace includes
+        # the file and its version)
+        self.closest_concepts_memo = RankedResultMemo(
+            cache=ResultCache() if cache is None else cache,
+            namespace=(
+                str(self),
+                *VectorStore.get_file_namespace(
+                    model_file if model_file != "" else vector_file
+                ),
+            ),
+        )
 
     def __transform_string(self, string_to_be_transformed: str) -> str:
         """Transforms any string for lookup, also URIs.
@@ -50,6 +116,15 @@ class AlodQueryService:
         string_to_be_transformed = string_to_be_transformed.replace("-", "_")
         return string_to_be_transformed
 
+    def to_snapshot(self) -> Snapshot:
+        """Snapshot of the term mapping (see ``Snapshot``)."""
+        term_table = TermTable.build(
+            term_mapping=self.all_lemmas,
+            key_to_index=self.word_vectors.key_to_index,
+            index_to_key=self.word_vectors.index_to_key,
+        )
+        return Snapshot(arrays=term_table.to_arrays("term_mapping"))
+
     def __read_lemmas(self):
         result = {}
         for entry in self.word_vectors.key_to_index:
@@ -62,24 +137,55 @@ class AlodQueryService:
         if key not in self.word_vectors.key_to_index:
             return None
 
-        result = '{\n"result": [\n'
-        is_first = True
-        for entry, similarity in self.word_vectors.most_similar(key, topn=int(top)):
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"' + str(entry) + '", "score":' + str(similarity) + "}"
-                )
+        indices, scores = self.__rank_closest_concepts(key=key, topn=int(top))
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
+
+    def __rank_closest_concepts(self, key: str, topn: int) -> Tuple[ndarray, ndarray]:
+        """Vocabulary indices and scores of the closest concepts of the key, ordered by descending score."""
+        closest_concepts_index = self.__get_closest_concepts_index()
+        if closest_concepts_index is not None:
+            index = self.word_vectors.key_to_index[key]
+            if self.batch_scheduler is not None:
+                # coalesced with the concurrent requests of other threads
+                indices, scores = self.batch_scheduler.submit(concept=index, topn=topn)
             else:
-                result += (
-                    ',\n{ "concept":"'
-                    + str(entry)
-                    + '", "score":'
-                    + str(similarity)
-                    + "}"
+                indices, scores = self.__search_closest_concepts([index], topn)
+                indices, scores = indices[0], scores[0]
+            found = scores != -np.inf
+            return indices[found], scores[found]
+        result_list = self.word_vectors.most_similar(key, topn=topn)
+        return (
+            np.array(
+                [self.word_vectors.key_to_index[entry] for entry, _ in result_list],
+                dtype=np.int64,
+            ),
+            np.array([similarity for _, similarity in result_list], dtype=np.float32),
+        )
+
+    def __get_closest_concepts_index(self) -> Union[None, NearestNeighbourIndex]:
+        """The index that answers closest concept queries; None if the vectors were not loaded from a vector
+        file (gensim is used then). The exact index is created on first use."""
+        if self.closest_concepts_index is None and self.vector_file != "":
+            self.closest_concepts_index = ExactIndex(
+                engine=self.vector_store.get_engine(
+                    path=self.vector_file, vectors=self.word_vectors.vectors
                 )
-        result += "\n]\n}"
-        return result
+            )
+        return self.closest_concepts_index
+
+    def __search_closest_concepts(
+        self, indices: List[int], topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        return self.__get_closest_concepts_index().search(
+            query_vectors=self.word_vectors.vectors[indices],
+            topn=topn,
+            exclude_indices=indices,
+        )
+
+    def __closest_concepts_to_json(self, indices: ndarray, scores: ndarray) -> str:
+        return json_serializer.closest_concepts_to_json(
+            keys=self.word_vectors.index_to_key, indices=indices, scores=scores
+        )
 
         # old
 
@@ -103,21 +209,19 @@ class AlodQueryService:
         # return result
 
     def find_closest_lemmas(self, lemma, top):
-        print("Closest lemma query for " + lemma + " received.")
+        logging.debug("Closest lemma query for %s received.", lemma)
         lookup_key = self.__transform_string(lemma)
 
-        if lookup_key in self.closest_concepts_cache:
-            print("Serve answer from cache.")
-            return self.closest_concepts_cache[lookup_key]
-
-        result = "{}"
-        if lookup_key in self.all_lemmas:
-            result = self.find_closest_lemmas_given_key(
-                key=self.all_lemmas[lookup_key], top=top
-            )
+        if lookup_key not in self.all_lemmas:
+            return json_serializer.EMPTY_RESULT
 
-        self.closest_concepts_cache[lookup_key] = result
-        return result
+        key = self.all_lemmas[lookup_key]
+        indices, scores = self.closest_concepts_memo.get_or_compute(
+            concept=lookup_key,
+            topn=int(top),
+            compute=lambda topn: self.__rank_closest_concepts(key=key, topn=topn),
+        )
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
 
     @staticmethod
     def __take_second(element):
@@ -129,15 +233,9 @@ class AlodQueryService:
         if lookup_key in self.all_lemmas:
             uri = self.all_lemmas[lookup_key]
             vector = self.word_vectors.get_vector(uri)
-            return (
-                '{ "uri": "'
-                + uri
-                + '",\n"vector": '
-                + self.__to_json_arry(vector)
-                + "}"
-            )
+            return json_serializer.vector_to_json(uri=uri, vector=vector)
         else:
-            return "{}"
+            return json_serializer.EMPTY_RESULT
 
     def get_similarity(self, concept_1: str, concept_2: str) -> float:
         """Calculate the similarity between the two given concepts.
@@ -178,22 +276,7 @@ class AlodQueryService:
         float
             Similarity as JSON.
         """
-        similarity = self.get_similarity(concept_1, concept_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
-
-    def __to_json_arry(self, vector):
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+        return json_serializer.result_to_json(self.get_similarity(concept_1, concept_2))
 
     def __get_file_name(self, file_path):
         return re.search("(?<=\/)[^\/]*$", file_path).group(0)
@@ -0,0 +1,376 @@
+"""ASGI entry point serving the ``/rest`` and ``/rest/v2`` routes of ``flask_server`` on asyncio, e.g.:
+
+    uvicorn kgvec2go_server.asgi_server:application --port 5001
+
+The services are the ones ``flask_server`` initializes (imported on first access of ``application``). Closest
+concept queries and model training run on the heavy executor, vector, similarity and triple score lookups on the
+light executor, so cheap requests do not queue behind expensive ones.
+"""
+
+from ast import literal_eval
+import logging
+from typing import List, Union
+
+from kgvec2go_server.generic import binary_vectors, json_serializer
+from kgvec2go_server.generic.asgi_app import (
+    AsgiApplication,
+    AsgiRequest,
+    AsgiResponse,
+    AsgiStreamingResponse,
+)
+from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.metrics import METRICS_MIMETYPE, Metrics
+from kgvec2go_server.generic.request_validation import (
+    ADMIN_TOKEN_HEADER,
+    BAD_REQUEST,
+    CONCEPT_LIST_ERROR,
+    CONCEPT_PAIR_LIST_ERROR,
+    FORBIDDEN_ERROR,
+    LEGACY_TOP_N_ERROR,
+    NO_SERVICE_ERROR,
+    PAYLOAD_TOO_LARGE,
+    TRIPLE_LIST_ERROR,
+    URI_HEADER_TOO_LARGE_ERROR,
+    is_admin_token,
+    parse_json_list,
+    parse_label_lines,
+    parse_legacy_top_n,
+)
+from kgvec2go_server.generic.service_catalog import ServiceCatalog
+from kgvec2go_server.generic.service_registry import ServiceRegistry
+
+
+def create_application(
+    service_catalog: ServiceCatalog,
+    rdf_2_vec=None,
+    heavy_workers: Union[None, int] = None,
+    light_workers: Union[None, int] = None,
+    metrics: Union[None, Metrics] = None,
+) -> AsgiApplication:
+    """Creates the ASGI application.
+
+    Parameters
+    ----------
+    service_catalog : ServiceCatalog
+        The services of the ``/rest/v2`` and of the legacy ``/rest`` routes.
+    rdf_2_vec : jRDF2Vec
+        Optional; the RDF2Vec light service.
+    heavy_workers : int
+        Number of threads for closest concept queries and training.
+    light_workers : int
+        Number of threads for lookups.
+    metrics : Metrics
+        Records the requests and is exported at ``/metrics``. Default: ``Metrics.get_default()``.
+
+    Returns
+    -------
+    AsgiApplication
+    """
+    app = AsgiApplication(
+        heavy_workers=heavy_workers, light_workers=light_workers, metrics=metrics
+    )
+
+    async def get_service(
+        dataset: str, dataset_version: str, model: str, model_version: str
+    ) -> Union[None, GenericKvQueryService]:
+        # a service that is not loaded yet is loaded on the heavy executor, not on the event loop
+        key = ServiceRegistry.get_key(dataset, dataset_version, model, model_version)
+        if service_catalog.is_loaded(key):
+            service = service_catalog.get(*key)
+        else:
+            service = await app.run_heavy(service_catalog.get, *key)
+        if service is None:
+            logging.error(
+                f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+            )
+        return service
+
+    async def get_legacy_service(data_set: str):
+        data_set = data_set.lower()
+        if service_catalog.is_loaded(data_set):
+            return service_catalog.get_legacy(data_set)
+        return await app.run_heavy(service_catalog.get_legacy, data_set)
+
+    async def get_vector_response(
+        service: GenericKvQueryService, labels: List[str], request: AsgiRequest
+    ) -> Union[None, AsgiResponse]:
+        mimetype = binary_vectors.negotiate_mimetype(request.get_header("accept"))
+        if mimetype == binary_vectors.JSON_MIMETYPE:
+            return None
+        uris, matrix = await app.run_light(service.get_vector_matrix, labels)
+        headers = binary_vectors.get_headers(
+            uris=uris, matrix=matrix, mimetype=mimetype
+        )
+        if headers is None:
+            return AsgiResponse(URI_HEADER_TOO_LARGE_ERROR, status=PAYLOAD_TOO_LARGE)
+        return AsgiResponse(
+            binary_vectors.encode(matrix=matrix, mimetype=mimetype, uris=uris),
+            mimetype=mimetype,
+            headers=headers,
+        )
+
+    async def get_streaming_closest_concepts_response(
+        service: GenericKvQueryService,
+        concept_name: str,
+        top_n: int,
+        request: AsgiRequest,
+    ) -> Union[None, AsgiResponse, AsgiStreamingResponse]:
+        mimetype = json_serializer.negotiate_mimetype(request.get_header("accept"))
+        if (
+            mimetype != json_serializer.NDJSON_MIMETYPE
+            and top_n <= json_serializer.STREAMING_TOP_N
+        ):
+            return None
+        chunks = await app.run_heavy(
+            service.stream_closest_concepts,
+            concept_name,
+            top_n,
+            mimetype == json_serializer.NDJSON_MIMETYPE,
+        )
+        if chunks is None:
+            return AsgiResponse(json_serializer.EMPTY_RESULT, mimetype=mimetype)
+        return AsgiStreamingResponse(chunks, mimetype=mimetype)
+
+    @app.route("/metrics")
+    async def get_metrics(request):
+        return AsgiResponse(app.metrics.render(), mimetype=METRICS_MIMETYPE)
+
+    @app.route("/rest/rdf2vec-light/<data_set>/<walks>/<mode>/<dimension>")
+    async def rdf2vec_light(request, data_set, walks, mode, dimension):
+        if data_set.lower() != "dbpedia" or rdf_2_vec is None:
+            return None
+        entities = request.get_header("entities")
+        if entities is None:
+            logging.error("Entities are missing in header.")
+            return None
+        entities = literal_eval(entities)
+        result = await rdf_2_vec.train_light_async(
+            entities=entities, number_of_walks=walks, mode=mode, dimension=dimension
+        )
+        return json_serializer.dumps(result)
+
+    @app.route(
+        "/rest/v2/closest-concepts/<dataset>/<dataset_version>/<model>/<model_version>/<int:top_n>/<concept_name>"
+    )
+    async def closest_concepts(
+        request, dataset, dataset_version, model, model_version, top_n, concept_name
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        streaming_response = await get_streaming_closest_concepts_response(
+            service, concept_name, top_n, request
+        )
+        if streaming_response is not None:
+            return streaming_response
+        return await app.run_heavy(
+            service.get_closest_concepts_json, concept_name, top_n
+        )
+
+    @app.route(
+        "/rest/v2/addition-closest-concepts/<dataset>/<dataset_version>/<model>/<model_version>/<int:top_n>/<concept_name_1>/<concept_name_2>"
+    )
+    async def addition_closest_concepts(
+        request,
+        dataset,
+        dataset_version,
+        model,
+        model_version,
+        top_n,
+        concept_name_1,
+        concept_name_2,
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        return await app.run_heavy(
+            service.most_similar_addition_json, concept_name_1, concept_name_2, top_n
+        )
+
+    @app.route("/rest/closest-concepts/<data_set>/<top_n>/<concept_name>")
+    async def closest_concepts_legacy(request, data_set, top_n, concept_name):
+        top_n = parse_legacy_top_n(top_n)
+        if top_n is None:
+            return AsgiResponse(LEGACY_TOP_N_ERROR, status=BAD_REQUEST)
+        service = await get_legacy_service(data_set)
+        if service is None:
+            return None
+        return await app.run_heavy(service.find_closest_lemmas, concept_name, top_n)
+
+    @app.route(
+        "/rest/v2/get-triple-score/<dataset>/<dataset_version>/<model>/<model_version>/<subject>/<predicate>/<object>"
+    )
+    async def get_triple_score(
+        request,
+        dataset,
+        dataset_version,
+        model,
+        model_version,
+        subject,
+        predicate,
+        object,
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        return await app.run_light(
+            service.get_triple_score_json, subject, predicate, object
+        )
+
+    @app.route(
+        "/rest/v2/get-vector/<dataset>/<dataset_version>/<model>/<model_version>/<concept_name>"
+    )
+    async def get_vector(
+        request, dataset, dataset_version, model, model_version, concept_name
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        binary_response = await get_vector_response(service, [concept_name], request)
+        if binary_response is not None:
+            return binary_response
+        return await app.run_light(service.get_vector_json, concept_name)
+
+    @app.route(
+        "/rest/v2/get-vector/<dataset>/<dataset_version>/<model>/<model_version>",
+        methods=("POST",),
+    )
+    async def get_vector_batch(request, dataset, dataset_version, model, model_version):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        labels = parse_json_list(request.get_json())
+        if labels is None:
+            return AsgiResponse(CONCEPT_LIST_ERROR, status=BAD_REQUEST)
+        binary_response = await get_vector_response(service, labels, request)
+        if binary_response is not None:
+            return binary_response
+        return await app.run_light(service.get_vectors_json, labels)
+
+    @app.route(
+        "/rest/v2/get-similarity/<dataset>/<dataset_version>/<model>/<model_version>",
+        methods=("POST",),
+    )
+    async def get_similarity_batch(
+        request, dataset, dataset_version, model, model_version
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        label_pairs = parse_json_list(request.get_json(), entry_length=2)
+        if label_pairs is None:
+            return AsgiResponse(CONCEPT_PAIR_LIST_ERROR, status=BAD_REQUEST)
+        return await app.run_light(service.get_similarities_json, label_pairs)
+
+    @app.route(
+        "/rest/v2/get-triple-score/<dataset>/<dataset_version>/<model>/<model_version>",
+        methods=("POST",),
+    )
+    async def get_triple_score_batch(
+        request, dataset, dataset_version, model, model_version
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        triples = parse_json_list(request.get_json(), entry_length=3)
+        if triples is None:
+            return AsgiResponse(TRIPLE_LIST_ERROR, status=BAD_REQUEST)
+        return await app.run_light(service.get_triple_scores_json, triples)
+
+    @app.route(
+        "/rest/v2/closest-concepts/<dataset>/<dataset_version>/<model>/<model_version>/<int:top_n>",
+        methods=("POST",),
+    )
+    async def closest_concepts_batch(
+        request, dataset, dataset_version, model, model_version, top_n
+    ):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        labels = parse_json_list(request.get_json())
+        if labels is None:
+            return AsgiResponse(CONCEPT_LIST_ERROR, status=BAD_REQUEST)
+        return await app.run_heavy(
+            service.get_closest_concepts_batch_json, labels, top_n
+        )
+
+    @app.route(
+        "/rest/v2/export-vectors/<dataset>/<dataset_version>/<model>/<model_version>",
+        methods=("POST",),
+    )
+    async def export_vectors(request, dataset, dataset_version, model, model_version):
+        service = await get_service(dataset, dataset_version, model, model_version)
+        if service is None:
+            return NO_SERVICE_ERROR
+        content_type = request.get_header("content-type", "")
+        if content_type.split(";")[0].strip() == "text/plain":
+            labels = parse_label_lines(request.body.decode("utf-8"))
+        else:
+            labels = parse_json_list(request.get_json())
+        if labels is None:
+            return AsgiResponse(CONCEPT_LIST_ERROR, status=BAD_REQUEST)
+        return AsgiStreamingResponse(
+            service.stream_vectors(labels), mimetype=json_serializer.NDJSON_MIMETYPE
+        )
+
+    @app.route("/rest/get-vector/<data_set>/<concept_name>")
+    async def get_vector_legacy(request, data_set, concept_name):
+        service = await get_legacy_service(data_set)
+        if service is None:
+            return None
+        return await app.run_light(service.get_vector, concept_name)
+
+    @app.route("/rest/get-similarity/<data_set>/<concept_name_1>/<concept_name_2>")
+    async def get_similarity(request, data_set, concept_name_1, concept_name_2):
+        service = await get_legacy_service(data_set)
+        if service is None:
+            return None
+        return await app.run_light(
+            service.get_similarity_json, concept_name_1, concept_name_2
+        )
+
+    @app.route("/admin/swap-service", methods=("POST",))
+    async def swap_service(request):
+        if not is_admin_token(request.get_header(ADMIN_TOKEN_HEADER)):
+            return AsgiResponse(FORBIDDEN_ERROR, status=403)
+        try:
+            configuration, replaces, warm_up_labels = ServiceCatalog.parse_swap_request(
+                request.get_json()
+            )
+        except ValueError as error:
+            return AsgiResponse(json_serializer.error_to_json(str(error)), status=400)
+        service_catalog.swap_in_background(configuration, replaces, warm_up_labels)
+        return AsgiResponse(json_serializer.dumps({"status": "loading"}), status=202)
+
+    @app.route("/admin/swap-service")
+    async def get_swap_status(request):
+        if not is_admin_token(request.get_header(ADMIN_TOKEN_HEADER)):
+            return AsgiResponse(FORBIDDEN_ERROR, status=403)
+        return json_serializer.dumps(service_catalog.get_swap_status())
+
+    return app
+
+
+def __getattr__(name: str):
+    """Builds ``application`` from the services of ``flask_server`` on first access."""
+    if name != "application":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from kgvec2go_server import flask_server
+
+    global application
+    application = create_application(
+        service_catalog=flask_server.service_catalog,
+        rdf_2_vec=flask_server.rdf_2_vec,
+        metrics=flask_server.metrics,
+    )
+    return application
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    from kgvec2go_server.flask_server import local_port
+
+    uvicorn.run(
+        "kgvec2go_server.asgi_server:application", host="0.0.0.0", port=local_port
+    )
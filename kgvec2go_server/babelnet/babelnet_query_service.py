@@ -1,18 +1,62 @@
+from functools import partial
 import gensim
+import logging
 import re
 from gensim.test.utils import get_tmpfile
 from gensim.models import KeyedVectors
-from collections import namedtuple
+import numpy as np
+from numpy import ndarray
+from typing import Dict, List, Tuple, Union
+
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.sense_index import SenseIndex
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+from kgvec2go_server.generic.term_snapshot import Snapshot, TermTable
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class BabelNetQueryService:
-    def __init__(self, entity_file, model_file="", vector_file=""):
+    POS_PATTERN = re.compile("_([a-zA-Z]{1})_(en|EN)$")
+    """POS suffix of a BabelNet lemma, e.g. ``_n_EN`` in ``bn:sleep_n_EN``."""
+
+    POS_TAGS = ("n", "v", "a", "r")
 
-        self.all_lemmas = self.__read_lemmas(entity_file)
+    SNAPSHOT_NAME = "babelnet"
 
-        # term mapping example entry: sleep -> {bn:sleep_n_EN, bn:sleep_v_EN, bn:Sleep_n_EN}
-        self.term_mapping = self.__map_terms(self.all_lemmas)
+    def __init__(
+        self,
+        entity_file,
+        model_file="",
+        vector_file="",
+        use_snapshot=True,
+        vector_store: Union[None, VectorStore] = None,
+        batch_window: Union[None, float] = None,
+    ):
+        """
 
+        Parameters
+        ----------
+        entity_file
+            File to the lemmas. Not read if a snapshot is loaded.
+        model_file
+            The model file. If used, the vector_file is not required.
+        vector_file
+            The vector file. If used, the model_file is not required.
+        use_snapshot
+            If True and a valid snapshot of the vector file exists (see scripts/build_snapshot.py), the term
+            mapping, the sense index and the lemma subset are loaded from the snapshot.
+        vector_store
+            Store through which the vectors are loaded and the normalized matrices are shared between the
+            processes of the host. Default: the store of the process.
+        batch_window
+            If given, concurrent closest lemma queries of the same POS are gathered for up to batch_window
+            seconds and answered with one search (see ``MicroBatchScheduler``).
+        """
+        vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
+        vector_file_path = ""
         if model_file == "" and vector_file == "":
             print("ERROR - At least one file must be given.")
         elif model_file != "":
@@ -26,15 +70,152 @@ class BabelNetQueryService:
         elif vector_file != "":
             try:
                 vector_file_path = get_tmpfile(self.__get_file_name(vector_file))
-                self.word_vectors: KeyedVectors = KeyedVectors.load(
-                    vector_file_path, mmap="r"
+                self.word_vectors: KeyedVectors = vector_store.load_vectors(
+                    vector_file_path
                 )
             except FileNotFoundError:
                 vector_file_path = vector_file
-                self.word_vectors: KeyedVectors = KeyedVectors.load(
-                    vector_file_path, mmap="r"
+                self.word_vectors: KeyedVectors = vector_store.load_vectors(
+                    vector_file_path
                 )
 
+        snapshot = None
+        if use_snapshot and vector_file_path != "":
+            snapshot = Snapshot.load(vector_file_path, name=self.SNAPSHOT_NAME)
+        if snapshot is not None:
+            self.__load_snapshot(snapshot)
+        else:
+            self.all_lemmas = self.__read_lemmas(entity_file)
+
+            # term mapping example entry: sleep -> {bn:sleep_n_EN, bn:sleep_v_EN, bn:Sleep_n_EN}
+            self.term_mapping = self.__map_terms(self.all_lemmas)
+
+            if hasattr(self, "word_vectors"):
+                self.__build_lemma_subset()
+                self.sense_index = SenseIndex.build(
+                    term_mapping=self.term_mapping,
+                    key_to_index=self.word_vectors.key_to_index,
+                    pos_tags=self.POS_TAGS,
+                    get_pos=self.__get_pos,
+                    fallback_pos="n",
+                )
+
+        if hasattr(self, "word_vectors"):
+            # one normalized matrix of all lemmas in the vocabulary; the subset matrix of one POS is the
+            # contiguous slice pos_ranges[pos] (no copy)
+            self.lemma_engine = vector_store.get_engine(
+                path=model_file if vector_file_path == "" else vector_file_path,
+                vectors=self.word_vectors.vectors,
+                indices=self.lemma_indices,
+            )
+            logging.info(
+                "Lemma matrix created. Lemmas per POS: %s",
+                {pos: end - start for pos, (start, end) in self.pos_ranges.items()},
+            )
+            # None: all lemmas
+            self.pos_engines: Dict[Union[None, str], BatchSimilarityEngine] = {
+                None: self.lemma_engine
+            }
+            for pos, (start, end) in self.pos_ranges.items():
+                self.pos_engines[pos] = BatchSimilarityEngine(
+                    vectors=self.lemma_engine.normalized_vectors[start:end],
+                    is_normalized=True,
+                    executor=self.lemma_engine.executor,
+                )
+
+        # one scheduler per POS: a batch is answered with one scan of the slice of its POS
+        self.batch_schedulers: Dict[Union[None, str], MicroBatchScheduler] = {}
+        if batch_window is not None and hasattr(self, "word_vectors"):
+            for pos in self.pos_engines:
+                self.batch_schedulers[pos] = MicroBatchScheduler(
+                    search=partial(self.__search_closest_lemmas, pos=pos),
+                    window=batch_window,
+                )
+
+    def to_snapshot(self) -> Snapshot:
+        """Snapshot of the structures derived from the entity file (see ``Snapshot``)."""
+        term_table = TermTable.build(
+            term_mapping=self.term_mapping,
+            key_to_index=self.word_vectors.key_to_index,
+            index_to_key=self.word_vectors.index_to_key,
+            multi_valued=True,
+        )
+        # the rows of the sense index are the rows of the term table
+        sense_index = SenseIndex.build(
+            term_mapping={
+                lookup_key: uris
+                for lookup_key, uris in self.term_mapping.items()
+                if lookup_key in term_table
+            },
+            key_to_index=self.word_vectors.key_to_index,
+            pos_tags=self.POS_TAGS,
+            get_pos=self.__get_pos,
+            fallback_pos="n",
+        )
+        return Snapshot(
+            arrays={
+                **term_table.to_arrays("term_mapping"),
+                "senses": sense_index.senses,
+                "lemma_indices": self.lemma_indices,
+            },
+            metadata={
+                "pos_tags": list(self.POS_TAGS),
+                "pos_ranges": {pos: list(r) for pos, r in self.pos_ranges.items()},
+            },
+        )
+
+    def __load_snapshot(self, snapshot: Snapshot):
+        self.term_mapping = TermTable.from_arrays(
+            snapshot.arrays,
+            prefix="term_mapping",
+            index_to_key=self.word_vectors.index_to_key,
+            multi_valued=True,
+        )
+        self.sense_index = SenseIndex(
+            row_of_key=self.term_mapping.keys,
+            pos_tags=tuple(snapshot.metadata["pos_tags"]),
+            senses=snapshot.arrays["senses"],
+        )
+        self.lemma_indices = snapshot.arrays["lemma_indices"]
+        self.pos_ranges = {
+            pos: (start, end)
+            for pos, (start, end) in snapshot.metadata["pos_ranges"].items()
+        }
+        self.all_lemmas = [
+            self.word_vectors.index_to_key[i] for i in self.lemma_indices
+        ]
+        logging.info("BabelNet snapshot loaded.")
+
+    @staticmethod
+    def __get_pos(lemma: str) -> Union[None, str]:
+        match = BabelNetQueryService.POS_PATTERN.search(lemma)
+        return None if match is None else match.group(1).lower()
+
+    def __build_lemma_subset(self):
+        """Determines the vocabulary indices of all lemmas that are in the vocabulary, grouped by POS, and the
+        row range of every POS."""
+        lemma_indices = []
+        lemma_pos = []
+        for lemma in self.all_lemmas:
+            index = self.word_vectors.key_to_index.get(lemma)
+            if index is None:
+                continue
+            pos = self.__get_pos(lemma)
+            lemma_indices.append(index)
+            lemma_pos.append("" if pos is None else pos)
+        lemma_pos = np.array(lemma_pos, dtype=str)
+        order = np.argsort(lemma_pos, kind="stable")
+        lemma_pos = lemma_pos[order]
+
+        # row i belongs to vocabulary index lemma_indices[i]
+        self.lemma_indices: ndarray = np.array(lemma_indices, dtype=np.int64)[order]
+        self.pos_ranges: Dict[str, Tuple[int, int]] = {}
+        for pos in np.unique(lemma_pos):
+            self.pos_ranges[str(pos)] = (
+                int(np.searchsorted(lemma_pos, pos, side="left")),
+                int(np.searchsorted(lemma_pos, pos, side="right")),
+            )
+
     def __map_terms(self, all_lemmas):
         result = {}
         for uri in all_lemmas:
@@ -78,30 +259,22 @@ class BabelNetQueryService:
         """
         lookup_key = self.transform_string(search_term)
         pos = pos.lower()
-        result = None
         if lookup_key not in self.term_mapping:
             # cannot be mapepd
             return None
         set_to_pick_from = self.term_mapping.get(lookup_key)
 
         # check for exact match
-        for candidate in set_to_pick_from:
-            if search_term in candidate and ("_" + pos + "_EN") in candidate:
-                return candidate
-
-        # exact match not found, return first POS match
-        for candidate in set_to_pick_from:
-            if ("_" + pos + "_EN") in candidate:
-                return candidate
-
-        # pos not found, try noun
-        if pos != "n":
-            pos = "n"
-            for candidate in set_to_pick_from:
-                if ("_" + pos + "_EN") in candidate:
-                    return candidate
-
-        # no POS match, no exact match, return any
+        candidate = "bn:" + search_term + "_" + pos + "_EN"
+        if candidate in set_to_pick_from:
+            return candidate
+
+        # exact match not found: POS match, else noun, else any (resolved by the sense index)
+        index = self.sense_index.lookup(lookup_key, pos=pos)
+        if index >= 0:
+            return self.word_vectors.index_to_key[index]
+
+        # no candidate in the vocabulary, return any
         return tuple(set_to_pick_from)[0]
 
     @staticmethod
@@ -138,66 +311,85 @@ class BabelNetQueryService:
         print("BabelNet lemmas read.")
         return result
 
-    def find_closest_lemmas_given_key(self, key, top):
-        if key not in self.word_vectors:
+    def find_closest_lemmas_given_key(
+        self, key: str, top, pos: Union[None, str] = None
+    ) -> Union[None, str]:
+        """Determine the closest lemmas of a BabelNet key.
+
+        Parameters
+        ----------
+        key : str
+            The key in the vector space, e.g. ``bn:sleep_n_EN``.
+        top : str
+            Top N most related concepts. Will be casted to int.
+        pos : str
+            Optional POS (n, v, a, r); if given, only lemmas of this POS are scanned. Default: all lemmas.
+
+        Returns
+        -------
+        str
+            Result list in JSON; None if the key is not in the vocabulary.
+        """
+        if key not in self.word_vectors.key_to_index:
             return None
-        result_list = []
-        ResultEntry = namedtuple("ResultEntry", "concept similarity")
-        for concept in self.all_lemmas:
-            result_list.append(
-                ResultEntry(
-                    concept, self.word_vectors.similarity(key, self.all_lemmas[concept])
-                )
-            )
-        result_list.sort(key=self.__take_second, reverse=True)
-        result_list = result_list[: int(top)]
-        result = '{\n"result": [\n'
-        is_first = True
-        for entry in result_list:
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-            else:
-                result += (
-                    ',\n{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-        result += "\n]\n}"
-        return result
+        indices, scores = self.__rank_closest_lemmas(key=key, topn=int(top), pos=pos)
+        return json_serializer.closest_concepts_to_json(
+            keys=self.word_vectors.index_to_key, indices=indices, scores=scores
+        )
 
-    def find_closest_lemmas(self, lemma, top):
-        print("Closest lemma query for " + lemma + " received.")
-        lookup_key = self.transform_string(lemma)
-        if lookup_key in self.all_lemmas:
-            return self.find_closest_lemmas_given_key(
-                key=self.all_lemmas[lookup_key], top=top
-            )
-        else:
-            return "{}"
+    def __rank_closest_lemmas(
+        self, key: str, topn: int, pos: Union[None, str] = None
+    ) -> Tuple[ndarray, ndarray]:
+        """Vocabulary indices and scores of the closest lemmas of the key, ordered by descending score."""
+        pos = None if pos is None else pos.lower()
+        if pos not in self.pos_engines:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        index = self.word_vectors.key_to_index[key]
+        if pos in self.batch_schedulers:
+            # coalesced with the concurrent requests of other threads
+            return self.batch_schedulers[pos].submit(concept=index, topn=topn)
+        indices, scores = self.__search_closest_lemmas([index], topn, pos=pos)
+        return indices[0], scores[0]
+
+    def __search_closest_lemmas(
+        self, indices: List[int], topn: int, pos: Union[None, str]
+    ) -> Tuple[ndarray, ndarray]:
+        start = 0 if pos is None else self.pos_ranges[pos][0]
+        positions, scores = self.pos_engines[pos].top_k(
+            query_vectors=self.word_vectors.vectors[indices], topn=topn
+        )
+        return self.lemma_indices[start + positions], scores
 
-    def __take_second(self, element):
-        """For sorting."""
-        return element[1]
+    def find_closest_lemmas(self, lemma, top, pos: Union[None, str] = None):
+        """Determine the closest lemmas of a lemma.
+
+        Parameters
+        ----------
+        lemma : str
+            Lemma for which the closest lemmas shall be obtained.
+        top : str
+            Top N most related concepts. Will be casted to int.
+        pos : str
+            Optional POS (n, v, a, r). If given, the sense of that POS is queried and only lemmas of that POS
+            are returned. Default: the noun sense (if any) is queried against all lemmas.
+
+        Returns
+        -------
+        str
+            Result list in JSON.
+        """
+        logging.debug("Closest lemma query for %s received.", lemma)
+        key = self.get_lookup_key(lemma, pos="n" if pos is None else pos)
+        if key is None or key not in self.word_vectors.key_to_index:
+            return json_serializer.EMPTY_RESULT
+        return self.find_closest_lemmas_given_key(key=key, top=top, pos=pos)
 
     def get_vector_json(self, lemma, pos="n"):
-        vector = self.get_lookup_key(lemma, pos)
-        if vector is None:
-            return "{}"
-        return (
-            '{ "uri": "'
-            + vector
-            + '",\n"vector": '
-            + self.__to_json_array(vector)
-            + "}"
+        key = self.get_lookup_key(lemma, pos)
+        if key is None or key not in self.word_vectors.key_to_index:
+            return json_serializer.EMPTY_RESULT
+        return json_serializer.vector_to_json(
+            uri=key, vector=self.word_vectors.get_vector(key)
         )
 
     def get_similarity(self, concept_1, concept_2, pos):
@@ -230,36 +422,21 @@ class BabelNetQueryService:
         lookup_key_1 = self.get_lookup_key(concept_1, pos_1)
         lookup_key_2 = self.get_lookup_key(concept_2, pos_2)
         if lookup_key_1 is None:
-            print(
-                "[babelnet_query_service#get_similarity] Concept '"
-                + concept_1
-                + "' could not be found."
-            )
+            logging.debug("Concept '%s' could not be found.", concept_1)
             return None
         if lookup_key_2 is None:
-            print(
-                "[babelnet_query_service#get_similarity] Concept '"
-                + concept_2
-                + "' could not be found."
-            )
+            logging.debug("Concept '%s' could not be found.", concept_2)
             return None
         try:
-            print("Find similarity for:")
-            print(lookup_key_1)
-            print(lookup_key_2)
-            similarity = self.word_vectors.similarity(lookup_key_1, lookup_key_2)
-            print("Similarity = " + str(similarity))
-            return similarity
+            return self.word_vectors.similarity(lookup_key_1, lookup_key_2)
         except KeyError:
-            print(
-                "A key error occurred for tuple: ("
-                + concept_1
-                + " | "
-                + concept_2
-                + ")"
+            logging.debug(
+                "A key error occurred for tuple: (%s | %s), lookup keys: %s, %s",
+                concept_1,
+                concept_2,
+                lookup_key_1,
+                lookup_key_2,
             )
-            print("Lookup key 1: " + lookup_key_1)
-            print("Lookup key 2: " + lookup_key_2)
             return None
 
     def get_similarity_json(
@@ -286,23 +463,9 @@ class BabelNetQueryService:
         float
             Similarity as JSON.
         """
-        similarity = self.get_similarity(concept_1, concept_2, pos_1=pos_1, pos_2=pos_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
-
-    @staticmethod
-    def __to_json_array(vector):
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+        return json_serializer.result_to_json(
+            self.get_similarity(concept_1, concept_2, pos_1=pos_1, pos_2=pos_2)
+        )
 
     @staticmethod
     def __get_file_name(file_path):
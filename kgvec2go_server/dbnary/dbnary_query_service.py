@@ -1,18 +1,33 @@
 import gensim
-from collections import namedtuple
 from gensim.models import KeyedVectors
-from typing import Union
+import logging
+import numpy as np
+from numpy import ndarray
+from typing import List, Union, Tuple
+
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.result_cache import ResultCache, RankedResultMemo
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+from kgvec2go_server.generic.term_snapshot import Snapshot, TermTable
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class DbnaryQueryService:
     """Query service for the dbnary data set."""
 
+    SNAPSHOT_NAME = "dbnary"
+
     def __init__(
         self,
         entity_file="",
         model_file="",
         vector_file="",
         is_reduced_vector_file=False,
+        cache: Union[None, ResultCache] = None,
+        use_snapshot: bool = True,
+        vector_store: Union[None, VectorStore] = None,
+        batch_window: Union[None, float] = None,
     ):
         """
 
@@ -26,19 +41,96 @@ class DbnaryQueryService:
             The vector file. If used, the model_file is not required.
         is_reduced_vector_file
             True if unnecessary have already been removed from the vector space (using vector_shrinker.py).
+        cache
+            Optional result cache (may be shared with other services). Default: a new in-process cache.
+        use_snapshot
+            If True and a valid snapshot of the vector file exists (see scripts/build_snapshot.py), the term
+            mapping and the lemma subset are loaded from the snapshot instead of the entity file.
+        vector_store
+            Store through which the vectors are loaded and the normalized matrices are shared between the
+            processes of the host. Default: the store of the process.
+        batch_window
+            If given (and the vector file is not reduced), concurrent closest lemma queries are gathered for up
+            to batch_window seconds and answered with one search (see ``MicroBatchScheduler``).
         """
+        vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
         if vector_file == "":
             self.model = gensim.models.Word2Vec.load(model_file)
             self.vectors = self.model.wv
         else:
-            self.vectors = KeyedVectors.load(vector_file, mmap="r")
+            self.vectors = vector_store.load_vectors(vector_file)
 
         self.is_reduced_vector_file = is_reduced_vector_file
-        self.all_lemmas = self.__read_lemmas(entity_file)
-        self.term_mapping = self.__map_terms(self.all_lemmas)
 
-        # cache for UI
-        self.closest_concepts_cache = {}
+        # normalized matrix of the lemma subset; row i belongs to vocabulary index lemma_indices[i]
+        self.lemma_indices: Union[None, ndarray] = None
+        self.lemma_engine: Union[None, BatchSimilarityEngine] = None
+
+        snapshot = None
+        if use_snapshot and vector_file != "" and not is_reduced_vector_file:
+            snapshot = Snapshot.load(vector_file, name=self.SNAPSHOT_NAME)
+        if snapshot is None:
+            self.all_lemmas = self.__read_lemmas(entity_file)
+            self.term_mapping = self.__map_terms(self.all_lemmas)
+            if not self.is_reduced_vector_file:
+                self.lemma_indices = np.array(
+                    [self.vectors.key_to_index[lemma] for lemma in self.all_lemmas],
+                    dtype=np.int64,
+                )
+        else:
+            self.__load_snapshot(snapshot)
+
+        if not self.is_reduced_vector_file:
+            self.lemma_engine = vector_store.get_engine(
+                path=model_file if vector_file == "" else vector_file,
+                vectors=self.vectors.vectors,
+                indices=self.lemma_indices,
+            )
+
+        # cache for UI; the cache may be shared with other services: the namespace includes the file, its version
+        # and the lemma subset
+        self.closest_concepts_memo = RankedResultMemo(
+            cache=ResultCache() if cache is None else cache,
+            namespace=(
+                str(self),
+                *VectorStore.get_file_namespace(
+                    model_file if vector_file == "" else vector_file,
+                    indices=self.lemma_indices,
+                ),
+            ),
+        )
+        self.batch_scheduler: Union[None, MicroBatchScheduler] = None
+        if batch_window is not None and not self.is_reduced_vector_file:
+            self.batch_scheduler = MicroBatchScheduler(
+                search=self.__search_closest_lemmas, window=batch_window
+            )
+
+    def to_snapshot(self) -> Snapshot:
+        """Snapshot of the structures derived from the entity file (see ``Snapshot``). Requires a non-reduced
+        vector file."""
+        term_table = TermTable.build(
+            term_mapping=self.term_mapping,
+            key_to_index=self.vectors.key_to_index,
+            index_to_key=self.vectors.index_to_key,
+        )
+        return Snapshot(
+            arrays={
+                **term_table.to_arrays("term_mapping"),
+                "lemma_indices": self.lemma_indices,
+            }
+        )
+
+    def __load_snapshot(self, snapshot: Snapshot):
+        self.term_mapping = TermTable.from_arrays(
+            snapshot.arrays,
+            prefix="term_mapping",
+            index_to_key=self.vectors.index_to_key,
+        )
+        self.lemma_indices = snapshot.arrays["lemma_indices"]
+        self.all_lemmas = [self.vectors.index_to_key[i] for i in self.lemma_indices]
+        logging.info("Dbnary snapshot loaded.")
 
     def __map_terms(self, all_lemmas):
         result = {}
@@ -94,91 +186,65 @@ class DbnaryQueryService:
     def find_closest_lemmas_given_key(self, key, top) -> Union[None, str]:
         if key not in self.vectors:
             return None
+        indices, scores = self.__rank_closest_lemmas(key=key, topn=int(top))
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
+
+    def __rank_closest_lemmas(self, key: str, topn: int) -> Tuple[ndarray, ndarray]:
+        """Vocabulary indices and scores of the closest lemmas of the key, ordered by descending score."""
         if self.is_reduced_vector_file:
-            result_list = self.vectors.most_similar(positive=key, topn=top)
-        else:
-            result_list = []
-            ResultEntry = namedtuple("ResultEntry", "concept similarity")
-            not_found_error = 0
-            for concept in self.all_lemmas:
-                try:
-                    similarity = self.vectors.similarity(key, concept)
-                    result_list.append(ResultEntry(concept, similarity))
-                except KeyError:
-                    print("Word " + concept + " not found. Continue...")
-                    not_found_error += 1
-            print("Not found keys: " + str(not_found_error))
-            result_list.sort(key=self.__take_second, reverse=True)
-            result_list = result_list[: int(top)]
-        result = '{\n"result": [\n'
-        is_first = True
-        for entry in result_list:
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-            else:
-                result += (
-                    ',\n{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-        result += "\n]\n}"
-        return result
+            result_list = self.vectors.most_similar(positive=key, topn=topn)
+            return (
+                np.array(
+                    [self.vectors.key_to_index[entry[0]] for entry in result_list],
+                    dtype=np.int64,
+                ),
+                np.array([entry[1] for entry in result_list], dtype=np.float32),
+            )
+        index = self.vectors.key_to_index[key]
+        if self.batch_scheduler is not None:
+            # coalesced with the concurrent requests of other threads
+            return self.batch_scheduler.submit(concept=index, topn=topn)
+        indices, scores = self.__search_closest_lemmas([index], topn)
+        return indices[0], scores[0]
+
+    def __search_closest_lemmas(
+        self, indices: List[int], topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        positions, scores = self.lemma_engine.top_k(
+            query_vectors=self.vectors.vectors[indices], topn=topn
+        )
+        return self.lemma_indices[positions], scores
+
+    def __closest_concepts_to_json(self, indices: ndarray, scores: ndarray) -> str:
+        return json_serializer.closest_concepts_to_json(
+            keys=self.vectors.index_to_key, indices=indices, scores=scores
+        )
 
     def find_closest_lemmas(self, lemma, top):
-        print("Closest lemma query for " + lemma + " received.")
+        logging.debug("Closest lemma query for %s received.", lemma)
         lookup_key = self.__transform_string(lemma)
 
-        if lookup_key in self.closest_concepts_cache:
-            print("Serve answer from cache.")
-            return self.closest_concepts_cache[lookup_key]
-
-        result = "{}"
-        if lookup_key in self.term_mapping:
-            result = self.find_closest_lemmas_given_key(
-                key=self.term_mapping[lookup_key], top=top
-            )
-
-        self.closest_concepts_cache[lookup_key] = result
-        return result
+        if lookup_key not in self.term_mapping:
+            return json_serializer.EMPTY_RESULT
+        key = self.term_mapping[lookup_key]
+        if key not in self.vectors:
+            return json_serializer.EMPTY_RESULT
 
-    def __take_second(self, element):
-        """For sorting."""
-        return element[1]
+        indices, scores = self.closest_concepts_memo.get_or_compute(
+            concept=lookup_key,
+            topn=int(top),
+            compute=lambda topn: self.__rank_closest_lemmas(key=key, topn=topn),
+        )
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
 
     def get_vector(self, lemma):
         lookup_key = self.__transform_string(lemma)
         if lookup_key in self.term_mapping:
             uri = self.term_mapping[lookup_key]
             vector = self.vectors.get_vector(uri)
-            return (
-                '{ "uri": "'
-                + uri
-                + '",\n"vector": '
-                + self.__to_json_arry(vector)
-                + "}"
-            )
+            return json_serializer.vector_to_json(uri=uri, vector=vector)
         else:
-            return "{}"
-
-    def __to_json_arry(self, vector):
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+            return json_serializer.EMPTY_RESULT
 
     def get_similarity(self, concept_1, concept_2):
         """Calculate the similarity between the two given concepts.
@@ -210,20 +276,20 @@ class DbnaryQueryService:
 
         if lookup_key_1 not in self.term_mapping:
             if lookup_key_1[0].islower():
-                print("Could not find " + lookup_key_1)
+                logging.debug("Could not find %s", lookup_key_1)
                 lookup_key_1 = lookup_key_1[0].upper() + lookup_key_1[1:]
-                print("Trying " + lookup_key_1)
+                logging.debug("Trying %s", lookup_key_1)
                 if lookup_key_1 not in self.term_mapping:
-                    print("Coud not find " + concept_1)
+                    logging.debug("Could not find %s", concept_1)
                     return None
 
         if lookup_key_2 not in self.term_mapping:
             if lookup_key_2[0].islower():
-                print("Could not find " + lookup_key_2)
+                logging.debug("Could not find %s", lookup_key_2)
                 lookup_key_2 = lookup_key_2[0].upper() + lookup_key_2[1:]
-                print("Trying " + lookup_key_2)
+                logging.debug("Trying %s", lookup_key_2)
                 if lookup_key_2 not in self.term_mapping:
-                    print("Coud not find " + concept_2)
+                    logging.debug("Could not find %s", concept_2)
                     return None
 
         try:
@@ -233,9 +299,11 @@ class DbnaryQueryService:
             # print("sim(" + concept_1 + ", " + concept_2 + ") = " + str(similarity))
             return similarity
         except KeyError:
-            print("KeyError: One of the following concepts not found in vocabulary.")
-            print("\t " + str(self.term_mapping[lookup_key_1]))
-            print("\t " + str(self.term_mapping[lookup_key_2]))
+            logging.debug(
+                "KeyError: One of the following concepts not found in vocabulary: %s, %s",
+                self.term_mapping[lookup_key_1],
+                self.term_mapping[lookup_key_2],
+            )
             return None
 
     def get_similarity_json(self, concept_1, concept_2):
@@ -254,11 +322,7 @@ class DbnaryQueryService:
         float
             Similarity as JSON.
         """
-        similarity = self.get_similarity(concept_1, concept_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
+        return json_serializer.result_to_json(self.get_similarity(concept_1, concept_2))
 
     def __str__(self):
         return "DBnary/Wiktionary Query Service"
@@ -1,18 +1,39 @@
-from typing import Set, Dict
+from typing import Set, Dict, List, Tuple
 
 import gensim
 from gensim.models import KeyedVectors
 import logging
+import numpy as np
+from numpy import ndarray
 from typing import Union
-import sys
 
-# logging
-logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+from kgvec2go_server.generic.ann_index import (
+    ExactIndex,
+    NearestNeighbourIndex,
+    QuantizedIndex,
+)
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.result_cache import ResultCache, RankedResultMemo
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.term_snapshot import Snapshot, TermTable
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class DBpediaQueryService:
+    SNAPSHOT_NAME = "dbpedia"
+
     def __init__(
-        self, model_file: str = "", vector_file: str = "", redirect_file: str = ""
+        self,
+        model_file: str = "",
+        vector_file: str = "",
+        redirect_file: str = "",
+        cache: Union[None, ResultCache] = None,
+        use_snapshot: bool = True,
+        vector_store: Union[None, VectorStore] = None,
+        use_quantized: bool = True,
+        batch_window: Union[None, float] = None,
     ):
         """Constructor
 
@@ -23,9 +44,27 @@ class DBpediaQueryService:
         vector_file : str
             The gensim vector file. Alternatively, a model_file can be provided
         redirect_file
+        cache : ResultCache
+            Optional result cache (may be shared with other services). Default: a new in-process cache.
+        use_snapshot : bool
+            If True and a valid snapshot of the vector file exists (see scripts/build_snapshot.py), the term
+            mapping (with resolved redirects) is loaded from the snapshot; the redirect file is not parsed.
+        vector_store : VectorStore
+            Store through which the vectors are loaded and the normalized matrices are shared between the
+            processes of the host. Default: the store of the process.
+        use_quantized : bool
+            If True and a quantized matrix of the vector file exists (see scripts/quantize_vectors.py), closest
+            concepts are determined on the quantized matrix and rescored on the float32 vectors.
+        batch_window : float
+            If given (and a vector file is used), concurrent closest concept queries are gathered for up to
+            batch_window seconds and answered with one search (see ``MicroBatchScheduler``).
         """
+        vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
         if vector_file != "":
-            self.vectors: KeyedVectors = KeyedVectors.load(vector_file, mmap=None)
+            # memory-mapped: the matrix exists once per host, not once per worker process
+            self.vectors: KeyedVectors = vector_store.load_vectors(vector_file)
         elif model_file != "":
             self.model = gensim.models.Word2Vec.load(model_file)
             self.vectors: KeyedVectors = self.model.wv
@@ -34,18 +73,72 @@ class DBpediaQueryService:
 
         self.all_lemmas = []
         self.redirects = {}
-        if redirect_file != "":
-            logging.info("Parsing redirects...")
-            self.redirects = self.__parse_redirects(redirect_file)
 
-        # reading the instances
-        # self.all_lemmas = self.__read_lemmas(entity_file)
+        snapshot = None
+        if use_snapshot and vector_file != "":
+            snapshot = Snapshot.load(vector_file, name=self.SNAPSHOT_NAME)
+        if snapshot is not None:
+            # redirects are resolved in the term mapping (as by __map_terms)
+            self.term_mapping = TermTable.from_arrays(
+                snapshot.arrays,
+                prefix="term_mapping",
+                index_to_key=self.vectors.index_to_key,
+            )
+            logging.info("DBpedia snapshot loaded.")
+        else:
+            if redirect_file != "":
+                logging.info("Parsing redirects...")
+                self.redirects = self.__parse_redirects(redirect_file)
+
+            # reading the instances
+            # self.all_lemmas = self.__read_lemmas(entity_file)
 
-        # term mapping example entry: sleep -> {bn:sleep_n_EN, bn:sleep_v_EN, bn:Sleep_n_EN}
-        self.term_mapping = self.__map_terms(self.vectors.key_to_index, self.redirects)
+            # term mapping example entry: sleep -> {bn:sleep_n_EN, bn:sleep_v_EN, bn:Sleep_n_EN}
+            self.term_mapping = self.__map_terms(
+                self.vectors.key_to_index, self.redirects
+            )
 
-        # cache init
-        self.closest_concepts_cache = {}
+        # closest concepts: scan of the quantized matrix if it has been built (scripts/quantize_vectors.py), else
+        # a sharded exact scan of the shared normalized matrix
+        self.vector_file = vector_file
+        self.vector_store = vector_store
+        self.closest_concepts_index: Union[None, NearestNeighbourIndex] = None
+        if use_quantized and vector_file != "":
+            quantized = QuantizedMatrix.load(vector_file)
+            if quantized is not None:
+                self.closest_concepts_index = QuantizedIndex(
+                    quantized=quantized,
+                    vectors=self.vectors.vectors,
+                    executor=ShardedScanExecutor.get_default(),
+                )
+                logging.info(f"DBpedia {quantized.dtype} quantized matrix loaded.")
+
+        self.batch_scheduler: Union[None, MicroBatchScheduler] = None
+        if batch_window is not None and vector_file != "":
+            self.batch_scheduler = MicroBatchScheduler(
+                search=self.__search_closest_concepts, window=batch_window
+            )
+
+        # cache init; the namespace separates the results of services on other files (or file versions) that
+        # share the cache
+        self.closest_concepts_memo = RankedResultMemo(
+            cache=ResultCache() if cache is None else cache,
+            namespace=(
+                str(self),
+                *VectorStore.get_file_namespace(
+                    vector_file if vector_file != "" else model_file
+                ),
+            ),
+        )
+
+    def to_snapshot(self) -> Snapshot:
+        """Snapshot of the term mapping (see ``Snapshot``); redirects are already resolved in it."""
+        term_table = TermTable.build(
+            term_mapping=self.term_mapping,
+            key_to_index=self.vectors.key_to_index,
+            index_to_key=self.vectors.index_to_key,
+        )
+        return Snapshot(arrays=term_table.to_arrays("term_mapping"))
 
     def __read_lemmas(self, entity_file_path):
         result = set()
@@ -83,7 +176,8 @@ class DBpediaQueryService:
         Returns
         -------
         dict
-            A dictionary of the form: normalized term -> uri.
+            A dictionary of the form: normalized term -> uri. Redirects are resolved, i.e. every uri is in the
+            vocabulary (redirects to concepts outside the vocabulary are dropped).
 
         """
         result = {}
@@ -92,7 +186,9 @@ class DBpediaQueryService:
             result[lookup_key] = uri
         for uri in redirects:
             lookup_key = self.transform_string(uri)
-            result[lookup_key] = uri
+            target = uri if uri in all_lemmas else redirects[uri]
+            if target in all_lemmas:
+                result[lookup_key] = target
         return result
 
     @staticmethod
@@ -154,59 +250,35 @@ class DBpediaQueryService:
 
         if lookup_key_1 not in self.term_mapping:
             if lookup_key_1[0].islower():
-                logging.info("Could not find " + lookup_key_1)
+                logging.debug("Could not find %s", lookup_key_1)
                 lookup_key_1 = lookup_key_1[0].upper() + lookup_key_1[1:]
-                logging.info("Trying " + lookup_key_1)
+                logging.debug("Trying %s", lookup_key_1)
                 if lookup_key_1 not in self.term_mapping:
-                    logging.info("Could not find " + concept_1)
+                    logging.debug("Could not find %s", concept_1)
                     return None
 
         if lookup_key_2 not in self.term_mapping:
             if lookup_key_2[0].islower():
-                logging.info("Could not find " + lookup_key_2)
+                logging.debug("Could not find %s", lookup_key_2)
                 lookup_key_2 = lookup_key_2[0].upper() + lookup_key_2[1:]
-                logging.info("Trying " + lookup_key_2)
+                logging.debug("Trying %s", lookup_key_2)
                 if lookup_key_2 not in self.term_mapping:
-                    logging.info("Could not find " + concept_2)
+                    logging.debug("Could not find %s", concept_2)
                     return None
 
-        lookup_key_1 = self.term_mapping[lookup_key_1]
-        lookup_key_2 = self.term_mapping[lookup_key_2]
-
         try:
-            # handling redirects
-            if lookup_key_1 not in self.vectors:
-                logging.info(
-                    "Lookup Key 1 ("
-                    + lookup_key_1
-                    + ") not in vocabulary. Check redirects."
-                )
-                lookup_key_1 = self.redirects[lookup_key_1]
-                logging.info(
-                    "Lookup Key 1 redirects to: "
-                    + str(lookup_key_1.encode(encoding="utf-8"))
-                )
-            if lookup_key_2 not in self.vectors:
-                logging.info(
-                    "Lookup Key 2 ("
-                    + lookup_key_2
-                    + ") not in vocabulary. Check redirects."
-                )
-                lookup_key_2 = self.redirects[lookup_key_2]
-                logging.info(
-                    "Lookup Key 2 redirects to: "
-                    + str(lookup_key_2.encode(encoding="utf-8"))
-                )
-
-            similarity = self.vectors.similarity(lookup_key_1, lookup_key_2)
+            # redirects are resolved in the term mapping
+            similarity = self.vectors.similarity(
+                self.term_mapping[lookup_key_1], self.term_mapping[lookup_key_2]
+            )
             # print("sim(" + concept_1 + ", " + concept_2 + ") = " + str(similarity))
             return similarity
         except KeyError:
-            logging.error(
-                "KeyError: One of the following concepts not found in vocabulary."
+            logging.debug(
+                "KeyError: One of the following concepts not found in vocabulary: %s, %s",
+                lookup_key_1,
+                lookup_key_2,
             )
-            logging.error("\t " + str(lookup_key_1.encode(encoding="utf-8")))
-            logging.error("\t " + str(lookup_key_2.encode(encoding="utf-8")))
             return None
 
     def get_similarity_json(self, concept_1: str, concept_2: str) -> str:
@@ -225,11 +297,7 @@ class DBpediaQueryService:
         str
             Similarity as JSON.
         """
-        similarity = self.get_similarity(concept_1, concept_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
+        return json_serializer.result_to_json(self.get_similarity(concept_1, concept_2))
 
     def find_closest_lemmas(self, lemma: str, top: str):
         """Find the closest concepts and return them as JSON message. The concept lemmas are returned rather than
@@ -248,26 +316,23 @@ class DBpediaQueryService:
         str
             A JSON message of the most related concepts.
         """
-        logging.info("Closest lemma query for " + lemma + " received.")
+        logging.debug("Closest lemma query for %s received.", lemma)
         lookup_key = self.transform_string(lemma)
-        logging.info(("Transformed to " + lookup_key))
+        logging.debug("Transformed to %s", lookup_key)
 
-        if lookup_key in self.closest_concepts_cache:
-            logging.info("Serve answer from cache.")
-            return self.closest_concepts_cache[lookup_key]
-
-        if lookup_key in self.term_mapping:
-            result = self.find_closest_lemmas_given_key(
-                key=self.term_mapping[lookup_key], topn=int(top)
-            )
-        else:
-            result = "{}"
-
-        if result is None:
-            result = "{}"
+        if lookup_key not in self.term_mapping:
+            return json_serializer.EMPTY_RESULT
+        key = self.term_mapping[lookup_key]
+        if key not in self.vectors:
+            logging.debug("Key %s not in vocab.", key)
+            return json_serializer.EMPTY_RESULT
 
-        self.closest_concepts_cache[lookup_key] = result
-        return result
+        indices, scores = self.closest_concepts_memo.get_or_compute(
+            concept=lookup_key,
+            topn=int(top),
+            compute=lambda topn: self.__rank_closest_concepts(key=key, topn=topn),
+        )
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
 
     @staticmethod
     def __take_second(element):
@@ -277,34 +342,11 @@ class DBpediaQueryService:
     def get_vector(self, lemma) -> str:
         lookup_key = self.transform_string(lemma)
         if lookup_key in self.term_mapping:
+            # redirects are resolved in the term mapping
             uri = self.term_mapping[lookup_key]
-
-            if uri not in self.vectors:
-                uri = self.redirects[uri]
-
-            if uri is not None:
-                vector = self.vectors.get_vector(uri)
-                return (
-                    '{ "uri": "'
-                    + uri
-                    + '",\n"vector": '
-                    + self.__to_json_array(vector)
-                    + "}"
-                )
-        else:
-            return "{}"
-
-    @staticmethod
-    def __to_json_array(vector) -> str:
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+            vector = self.vectors.get_vector(uri)
+            return json_serializer.vector_to_json(uri=uri, vector=vector)
+        return json_serializer.EMPTY_RESULT
 
     def find_closest_lemmas_given_key(self, key: str, topn: int) -> str:
         """Closest match operation.
@@ -324,34 +366,73 @@ class DBpediaQueryService:
 
         """
         if key not in self.vectors:
-            logging.info(("Key " + str(key) + " not in vocab."))
+            logging.debug("Key %s not in vocab.", key)
             return None
+        indices, scores = self.__rank_closest_concepts(key=key, topn=topn)
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
 
-        logging.info(("Execute most similar operation (gensim) for key: " + key + "."))
-        result_list = self.vectors.most_similar(key, topn=topn)
-        logging.info("Operation completed.")
-        result = '{\n"result": [\n'
-        is_first = True
-        for entry in list(result_list):
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
+    def __rank_closest_concepts(self, key: str, topn: int) -> Tuple[ndarray, ndarray]:
+        """Determine the closest concepts of a key in the vocabulary.
+
+        Parameters
+        ----------
+        key : str
+            Linked concept.
+
+        topn : int
+            The number of top related concepts to be returned.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Vocabulary indices and scores, ordered by descending score.
+        """
+        closest_concepts_index = self.__get_closest_concepts_index()
+        if closest_concepts_index is not None:
+            index = self.vectors.key_to_index[key]
+            if self.batch_scheduler is not None:
+                # coalesced with the concurrent requests of other threads
+                indices, scores = self.batch_scheduler.submit(concept=index, topn=topn)
             else:
-                result += (
-                    ',\n{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
+                indices, scores = self.__search_closest_concepts([index], topn)
+                indices, scores = indices[0], scores[0]
+            found = scores != -np.inf
+            return indices[found], scores[found]
+        logging.debug("Execute most similar operation (gensim) for key: %s.", key)
+        result_list = self.vectors.most_similar(key, topn=topn)
+        logging.debug("Operation completed.")
+        return (
+            np.array(
+                [self.vectors.key_to_index[concept] for concept, _ in result_list],
+                dtype=np.int64,
+            ),
+            np.array([score for _, score in result_list], dtype=np.float32),
+        )
+
+    def __get_closest_concepts_index(self) -> Union[None, NearestNeighbourIndex]:
+        """The index that answers closest concept queries; None if the vectors were not loaded from a vector
+        file (gensim is used then). The exact index is created on first use."""
+        if self.closest_concepts_index is None and self.vector_file != "":
+            self.closest_concepts_index = ExactIndex(
+                engine=self.vector_store.get_engine(
+                    path=self.vector_file, vectors=self.vectors.vectors
                 )
-        result += "\n]\n}"
-        return result
+            )
+        return self.closest_concepts_index
+
+    def __search_closest_concepts(
+        self, indices: List[int], topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        return self.__get_closest_concepts_index().search(
+            query_vectors=self.vectors.vectors[indices],
+            topn=topn,
+            exclude_indices=indices,
+        )
+
+    def __closest_concepts_to_json(self, indices: ndarray, scores: ndarray) -> str:
+        return json_serializer.closest_concepts_to_json(
+            keys=self.vectors.index_to_key, indices=indices, scores=scores
+        )
 
     def __parse_redirects(self, path_to_redirects: str) -> Dict[str, str]:
         """
@@ -388,11 +469,11 @@ class DBpediaQueryService:
 
     def analogy(self, a_is_to, b_like, c_to, topn=10):
         a_is_to_key = self.__link_term(a_is_to)
-        print(a_is_to + " linked to " + a_is_to_key)
+        logging.debug("%s linked to %s", a_is_to, a_is_to_key)
         b_like_key = self.__link_term(b_like)
-        print(b_like + " linked to " + b_like_key)
+        logging.debug("%s linked to %s", b_like, b_like_key)
         c_to_key = self.__link_term(c_to)
-        print(c_to + " linked to " + c_to_key)
+        logging.debug("%s linked to %s", c_to, c_to_key)
 
         if a_is_to_key is None or b_like_key is None or c_to_key is None:
             return None
@@ -410,11 +491,11 @@ class DBpediaQueryService:
         lookup_key = None
         if normalized_term not in self.term_mapping:
             if normalized_term[0].islower():
-                logging.info("Could not find " + normalized_term)
+                logging.debug("Could not find %s", normalized_term)
                 normalized_term = normalized_term[0].upper() + normalized_term[1:]
-                logging.info("Trying " + normalized_term)
+                logging.debug("Trying %s", normalized_term)
                 if normalized_term not in self.term_mapping:
-                    logging.info("Could not find " + term)
+                    logging.debug("Could not find %s", term)
                     return None
                 else:
                     return self.term_mapping[normalized_term]
@@ -422,15 +503,13 @@ class DBpediaQueryService:
             lookup_key = self.term_mapping[normalized_term]
 
         if lookup_key not in self.vectors:
-            logging.info(
-                "Lookup Key (" + lookup_key + ") not in vocabulary. Check redirects."
+            logging.debug(
+                "Lookup key %s not in vocabulary. Check redirects.", lookup_key
             )
             if lookup_key not in self.redirects:
                 return None
             lookup_key = self.redirects[lookup_key]
-            logging.info(
-                "Lookup Key 1 redirects to: " + str(lookup_key.encode(encoding="utf-8"))
-            )
+            logging.debug("Lookup key redirects to: %s", lookup_key)
             return lookup_key
         else:
             return lookup_key
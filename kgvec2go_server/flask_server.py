@@ -1,26 +1,44 @@
 from typing import Union, List
 
-from flask import Flask, render_template, request
+from flask import Flask, g, render_template, request, Response
 from ast import literal_eval
 import logging
+import os
 import sys
 import platform
+import time
 
-from gensim.models import KeyedVectors
-
-from kgvec2go_server.alod.alod_query_service import AlodQueryService
-from kgvec2go_server.dbnary.dbnary_query_service import DbnaryQueryService
-from kgvec2go_server.dbpedia.dbpedia_query_service import DBpediaQueryService
-from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic import binary_vectors, json_serializer
 from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.metrics import METRICS_MIMETYPE, Metrics
+from kgvec2go_server.generic.request_validation import (
+    ADMIN_TOKEN_HEADER,
+    BAD_REQUEST,
+    CONCEPT_LIST_ERROR,
+    CONCEPT_PAIR_LIST_ERROR,
+    FORBIDDEN_ERROR,
+    LEGACY_TOP_N_ERROR,
+    NO_SERVICE_ERROR,
+    PAYLOAD_TOO_LARGE,
+    TRIPLE_LIST_ERROR,
+    URI_HEADER_TOO_LARGE_ERROR,
+    is_admin_token,
+    parse_json_list,
+    parse_label_lines,
+    parse_legacy_top_n,
+)
+from kgvec2go_server.generic.result_cache import ResultCache, InProcessCacheBackend
+from kgvec2go_server.generic.service_catalog import ServiceCatalog
+from kgvec2go_server.generic.vector_store import VectorStore
 from kgvec2go_server.jRDF2Vec.jRDF2Vec import jRDF2Vec
-from kgvec2go_server.wordnet.wordnet_query_service import WordnetQueryService
 
 # set manually if you do not have a mac:
 on_local = "macOS" in platform.platform()
 local_port = 5001  # apple now uses 5000 for airplay
 
 
+# per-request logging is on DEBUG level; set KGVEC2GO_LOG_LEVEL=DEBUG to enable it
+log_level = os.environ.get("KGVEC2GO_LOG_LEVEL", "INFO").upper()
 if on_local:
     logging.basicConfig(
         handlers=[
@@ -28,15 +46,42 @@ if on_local:
             logging.StreamHandler(),
         ],
         format="%(asctime)s %(levelname)s:%(message)s",
-        level=logging.DEBUG,
+        level=log_level,
     )
 else:
-    logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+    logging.basicConfig(stream=sys.stderr, level=log_level)
 
 app = Flask(__name__)
 logging.info("Initiating Server...")
 
 
+metrics: Metrics = Metrics.get_default()
+"""Latencies, stage timings, payload sizes, and cache statistics; exported at /metrics.
+"""
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def observe_request(response: Response) -> Response:
+    if request.url_rule is not None and "request_start" in g:
+        metrics.observe_request(
+            route=request.url_rule.rule,
+            seconds=time.perf_counter() - g.request_start,
+            status=response.status_code,
+            payload_size=None if response.is_streamed else response.content_length,
+        )
+    return response
+
+
+@app.route("/metrics")
+def get_metrics():
+    return Response(metrics.render(), mimetype=METRICS_MIMETYPE)
+
+
 @app.route("/index.html")
 @app.route("/about.html")
 @app.route("/")
@@ -74,132 +119,42 @@ def robots_txt():
     return render_template("robots.txt")
 
 
-generic_services: List[GenericKvQueryService] = []
-"""A list of generic services running in the backend.
+result_cache: ResultCache = ResultCache(
+    backend=InProcessCacheBackend(max_bytes=512 * 1024 * 1024)
+)
+"""Bounded result cache shared by all query services.
 """
+metrics.register_cache("results", result_cache)
 
-if on_local:
-    logging.info("Using local environment.")
-
-    """
-    logging.info("Init DBpediaQueryService")
-    path_to_dbpedia_vectors = "/Users/janportisch/Documents/Data/KGvec2go_DBpedia_Optimized/sg200_dbpedia_500_8_df_vectors_reduced.kv"
-    # path_to_dbpedia_entities = "/Users/janportisch/Documents/PhD/LREC_2020/Language_Models/dbpedia/dbpedia_entities.txt"
-    path_to_dbpedia_redirects = "/Users/janportisch/Documents/PhD/LREC_2020/Language_Models/dbpedia/redirects_en.ttl"
-    # dbpedia_service = DBpediaQueryService(
-    #    vector_file=path_to_dbpedia_vectors, redirect_file=path_to_dbpedia_redirects
-    # )
-    logging.info("DBpediaQueryService Initialized.")
-
-    # dbpedia_service = DBpediaQueryService(entity_file=path_to_dbpedia_entities, vector_file=path_to_dbpedia_vectors, redirect_file=path_to_dbpedia_redirects)
-    alod_service = 0
-    wordnet_service = 0
-
-    logging.info("Init WordnetQueryService")
-    path_to_wordnet_vectors = "/Users/janportisch/Documents/PhD/LREC_2020/Language_Models/wordnet/sg200_wordnet_500_8_df_mc1_it3_reduced_vectors.kv"
-    path_to_wordnet_entities = "/Users/janportisch/Documents/PhD/LREC_2020/Language_Models/wordnet/wordnet_entities.txt"
-    # wordnet_service = WordnetQueryService(
-    #    entity_file=path_to_wordnet_entities,
-    #    vector_file=path_to_wordnet_vectors,
-    #    is_reduced_vector_file=True,
-    # )
-    logging.info("WordnetQueryService initialized.")
-
-    dbnary_service = 0
-    # rdf_2_vec = jRDF2Vec()
-    """
-
-    transe_dbpedia_vectors_path: str = (
-        "/Users/janportisch/Downloads/transeL2-all-dbpedia.kv"
-    )
-    transe_dbpedia_vectors: KeyedVectors = KeyedVectors.load(
-        transe_dbpedia_vectors_path, mmap="r"
-    )
-
-    transe_linker: GenericDBpediaLinker = GenericDBpediaLinker(
-        kv=transe_dbpedia_vectors
-    )
-    transe_service: GenericKvQueryService = GenericKvQueryService(
-        kv=transe_dbpedia_vectors,
-        linker=transe_linker,
-        dataset="DBpedia",
-        dataset_version="2021-09",
-        model="transe",
-        model_version="v1",
-    )
-
-    generic_services.append(transe_service)
-
-    logging.info("KGvec2go Operational")
-
-else:
-    logging.info("Using server environment.")
-
-    # ~~~ WordNet ~~~
-    path_to_wordnet_model = "/disk/wordnet/sg200_wordnet_100_8_df_mc1_it3"
-    path_to_wordnet_entities = "/disk/wordnet/wordnet_entities.txt"
-
-    # wordnet_service = 0
-    wordnet_service = WordnetQueryService(
-        entity_file=path_to_wordnet_entities,
-        model_file=path_to_wordnet_model,
-        is_reduced_vector_file=False,
-    )
-    logging.info("WordNet service initiated.")
-
-    # ~~~ TransE ~~~
-    transe_dbpedia_vectors_path = "/disk/dbpedia/transe/v1/transeL2-all-dbpedia.kv"
-
-    # load transE vectors
-    transe_dbpedia_vectors: KeyedVectors = KeyedVectors.load(
-        transe_dbpedia_vectors_path, mmap="r"
-    )
-
-    transe_linker: GenericDBpediaLinker = GenericDBpediaLinker(
-        kv=transe_dbpedia_vectors
-    )
-    transe_service: GenericKvQueryService = GenericKvQueryService(
-        kv=transe_dbpedia_vectors,
-        linker=transe_linker,
-        dataset="DBpedia",
-        dataset_version="2021-09",
-        model="transe",
-        model_version="v1",
-    )
-
-    generic_services.append(transe_service)
-
-    # ~~~ ALOD ~~~
-    path_to_alod_vectors = "/disk/alod/sg200_alod_100_8_df_mc1_it3_vectors.kv"
-
-    # alod_service = 0
-    alod_service = AlodQueryService(vector_file=path_to_alod_vectors)
-    logging.info("ALOD service initiated.")
-
-    # ~~~ DBpedia ~~~
-    path_to_dbpedia_vectors = "/disk/dbpedia/api_vectors/v2/model.kv"
-    # path_to_dbpedia_redirects = "/disk/dbpedia/redirects_en.ttl"
-    dbpedia_service = DBpediaQueryService(
-        vector_file=path_to_dbpedia_vectors, redirect_file=""
-    )
-    logging.info("DBpedia service initiated.")
+vector_store: VectorStore = VectorStore.get_default()
+"""Memory-mapped vectors and normalized matrices shared by all worker processes of the host.
+"""
 
-    # ~~~ DBnary / Wiktionary ~~~
-    path_to_dbnary_vectors = "/disk/dbnary/sg200_dbnary_100_8_df_mc1_it3_vectors.kv"
-    path_to_dbnary_entities = "/disk/dbnary/dbnary_entities.txt"
+# the services are configured in a JSON file (see ServiceCatalog.load); set KGVEC2GO_SERVICES to use another one
+services_file = os.environ.get(
+    "KGVEC2GO_SERVICES",
+    os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        "services_local.json" if on_local else "services.json",
+    ),
+)
+logging.info(f"Using service configuration {services_file}.")
 
-    # dbnary_service = 0
-    dbnary_service = DbnaryQueryService(
-        entity_file=path_to_dbnary_entities, vector_file=path_to_dbnary_vectors
-    )
-    logging.info("Wiktionary service initiated.")
+service_catalog: ServiceCatalog = ServiceCatalog.load(
+    services_file, vector_store=vector_store, cache=result_cache
+)
+"""The services running in the backend; loaded on their first request (or preloaded).
+"""
+service_catalog.preload()
 
+rdf_2_vec: Union[None, jRDF2Vec] = None
+if not on_local:
     rdf_2_vec = jRDF2Vec(
         jrdf_2_vec_directory="/mnt/disk/server/EmbeddingServer/jRDF2Vec/"
     )
-    print("RDF2Vec Service initiated")
+    logging.info("RDF2Vec Service initiated")
 
-    logging.info("KGvec2go Operational")
+logging.info("KGvec2go Operational")
 
 logging.info("Server Initiated.")
 
@@ -208,13 +163,11 @@ logging.info("Server Initiated.")
 def rdf2vec_light(data_set, walks, mode, dimension):
     # sanity check:
     if data_set.lower() != "dbpedia":
-        print("Only DBpedia allowed")
+        logging.error("Only DBpedia allowed")
         return None
-    if request is None:
-        print("none")
     entities = request.headers.get("entities")
     if entities is None:
-        print("ERROR: Entities are missing in header.")
+        logging.error("Entities are missing in header.")
         return None
     entities = literal_eval(entities)
     result = rdf_2_vec.train_light(
@@ -235,8 +188,7 @@ def closest_concepts(
     top_n: int,
     concept_name: str,
 ) -> Union[None, str]:
-    service = GenericKvQueryService.get_service_from_list(
-        the_list=generic_services,
+    service = service_catalog.get(
         dataset=dataset,
         dataset_version=dataset_version,
         model=model,
@@ -246,9 +198,39 @@ def closest_concepts(
         logging.error(
             f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
         )
-        return '{"error": "No embedding found for model/dataset combination."}'
-    else:
-        return service.get_closest_concepts_json(label=concept_name, topn=int(top_n))
+        return NO_SERVICE_ERROR
+    streaming_response = get_streaming_closest_concepts_response(
+        service=service, concept_name=concept_name, top_n=int(top_n)
+    )
+    if streaming_response is not None:
+        return streaming_response
+    return service.get_closest_concepts_json(label=concept_name, topn=int(top_n))
+
+
+def get_streaming_closest_concepts_response(
+    service: GenericKvQueryService, concept_name: str, top_n: int
+) -> Union[None, Response]:
+    """Streams the closest concepts if the client accepts ``application/x-ndjson`` (one concept per line) or if
+    top_n exceeds ``json_serializer.STREAMING_TOP_N`` (chunked JSON, same payload as the non-streamed response).
+
+    Returns
+    -------
+    The streamed response or None if the complete JSON string shall be returned.
+    """
+    mimetype = json_serializer.negotiate_mimetype(request.headers.get("Accept"))
+    if (
+        mimetype != json_serializer.NDJSON_MIMETYPE
+        and top_n <= json_serializer.STREAMING_TOP_N
+    ):
+        return None
+    chunks = service.stream_closest_concepts(
+        label=concept_name,
+        topn=top_n,
+        ndjson=mimetype == json_serializer.NDJSON_MIMETYPE,
+    )
+    if chunks is None:
+        return Response(json_serializer.EMPTY_RESULT, mimetype=mimetype)
+    return Response(chunks, mimetype=mimetype)
 
 
 @app.route(
@@ -264,8 +246,7 @@ def addition_closest_concepts(
     concept_name_1: str,
     concept_name_2: str,
 ) -> Union[None, str]:
-    service = GenericKvQueryService.get_service_from_list(
-        the_list=generic_services,
+    service = service_catalog.get(
         dataset=dataset,
         dataset_version=dataset_version,
         model=model,
@@ -275,7 +256,7 @@ def addition_closest_concepts(
         logging.error(
             f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
         )
-        return '{"error": "No embedding found for model/dataset combination."}'
+        return NO_SERVICE_ERROR
     else:
         return service.most_similar_addition_json(
             label_1=concept_name_1, label_2=concept_name_2, topn=int(top_n)
@@ -290,7 +271,7 @@ def closest_concepts_legacy(data_set, top_n, concept_name) -> Union[None, str]:
     ----------
     data_set : str
     top_n : str
-        Integer as string.
+        Integer as string; at most ``json_serializer.STREAMING_TOP_N`` (see ``parse_legacy_top_n``).
     concept_name : str
         Concept name.
 
@@ -299,31 +280,14 @@ def closest_concepts_legacy(data_set, top_n, concept_name) -> Union[None, str]:
     str
     JSON message.
     """
-    data_sets = ["wordnet", "wiktionary", "babelnet", "alod", "dbpedia"]
+    top_n = parse_legacy_top_n(top_n)
+    if top_n is None:
+        return bad_request(LEGACY_TOP_N_ERROR)
     data_set = data_set.lower()
-    if data_set not in data_sets:
+    service = service_catalog.get_legacy(data_set)
+    if service is None:
         return None
-    if data_set == "wiktionary":
-        print("Wiktionary closest-concepts query fired.")
-        result = dbnary_service.find_closest_lemmas(concept_name, top_n)
-        print(result)
-        return result
-    elif data_set == "wordnet":
-        print("Wordnet closest-concepts query fired.")
-        result = wordnet_service.find_closest_lemmas(concept_name, top_n)
-        print(result)
-        return result
-    elif data_set == "alod":
-        print("ALOD Classic closest-concepts query fired.")
-        result = alod_service.find_closest_lemmas(concept_name, top_n)
-        print(result)
-        return result
-    elif data_set == "dbpedia":
-        print("DBpedia closts-concepts query fired.")
-        result = dbpedia_service.find_closest_lemmas(concept_name, top_n)
-        print(result)
-        return result
-    return None
+    return service.find_closest_lemmas(concept_name, top_n)
 
 
 @app.route(
@@ -339,8 +303,7 @@ def get_triple_score(
     predicate: str,
     object: str,
 ) -> str:
-    service = GenericKvQueryService.get_service_from_list(
-        the_list=generic_services,
+    service = service_catalog.get(
         dataset=dataset,
         dataset_version=dataset_version,
         model=model,
@@ -350,20 +313,49 @@ def get_triple_score(
         logging.error(
             f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
         )
-        return '{"error": "No embedding found for model/dataset combination."}'
+        return NO_SERVICE_ERROR
     else:
         return service.get_triple_score_json(
             subject_label=subject, predicate_label=predicate, object_label=object
         )
 
 
+def get_binary_vector_response(
+    service: GenericKvQueryService, labels: List[str]
+) -> Union[None, Response]:
+    """Content negotiation for the get-vector routes. Clients sending ``Accept: application/octet-stream`` or
+    ``Accept: application/x-npy`` receive the vectors as float32 matrix; the URIs are sent in the
+    ``X-Vector-URIs`` header (status 413 if they do not fit into it). ``Accept: application/x-npz`` yields the
+    vectors and the URIs in the body.
+
+    Returns
+    -------
+    The binary response or None if JSON shall be returned.
+    """
+    mimetype = binary_vectors.negotiate_mimetype(request.headers.get("Accept"))
+    if mimetype == binary_vectors.JSON_MIMETYPE:
+        return None
+    uris, matrix = service.get_vector_matrix(labels=labels)
+    headers = binary_vectors.get_headers(uris=uris, matrix=matrix, mimetype=mimetype)
+    if headers is None:
+        return Response(
+            URI_HEADER_TOO_LARGE_ERROR,
+            status=PAYLOAD_TOO_LARGE,
+            mimetype="application/json",
+        )
+    return Response(
+        binary_vectors.encode(matrix=matrix, mimetype=mimetype, uris=uris),
+        mimetype=mimetype,
+        headers=headers,
+    )
+
+
 @app.route(
     "/rest/v2/get-vector/<dataset>/<dataset_version>/<model>/<model_version>/<concept_name>",
     methods=["GET"],
 )
 def get_vector(dataset, dataset_version, model, model_version, concept_name) -> str:
-    service = GenericKvQueryService.get_service_from_list(
-        the_list=generic_services,
+    service = service_catalog.get(
         dataset=dataset,
         dataset_version=dataset_version,
         model=model,
@@ -373,73 +365,212 @@ def get_vector(dataset, dataset_version, model, model_version, concept_name) ->
         logging.error(
             f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
         )
-        return '{"error": "No embedding found for model/dataset combination."}'
+        return NO_SERVICE_ERROR
+    binary_response = get_binary_vector_response(service=service, labels=[concept_name])
+    if binary_response is not None:
+        return binary_response
+    return service.get_vector_json(label=concept_name)
+
+
+def bad_request(error: str) -> Response:
+    """Response of a request whose body is not valid; error is one of the error payloads of
+    ``request_validation``."""
+    return Response(error, status=BAD_REQUEST, mimetype="application/json")
+
+
+def read_json_list_from_request(entry_length: Union[None, int] = None):
+    """Reads the JSON body of a batch request which must be a list. If entry_length is given, every entry has to
+    be a list of that many strings (e.g. 2 for label pairs, 3 for triples), else every entry has to be a string.
+
+    Returns
+    -------
+    The parsed list or None if the body is not valid.
+    """
+    return parse_json_list(
+        request.get_json(force=True, silent=True), entry_length=entry_length
+    )
+
+
+@app.route(
+    "/rest/v2/get-vector/<dataset>/<dataset_version>/<model>/<model_version>",
+    methods=["POST"],
+)
+def get_vector_batch(dataset, dataset_version, model, model_version) -> str:
+    """Batch variant of get-vector. The body is a JSON list of concept labels."""
+    service = service_catalog.get(
+        dataset=dataset,
+        dataset_version=dataset_version,
+        model=model,
+        model_version=model_version,
+    )
+    if service is None:
+        logging.error(
+            f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+        )
+        return NO_SERVICE_ERROR
+    labels = read_json_list_from_request()
+    if labels is None:
+        return bad_request(CONCEPT_LIST_ERROR)
+    binary_response = get_binary_vector_response(service=service, labels=labels)
+    if binary_response is not None:
+        return binary_response
+    return service.get_vectors_json(labels=labels)
+
+
+@app.route(
+    "/rest/v2/get-similarity/<dataset>/<dataset_version>/<model>/<model_version>",
+    methods=["POST"],
+)
+def get_similarity_batch(dataset, dataset_version, model, model_version) -> str:
+    """Batch similarity. The body is a JSON list of concept pairs, e.g. [["Berlin", "Germany"], ...]."""
+    service = service_catalog.get(
+        dataset=dataset,
+        dataset_version=dataset_version,
+        model=model,
+        model_version=model_version,
+    )
+    if service is None:
+        logging.error(
+            f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+        )
+        return NO_SERVICE_ERROR
+    label_pairs = read_json_list_from_request(entry_length=2)
+    if label_pairs is None:
+        return bad_request(CONCEPT_PAIR_LIST_ERROR)
+    return service.get_similarities_json(label_pairs=label_pairs)
+
+
+@app.route(
+    "/rest/v2/get-triple-score/<dataset>/<dataset_version>/<model>/<model_version>",
+    methods=["POST"],
+)
+def get_triple_score_batch(dataset, dataset_version, model, model_version) -> str:
+    """Batch variant of get-triple-score. The body is a JSON list of [subject, predicate, object] triples."""
+    service = service_catalog.get(
+        dataset=dataset,
+        dataset_version=dataset_version,
+        model=model,
+        model_version=model_version,
+    )
+    if service is None:
+        logging.error(
+            f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+        )
+        return NO_SERVICE_ERROR
+    triples = read_json_list_from_request(entry_length=3)
+    if triples is None:
+        return bad_request(TRIPLE_LIST_ERROR)
+    return service.get_triple_scores_json(triples=triples)
+
+
+@app.route(
+    "/rest/v2/closest-concepts/<dataset>/<dataset_version>/<model>/<model_version>/<int:top_n>",
+    methods=["POST"],
+)
+def closest_concepts_batch(
+    dataset: str, dataset_version: str, model: str, model_version: str, top_n: int
+) -> str:
+    """Batch variant of closest-concepts. The body is a JSON list of concept labels."""
+    service = service_catalog.get(
+        dataset=dataset,
+        dataset_version=dataset_version,
+        model=model,
+        model_version=model_version,
+    )
+    if service is None:
+        logging.error(
+            f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+        )
+        return NO_SERVICE_ERROR
+    labels = read_json_list_from_request()
+    if labels is None:
+        return bad_request(CONCEPT_LIST_ERROR)
+    return service.get_closest_concepts_batch_json(labels=labels, topn=int(top_n))
+
+
+@app.route(
+    "/rest/v2/export-vectors/<dataset>/<dataset_version>/<model>/<model_version>",
+    methods=["POST"],
+)
+def export_vectors(dataset, dataset_version, model, model_version):
+    """Bulk export of the vectors of an uploaded entity list, streamed as NDJSON (one line per concept). The
+    body is a JSON list of concept labels or (content type ``text/plain``) one label per line.
+    """
+    service = service_catalog.get(
+        dataset=dataset,
+        dataset_version=dataset_version,
+        model=model,
+        model_version=model_version,
+    )
+    if service is None:
+        logging.error(
+            f"No embedding configuration found for: {dataset}/{dataset_version}/{model}/{model_version}"
+        )
+        return NO_SERVICE_ERROR
+    if request.mimetype == "text/plain":
+        labels = parse_label_lines(request.get_data(as_text=True))
     else:
-        return service.get_vector_json(label=concept_name)
+        labels = read_json_list_from_request()
+    if labels is None:
+        return bad_request(CONCEPT_LIST_ERROR)
+    return Response(
+        service.stream_vectors(labels=labels),
+        mimetype=json_serializer.NDJSON_MIMETYPE,
+    )
 
 
 @app.route("/rest/get-vector/<data_set>/<concept_name>", methods=["GET"])
 def get_vector_legacy(data_set, concept_name):
-    data_sets = ["wordnet", "wiktionary", "babelnet", "alod", "dbpedia"]
     data_set = data_set.lower()
-    if data_set not in data_sets:
+    service = service_catalog.get_legacy(data_set)
+    if service is None:
         return None
-    if data_set == "wiktionary":
-        print("Wiktionary get-vector query fired.")
-        result = dbnary_service.get_vector(concept_name)
-        print(result)
-        return result
-    elif data_set == "wordnet":
-        print("WordNet get-vector query fired.")
-        result = wordnet_service.get_vector(concept_name)
-        print(result)
-        return result
-    elif data_set == "alod":
-        print("ALOD Classic get-vector query fired.")
-        result = alod_service.get_vector(concept_name)
-        print(result)
-        return result
-    elif data_set == "dbpedia":
-        print("DBpedia get-vector query fired.")
-        result = dbpedia_service.get_vector(concept_name)
-        print(result)
-        return result
-    return None
+    return service.get_vector(concept_name)
 
 
 @app.route(
     "/rest/get-similarity/<data_set>/<concept_name_1>/<concept_name_2>", methods=["GET"]
 )
 def get_similarity(data_set: str, concept_name_1: str, concept_name_2: str):
-    data_sets = ["wordnet", "wiktionary", "babelnet", "alod", "dbpedia"]
     data_set = data_set.lower()
-    if data_set not in data_sets:
+    service = service_catalog.get_legacy(data_set)
+    if service is None:
         return None
-    if data_set == "wiktionary":
-        print("Wiktionary get-vector query fired.")
-        result = dbnary_service.get_similarity_json(concept_name_1, concept_name_2)
-        print(result)
-        return result
-    elif data_set == "wordnet":
-        print("Wordnet get-vector query fired.")
-        result = wordnet_service.get_similarity_json(concept_name_1, concept_name_2)
-        print(result)
-        return result
-    elif data_set == "alod":
-        print("ALOD Classic get-similarity query fired.")
-        result = alod_service.get_similarity_json(concept_name_1, concept_name_2)
-        print(result)
-        return result
-    elif data_set == "dbpedia":
-        print("DBpedia get-similarity query fired.")
-        result = dbpedia_service.get_similarity_json(concept_name_1, concept_name_2)
-        print(result)
-        return result
+    return service.get_similarity_json(concept_name_1, concept_name_2)
+
+
+@app.route("/admin/swap-service", methods=["POST"])
+def swap_service():
+    """Replaces a generic service without restart (see ``ServiceCatalog.swap``). The body is a swap request (see
+    ``ServiceCatalog.parse_swap_request``); the service is loaded in the background, GET reports the progress.
+    Only the worker process receiving the request swaps its service."""
+    if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return Response(FORBIDDEN_ERROR, status=403, mimetype="application/json")
+    try:
+        configuration, replaces, warm_up_labels = ServiceCatalog.parse_swap_request(
+            request.get_json(force=True, silent=True)
+        )
+    except ValueError as error:
+        return Response(
+            json_serializer.error_to_json(str(error)),
+            status=400,
+            mimetype="application/json",
+        )
+    service_catalog.swap_in_background(configuration, replaces, warm_up_labels)
+    return Response(
+        json_serializer.dumps({"status": "loading"}),
+        status=202,
+        mimetype="application/json",
+    )
 
 
-if on_local:
-    app.run(host="0.0.0.0", port=local_port, debug=False)
+@app.route("/admin/swap-service", methods=["GET"])
+def get_swap_status():
+    if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return Response(FORBIDDEN_ERROR, status=403, mimetype="application/json")
+    return json_serializer.dumps(service_catalog.get_swap_status())
 
 
+# the same routes are served on asyncio by asgi_server.py
 if __name__ == "__main__":
-    pass
+    app.run(host="0.0.0.0", port=local_port, debug=False)
@@ -0,0 +1,412 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+import logging
+from typing import Tuple, Union, Sequence
+
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.similarity_engine import (
+    BatchSimilarityEngine,
+    normalize_rows,
+)
+from kgvec2go_server.generic.term_snapshot import Snapshot
+
+
+class NearestNeighbourIndex(ABC):
+    """A cosine nearest neighbour index over the vectors of one KeyedVectors instance. Matrix indices returned
+    by an index are the indices of ``kv.index_to_key``."""
+
+    engine: Union[None, BatchSimilarityEngine]
+    """Engine holding the normalized vectors the index refers to; None if the index does not hold a float32
+    normalized matrix (see ``QuantizedIndex``)."""
+
+    @abstractmethod
+    def search(
+        self,
+        query_vectors: ndarray,
+        topn: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+    ) -> Tuple[ndarray, ndarray]:
+        """Determine the (approximate) topn most similar vectors for each query vector.
+
+        Parameters
+        ----------
+        query_vectors : ndarray
+            Matrix of shape (number of queries, dimension).
+        topn : int
+            Number of closest vectors that shall be returned per query.
+        exclude_indices : Sequence of int or None
+            Optional; one matrix index per query that shall not appear in the result of that query.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Indices and scores, each of shape (number of queries, k), ordered by descending score. Rows that
+            have fewer than k results are padded with index -1 and score -inf.
+        """
+        pass
+
+
+class ExactIndex(NearestNeighbourIndex):
+    """Brute-force index; exact results. Also serves as fallback of the approximate indices."""
+
+    def __init__(self, engine: BatchSimilarityEngine):
+        self.engine = engine
+
+    def search(
+        self,
+        query_vectors: ndarray,
+        topn: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+    ) -> Tuple[ndarray, ndarray]:
+        return self.engine.top_k(
+            query_vectors=query_vectors, topn=topn, exclude_indices=exclude_indices
+        )
+
+
+class IvfIndex(NearestNeighbourIndex):
+    """Inverted file index: The vectors are clustered (spherical k-means) into ``number_of_lists`` lists.
+    A query only scans the ``n_probe`` lists whose centroids are closest to it.
+
+    ``n_probe`` is the recall/latency knob: 1 is fastest, ``number_of_lists`` is equivalent to an exact scan.
+    The index is built offline (see ``scripts/build_ann_index.py``) and stored as snapshot next to the ``.kv``
+    file so that it can be memory-mapped at startup; an index built for another version of the ``.kv`` file is
+    rejected.
+    """
+
+    SNAPSHOT_NAME = "ivf"
+    FILE_SUFFIXES = ("centroids", "offsets", "members")
+
+    def __init__(
+        self,
+        engine: BatchSimilarityEngine,
+        centroids: ndarray,
+        offsets: ndarray,
+        members: ndarray,
+        n_probe: int = 8,
+    ):
+        """
+
+        Parameters
+        ----------
+        engine : BatchSimilarityEngine
+            Engine holding the normalized vectors. Used for candidate scoring and as exact fallback.
+        centroids : ndarray
+            Normalized list centroids of shape (number of lists, dimension).
+        offsets : ndarray
+            Array of length number of lists + 1; list i consists of members[offsets[i]:offsets[i+1]].
+        members : ndarray
+            Matrix indices ordered by list.
+        n_probe : int
+            Number of lists that are scanned per query.
+        """
+        self.engine = engine
+        self.centroids = centroids
+        self.offsets = offsets
+        self.members = members
+        self.n_probe = n_probe
+        self.exact_index = ExactIndex(engine=engine)
+
+    @property
+    def number_of_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    def search(
+        self,
+        query_vectors: ndarray,
+        topn: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+        n_probe: Union[None, int] = None,
+        exact: bool = False,
+    ) -> Tuple[ndarray, ndarray]:
+        """See ``NearestNeighbourIndex.search``.
+
+        Parameters
+        ----------
+        n_probe : int or None
+            Overrides the index-wide ``n_probe`` for this call.
+        exact : bool
+            If True, the approximate path is bypassed and an exact scan is performed.
+        """
+        if exact:
+            return self.exact_index.search(query_vectors, topn, exclude_indices)
+
+        n_probe = min(
+            self.n_probe if n_probe is None else n_probe, self.number_of_lists
+        )
+        queries = normalize_rows(query_vectors)
+        k = max(0, min(int(topn), len(self.engine)))
+        result_indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        result_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        if k == 0 or queries.shape[0] == 0:
+            return result_indices, result_scores
+
+        centroid_scores = queries @ self.centroids.T
+        probed_lists, _ = BatchSimilarityEngine.select_top_k(
+            scores=centroid_scores, k=n_probe
+        )
+        for row in range(queries.shape[0]):
+            candidates = np.concatenate(
+                [
+                    self.members[self.offsets[list_id] : self.offsets[list_id + 1]]
+                    for list_id in probed_lists[row]
+                ]
+            )
+            excluded = None if exclude_indices is None else exclude_indices[row]
+            if excluded is not None:
+                candidates = candidates[candidates != excluded]
+            if len(candidates) < k:
+                # not enough candidates in the probed lists: exact fallback for this query
+                indices, scores = self.exact_index.search(
+                    queries[row : row + 1], k, [excluded]
+                )
+                result_indices[row] = indices[0]
+                result_scores[row] = scores[0]
+                continue
+            scores = self.engine.normalized_vectors[candidates] @ queries[row]
+            positions, top_scores = BatchSimilarityEngine.select_top_k(
+                scores=scores.reshape(1, -1), k=k
+            )
+            result_indices[row] = candidates[positions[0]]
+            result_scores[row] = top_scores[0]
+        return result_indices, result_scores
+
+    @staticmethod
+    def build(
+        engine: BatchSimilarityEngine,
+        number_of_lists: Union[None, int] = None,
+        iterations: int = 10,
+        sample_size: int = 100000,
+        n_probe: int = 8,
+        seed: int = 42,
+    ) -> IvfIndex:
+        """Build an IVF index with spherical k-means.
+
+        Parameters
+        ----------
+        engine : BatchSimilarityEngine
+            Engine holding the normalized vectors.
+        number_of_lists : int or None
+            Number of clusters. Default: about the square root of the vocabulary size.
+        iterations : int
+            Number of k-means iterations.
+        sample_size : int
+            Number of vectors the centroids are trained on.
+        n_probe : int
+            Default number of lists scanned per query.
+        seed : int
+            Random seed.
+
+        Returns
+        -------
+        IvfIndex
+        """
+        vectors = engine.normalized_vectors
+        number_of_vectors = vectors.shape[0]
+        if number_of_lists is None:
+            number_of_lists = max(1, int(np.sqrt(number_of_vectors)))
+        number_of_lists = min(number_of_lists, number_of_vectors)
+
+        random = np.random.default_rng(seed)
+        sample = vectors[
+            random.choice(
+                number_of_vectors,
+                size=min(sample_size, number_of_vectors),
+                replace=False,
+            )
+        ]
+        centroids = sample[
+            random.choice(sample.shape[0], size=number_of_lists, replace=False)
+        ].copy()
+        for iteration in range(iterations):
+            assignment = IvfIndex.__assign(sample, centroids)
+            for list_id in range(number_of_lists):
+                list_members = sample[assignment == list_id]
+                if len(list_members) > 0:
+                    centroids[list_id] = list_members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+            logging.info(f"k-means iteration {iteration + 1}/{iterations} completed.")
+
+        assignment = IvfIndex.__assign(vectors, centroids)
+        members = np.argsort(assignment, kind="stable").astype(np.int64)
+        offsets = np.zeros(number_of_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assignment, minlength=number_of_lists))
+        return IvfIndex(
+            engine=engine,
+            centroids=centroids,
+            offsets=offsets,
+            members=members,
+            n_probe=n_probe,
+        )
+
+    @staticmethod
+    def __assign(vectors: ndarray, centroids: ndarray, chunk_size: int = 65536):
+        assignment = np.empty(vectors.shape[0], dtype=np.int64)
+        for start in range(0, vectors.shape[0], chunk_size):
+            assignment[start : start + chunk_size] = np.argmax(
+                vectors[start : start + chunk_size] @ centroids.T, axis=1
+            )
+        return assignment
+
+    @staticmethod
+    def get_file_path(kv_path: str, suffix: str) -> str:
+        """Path of one index file that belongs to the given ``.kv`` file."""
+        return Snapshot.get_file_path(kv_path, IvfIndex.SNAPSHOT_NAME, suffix)
+
+    def save(self, kv_path: str) -> None:
+        """Persist the index next to the given ``.kv`` file (together with the checksum of the file).
+
+        Parameters
+        ----------
+        kv_path : str
+            Path to the vector file the index was built from.
+        """
+        Snapshot(
+            arrays=dict(
+                zip(
+                    IvfIndex.FILE_SUFFIXES,
+                    (self.centroids, self.offsets, self.members),
+                )
+            )
+        ).save(kv_path, name=IvfIndex.SNAPSHOT_NAME)
+
+    @staticmethod
+    def load(
+        kv_path: str,
+        engine: BatchSimilarityEngine,
+        n_probe: int = 8,
+        mmap_mode: Union[None, str] = "r",
+    ) -> Union[None, IvfIndex]:
+        """Load an index that has been persisted next to the given ``.kv`` file.
+
+        Parameters
+        ----------
+        kv_path : str
+            Path to the vector file.
+        engine : BatchSimilarityEngine
+            Engine holding the normalized vectors of that file.
+        n_probe : int
+            Number of lists scanned per query.
+        mmap_mode : str or None
+            Memory-map mode passed to ``numpy.load``.
+
+        Returns
+        -------
+        IvfIndex
+            None if there is no index or if it was built for another version of the ``.kv`` file (queries have to
+            fall back to an exact scan).
+        """
+        snapshot = Snapshot.load(
+            kv_path, name=IvfIndex.SNAPSHOT_NAME, mmap_mode=mmap_mode
+        )
+        if snapshot is None:
+            return None
+        centroids, offsets, members = [
+            snapshot.arrays[suffix] for suffix in IvfIndex.FILE_SUFFIXES
+        ]
+        if len(members) != engine.normalized_vectors.shape[0]:
+            logging.warning(
+                f"Ignoring IVF index of {kv_path}: it does not cover the {engine.normalized_vectors.shape[0]} vectors."
+            )
+            return None
+        return IvfIndex(
+            engine=engine,
+            centroids=centroids,
+            offsets=offsets,
+            members=members,
+            n_probe=n_probe,
+        )
+
+
+class QuantizedIndex(NearestNeighbourIndex):
+    """Exact-rescoring index on a QuantizedMatrix: the candidates of a query are determined by a scan over the
+    float16/int8 matrix (a half or a quarter of the memory traffic of a float32 scan); the
+    ``rescore_factor * topn`` best candidates are rescored on the float32 vectors, typically the memory-mapped
+    ``kv.vectors`` of which only the candidate rows are read. The index holds no float32 normalized matrix.
+    """
+
+    def __init__(
+        self,
+        quantized: QuantizedMatrix,
+        vectors: ndarray,
+        rescore_factor: int = 4,
+        query_chunk_size: int = 256,
+        executor: Union[None, ShardedScanExecutor] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        quantized : QuantizedMatrix
+            Quantized normalized vectors.
+        vectors : ndarray
+            The original vectors (e.g. ``kv.vectors``); used for rescoring.
+        rescore_factor : int
+            Number of candidates rescored per requested result.
+        query_chunk_size : int
+            Maximal number of queries that are scanned at once.
+        executor : ShardedScanExecutor
+            Optional; executor that scans the quantized matrix in parallel shards.
+        """
+        self.engine = None
+        self.quantized = quantized
+        self.vectors = vectors
+        self.rescore_factor = rescore_factor
+        self.query_chunk_size = query_chunk_size
+        self.executor = executor
+
+    def search(
+        self,
+        query_vectors: ndarray,
+        topn: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+    ) -> Tuple[ndarray, ndarray]:
+        queries = normalize_rows(query_vectors)
+        k = max(0, min(int(topn), len(self.quantized)))
+        result_indices = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        result_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        if k == 0 or queries.shape[0] == 0:
+            return result_indices, result_scores
+
+        number_of_candidates = min(k * max(1, self.rescore_factor), len(self.quantized))
+        for start in range(0, queries.shape[0], self.query_chunk_size):
+            end = min(start + self.query_chunk_size, queries.shape[0])
+            chunk = queries[start:end]
+            excluded = [None] * (end - start)
+            if exclude_indices is not None:
+                excluded = exclude_indices[start:end]
+            if self.executor is not None:
+                candidates, _ = self.executor.top_k(
+                    score_shard=lambda first, last: self.quantized.scores(
+                        chunk, first, last
+                    ),
+                    number_of_rows=len(self.quantized),
+                    k=number_of_candidates,
+                    exclude_indices=excluded,
+                )
+            else:
+                approximate_scores = self.quantized.scores(chunk)
+                for row, index in enumerate(excluded):
+                    if index is not None:
+                        approximate_scores[row, index] = -np.inf
+                candidates, _ = BatchSimilarityEngine.select_top_k(
+                    scores=approximate_scores, k=number_of_candidates
+                )
+            for row in range(end - start):
+                # sorted indices: sequential access to the (memory-mapped) vectors
+                row_candidates = np.sort(candidates[row])
+                scores = (
+                    normalize_rows(self.vectors[row_candidates]) @ queries[start + row]
+                )
+                if excluded[row] is not None:
+                    scores[row_candidates == excluded[row]] = -np.inf
+                positions, top_scores = BatchSimilarityEngine.select_top_k(
+                    scores=scores.reshape(1, -1), k=k
+                )
+                result_indices[start + row] = row_candidates[positions[0]]
+                result_scores[start + row] = top_scores[0]
+        return result_indices, result_scores
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Tuple, Union
+from urllib.parse import parse_qs
+
+from kgvec2go_server.generic.json_serializer import error_to_json
+from kgvec2go_server.generic.metrics import Metrics
+
+JSON_MIMETYPE = "application/json"
+NOT_FOUND_ERROR = error_to_json("Not found.")
+METHOD_NOT_ALLOWED_ERROR = error_to_json("Method not allowed.")
+INTERNAL_ERROR = error_to_json("Internal server error.")
+
+
+class AsgiRequest:
+    """The parts of an HTTP request the routes need."""
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        headers: Dict[str, str],
+        query_string: bytes = b"",
+        body: bytes = b"",
+    ):
+        """
+
+        Parameters
+        ----------
+        method : str
+            HTTP method, e.g. "GET".
+        path : str
+            Decoded request path.
+        headers : Dict[str, str]
+            Headers; the names are lower case.
+        query_string : bytes
+            Raw query string.
+        body : bytes
+            The complete body.
+        """
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.query_string = query_string
+        self.body = body
+
+    def get_header(
+        self, name: str, default: Union[None, str] = None
+    ) -> Union[None, str]:
+        return self.headers.get(name.lower(), default)
+
+    def get_query_parameters(self) -> Dict[str, List[str]]:
+        return parse_qs(self.query_string.decode("latin-1"))
+
+    def get_json(self) -> Any:
+        """The parsed JSON body (regardless of the content type); None if the body is not valid JSON."""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class AsgiResponse:
+    def __init__(
+        self,
+        body: Union[str, bytes],
+        status: int = 200,
+        mimetype: str = JSON_MIMETYPE,
+        headers: Union[None, Dict[str, str]] = None,
+    ):
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = {} if headers is None else headers
+
+
+class AsgiStreamingResponse:
+    """A response whose body is sent chunk by chunk (without content length) while the chunks are produced."""
+
+    def __init__(
+        self,
+        chunks: Iterator[Union[str, bytes]],
+        status: int = 200,
+        mimetype: str = JSON_MIMETYPE,
+        headers: Union[None, Dict[str, str]] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        chunks : Iterator[Union[str, bytes]]
+            The body; the iterator is consumed on the light executor, not on the event loop.
+        status : int
+            HTTP status.
+        mimetype : str
+            Content type.
+        headers : Dict[str, str]
+            Further headers.
+        """
+        self.chunks = chunks
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = {} if headers is None else headers
+
+
+Handler = Callable[
+    ..., Awaitable[Union[None, str, AsgiResponse, AsgiStreamingResponse]]
+]
+
+
+class AsgiApplication:
+    """Minimal asyncio ASGI application: a router for Flask-style rules (``/a/<name>/<int:n>``) on top of the
+    raw ASGI protocol, so that no further web framework is required.
+
+    Handlers are coroutines that receive the request and the path parameters as keyword arguments and return a
+    string (sent as JSON), an AsgiResponse, an AsgiStreamingResponse, or None (404). Blocking work must not run on the event loop:
+    handlers hand it to ``run_heavy`` (scans, model training) or ``run_light`` (lookups). The two thread pools
+    are separate, so cheap requests never queue behind expensive ones. The latency, status, and payload size of
+    every request are recorded per route rule in ``metrics``.
+    """
+
+    __CONVERTERS = {"int": (r"\d+", int), "string": (r"[^/]+", str)}
+
+    def __init__(
+        self,
+        heavy_workers: Union[None, int] = None,
+        light_workers: Union[None, int] = None,
+        metrics: Union[None, Metrics] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        heavy_workers : int
+            Number of threads for expensive work; default: see ``ThreadPoolExecutor``.
+        light_workers : int
+            Number of threads for cheap work; default: see ``ThreadPoolExecutor``.
+        metrics : Metrics
+            Records the requests. Default: ``Metrics.get_default()``.
+        """
+        self.metrics = Metrics.get_default() if metrics is None else metrics
+        self.heavy_executor = ThreadPoolExecutor(
+            max_workers=heavy_workers, thread_name_prefix="asgi-heavy"
+        )
+        self.light_executor = ThreadPoolExecutor(
+            max_workers=light_workers, thread_name_prefix="asgi-light"
+        )
+        self.routes: List[
+            Tuple[str, re.Pattern, Tuple[str, ...], Dict[str, Callable], Handler]
+        ] = []
+
+    def route(self, rule: str, methods: Tuple[str, ...] = ("GET",)):
+        """Decorator registering a handler for a rule, e.g. ``/rest/closest-concepts/<int:top_n>/<concept>``."""
+
+        def decorator(handler: Handler) -> Handler:
+            pattern, converters = AsgiApplication.compile_rule(rule)
+            self.routes.append((rule, pattern, tuple(methods), converters, handler))
+            return handler
+
+        return decorator
+
+    @staticmethod
+    def compile_rule(rule: str) -> Tuple[re.Pattern, Dict[str, Callable]]:
+        """Regular expression and parameter converters of a Flask-style rule."""
+        converters = {}
+        regex = ""
+        position = 0
+        for match in re.finditer(r"<(?:(\w+):)?(\w+)>", rule):
+            converter_name = match.group(1) or "string"
+            expression, converter = AsgiApplication.__CONVERTERS[converter_name]
+            regex += re.escape(rule[position : match.start()])
+            regex += f"(?P<{match.group(2)}>{expression})"
+            converters[match.group(2)] = converter
+            position = match.end()
+        regex += re.escape(rule[position:])
+        return re.compile(regex + "$"), converters
+
+    async def run_heavy(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.heavy_executor, function, *args
+        )
+
+    async def run_light(self, function: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(
+            self.light_executor, function, *args
+        )
+
+    async def handle(
+        self, request: AsgiRequest
+    ) -> Union[AsgiResponse, AsgiStreamingResponse]:
+        """Routes the request to its handler."""
+        start = time.perf_counter()
+        rule, response = await self.__dispatch(request)
+        if rule is not None:
+            self.metrics.observe_request(
+                route=rule,
+                seconds=time.perf_counter() - start,
+                status=response.status,
+                payload_size=(
+                    len(response.body) if isinstance(response, AsgiResponse) else None
+                ),
+            )
+        return response
+
+    async def __dispatch(
+        self, request: AsgiRequest
+    ) -> Tuple[Union[None, str], Union[AsgiResponse, AsgiStreamingResponse]]:
+        """The rule of the matching route (None if no route matches) and the response."""
+        is_known_path = False
+        for rule, pattern, methods, converters, handler in self.routes:
+            match = pattern.match(request.path)
+            if match is None:
+                continue
+            is_known_path = True
+            if request.method not in methods:
+                continue
+            parameters = {
+                name: converters[name](value)
+                for name, value in match.groupdict().items()
+            }
+            try:
+                result = await handler(request, **parameters)
+            except Exception:
+                logging.exception(f"Error while handling {request.path}")
+                return rule, AsgiResponse(INTERNAL_ERROR, status=500)
+            if result is None:
+                return rule, AsgiResponse("{}", status=404)
+            if isinstance(result, (AsgiResponse, AsgiStreamingResponse)):
+                return rule, result
+            return rule, AsgiResponse(result)
+        if is_known_path:
+            return None, AsgiResponse(METHOD_NOT_ALLOWED_ERROR, status=405)
+        return None, AsgiResponse(NOT_FOUND_ERROR, status=404)
+
+    async def __call__(self, scope: Dict[str, Any], receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self.__lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        request = AsgiRequest(
+            method=scope["method"],
+            path=scope["path"],
+            headers={
+                name.decode("latin-1").lower(): value.decode("latin-1")
+                for name, value in scope.get("headers", [])
+            },
+            query_string=scope.get("query_string", b""),
+            body=body,
+        )
+        response = await self.handle(request)
+        headers = [(b"content-type", response.mimetype.encode("latin-1"))]
+        if isinstance(response, AsgiResponse):
+            headers.append(
+                (b"content-length", str(len(response.body)).encode("latin-1"))
+            )
+        headers += [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in response.headers.items()
+        ]
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response.status,
+                "headers": headers,
+            }
+        )
+        if isinstance(response, AsgiResponse):
+            await send({"type": "http.response.body", "body": response.body})
+            return
+        await self.__send_chunks(response.chunks, send)
+
+    async def __send_chunks(self, chunks: Iterator[Union[str, bytes]], send) -> None:
+        """Sends the chunks as soon as they are produced; chunks are produced on the light executor."""
+        while True:
+            try:
+                chunk = await self.run_light(next, chunks, None)
+            except Exception:
+                # the status has already been sent: the body ends early
+                logging.exception("Error while streaming a response")
+                chunk = None
+            if chunk is None:
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+    async def __lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.heavy_executor.shutdown(wait=False)
+                self.light_executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from concurrent.futures import Future
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Tuple
+
+from numpy import ndarray
+
+
+class _BatchEntry:
+    """One distinct query of a batch; all requests for the same concept wait for the same future."""
+
+    def __init__(self, topn: int):
+        self.topn = topn
+        self.future: Future = Future()
+
+
+class MicroBatchScheduler:
+    """Coalesces concurrent closest-concept queries into one matrix-matrix product.
+
+    The first request that arrives while no batch is being gathered becomes the leader of a new batch: it waits
+    up to ``window`` seconds (or until ``max_batch_size`` distinct concepts have arrived), then executes the
+    whole batch with one ``search`` call (for the largest requested topn) and fans the results out to the
+    waiting request threads. Identical queries are deduplicated: a request joins the entry of the same concept
+    in the batch being gathered or in a batch being executed (if that one is computed for a topn at least as
+    large). No background thread is required; while a batch is executed, the next batch is gathered.
+    """
+
+    def __init__(
+        self,
+        search: Callable[[List[Hashable], int], Tuple[ndarray, ndarray]],
+        window: float = 0.002,
+        max_batch_size: int = 64,
+    ):
+        """
+
+        Parameters
+        ----------
+        search : Callable[[List[Hashable], int], Tuple[ndarray, ndarray]]
+            Determines the closest concepts of the given concepts for the given topn; returns indices and scores
+            of shape (number of concepts, k), ordered by descending score (see ``NearestNeighbourIndex.search``).
+        window : float
+            Maximal number of seconds a batch is gathered.
+        max_batch_size : int
+            Number of distinct concepts after which a batch is executed without waiting for the window to end.
+        """
+        self.search = search
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._condition = threading.Condition()
+        self._pending: Dict[Hashable, _BatchEntry] = {}
+        self._in_flight: Dict[Hashable, _BatchEntry] = {}
+        self._is_gathering = False
+        self.batches = 0
+        self.requests = 0
+        self.deduplicated_requests = 0
+
+    def submit(self, concept: Hashable, topn: int) -> Tuple[ndarray, ndarray]:
+        """Determine the closest concepts of one concept; blocks until the batch of the request is executed.
+
+        Parameters
+        ----------
+        concept : Hashable
+            The query concept (e.g. a vocabulary index).
+        topn : int
+            Number of closest concepts.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Indices and scores of the query (one row of the ``search`` result cut to topn).
+        """
+        with self._condition:
+            self.requests += 1
+            entry = self._in_flight.get(concept)
+            if entry is None or entry.topn < topn:
+                entry = self._pending.get(concept)
+                if entry is None:
+                    entry = _BatchEntry(topn=topn)
+                    self._pending[concept] = entry
+                    self._condition.notify_all()
+                else:
+                    self.deduplicated_requests += 1
+                    entry.topn = max(entry.topn, topn)
+            else:
+                self.deduplicated_requests += 1
+            is_leader = not self._is_gathering and concept in self._pending
+            if is_leader:
+                self._is_gathering = True
+
+        if is_leader:
+            self.__gather_and_execute()
+        indices, scores = entry.future.result()
+        return indices[:topn], scores[:topn]
+
+    def __gather_and_execute(self) -> None:
+        deadline = time.monotonic() + self.window
+        with self._condition:
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+            batch = self._pending
+            self._pending = {}
+            self._in_flight.update(batch)
+            self._is_gathering = False
+            self.batches += 1
+
+        concepts = list(batch)
+        try:
+            indices, scores = self.search(
+                concepts, max(entry.topn for entry in batch.values())
+            )
+            for row, concept in enumerate(concepts):
+                batch[concept].future.set_result((indices[row], scores[row]))
+        except Exception as exception:
+            for entry in batch.values():
+                if not entry.future.done():
+                    entry.future.set_exception(exception)
+        finally:
+            with self._condition:
+                for concept, entry in batch.items():
+                    if self._in_flight.get(concept) is entry:
+                        del self._in_flight[concept]
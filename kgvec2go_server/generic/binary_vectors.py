@@ -0,0 +1,149 @@
+import io
+import json
+from typing import List, Union, Dict
+
+import numpy as np
+from numpy import ndarray
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+JSON_MIMETYPE = "application/json"
+RAW_MIMETYPE = "application/octet-stream"
+NPY_MIMETYPE = "application/x-npy"
+NPZ_MIMETYPE = "application/x-npz"
+
+VECTOR_MIMETYPES = [JSON_MIMETYPE, RAW_MIMETYPE, NPY_MIMETYPE, NPZ_MIMETYPE]
+"""Mimetypes supported by the get-vector routes; the first one is the default."""
+
+VECTOR_DTYPE = "<f4"
+"""Binary vectors are always transferred as little-endian float32."""
+
+MAX_URI_HEADER_BYTES = 8192
+"""Maximal size of the ``X-Vector-URIs`` header (proxies commonly limit headers to 8 to 16 KB). Larger batches
+have to be requested as NPZ_MIMETYPE, which carries the URIs in the body."""
+
+
+def negotiate_mimetype(accept_header: Union[None, str]) -> str:
+    """The best vector mimetype for the given ``Accept`` header; JSON_MIMETYPE if none is acceptable.
+
+    Parameters
+    ----------
+    accept_header : str
+        Value of the ``Accept`` header of the request (None if the header is missing).
+
+    Returns
+    -------
+    str
+    """
+    return parse_accept_header(accept_header, MIMEAccept).best_match(
+        VECTOR_MIMETYPES, default=JSON_MIMETYPE
+    )
+
+
+def to_raw_bytes(matrix: ndarray) -> bytes:
+    """Encodes the matrix as raw, row-major little-endian float32 bytes. The matrix is copied once (into the
+    bytes object).
+
+    Parameters
+    ----------
+    matrix : ndarray
+        Matrix of shape (number of vectors, dimension).
+
+    Returns
+    -------
+    bytes
+    """
+    return np.ascontiguousarray(matrix, dtype=VECTOR_DTYPE).tobytes()
+
+
+def to_npy_bytes(matrix: ndarray) -> bytes:
+    """Encodes the matrix in the NumPy ``.npy`` format (readable with ``numpy.load``). The matrix is copied once
+    (into the bytes object).
+
+    Parameters
+    ----------
+    matrix : ndarray
+        Matrix of shape (number of vectors, dimension).
+
+    Returns
+    -------
+    bytes
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=VECTOR_DTYPE)
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, np.lib.format.header_data_from_array_1_0(matrix)
+    )
+    # the header and the matrix buffer are joined without an intermediate copy of the matrix
+    return b"".join([header.getvalue(), memoryview(matrix).cast("B")])
+
+
+def to_npz_bytes(uris: List[Union[None, str]], matrix: ndarray) -> bytes:
+    """Encodes the matrix and the URIs in the (uncompressed) NumPy ``.npz`` format: ``numpy.load`` yields the
+    arrays "vectors" (float32) and "uris" (strings; empty for rows of labels that could not be linked).
+
+    Parameters
+    ----------
+    uris : List[Union[None, str]]
+        One URI per row of the matrix.
+    matrix : ndarray
+        Matrix of shape (number of vectors, dimension).
+
+    Returns
+    -------
+    bytes
+    """
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        vectors=np.ascontiguousarray(matrix, dtype=VECTOR_DTYPE),
+        uris=np.array(["" if uri is None else uri for uri in uris], dtype=str),
+    )
+    return buffer.getvalue()
+
+
+def encode(
+    matrix: ndarray, mimetype: str, uris: Union[None, List[Union[None, str]]] = None
+) -> bytes:
+    """Encodes the matrix for the given binary mimetype (RAW_MIMETYPE, NPY_MIMETYPE, or NPZ_MIMETYPE, which
+    requires the URIs)."""
+    if mimetype == NPY_MIMETYPE:
+        return to_npy_bytes(matrix)
+    if mimetype == RAW_MIMETYPE:
+        return to_raw_bytes(matrix)
+    if mimetype == NPZ_MIMETYPE and uris is not None:
+        return to_npz_bytes(uris=uris, matrix=matrix)
+    raise ValueError(f"Unsupported binary vector mimetype: {mimetype}")
+
+
+def get_headers(
+    uris: List[Union[None, str]], matrix: ndarray, mimetype: str = RAW_MIMETYPE
+) -> Union[None, Dict[str, str]]:
+    """HTTP headers describing a binary vector response. For RAW_MIMETYPE and NPY_MIMETYPE, the URIs are
+    transferred as (ASCII) JSON list in ``X-Vector-URIs``; null marks rows of labels that could not be linked
+    (these rows are zero vectors). NPZ_MIMETYPE responses carry the URIs in the body.
+
+    Parameters
+    ----------
+    uris : List[Union[None, str]]
+        One URI per row of the matrix.
+    matrix : ndarray
+        The matrix that is transferred.
+    mimetype : str
+        Mimetype of the response.
+
+    Returns
+    -------
+    Dict[str, str]
+        None if the URIs exceed MAX_URI_HEADER_BYTES (the response has to be requested as NPZ_MIMETYPE).
+    """
+    headers = {
+        "X-Vector-Shape": f"{matrix.shape[0]},{matrix.shape[1]}",
+        "X-Vector-Dtype": VECTOR_DTYPE,
+    }
+    if mimetype != NPZ_MIMETYPE:
+        uri_header = json.dumps(uris, ensure_ascii=True)
+        if len(uri_header) > MAX_URI_HEADER_BYTES:
+            return None
+        headers["X-Vector-URIs"] = uri_header
+    return headers
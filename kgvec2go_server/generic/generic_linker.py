@@ -1,18 +1,84 @@
 from abc import ABC
-from typing import Union
+from typing import Union, List
 from gensim.models import KeyedVectors
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.linker_index import LinkerIndex
 
 
 class GenericLinker(ABC):
     def link(self, label: str) -> Union[None, str]:
         pass
 
+    def link_index(self, label: str) -> int:
+        """Link the label to a vocabulary index.
+
+        Parameters
+        ----------
+        label : str
+            The label to be linked.
+
+        Returns
+        -------
+        int
+            The vocabulary index; -1 if the label cannot be linked.
+        """
+        pass
+
+    def link_all(self, labels: List[str]) -> List[Union[None, str]]:
+        """Link multiple labels in one pass.
+
+        Parameters
+        ----------
+        labels : List[str]
+            The labels to be linked.
+
+        Returns
+        -------
+        List[Union[None, str]]
+            One link per label (same order); None if a label cannot be linked.
+        """
+        return [self.link(label=label) for label in labels]
+
+    def link_all_indices(self, labels: List[str]) -> ndarray:
+        """Link multiple labels to vocabulary indices in one pass.
+
+        Parameters
+        ----------
+        labels : List[str]
+            The labels to be linked.
+
+        Returns
+        -------
+        ndarray
+            One vocabulary index per label (same order); -1 if a label cannot be linked.
+        """
+        return np.array(
+            [self.link_index(label=label) for label in labels], dtype=np.int64
+        )
+
 
 class GenericDBpediaLinker(GenericLinker):
-    def __init__(self, kv: KeyedVectors):
+    def __init__(self, kv: KeyedVectors, index: Union[None, LinkerIndex] = None):
+        """
+
+        Parameters
+        ----------
+        kv : KeyedVectors
+            Vectors.
+        index : LinkerIndex
+            Optional precomputed linker index. If given, labels are resolved through the index which also
+            resolves case variants and redirects.
+        """
         self.kv = kv
+        self.index = index
 
     def link(self, label: str) -> Union[None, str]:
+        if self.index is not None:
+            index = self.link_index(label=label)
+            return None if index < 0 else self.kv.index_to_key[index]
+
         if label is None:
             return None
 
@@ -39,3 +105,17 @@ class GenericDBpediaLinker(GenericLinker):
             return label
 
         return None
+
+    def link_index(self, label: str) -> int:
+        if self.index is None:
+            link = self.link(label=label)
+            return -1 if link is None else self.kv.key_to_index[link]
+
+        if label is None:
+            return -1
+
+        # exact keys (e.g. full URIs) are resolved directly
+        index = self.kv.key_to_index.get(label)
+        if index is not None:
+            return index
+        return self.index.lookup(label=label)
@@ -3,14 +3,21 @@ from __future__ import annotations
 from gensim import matutils
 from gensim.models import KeyedVectors
 import logging
-from typing import Union, List, Tuple
-import sys
+from typing import Iterator, Union, List, Tuple
+import numpy as np
 from numpy import ndarray, dot
 
+from kgvec2go_server.generic.ann_index import NearestNeighbourIndex, ExactIndex
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic import json_serializer
 from kgvec2go_server.generic.generic_linker import GenericLinker
-
-# logging
-logging.basicConfig(stream=sys.stderr, level=logging.DEBUG)
+from kgvec2go_server.generic.metrics import Metrics
+from kgvec2go_server.generic.result_cache import ResultCache, RankedResultMemo
+from kgvec2go_server.generic.service_registry import ServiceRegistry
+from kgvec2go_server.generic.similarity_engine import (
+    BatchSimilarityEngine,
+    normalize_rows,
+)
 
 
 class GenericKvQueryService:
@@ -24,6 +31,12 @@ class GenericKvQueryService:
         dataset_version: str,
         model: str,
         model_version: str,
+        index: Union[None, NearestNeighbourIndex] = None,
+        cache: Union[None, ResultCache] = None,
+        batch_window: Union[None, float] = None,
+        max_batch_size: int = 64,
+        vectors_version: Union[None, str] = None,
+        metrics: Union[None, Metrics] = None,
     ):
         """
 
@@ -39,6 +52,22 @@ class GenericKvQueryService:
             String representation of the version of the embedded dataset (e.g. "").
         model
         model_version
+        index : NearestNeighbourIndex
+            Optional nearest neighbour index used for closest concept queries (e.g. an IvfIndex or a
+            QuantizedIndex). If None, an exact index is used.
+        cache : ResultCache
+            Optional cache for closest concept results (may be shared with other services). Default: a new
+            in-process cache.
+        batch_window : float
+            If given, concurrent single-concept closest concept queries are gathered for up to batch_window
+            seconds and answered with one search (see ``MicroBatchScheduler``).
+        max_batch_size : int
+            Maximal number of distinct concepts of such a batch.
+        vectors_version : str
+            Optional version of the vectors (see ``VectorStore.get_file_version``); part of the cache keys, so
+            results cached for a replaced vector file are not returned for the new one.
+        metrics : Metrics
+            Records the link, scan, and serialize timings. Default: ``Metrics.get_default()``.
         """
         self.kv = kv
         self.linker = linker
@@ -46,19 +75,53 @@ class GenericKvQueryService:
         self.dataset_version = dataset_version
         self.model = model
         self.model_version = model_version
+        self._index: Union[None, NearestNeighbourIndex] = index
+        self.metrics = Metrics.get_default() if metrics is None else metrics
+        self.closest_concepts_memo = RankedResultMemo(
+            cache=ResultCache() if cache is None else cache,
+            namespace=(dataset, dataset_version, model, model_version, vectors_version),
+        )
+        self._similarity_engine: Union[None, BatchSimilarityEngine] = (
+            None if index is None else index.engine
+        )
+        self.batch_scheduler: Union[None, MicroBatchScheduler] = None
+        if batch_window is not None:
+            self.batch_scheduler = MicroBatchScheduler(
+                search=self._search_closest_concepts,
+                window=batch_window,
+                max_batch_size=max_batch_size,
+            )
+
+    @property
+    def similarity_engine(self) -> BatchSimilarityEngine:
+        """The batch similarity engine over the normalized vectors. It is built on first use so that services
+        which are never queried for closest concepts do not hold a normalized copy of the matrix.
+        """
+        if self._similarity_engine is None:
+            self._similarity_engine = BatchSimilarityEngine(vectors=self.kv.vectors)
+        return self._similarity_engine
+
+    @property
+    def index(self) -> NearestNeighbourIndex:
+        """The nearest neighbour index that answers closest concept queries."""
+        if self._index is None:
+            self._index = ExactIndex(engine=self.similarity_engine)
+        return self._index
 
     def get_vector(self, label: str) -> Union[Tuple[str, ndarray], None]:
-        link: str = self.linker.link(label=label)
-        if link is None:
+        index: int = self._link_index(label=label)
+        if index < 0:
             return None
-        return link, self.kv[link]
+        return self.kv.index_to_key[index], self.kv.vectors[index]
 
     def get_vector_json(self, label: str) -> str:
         link_vector: Union[Tuple[str, ndarray], None] = self.get_vector(label=label)
         if link_vector is None:
-            return "{}"
-        result = f'{{ "uri": "{link_vector[0]}", "vector": {GenericKvQueryService.__to_json_array(vector=link_vector[1])}}}'
-        return result
+            return json_serializer.EMPTY_RESULT
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.vector_to_json(
+                uri=link_vector[0], vector=link_vector[1]
+            )
 
     def get_similarity(self, label_1: str, label_2: str) -> Union[float, None]:
         """Calculate the similarity between the two given concepts.
@@ -76,12 +139,15 @@ class GenericKvQueryService:
         float
             Similarity. If no concepts can be found: None.
         """
-        link_1 = self.linker.link(label=label_1)
-        link_2 = self.linker.link(label=label_2)
+        index_1 = self._link_index(label=label_1)
+        index_2 = self._link_index(label=label_2)
 
-        if link_1 is None or link_2 is None:
+        if index_1 < 0 or index_2 < 0:
             return None
-        return self.kv.similarity(w1=link_1, w2=link_2)
+        return dot(
+            matutils.unitvec(self.kv.vectors[index_1]),
+            matutils.unitvec(self.kv.vectors[index_2]),
+        )
 
     def get_similarity_json(self, label_1: str, label_2: str) -> str:
         """Calculate the similarity between the two given concepts.
@@ -99,11 +165,7 @@ class GenericKvQueryService:
         str
             Similarity as JSON.
         """
-        similarity = self.get_similarity(label_1, label_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
+        return json_serializer.result_to_json(self.get_similarity(label_1, label_2))
 
     def get_closest_concepts(
         self, label: str, topn: int
@@ -121,12 +183,89 @@ class GenericKvQueryService:
         -------
         list of (str, float) or numpy.array
         """
-        link: str = self.linker.link(label=label)
-        if link is None:
-            logging.error(f"No concept found for label `{label}`")
-            return None
+        return self.get_closest_concepts_batch(labels=[label], topn=topn)[0]
+
+    def get_closest_concepts_batch(
+        self, labels: List[str], topn: int
+    ) -> List[Union[None, List[Tuple[str, float]]]]:
+        """Get the closest concepts for multiple labels at once. Labels that are not memoized are answered with
+        a single matrix-matrix product.
+
+        Parameters
+        ----------
+        labels: List[str]
+            Concept labels or URIs.
+        topn: int
+            Number of closest concepts that shall be returned per label.
 
-        return self.kv.most_similar(link, topn=topn)
+        Returns
+        -------
+        List[Union[None, List[Tuple[str, float]]]]
+            One entry per label (same order): the list of (concept, score) tuples or None if the label cannot
+            be linked.
+        """
+        return [
+            (
+                None
+                if ranked is None
+                else BatchSimilarityEngine.to_result_list(
+                    keys=self.kv.index_to_key, indices=ranked[0], scores=ranked[1]
+                )
+            )
+            for ranked in self._rank_closest_concepts_batch(labels=labels, topn=topn)
+        ]
+
+    def _rank_closest_concepts_batch(
+        self, labels: List[str], topn: int
+    ) -> List[Union[None, Tuple[ndarray, ndarray]]]:
+        """Rank the closest concepts for multiple labels (see ``get_closest_concepts_batch``).
+
+        Returns
+        -------
+        List[Union[None, Tuple[ndarray, ndarray]]]
+            One entry per label (same order): matrix indices and scores (may contain unresolved entries, see
+            ``NearestNeighbourIndex.search``) or None if the label cannot be linked.
+        """
+        result: List[Union[None, Tuple[ndarray, ndarray]]] = [None] * len(labels)
+        linked_indices = self._link_to_indices(labels=labels)
+        ranked_results = {}
+        for position, index in enumerate(linked_indices):
+            if index < 0:
+                logging.debug("No concept found for label `%s`", labels[position])
+                continue
+            index = int(index)
+            if index not in ranked_results:
+                ranked_results[index] = self.closest_concepts_memo.get(
+                    concept=index, topn=topn
+                )
+
+        indices_to_compute = [
+            index for index, ranked in ranked_results.items() if ranked is None
+        ]
+        if len(indices_to_compute) > 0:
+            if len(indices_to_compute) == 1 and self.batch_scheduler is not None:
+                # coalesced with the concurrent requests of other threads
+                top_indices, top_scores = self.batch_scheduler.submit(
+                    concept=indices_to_compute[0], topn=topn
+                )
+                top_indices, top_scores = top_indices[None, :], top_scores[None, :]
+            else:
+                top_indices, top_scores = self._search_closest_concepts(
+                    indices=indices_to_compute, topn=topn
+                )
+            for row, index in enumerate(indices_to_compute):
+                self.closest_concepts_memo.put(
+                    concept=index,
+                    topn=topn,
+                    indices=top_indices[row],
+                    scores=top_scores[row],
+                )
+                ranked_results[index] = (top_indices[row], top_scores[row])
+
+        for position, index in enumerate(linked_indices):
+            if index >= 0:
+                result[position] = ranked_results[int(index)]
+        return result
 
     def get_closest_concepts_json(self, label: str, topn: int) -> str:
         """Get the closest concepts as JSON string.
@@ -143,20 +282,50 @@ class GenericKvQueryService:
         Result as JSON string.
         """
         return self.__closest_concepts_to_json(
-            self.get_closest_concepts(label=label, topn=topn)
+            self._rank_closest_concepts_batch(labels=[label], topn=topn)[0]
+        )
+
+    def stream_closest_concepts(
+        self, label: str, topn: int, ndjson: bool = False
+    ) -> Union[None, Iterator[str]]:
+        """Get the closest concepts as chunks of JSON (for large topn). The ranking is computed on call, the
+        chunks are rendered while the iterator is consumed.
+
+        Parameters
+        ----------
+        label: str
+            Concept label or URI.
+        topn: int
+            Number of closest concepts that shall be returned.
+        ndjson: bool
+            If True, one JSON object per line; else the chunks form the payload of ``get_closest_concepts_json``.
+
+        Returns
+        -------
+        Union[None, Iterator[str]]
+            The chunks; None if the label cannot be linked.
+        """
+        ranked = self._rank_closest_concepts_batch(labels=[label], topn=topn)[0]
+        if ranked is None:
+            return None
+        return json_serializer.iter_closest_concepts_json(
+            keys=self.kv.index_to_key,
+            indices=ranked[0],
+            scores=ranked[1],
+            ndjson=ndjson,
         )
 
     def get_triple_score(
         self, subject_label: str, predicate_label: str, object_label: str
     ) -> Union[None, float]:
-        subject_link: str = self.linker.link(label=subject_label)
-        predicate_link: str = self.linker.link(label=predicate_label)
-        object_link: str = self.linker.link(label=object_label)
-        if subject_link is None or predicate_link is None or object_link is None:
+        subject_index: int = self._link_index(label=subject_label)
+        predicate_index: int = self._link_index(label=predicate_label)
+        object_index: int = self._link_index(label=object_label)
+        if subject_index < 0 or predicate_index < 0 or object_index < 0:
             return None
-        subject_vector = self.kv.get_vector(key=subject_link)
-        predicate_vector = self.kv.get_vector(key=predicate_link)
-        object_vector = self.kv.get_vector(key=object_link)
+        subject_vector = self.kv.vectors[subject_index]
+        predicate_vector = self.kv.vectors[predicate_index]
+        object_vector = self.kv.vectors[object_index]
         lookup_vector = subject_vector + predicate_vector
 
         # this is the code of the similarity function of gensim (which cannot be used since we do not want
@@ -166,15 +335,13 @@ class GenericKvQueryService:
     def get_triple_score_json(
         self, subject_label: str, predicate_label: str, object_label: str
     ):
-        score = self.get_triple_score(
-            subject_label=subject_label,
-            predicate_label=predicate_label,
-            object_label=object_label,
+        return json_serializer.result_to_json(
+            self.get_triple_score(
+                subject_label=subject_label,
+                predicate_label=predicate_label,
+                object_label=object_label,
+            )
         )
-        if score is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(score) + " }"
 
     def most_similar_addition(
         self, label_1: str, label_2: str, topn: int
@@ -192,75 +359,269 @@ class GenericKvQueryService:
         List[Tuple[str, float]]]
         Topn closest concepts and scores (list of tuples). None if the labels cannot be linked to concepts.
         """
-        link_1: str = self.linker.link(label=label_1)
-        link_2: str = self.linker.link(label=label_2)
-        if link_1 is None or link_2 is None:
+        ranked = self._rank_addition(label_1=label_1, label_2=label_2, topn=topn)
+        if ranked is None:
+            return None
+        return BatchSimilarityEngine.to_result_list(
+            keys=self.kv.index_to_key, indices=ranked[0], scores=ranked[1]
+        )
+
+    def _rank_addition(
+        self, label_1: str, label_2: str, topn: int
+    ) -> Union[None, Tuple[ndarray, ndarray]]:
+        """Matrix indices and scores of the concepts closest to the sum of the two label vectors (see
+        ``most_similar_addition``); None if the labels cannot be linked to concepts."""
+        index_1: int = self._link_index(label=label_1)
+        index_2: int = self._link_index(label=label_2)
+        if index_1 < 0 or index_2 < 0:
             return None
 
-        l1_vector = self.kv.get_vector(key=link_1)
-        l2_vector = self.kv.get_vector(key=link_2)
+        l1_vector = self.kv.vectors[index_1]
+        l2_vector = self.kv.vectors[index_2]
         lookup_vector = l1_vector + l2_vector
 
-        return self.kv.most_similar(positive=[lookup_vector], topn=topn)
+        with self.metrics.time_stage("scan"):
+            top_indices, top_scores = self.index.search(
+                query_vectors=lookup_vector.reshape(1, -1), topn=topn
+            )
+        return top_indices[0], top_scores[0]
 
     def most_similar_addition_json(self, label_1: str, label_2: str, topn: int) -> str:
         return self.__closest_concepts_to_json(
-            self.most_similar_addition(label_1=label_1, label_2=label_2, topn=topn)
+            self._rank_addition(label_1=label_1, label_2=label_2, topn=topn)
         )
 
-    @staticmethod
-    def __closest_concepts_to_json(
-        closest_concepts: Union[None, List[Tuple[str, float]]]
-    ) -> str:
-        if closest_concepts is None:
-            return "{}"
-        is_first = True
-        result = '{\n"result": [\n'
-        for concept, score in list(closest_concepts):
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"' + str(concept) + '", "score":' + str(score) + "}"
-                )
-            else:
-                result += (
-                    ',\n{ "concept":"' + str(concept) + '", "score":' + str(score) + "}"
-                )
-        result += "\n]\n}"
+    def _search_closest_concepts(
+        self, indices: List[int], topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        """Closest concepts of the given matrix indices (without the concepts themselves), see
+        ``NearestNeighbourIndex.search``."""
+        with self.metrics.time_stage("scan"):
+            return self.index.search(
+                query_vectors=self.kv.vectors[indices],
+                topn=topn,
+                exclude_indices=indices,
+            )
+
+    def _link_index(self, label: str) -> int:
+        """Matrix index of the given label; -1 if it cannot be linked."""
+        with self.metrics.time_stage("link"):
+            return self.linker.link_index(label=label)
+
+    def _link_to_indices(self, labels: List[str]) -> ndarray:
+        """Link the given labels in one pass and map them to matrix indices.
+
+        Parameters
+        ----------
+        labels : List[str]
+            Concept labels or URIs.
+
+        Returns
+        -------
+        ndarray
+            One matrix index per label; -1 for labels that cannot be linked.
+        """
+        with self.metrics.time_stage("link"):
+            return self.linker.link_all_indices(labels=labels)
+
+    def _get_rows(self, indices: ndarray) -> ndarray:
+        """Gathers the vectors of the given matrix indices; unresolved indices (-1) yield zero vectors."""
+        result = np.zeros((len(indices), self.kv.vector_size), dtype=np.float32)
+        resolved = indices >= 0
+        result[resolved] = self.kv.vectors[indices[resolved]]
         return result
 
-    @staticmethod
-    def __to_json_array(vector):
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+    def get_vectors(self, labels: List[str]) -> List[Union[None, Tuple[str, ndarray]]]:
+        """Get the vectors for multiple labels.
 
-    @staticmethod
-    def _normalize_for_list_search(
-        name: str,
-    ) -> str:
-        """Normalization operation for searching/finding services in a list of services.
+        Parameters
+        ----------
+        labels : List[str]
+            Concept labels or URIs.
+
+        Returns
+        -------
+        List[Union[None, Tuple[str, ndarray]]]
+            One (uri, vector) tuple per label (same order); None if a label cannot be linked.
+        """
+        indices = self._link_to_indices(labels=labels)
+        vectors = self._get_rows(indices=indices)
+        return [
+            None if index < 0 else (self.kv.index_to_key[index], vectors[row])
+            for row, index in enumerate(indices)
+        ]
+
+    def get_vectors_json(self, labels: List[str]) -> str:
+        uris, matrix = self.get_vector_matrix(labels=labels)
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.dumps(
+                {
+                    "result": [
+                        {
+                            "concept": label,
+                            "uri": uri,
+                            "vector": None if uri is None else matrix[row],
+                        }
+                        for row, (label, uri) in enumerate(zip(labels, uris))
+                    ]
+                }
+            )
+
+    def stream_vectors(
+        self, labels: List[str], chunk_size: int = json_serializer.STREAM_CHUNK_SIZE
+    ) -> Iterator[str]:
+        """Export the vectors of many labels as NDJSON (one ``{"concept", "uri", "vector"}`` object per line). The
+        labels are linked and rendered chunk by chunk while the iterator is consumed.
 
         Parameters
         ----------
-        name : str
-            String to be normalized.
+        labels : List[str]
+            Concept labels or URIs.
+        chunk_size : int
+            Number of labels per chunk.
 
         Returns
         -------
-        Normalized string.
+        Iterator[str]
         """
-        name = name.lower()
-        name = name.replace("-", "")
-        name = name.replace("_", "")
-        name = name.replace(" ", "")
-        return name
+        for start in range(0, len(labels), chunk_size):
+            chunk = labels[start : start + chunk_size]
+            uris, matrix = self.get_vector_matrix(labels=chunk)
+            yield json_serializer.vectors_to_ndjson(
+                labels=chunk, uris=uris, matrix=matrix
+            )
+
+    def get_vector_matrix(
+        self, labels: List[str]
+    ) -> Tuple[List[Union[None, str]], ndarray]:
+        """Get the vectors for the given labels as one matrix (used for binary responses). For a single linked
+        label, the result is a view on ``kv.vectors`` (the row is only copied when the response is encoded).
+
+        Parameters
+        ----------
+        labels : List[str]
+            Concept labels or URIs.
+
+        Returns
+        -------
+        Tuple[List[Union[None, str]], ndarray]
+            One URI per label (None if the label cannot be linked) and a matrix with one row per label. Rows of
+            labels that cannot be linked are zero vectors.
+        """
+        indices = self._link_to_indices(labels=labels)
+        uris = [None if index < 0 else self.kv.index_to_key[index] for index in indices]
+        if len(indices) == 1 and indices[0] >= 0:
+            return uris, self.kv.vectors[indices[0] : indices[0] + 1]
+        return uris, self._get_rows(indices=indices)
+
+    def get_similarities(
+        self, label_pairs: List[Tuple[str, str]]
+    ) -> List[Union[None, float]]:
+        """Calculate the similarities of multiple label pairs with one vectorized operation.
+
+        Parameters
+        ----------
+        label_pairs : List[Tuple[str, str]]
+            Pairs of concept labels or URIs.
+
+        Returns
+        -------
+        List[Union[None, float]]
+            One similarity per pair (same order); None if one of the labels cannot be linked.
+        """
+        indices = self._link_to_indices(
+            labels=[label for pair in label_pairs for label in pair]
+        ).reshape(-1, 2)
+        vectors = normalize_rows(self._get_rows(indices=indices.reshape(-1)))
+        similarities = np.einsum("ij,ij->i", vectors[0::2], vectors[1::2])
+        return [
+            None if (pair_indices < 0).any() else float(similarity)
+            for pair_indices, similarity in zip(indices, similarities)
+        ]
+
+    def get_similarities_json(self, label_pairs: List[Tuple[str, str]]) -> str:
+        similarities = self.get_similarities(label_pairs=label_pairs)
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.dumps(
+                {
+                    "result": [
+                        {"concepts": list(pair), "result": similarity}
+                        for pair, similarity in zip(label_pairs, similarities)
+                    ]
+                }
+            )
+
+    def get_triple_scores(
+        self, triples: List[Tuple[str, str, str]]
+    ) -> List[Union[None, float]]:
+        """Calculate the scores of multiple triples with one vectorized operation (see ``get_triple_score``).
+
+        Parameters
+        ----------
+        triples : List[Tuple[str, str, str]]
+            (subject, predicate, object) labels or URIs.
+
+        Returns
+        -------
+        List[Union[None, float]]
+            One score per triple (same order); None if one of the labels cannot be linked.
+        """
+        indices = self._link_to_indices(
+            labels=[label for triple in triples for label in triple]
+        ).reshape(-1, 3)
+        vectors = self._get_rows(indices=indices.reshape(-1))
+        lookup_vectors = normalize_rows(vectors[0::3] + vectors[1::3])
+        object_vectors = normalize_rows(vectors[2::3])
+        scores = np.einsum("ij,ij->i", lookup_vectors, object_vectors)
+        return [
+            None if (triple_indices < 0).any() else float(score)
+            for triple_indices, score in zip(indices, scores)
+        ]
+
+    def get_triple_scores_json(self, triples: List[Tuple[str, str, str]]) -> str:
+        scores = self.get_triple_scores(triples=triples)
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.dumps(
+                {
+                    "result": [
+                        {"triple": list(triple), "result": score}
+                        for triple, score in zip(triples, scores)
+                    ]
+                }
+            )
+
+    def get_closest_concepts_batch_json(self, labels: List[str], topn: int) -> str:
+        ranked_batch = self._rank_closest_concepts_batch(labels=labels, topn=topn)
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.dumps(
+                {
+                    "result": [
+                        {
+                            "concept": label,
+                            "result": (
+                                None
+                                if ranked is None
+                                else json_serializer.ranked_results(
+                                    keys=self.kv.index_to_key,
+                                    indices=ranked[0],
+                                    scores=ranked[1],
+                                )
+                            ),
+                        }
+                        for label, ranked in zip(labels, ranked_batch)
+                    ]
+                }
+            )
+
+    def __closest_concepts_to_json(
+        self, ranked: Union[None, Tuple[ndarray, ndarray]]
+    ) -> str:
+        if ranked is None:
+            return json_serializer.EMPTY_RESULT
+        with self.metrics.time_stage("serialize"):
+            return json_serializer.closest_concepts_to_json(
+                keys=self.kv.index_to_key, indices=ranked[0], scores=ranked[1]
+            )
 
     @staticmethod
     def get_service_from_list(
@@ -270,7 +631,8 @@ class GenericKvQueryService:
         model: str,
         model_version: str,
     ) -> Union[None, GenericKvQueryService]:
-        """Retrieves a service from a list given search criteria.
+        """Retrieves a service from a list given search criteria. Names are compared like in the
+        ``ServiceRegistry`` (see ``normalize_name``); if several services match, the first one is returned.
 
         Parameters
         ----------
@@ -289,23 +651,8 @@ class GenericKvQueryService:
         -------
         None if no service could be found for the given concepts, else the found service.
         """
-        for entry in the_list:
-            if not GenericKvQueryService._normalize_for_list_search(
-                name=entry.dataset
-            ) == GenericKvQueryService._normalize_for_list_search(dataset):
-                continue
-            if not GenericKvQueryService._normalize_for_list_search(
-                name=entry.dataset_version
-            ) == GenericKvQueryService._normalize_for_list_search(dataset_version):
-                continue
-            if not GenericKvQueryService._normalize_for_list_search(
-                name=entry.model
-            ) == GenericKvQueryService._normalize_for_list_search(model):
-                continue
-            if not GenericKvQueryService._normalize_for_list_search(
-                name=entry.model_version
-            ) == GenericKvQueryService._normalize_for_list_search(model_version):
-                continue
-            return entry
-
-        return None
+        registry = ServiceRegistry()
+        # a later registration replaces an earlier one: register in reverse order so that the first match wins
+        for entry in reversed(the_list):
+            registry.register(entry)
+        return registry.get(dataset, dataset_version, model, model_version)
@@ -0,0 +1,250 @@
+"""JSON rendering of the result payloads of all services and routes.
+
+Ranked results and vectors are rendered in bulk from the NumPy arrays of the services (no per-element string
+concatenation) and all strings are escaped, so URIs that contain quotes or backslashes yield valid JSON. orjson is
+used if it is installed; otherwise the standard library ``json`` module is used (same output structure).
+
+Large payloads can be streamed: ``iter_closest_concepts_json`` and ``vectors_to_ndjson`` render chunks of at most
+``STREAM_CHUNK_SIZE`` entries, either as one JSON document or as NDJSON (one JSON object per line).
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Sequence, Union
+
+import numpy as np
+from numpy import ndarray
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+EMPTY_RESULT = "{}"
+"""Payload of queries that cannot be answered, e.g. because a concept cannot be linked."""
+
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+STREAM_CHUNK_SIZE = 1000
+"""Number of entries rendered per chunk of a streamed response."""
+
+STREAMING_TOP_N = 10000
+"""Closest concept responses for a larger top_n are streamed (the payload is the same)."""
+
+
+def dumps(value: Any) -> str:
+    """Serializes the given value to a compact JSON string. NumPy arrays and scalars may occur anywhere in the
+    value.
+
+    Parameters
+    ----------
+    value : Any
+        Dicts, lists, tuples, strings, numbers, None, NumPy arrays and NumPy scalars.
+
+    Returns
+    -------
+    str
+        JSON string.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            value, default=_to_serializable, option=orjson.OPT_SERIALIZE_NUMPY
+        ).decode("utf-8")
+    return json.dumps(
+        value, default=_to_serializable, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def _to_serializable(value: Any) -> Any:
+    """Fallback of ``dumps`` for values the JSON library cannot serialize natively."""
+    if isinstance(value, ndarray):
+        if orjson is not None and value.dtype in (np.float32, np.float64):
+            # memory-mapped and non-contiguous arrays: contiguous plain copy, serialized natively
+            return np.ascontiguousarray(value)
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def ranked_results(
+    keys: Sequence[str], indices: ndarray, scores: ndarray
+) -> List[Dict[str, Any]]:
+    """Converts one row of ranked results into ``{"concept": ..., "score": ...}`` entries. Unresolved entries
+    (index -1 or score -inf, see ``NearestNeighbourIndex.search``) are dropped.
+
+    Parameters
+    ----------
+    keys : Sequence[str]
+        Index to key mapping, e.g. ``kv.index_to_key``.
+    indices : ndarray
+        One row of result indices.
+    scores : ndarray
+        One row of result scores (same length).
+
+    Returns
+    -------
+    List[Dict[str, Any]]
+    """
+    return [
+        {"concept": keys[index], "score": score}
+        for index, score in zip(
+            np.asarray(indices).tolist(), np.asarray(scores).tolist()
+        )
+        if index >= 0 and score != -np.inf
+    ]
+
+
+def closest_concepts_to_json(
+    keys: Sequence[str], indices: ndarray, scores: ndarray
+) -> str:
+    """Renders one row of ranked results as ``{"result": [{"concept": ..., "score": ...}, ...]}``.
+
+    Parameters
+    ----------
+    keys : Sequence[str]
+        Index to key mapping, e.g. ``kv.index_to_key``.
+    indices : ndarray
+        One row of result indices.
+    scores : ndarray
+        One row of result scores (same length).
+
+    Returns
+    -------
+    str
+        JSON string.
+    """
+    return dumps({"result": ranked_results(keys=keys, indices=indices, scores=scores)})
+
+
+def vector_to_json(uri: str, vector: ndarray) -> str:
+    """Renders a vector as ``{"uri": ..., "vector": [...]}``."""
+    return dumps({"uri": uri, "vector": vector})
+
+
+def vectors_to_json(uris: Sequence[str], matrix: ndarray) -> str:
+    """Renders one vector per URI (rows of the matrix) as ``{"result": [{"uri": ..., "vector": [...]}, ...]}``."""
+    matrix = np.ascontiguousarray(matrix)
+    return dumps(
+        {
+            "result": [
+                {"uri": uri, "vector": matrix[row]} for row, uri in enumerate(uris)
+            ]
+        }
+    )
+
+
+def result_to_json(value: Union[None, float]) -> str:
+    """Renders a single value (e.g. a similarity) as ``{"result": ...}``; ``EMPTY_RESULT`` for None."""
+    if value is None:
+        return EMPTY_RESULT
+    return dumps({"result": value})
+
+
+def iter_closest_concepts_json(
+    keys: Sequence[str],
+    indices: ndarray,
+    scores: ndarray,
+    ndjson: bool = False,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[str]:
+    """Renders one row of ranked results in chunks of at most chunk_size entries, so that no string of the
+    complete payload is built.
+
+    Parameters
+    ----------
+    keys : Sequence[str]
+        Index to key mapping, e.g. ``kv.index_to_key``.
+    indices : ndarray
+        One row of result indices.
+    scores : ndarray
+        One row of result scores (same length).
+    ndjson : bool
+        If True, one ``{"concept": ..., "score": ...}`` object per line; else the chunks form the payload of
+        ``closest_concepts_to_json``.
+    chunk_size : int
+        Number of entries per chunk.
+
+    Returns
+    -------
+    Iterator[str]
+    """
+    if not ndjson:
+        yield '{"result":['
+    separator = ""
+    for start in range(0, len(indices), chunk_size):
+        entries = ranked_results(
+            keys=keys,
+            indices=indices[start : start + chunk_size],
+            scores=scores[start : start + chunk_size],
+        )
+        if len(entries) == 0:
+            continue
+        if ndjson:
+            yield "".join([dumps(entry) + "\n" for entry in entries])
+        else:
+            # the entries of the chunk without the brackets of the list
+            yield separator + dumps(entries)[1:-1]
+            separator = ","
+    if not ndjson:
+        yield "]}"
+
+
+def vectors_to_ndjson(
+    labels: Sequence[str], uris: Sequence[Union[None, str]], matrix: ndarray
+) -> str:
+    """Renders one ``{"concept": ..., "uri": ..., "vector": [...]}`` line per label; uri and vector are null for
+    labels that cannot be linked.
+
+    Parameters
+    ----------
+    labels : Sequence[str]
+        The requested labels.
+    uris : Sequence[Union[None, str]]
+        One URI per label (None if the label cannot be linked).
+    matrix : ndarray
+        One row per label.
+
+    Returns
+    -------
+    str
+    """
+    matrix = np.ascontiguousarray(matrix)
+    return "".join(
+        [
+            dumps(
+                {
+                    "concept": label,
+                    "uri": uri,
+                    "vector": None if uri is None else matrix[row],
+                }
+            )
+            + "\n"
+            for row, (label, uri) in enumerate(zip(labels, uris))
+        ]
+    )
+
+
+def negotiate_mimetype(accept_header: Union[None, str]) -> str:
+    """JSON_MIMETYPE or NDJSON_MIMETYPE, whichever fits the given ``Accept`` header better; JSON_MIMETYPE if
+    none is acceptable.
+
+    Parameters
+    ----------
+    accept_header : str
+        Value of the ``Accept`` header of the request (None if the header is missing).
+
+    Returns
+    -------
+    str
+    """
+    return parse_accept_header(accept_header, MIMEAccept).best_match(
+        [JSON_MIMETYPE, NDJSON_MIMETYPE], default=JSON_MIMETYPE
+    )
+
+
+def error_to_json(message: str) -> str:
+    """Renders an error message as ``{"error": ...}``."""
+    return dumps({"error": message})
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+from hashlib import blake2b
+from typing import List, Dict, Union, Tuple
+
+import numpy as np
+from numpy import ndarray
+
+DBPEDIA_PREFIXES: Tuple[Tuple[str, int], ...] = (
+    ("http://dbpedia.org/resource/", 0),
+    ("dbr:", 0),
+    ("http://dbpedia.org/ontology/", 1),
+    ("dbo:", 1),
+)
+"""Prefixes that are stripped from surface forms together with the priority of the stripped form (lower wins,
+resources are preferred over ontology elements like in GenericDBpediaLinker)."""
+
+OTHER_PRIORITY = 2
+REDIRECT_PRIORITY = 3
+
+
+def normalize_surface_form(label: str) -> Tuple[str, int]:
+    """Normalizes a label or URI: surrounding spaces are removed, spaces are replaced by underscores and a DBpedia
+    prefix is stripped.
+
+    Parameters
+    ----------
+    label : str
+        Label or URI.
+
+    Returns
+    -------
+    Tuple[str, int]
+        The normalized form and the priority of the stripped prefix.
+
+    Raises
+    ------
+    TypeError
+        If the label is not a string.
+    """
+    if not isinstance(label, str):
+        raise TypeError(f"Labels must be strings, not {type(label).__name__}.")
+    label = label.strip(" ").replace(" ", "_")
+    for prefix, priority in DBPEDIA_PREFIXES:
+        if label.startswith(prefix):
+            return label[len(prefix) :], priority
+    return label, OTHER_PRIORITY
+
+
+def hash_surface_form(surface_form: str) -> int:
+    """Stable (process-independent) 64 bit hash of a surface form."""
+    return int.from_bytes(
+        blake2b(surface_form.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+class LinkerIndex:
+    """Precomputed index from normalized surface forms to vocabulary indices.
+
+    Every entry holds the hash of the case-folded normalized form (the arrays are sorted by this hash), the hash
+    of the case-sensitive normalized form, the vocabulary index and a priority. A lookup is one binary search
+    for the case-folded hash; among the entries of that hash, a case-sensitive match wins over a case variant,
+    an explicitly given prefix (e.g. ``dbo:``) is respected and lower priorities win over higher ones (resource
+    before ontology before redirect).
+
+    The arrays are stored as a snapshot next to the ``.kv`` file so that they can be memory-mapped; an index built
+    for another version of the ``.kv`` file is rejected.
+    """
+
+    SNAPSHOT_NAME = "linker"
+    FILE_SUFFIXES = ("fold_hashes", "exact_hashes", "indices", "priorities")
+
+    def __init__(
+        self,
+        fold_hashes: ndarray,
+        exact_hashes: ndarray,
+        indices: ndarray,
+        priorities: ndarray,
+    ):
+        self.fold_hashes = fold_hashes
+        self.exact_hashes = exact_hashes
+        self.indices = indices
+        self.priorities = priorities
+
+    def __len__(self):
+        return len(self.indices)
+
+    def lookup(self, label: str) -> int:
+        """Resolve a label to a vocabulary index.
+
+        Parameters
+        ----------
+        label : str
+            Label or URI.
+
+        Returns
+        -------
+        int
+            The vocabulary index or -1 if the label cannot be resolved.
+        """
+        if label is None:
+            return -1
+        surface_form, prefix_priority = normalize_surface_form(label)
+        fold_hash = np.uint64(hash_surface_form(surface_form.casefold()))
+        start = np.searchsorted(self.fold_hashes, fold_hash, side="left")
+        end = np.searchsorted(self.fold_hashes, fold_hash, side="right")
+        if start == end:
+            return -1
+        if end - start == 1:
+            return int(self.indices[start])
+        exact_hash = np.uint64(hash_surface_form(surface_form))
+        priorities = self.priorities[start:end].astype(np.int64)
+        # ranking: case-sensitive match first, then the prefix given in the label (if any), then priority
+        ranks = (self.exact_hashes[start:end] != exact_hash) * 100 + priorities
+        if prefix_priority != OTHER_PRIORITY:
+            ranks += (priorities != prefix_priority) * 10
+        return int(self.indices[start + int(np.argmin(ranks))])
+
+    @staticmethod
+    def build(
+        keys: List[str], redirects: Union[None, Dict[str, str]] = None
+    ) -> LinkerIndex:
+        """Build the index for a vocabulary.
+
+        Parameters
+        ----------
+        keys : List[str]
+            The vocabulary, e.g. ``kv.index_to_key``.
+        redirects : Dict[str, str]
+            Optional; redirect source -> redirect target. Sources whose target is not in the vocabulary are
+            ignored.
+
+        Returns
+        -------
+        LinkerIndex
+        """
+        key_to_index = {key: index for index, key in enumerate(keys)}
+        entries = [(key, index, None) for index, key in enumerate(keys)]
+        if redirects is not None:
+            entries += [
+                (source, key_to_index[target], REDIRECT_PRIORITY)
+                for source, target in redirects.items()
+                if target in key_to_index
+            ]
+
+        fold_hashes = np.empty(len(entries), dtype=np.uint64)
+        exact_hashes = np.empty(len(entries), dtype=np.uint64)
+        indices = np.empty(len(entries), dtype=np.int64)
+        priorities = np.empty(len(entries), dtype=np.int64)
+        for position, (surface_form, index, priority) in enumerate(entries):
+            surface_form, prefix_priority = normalize_surface_form(surface_form)
+            fold_hashes[position] = hash_surface_form(surface_form.casefold())
+            exact_hashes[position] = hash_surface_form(surface_form)
+            indices[position] = index
+            priorities[position] = prefix_priority if priority is None else priority
+
+        order = np.argsort(fold_hashes, kind="stable")
+        return LinkerIndex(
+            fold_hashes=fold_hashes[order],
+            exact_hashes=exact_hashes[order],
+            indices=indices[order],
+            priorities=priorities[order].astype(np.uint8),
+        )
+
+    @staticmethod
+    def get_file_path(kv_path: str, suffix: str) -> str:
+        """Path of one index file that belongs to the given ``.kv`` file."""
+        # imported here: term_snapshot depends on the hashing of this module
+        from kgvec2go_server.generic.term_snapshot import Snapshot
+
+        return Snapshot.get_file_path(kv_path, LinkerIndex.SNAPSHOT_NAME, suffix)
+
+    def save(self, kv_path: str) -> None:
+        """Persist the index next to the given ``.kv`` file (together with the checksum of the file)."""
+        from kgvec2go_server.generic.term_snapshot import Snapshot
+
+        Snapshot(
+            arrays={
+                suffix: getattr(self, suffix) for suffix in LinkerIndex.FILE_SUFFIXES
+            }
+        ).save(kv_path, name=LinkerIndex.SNAPSHOT_NAME)
+
+    @staticmethod
+    def load(
+        kv_path: str, mmap_mode: Union[None, str] = "r"
+    ) -> Union[None, LinkerIndex]:
+        """Load an index that has been persisted next to the given ``.kv`` file.
+
+        Parameters
+        ----------
+        kv_path : str
+            Path to the vector file.
+        mmap_mode : str or None
+            Memory-map mode passed to ``numpy.load``.
+
+        Returns
+        -------
+        LinkerIndex
+            None if there is no index or if it was built for another version of the ``.kv`` file.
+        """
+        from kgvec2go_server.generic.term_snapshot import Snapshot
+
+        snapshot = Snapshot.load(
+            kv_path, name=LinkerIndex.SNAPSHOT_NAME, mmap_mode=mmap_mode
+        )
+        if snapshot is None:
+            return None
+        return LinkerIndex(
+            *[snapshot.arrays[suffix] for suffix in LinkerIndex.FILE_SUFFIXES]
+        )
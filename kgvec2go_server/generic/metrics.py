@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import bisect
+from contextlib import contextmanager
+import threading
+import time
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from kgvec2go_server.generic.result_cache import ResultCache
+
+METRICS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Content type of the Prometheus text format rendered by ``Metrics.render``."""
+
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""Upper bounds (seconds) of the buckets of request and stage latencies."""
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+"""Upper bounds (bytes) of the buckets of response payload sizes."""
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Thread-safe histogram with fixed buckets (cumulative on rendering, as in Prometheus)."""
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+
+        Parameters
+        ----------
+        buckets : Sequence[float]
+            Upper bounds of the buckets; values above the largest bound are counted in the implicit +Inf bucket.
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[position] += 1
+            self.sum += value
+            self.count += 1
+
+    def get_cumulative_counts(self) -> List[Tuple[str, int]]:
+        """(upper bound, number of values <= upper bound) per bucket, the last bound is "+Inf"."""
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], counts):
+            total += count
+            result.append((str(bound), total))
+        return result
+
+
+class Metrics:
+    """Instrumentation of the routes and services, exported in the Prometheus text format (``/metrics``).
+
+    Recorded are per-route latency histograms, response counts per status and payload sizes, per-stage timings
+    of the services (``link``: label to vector index, ``scan``: closest concept search, ``serialize``: JSON
+    rendering), and the statistics of registered result caches. Recording a value takes a lock for a few
+    additions only, so the hot paths do not log anything.
+    """
+
+    __default: Union[None, Metrics] = None
+    __default_lock = threading.Lock()
+
+    def __init__(self):
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], int] = {}
+        self._caches: Dict[str, ResultCache] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_default() -> Metrics:
+        """The metrics shared by all routes and services of this process."""
+        with Metrics.__default_lock:
+            if Metrics.__default is None:
+                Metrics.__default = Metrics()
+            return Metrics.__default
+
+    def __get_histogram(
+        self, name: str, labels: Labels, buckets: Sequence[float]
+    ) -> Histogram:
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    def observe_request(
+        self,
+        route: str,
+        seconds: float,
+        status: int = 200,
+        payload_size: Union[None, int] = None,
+    ) -> None:
+        """Records one answered request.
+
+        Parameters
+        ----------
+        route : str
+            The rule of the route (not the path, so that the number of label values is bounded).
+        seconds : float
+            Time until the response was produced (for streamed responses: until the first chunk).
+        status : int
+            HTTP status of the response.
+        payload_size : int
+            Size of the body in bytes; None if it is unknown (streamed responses).
+        """
+        labels = (("route", route),)
+        self.__get_histogram(
+            "kgvec2go_request_duration_seconds", labels, LATENCY_BUCKETS
+        ).observe(seconds)
+        if payload_size is not None:
+            self.__get_histogram(
+                "kgvec2go_response_size_bytes", labels, SIZE_BUCKETS
+            ).observe(payload_size)
+        key = ("kgvec2go_responses_total", labels + (("status", str(status)),))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Records the duration of one stage of a query, e.g. "link", "scan", or "serialize"."""
+        self.__get_histogram(
+            "kgvec2go_stage_duration_seconds", (("stage", stage),), LATENCY_BUCKETS
+        ).observe(seconds)
+
+    @contextmanager
+    def time_stage(self, stage: str) -> Iterator[None]:
+        """Context manager recording the duration of its block as the given stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start)
+
+    def register_cache(self, name: str, cache: ResultCache) -> None:
+        """Exports the statistics (hits, misses, hit rate, size) of the cache under the given name."""
+        with self._lock:
+            self._caches[name] = cache
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text format."""
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            caches = sorted(self._caches.items())
+        lines = []
+        types = set()
+        for (name, labels), histogram in histograms:
+            if name not in types:
+                types.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            for bound, count in histogram.get_cumulative_counts():
+                bucket_labels = Metrics.__format_labels(labels + (("le", bound),))
+                lines.append(f"{name}_bucket{bucket_labels} {count}")
+            lines.append(f"{name}_sum{Metrics.__format_labels(labels)} {histogram.sum}")
+            lines.append(
+                f"{name}_count{Metrics.__format_labels(labels)} {histogram.count}"
+            )
+        for (name, labels), value in counters:
+            if name not in types:
+                types.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{Metrics.__format_labels(labels)} {value}")
+        cache_metrics = (
+            ("kgvec2go_cache_hits_total", "counter", "hits"),
+            ("kgvec2go_cache_misses_total", "counter", "misses"),
+            ("kgvec2go_cache_hit_ratio", "gauge", "hit_rate"),
+            ("kgvec2go_cache_entries", "gauge", "entries"),
+            ("kgvec2go_cache_bytes", "gauge", "bytes"),
+        )
+        statistics = [(name, cache.get_statistics()) for name, cache in caches]
+        for name, metric_type, statistic in cache_metrics if statistics else ():
+            lines.append(f"# TYPE {name} {metric_type}")
+            for cache_name, values in statistics:
+                labels = Metrics.__format_labels((("cache", cache_name),))
+                lines.append(f"{name}{labels} {values[statistic]}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __format_labels(labels: Labels) -> str:
+        escaped = [
+            (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for name, value in labels
+        ]
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
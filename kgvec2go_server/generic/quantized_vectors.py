@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from typing import Union
+
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.similarity_engine import normalize_rows
+from kgvec2go_server.generic.term_snapshot import Snapshot
+
+QUANTIZATION_DTYPES = ("float16", "int8")
+"""Supported storage types of a QuantizedMatrix."""
+
+
+class QuantizedMatrix:
+    """Reduced-precision copy of the row-normalized vector matrix, used to scan for candidates.
+
+    ``float16`` halves the size of the float32 matrix; ``int8`` quarters it: every row is stored as int8 codes
+    together with a float32 scale, row i is approximately ``codes[i] * scales[i]``. The scores of a scan are
+    approximate cosine similarities; exact scores are obtained by rescoring the candidates on the float32
+    vectors (see ``QuantizedIndex``).
+
+    The matrix is built offline (see ``scripts/quantize_vectors.py``) and persisted as snapshot next to the
+    ``.kv`` file, so it is memory-mapped at startup.
+    """
+
+    SNAPSHOT_NAME = "quantized"
+
+    def __init__(
+        self,
+        codes: ndarray,
+        scales: Union[None, ndarray] = None,
+        chunk_size: int = 65536,
+    ):
+        """
+
+        Parameters
+        ----------
+        codes : ndarray
+            float16 or int8 matrix of shape (number of vectors, dimension).
+        scales : ndarray
+            Per-row float32 scales; required for int8 codes, None for float16.
+        chunk_size : int
+            Number of rows that are converted to float32 at once during a scan.
+        """
+        if codes.dtype == np.int8 and scales is None:
+            raise ValueError("int8 codes require per-row scales.")
+        self.codes = codes
+        self.scales = scales
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def dtype(self) -> str:
+        return self.codes.dtype.name
+
+    def scores(
+        self, queries: ndarray, start: int = 0, end: Union[None, int] = None
+    ) -> ndarray:
+        """Approximate cosine similarities between the given normalized queries and the rows [start, end).
+
+        Parameters
+        ----------
+        queries : ndarray
+            Normalized float32 matrix of shape (number of queries, dimension).
+        start : int
+            First row.
+        end : int
+            End of the rows (exclusive); default: number of rows.
+
+        Returns
+        -------
+        ndarray
+            float32 matrix of shape (number of queries, end - start).
+        """
+        end = len(self) if end is None else end
+        result = np.empty((queries.shape[0], end - start), dtype=np.float32)
+        for first in range(start, end, self.chunk_size):
+            last = min(first + self.chunk_size, end)
+            block = result[:, first - start : last - start]
+            block[:] = queries @ self.codes[first:last].astype(np.float32).T
+            if self.scales is not None:
+                block *= self.scales[first:last]
+        return result
+
+    @staticmethod
+    def quantize(
+        vectors: ndarray, dtype: str = "int8", chunk_size: int = 65536
+    ) -> QuantizedMatrix:
+        """Quantize the row-normalized vectors.
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrix of shape (number of vectors, dimension), e.g. ``kv.vectors``; normalized chunk by chunk.
+        dtype : str
+            One of ``QUANTIZATION_DTYPES``.
+        chunk_size : int
+            Number of rows quantized at once.
+
+        Returns
+        -------
+        QuantizedMatrix
+        """
+        if dtype not in QUANTIZATION_DTYPES:
+            raise ValueError(
+                f"Unsupported dtype: {dtype}; expected one of {QUANTIZATION_DTYPES}."
+            )
+        codes = np.empty(vectors.shape, dtype=dtype)
+        scales = (
+            np.empty(vectors.shape[0], dtype=np.float32) if dtype == "int8" else None
+        )
+        for start in range(0, vectors.shape[0], chunk_size):
+            chunk = normalize_rows(vectors[start : start + chunk_size])
+            if scales is None:
+                codes[start : start + chunk_size] = chunk
+                continue
+            chunk_scales = np.abs(chunk).max(axis=1) / 127.0
+            chunk_scales[chunk_scales == 0] = 1.0
+            codes[start : start + chunk_size] = np.rint(chunk / chunk_scales[:, None])
+            scales[start : start + chunk_size] = chunk_scales
+        return QuantizedMatrix(codes=codes, scales=scales, chunk_size=chunk_size)
+
+    def save(self, kv_path: str) -> None:
+        """Persist the matrix next to the given ``.kv`` file."""
+        arrays = {"codes": self.codes}
+        if self.scales is not None:
+            arrays["scales"] = self.scales
+        Snapshot(arrays=arrays, metadata={"dtype": self.dtype}).save(
+            kv_path, name=self.SNAPSHOT_NAME
+        )
+
+    @staticmethod
+    def load(kv_path: str) -> Union[None, QuantizedMatrix]:
+        """Load (memory-mapped) the matrix persisted next to the given ``.kv`` file.
+
+        Returns
+        -------
+        QuantizedMatrix
+            None if there is no (valid) quantized matrix for the file.
+        """
+        snapshot = Snapshot.load(kv_path, name=QuantizedMatrix.SNAPSHOT_NAME)
+        if snapshot is None:
+            return None
+        return QuantizedMatrix(
+            codes=snapshot.arrays["codes"], scales=snapshot.arrays.get("scales")
+        )
@@ -0,0 +1,118 @@
+import hmac
+import os
+from typing import Any, List, Union
+
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.json_serializer import error_to_json
+
+ADMIN_TOKEN_VARIABLE = "KGVEC2GO_ADMIN_TOKEN"
+"""Environment variable holding the token of the admin routes; the admin routes are disabled if it is not set."""
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# statuses of client errors and the error payloads of the routes
+BAD_REQUEST = 400
+PAYLOAD_TOO_LARGE = 413
+NO_SERVICE_ERROR = error_to_json("No embedding found for model/dataset combination.")
+CONCEPT_LIST_ERROR = error_to_json("The request body must be a JSON list of concepts.")
+CONCEPT_PAIR_LIST_ERROR = error_to_json(
+    "The request body must be a JSON list of concept pairs."
+)
+TRIPLE_LIST_ERROR = error_to_json("The request body must be a JSON list of triples.")
+FORBIDDEN_ERROR = error_to_json("Forbidden.")
+URI_HEADER_TOO_LARGE_ERROR = error_to_json(
+    "Too many vectors for the X-Vector-URIs header; request application/x-npz (URIs in the body)."
+)
+LEGACY_TOP_N_ERROR = error_to_json(
+    f"top_n must be an integer between 0 and {json_serializer.STREAMING_TOP_N} on the legacy routes; the /rest/v2 routes "
+    "stream larger results."
+)
+
+
+def parse_json_list(
+    body: Any, entry_length: Union[None, int] = None
+) -> Union[None, List[Any]]:
+    """Validates the parsed JSON body of a batch request which must be a list. If entry_length is given, every
+    entry has to be a list of that many strings (e.g. 2 for label pairs, 3 for triples), else every entry has to
+    be a string.
+
+    Parameters
+    ----------
+    body : Any
+        The parsed JSON body (None if the body is not valid JSON).
+    entry_length : int
+        Optional; required length of every entry.
+
+    Returns
+    -------
+    The list or None if the body is not valid.
+    """
+    if not isinstance(body, list):
+        return None
+    for entry in body:
+        if entry_length is None:
+            if not isinstance(entry, str):
+                return None
+        elif (
+            not isinstance(entry, list)
+            or len(entry) != entry_length
+            or not all(isinstance(item, str) for item in entry)
+        ):
+            return None
+    return body
+
+
+def parse_legacy_top_n(top_n: str) -> Union[None, int]:
+    """Validates top_n of the legacy closest concepts route. The legacy services render the complete JSON string
+    in memory, hence top_n is capped at ``json_serializer.STREAMING_TOP_N`` (above which the v2 route streams).
+
+    Parameters
+    ----------
+    top_n : str
+        The path segment.
+
+    Returns
+    -------
+    The number of closest concepts or None if it is not an integer or exceeds the cap.
+    """
+    try:
+        top_n = int(top_n)
+    except ValueError:
+        return None
+    if not 0 <= top_n <= json_serializer.STREAMING_TOP_N:
+        return None
+    return top_n
+
+
+def parse_label_lines(body: str) -> List[str]:
+    """Parses an uploaded entity list with one concept label per line (empty lines are skipped).
+
+    Parameters
+    ----------
+    body : str
+        The decoded body.
+
+    Returns
+    -------
+    List[str]
+    """
+    return [line.strip() for line in body.splitlines() if line.strip() != ""]
+
+
+def is_admin_token(token: Union[None, str]) -> bool:
+    """Whether the given token (value of the ADMIN_TOKEN_HEADER of a request) grants access to the admin
+    routes.
+
+    Parameters
+    ----------
+    token : str
+        The token sent with the request (None if the header is missing).
+
+    Returns
+    -------
+    bool
+    """
+    expected = os.environ.get(ADMIN_TOKEN_VARIABLE)
+    if not expected or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+
+
+def estimate_size(value: Any) -> int:
+    """Estimates the memory footprint of a cache value in bytes.
+
+    Parameters
+    ----------
+    value : Any
+        Strings, bytes, numpy arrays and (nested) tuples/lists of those are measured; other objects are
+        measured with ``sys.getsizeof``.
+
+    Returns
+    -------
+    int
+        Estimated size in bytes.
+    """
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 96
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CacheBackend(ABC):
+    """Storage of a ResultCache. Implementations evict entries in LRU order once ``max_bytes`` is exceeded."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Returns (True, value) for a live entry, else (False, None). Expired entries are removed."""
+        pass
+
+    @abstractmethod
+    def set(
+        self, key: Hashable, value: Any, size: int, expires_at: Union[None, float]
+    ) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def get_size(self) -> Tuple[int, int]:
+        """Returns the number of entries and their total size in bytes."""
+        pass
+
+
+class InProcessCacheBackend(CacheBackend):
+    """LRU storage in the memory of the current process."""
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__(max_bytes=max_bytes)
+        self._entries: OrderedDict = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self._size -= size
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(
+        self, key: Hashable, value: Any, size: int, expires_at: Union[None, float]
+    ) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def get_size(self) -> Tuple[int, int]:
+        return len(self._entries), self._size
+
+
+class DiskCacheBackend(CacheBackend):
+    """LRU storage in an SQLite file that can be shared by all worker processes of a host. Placing the file on a
+    tmpfs (e.g. ``/dev/shm``) keeps it in shared memory. Values are pickled; sizes are the pickled sizes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024):
+        super().__init__(max_bytes=max_bytes)
+        self.path = path
+        self._local = threading.local()
+        connection = self._get_connection()
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, size INTEGER, "
+                "accessed REAL, expires REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+            )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # sqlite connections must not be shared between threads (or processes after a fork)
+        connection = getattr(self._local, "connection", None)
+        if connection is None or getattr(self._local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        connection = self._get_connection()
+        key = repr(key)
+        row = connection.execute(
+            "SELECT value, expires FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return False, None
+        with connection:
+            if row[1] is not None and row[1] < time.time():
+                connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return False, None
+            connection.execute(
+                "UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return True, pickle.loads(row[0])
+
+    def set(
+        self, key: Hashable, value: Any, size: int, expires_at: Union[None, float]
+    ) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        connection = self._get_connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (repr(key), data, len(data), time.time(), expires_at),
+            )
+            total_size = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()[0]
+            while total_size > self.max_bytes:
+                key_to_evict, evicted_size = connection.execute(
+                    "SELECT key, size FROM entries ORDER BY accessed LIMIT 1"
+                ).fetchone()
+                connection.execute("DELETE FROM entries WHERE key = ?", (key_to_evict,))
+                total_size -= evicted_size
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        connection = self._get_connection()
+        with connection:
+            connection.execute("DELETE FROM entries WHERE key = ?", (repr(key),))
+
+    def clear(self) -> None:
+        connection = self._get_connection()
+        with connection:
+            connection.execute("DELETE FROM entries")
+
+    def get_size(self) -> Tuple[int, int]:
+        return tuple(
+            self._get_connection()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries")
+            .fetchone()
+        )
+
+
+class ResultCache:
+    """Bounded result cache shared by the query services. Entries are evicted in LRU order once the byte budget
+    of the backend is exceeded and expire after ``ttl`` seconds (if given). Hit and miss counters are kept per
+    process."""
+
+    def __init__(
+        self,
+        backend: Union[None, CacheBackend] = None,
+        ttl: Union[None, float] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        backend : CacheBackend
+            Storage. Default: InProcessCacheBackend with a budget of 256 MB.
+        ttl : float
+            Optional time to live of an entry in seconds.
+        """
+        self.backend = InProcessCacheBackend() if backend is None else backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # serializes conditional puts (see put)
+        self._put_lock = threading.Lock()
+
+    def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+        accept: Union[None, Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Returns the cached value for the key or default. A value that ``accept`` rejects (e.g. a result that
+        has been computed for fewer items than requested) is not returned and counts as a miss.
+        """
+        found, value = self.backend.get(key)
+        if found and (accept is None or accept(value)):
+            self.hits += 1
+            return value
+        self.misses += 1
+        return default
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.backend.get(key)[0]
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        replace: Union[None, Callable[[Any], bool]] = None,
+    ) -> None:
+        """Stores the value. If ``replace`` is given, an existing value is only overwritten if ``replace`` accepts
+        it (checked atomically within this process)."""
+        if replace is None:
+            self.__set(key, value)
+            return
+        with self._put_lock:
+            found, existing = self.backend.get(key)
+            if not found or replace(existing):
+                self.__set(key, value)
+
+    def __set(self, key: Hashable, value: Any) -> None:
+        self.backend.set(
+            key,
+            value,
+            size=estimate_size(value) + estimate_size(key),
+            expires_at=None if self.ttl is None else time.time() + self.ttl,
+        )
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the cached value for the key; on a miss, the value is computed, stored and returned."""
+        found, value = self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def get_statistics(self) -> Dict[str, Union[int, float]]:
+        entries, size = self.backend.get_size()
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": 0.0 if requests == 0 else self.hits / requests,
+            "evictions": self.backend.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.backend.max_bytes,
+        }
+
+
+class RankedResultMemo:
+    """Memoization of ranked closest-concept results on top of a ResultCache.
+
+    Per concept, the raw ranked vocabulary indices and scores are stored together with the top_n they were
+    computed for. A request for a smaller (or equal) top_n is answered by slicing the stored arrays (a cache hit);
+    a request for a larger top_n is a cache miss and is recomputed with a full scan for the larger top_n (the
+    scores beyond the stored top_n are not kept, hence the stored prefix cannot be extended incrementally). An
+    entry is only replaced by a result for a top_n at least as large, so concurrent requests for different top_n
+    keep the larger result.
+    """
+
+    def __init__(self, cache: ResultCache, namespace: Hashable):
+        """
+
+        Parameters
+        ----------
+        cache : ResultCache
+            The cache holding the entries (may be shared with other services).
+        namespace : Hashable
+            Prefix of all cache keys of this memo, e.g. the name of the service.
+        """
+        self.cache = cache
+        self.namespace = namespace
+
+    def get(self, concept: Hashable, topn: int) -> Union[None, Tuple[ndarray, ndarray]]:
+        """Returns the stored (indices, scores) for the concept cut to topn or None if they have not been
+        computed for a top_n at least as large."""
+        entry = self.cache.get(
+            (self.namespace, concept),
+            accept=lambda stored: RankedResultMemo.__covers(stored, topn),
+        )
+        if entry is None:
+            return None
+        indices, scores, _ = entry
+        return indices[:topn], scores[:topn]
+
+    def put(self, concept: Hashable, topn: int, indices: ndarray, scores: ndarray):
+        """Stores the ranked result of the concept that has been computed for topn unless a result for a larger
+        top_n is stored already."""
+        self.cache.put(
+            (self.namespace, concept),
+            (indices, scores, topn),
+            replace=lambda stored: topn >= stored[2],
+        )
+
+    @staticmethod
+    def __covers(entry: Tuple[ndarray, ndarray, int], topn: int) -> bool:
+        indices, _, computed_topn = entry
+        # fewer results than requested means that all candidates are contained
+        return topn <= computed_topn or len(indices) < computed_topn
+
+    def get_or_compute(
+        self,
+        concept: Hashable,
+        topn: int,
+        compute: Callable[[int], Tuple[ndarray, ndarray]],
+    ) -> Tuple[ndarray, ndarray]:
+        """Returns the ranked result of the concept; computes (and stores) it if required.
+
+        Parameters
+        ----------
+        concept : Hashable
+            The concept (lookup key or vocabulary index).
+        topn : int
+            Number of results.
+        compute : Callable[[int], Tuple[ndarray, ndarray]]
+            Computes (indices, scores) for a given topn.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+        """
+        result = self.get(concept=concept, topn=topn)
+        if result is not None:
+            return result
+        indices, scores = compute(topn)
+        self.put(concept=concept, topn=topn, indices=indices, scores=scores)
+        return indices, scores
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import logging
+import os
+import threading
+from typing import Any, Callable, Iterator, Sequence, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover - optional dependency
+    threadpool_limits = None
+
+
+class ShardedScanExecutor:
+    """Runs brute-force top-k scans on multiple cores.
+
+    The rows of the scanned matrix are split into shards; every shard is scored and reduced to its partial top-k
+    on a bounded thread pool (numpy releases the GIL in matrix products), the partial results are merged into
+    the global top-k. The pool is shared by all request threads, hence the number of cores used for scans is
+    bounded no matter how many requests are answered concurrently.
+
+    Each shard already runs on its own core, so BLAS threading only oversubscribes the CPU: the BLAS libraries
+    are limited to ``blas_threads`` threads while sharded scans are running (the limit is process-wide, so it is
+    set by the first of concurrent scans and restored by the last one). This requires ``threadpoolctl`` (see
+    requirements.txt); without it, set e.g. ``OPENBLAS_NUM_THREADS``. Matrices with fewer than
+    ``2 * min_shard_rows`` rows are scanned in the calling thread.
+    """
+
+    __default: Union[None, ShardedScanExecutor] = None
+    __default_lock = threading.Lock()
+
+    def __init__(
+        self,
+        number_of_workers: Union[None, int] = None,
+        min_shard_rows: int = 16384,
+        blas_threads: Union[None, int] = 1,
+    ):
+        """
+
+        Parameters
+        ----------
+        number_of_workers : int
+            Size of the pool, i.e. maximal number of shards scanned in parallel. Default: number of CPUs.
+        min_shard_rows : int
+            Minimal number of rows of a shard.
+        blas_threads : int
+            Number of BLAS threads during sharded scans (requires ``threadpoolctl``); None: no limit.
+        """
+        if number_of_workers is None:
+            number_of_workers = os.cpu_count() or 1
+        self.number_of_workers = number_of_workers
+        self.min_shard_rows = min_shard_rows
+        self.blas_threads = blas_threads
+        self._pool: Union[None, ThreadPoolExecutor] = None
+        # BLAS limits of the running sharded scans (see __limit_blas_threads)
+        self._blas_lock = threading.Lock()
+        self._running_scans = 0
+        self._blas_limits: Any = None
+        if self.number_of_workers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.number_of_workers, thread_name_prefix="scan"
+            )
+            if blas_threads is not None and threadpool_limits is None:
+                logging.warning(
+                    "threadpoolctl is not installed; BLAS threads are not limited and sharded scans "
+                    "oversubscribe the CPU (install threadpoolctl or set e.g. OPENBLAS_NUM_THREADS=1)."
+                )
+
+    @staticmethod
+    def get_default() -> ShardedScanExecutor:
+        """The executor shared by all services of this process."""
+        with ShardedScanExecutor.__default_lock:
+            if ShardedScanExecutor.__default is None:
+                ShardedScanExecutor.__default = ShardedScanExecutor()
+            return ShardedScanExecutor.__default
+
+    def get_shards(self, number_of_rows: int) -> Sequence[Tuple[int, int]]:
+        """Row ranges [start, end) the given number of rows is split into."""
+        number_of_shards = max(
+            1, min(self.number_of_workers, number_of_rows // self.min_shard_rows)
+        )
+        bounds = np.linspace(0, number_of_rows, number_of_shards + 1).astype(np.int64)
+        return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def top_k(
+        self,
+        score_shard: Callable[[int, int], ndarray],
+        number_of_rows: int,
+        k: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+    ) -> Tuple[ndarray, ndarray]:
+        """Top-k scan over all rows.
+
+        Parameters
+        ----------
+        score_shard : Callable[[int, int], ndarray]
+            Returns the (writable) float32 score matrix of shape (number of queries, end - start) of the rows
+            [start, end), e.g. ``lambda start, end: queries @ matrix[start:end].T``.
+        number_of_rows : int
+            Number of rows of the scanned matrix.
+        k : int
+            Number of results per query; must not exceed number_of_rows.
+        exclude_indices : Sequence of int or None
+            Optional; one row per query that shall not appear in the result of that query.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Row indices and scores of shape (number of queries, k), ordered by descending score. Excluded rows
+            get the score -inf.
+        """
+        shards = self.get_shards(number_of_rows)
+        if self._pool is None or len(shards) == 1:
+            return self.__scan_shard(score_shard, 0, number_of_rows, k, exclude_indices)
+        with self.__limit_blas_threads():
+            partial_results = list(
+                self._pool.map(
+                    lambda shard: self.__scan_shard(
+                        score_shard, shard[0], shard[1], k, exclude_indices
+                    ),
+                    shards,
+                )
+            )
+        indices = np.concatenate([result[0] for result in partial_results], axis=1)
+        scores = np.concatenate([result[1] for result in partial_results], axis=1)
+        positions, top_scores = BatchSimilarityEngine.select_top_k(scores=scores, k=k)
+        return np.take_along_axis(indices, positions, axis=1), top_scores
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    @contextmanager
+    def __limit_blas_threads(self) -> Iterator[None]:
+        """Limits the BLAS threads of the process while at least one sharded scan is running."""
+        if self.blas_threads is None or threadpool_limits is None:
+            yield
+            return
+        with self._blas_lock:
+            if self._running_scans == 0:
+                self._blas_limits = threadpool_limits(
+                    limits=self.blas_threads, user_api="blas"
+                )
+            self._running_scans += 1
+        try:
+            yield
+        finally:
+            with self._blas_lock:
+                self._running_scans -= 1
+                if self._running_scans == 0:
+                    self._blas_limits.restore_original_limits()
+                    self._blas_limits = None
+
+    @staticmethod
+    def __scan_shard(
+        score_shard: Callable[[int, int], ndarray],
+        start: int,
+        end: int,
+        k: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]],
+    ) -> Tuple[ndarray, ndarray]:
+        scores = score_shard(start, end)
+        if exclude_indices is not None:
+            for row, excluded in enumerate(exclude_indices):
+                if excluded is not None and start <= excluded < end:
+                    scores[row, excluded - start] = -np.inf
+        indices, top_scores = BatchSimilarityEngine.select_top_k(
+            scores=scores, k=min(k, end - start)
+        )
+        return indices + start, top_scores
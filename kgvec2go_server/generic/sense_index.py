@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, Mapping, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.term_snapshot import HashedKeys
+
+
+class SenseIndex:
+    """Precomputed mapping (lookup key, POS) -> vocabulary index of the sense that shall be used.
+
+    The lexical services (WordNet, BabelNet) map a transformed lemma (lookup key) to several senses that differ
+    in their POS. Picking the sense for a requested POS used to be a scan over the candidate URIs with string
+    checks on every call. The index resolves the choice (including the fallbacks of the service) once at build
+    time: row ``row_of_key[lookup_key]`` of the integer matrix ``senses`` holds one vocabulary index per POS
+    column (-1 if there is no sense at all).
+    """
+
+    def __init__(
+        self,
+        row_of_key: Union[Dict[str, int], HashedKeys],
+        pos_tags: Tuple[str, ...],
+        senses: ndarray,
+        default_pos: str = "n",
+    ):
+        """
+
+        Parameters
+        ----------
+        row_of_key : Dict[str, int] or HashedKeys
+            Lookup key -> row of ``senses``. A HashedKeys table is used if the index is loaded from a snapshot.
+        pos_tags : Tuple[str, ...]
+            The (lower case) POS tags; POS tag i is column i of ``senses``.
+        senses : ndarray
+            Integer matrix of shape (number of lookup keys, number of POS tags).
+        default_pos : str
+            POS that is used for POS tags that are not in ``pos_tags``.
+        """
+        self.row_of_key = row_of_key
+        self.pos_tags = pos_tags
+        self.senses = senses
+        self.column_of_pos = {pos: column for column, pos in enumerate(pos_tags)}
+        self.default_column = self.column_of_pos[default_pos]
+
+    def __len__(self):
+        return len(self.row_of_key)
+
+    def __contains__(self, lookup_key: str) -> bool:
+        return lookup_key in self.row_of_key
+
+    def lookup(self, lookup_key: str, pos: str = "n") -> int:
+        """Resolve a lookup key and a POS to a vocabulary index.
+
+        Parameters
+        ----------
+        lookup_key : str
+            The transformed lemma.
+        pos : str
+            The preferred POS (case-insensitive). Unknown POS tags are treated as the default POS.
+
+        Returns
+        -------
+        int
+            The vocabulary index; -1 if the lookup key is unknown.
+        """
+        row = self.row_of_key.get(lookup_key)
+        if row is None:
+            return -1
+        column = self.column_of_pos.get(pos.lower(), self.default_column)
+        return int(self.senses[row, column])
+
+    @staticmethod
+    def build(
+        term_mapping: Mapping[str, Iterable[str]],
+        key_to_index: Mapping[str, int],
+        pos_tags: Tuple[str, ...],
+        get_pos: Callable[[str], Union[None, str]],
+        fallback_pos: Union[None, str] = None,
+        default_pos: str = "n",
+    ) -> SenseIndex:
+        """Build the index.
+
+        For every lookup key and POS, the first sense of that POS is picked. If there is none, the first sense
+        of ``fallback_pos`` is picked (if given); otherwise the first sense. Senses that are not in the
+        vocabulary are ignored.
+
+        Parameters
+        ----------
+        term_mapping : Mapping[str, Iterable[str]]
+            Lookup key -> senses (keys of the vector space).
+        key_to_index : Mapping[str, int]
+            Vocabulary, e.g. ``kv.key_to_index``.
+        pos_tags : Tuple[str, ...]
+            The (lower case) POS tags that can be requested.
+        get_pos : Callable[[str], Union[None, str]]
+            Determines the lower case POS tag of a sense (None if it has no POS).
+        fallback_pos : str
+            Optional POS that is preferred if there is no sense of the requested POS.
+        default_pos : str
+            POS that is used for POS tags that are not in ``pos_tags``.
+
+        Returns
+        -------
+        SenseIndex
+        """
+        row_of_key = {}
+        senses = np.full((len(term_mapping), len(pos_tags)), -1, dtype=np.int64)
+        for lookup_key, candidates in term_mapping.items():
+            row = len(row_of_key)
+            row_of_key[lookup_key] = row
+            first_of_pos = {}
+            first = -1
+            for candidate in candidates:
+                index = key_to_index.get(candidate)
+                if index is None:
+                    continue
+                if first < 0:
+                    first = index
+                first_of_pos.setdefault(get_pos(candidate), index)
+            fallback = first
+            if fallback_pos is not None:
+                fallback = first_of_pos.get(fallback_pos, first)
+            for column, pos in enumerate(pos_tags):
+                senses[row, column] = first_of_pos.get(pos, fallback)
+        if len(key_to_index) < np.iinfo(np.int32).max:
+            senses = senses.astype(np.int32)
+        return SenseIndex(
+            row_of_key=row_of_key,
+            pos_tags=pos_tags,
+            senses=senses,
+            default_pos=default_pos,
+        )
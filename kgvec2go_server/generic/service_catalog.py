@@ -0,0 +1,651 @@
+from __future__ import annotations
+
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Hashable, Iterator, List, Tuple, Union
+import weakref
+
+from kgvec2go_server.alod.alod_query_service import AlodQueryService
+from kgvec2go_server.babelnet.babelnet_query_service import BabelNetQueryService
+from kgvec2go_server.dbnary.dbnary_query_service import DbnaryQueryService
+from kgvec2go_server.dbpedia.dbpedia_query_service import DBpediaQueryService
+from kgvec2go_server.generic.ann_index import (
+    ExactIndex,
+    IvfIndex,
+    NearestNeighbourIndex,
+    QuantizedIndex,
+)
+from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.linker_index import LinkerIndex
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.result_cache import ResultCache
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.service_registry import ServiceKey, ServiceRegistry
+from kgvec2go_server.generic.term_snapshot import Snapshot
+from kgvec2go_server.generic.vector_store import VectorStore
+from kgvec2go_server.wordnet.wordnet_query_service import WordnetQueryService
+
+LINKER_TYPES = {"dbpedia": GenericDBpediaLinker}
+"""Linkers a generic service can be configured with."""
+
+INDEX_TYPES = ("auto", "exact", "ivf", "quantized")
+"""Closest concept indices a generic service can be configured with; "auto" uses the IVF index if it has been
+built, else the quantized matrix if it has been built, else an exact scan. Indices built for another version of
+the ``.kv`` file are ignored ("ivf" then falls back to an exact scan)."""
+
+LEGACY_SERVICE_TYPES = {
+    "wordnet": WordnetQueryService,
+    "wiktionary": DbnaryQueryService,
+    "babelnet": BabelNetQueryService,
+    "alod": AlodQueryService,
+    "dbpedia": DBpediaQueryService,
+}
+"""Service classes of the data sets of the legacy ``/rest`` routes."""
+
+
+class ServiceConfiguration:
+    """Configuration of a GenericKvQueryService."""
+
+    def __init__(
+        self,
+        dataset: str,
+        dataset_version: str,
+        model: str,
+        model_version: str,
+        vector_file: str,
+        linker: str = "dbpedia",
+        index: str = "auto",
+        preload: bool = False,
+    ):
+        """
+
+        Parameters
+        ----------
+        dataset : str
+            The dataset name.
+        dataset_version : str
+            The dataset version.
+        model : str
+            The model name.
+        model_version : str
+            The model version.
+        vector_file : str
+            Path to the ``.kv`` file.
+        linker : str
+            One of ``LINKER_TYPES``. A precomputed linker index (scripts/build_linker_index.py) is used if it
+            has been built.
+        index : str
+            One of ``INDEX_TYPES``.
+        preload : bool
+            If True, the service is loaded by ``ServiceCatalog.preload`` rather than on the first request.
+        """
+        if linker not in LINKER_TYPES:
+            raise ValueError(
+                f"Unknown linker: {linker}; expected one of {list(LINKER_TYPES)}."
+            )
+        if index not in INDEX_TYPES:
+            raise ValueError(f"Unknown index: {index}; expected one of {INDEX_TYPES}.")
+        self.dataset = dataset
+        self.dataset_version = dataset_version
+        self.model = model
+        self.model_version = model_version
+        self.vector_file = vector_file
+        self.linker = linker
+        self.index = index
+        self.preload = preload
+
+    def get_key(self) -> ServiceKey:
+        return ServiceRegistry.get_key(
+            self.dataset, self.dataset_version, self.model, self.model_version
+        )
+
+    def create_service(
+        self,
+        vector_store: VectorStore,
+        cache: Union[None, ResultCache] = None,
+        batch_window: Union[None, float] = None,
+    ) -> GenericKvQueryService:
+        kv = vector_store.load_vectors(self.vector_file)
+        # None if the index has not been built or was built for another version of the file
+        linker_index = LinkerIndex.load(kv_path=self.vector_file)
+        return GenericKvQueryService(
+            kv=kv,
+            linker=LINKER_TYPES[self.linker](kv=kv, index=linker_index),
+            dataset=self.dataset,
+            dataset_version=self.dataset_version,
+            model=self.model,
+            model_version=self.model_version,
+            index=self.__create_index(vector_store, kv.vectors),
+            cache=cache,
+            batch_window=batch_window,
+            vectors_version=VectorStore.get_file_version(self.vector_file),
+        )
+
+    def __create_index(
+        self, vector_store: VectorStore, vectors
+    ) -> NearestNeighbourIndex:
+        if self.index == "ivf" or (
+            self.index == "auto"
+            and os.path.isfile(
+                Snapshot.get_metadata_path(self.vector_file, IvfIndex.SNAPSHOT_NAME)
+            )
+        ):
+            engine = vector_store.get_engine(path=self.vector_file, vectors=vectors)
+            ivf_index = IvfIndex.load(kv_path=self.vector_file, engine=engine)
+            if ivf_index is not None:
+                return ivf_index
+            if self.index == "ivf":
+                # missing or stale index (built for another version of the file): exact scan
+                return ExactIndex(engine=engine)
+        if self.index in ("auto", "quantized"):
+            quantized = QuantizedMatrix.load(self.vector_file)
+            if quantized is not None:
+                return QuantizedIndex(
+                    quantized=quantized,
+                    vectors=vectors,
+                    executor=ShardedScanExecutor.get_default(),
+                )
+            if self.index == "quantized":
+                raise ValueError(
+                    f"No quantized matrix for the current version of {self.vector_file}."
+                )
+        return ExactIndex(
+            engine=vector_store.get_engine(path=self.vector_file, vectors=vectors)
+        )
+
+
+class LegacyServiceConfiguration:
+    """Configuration of the service of a data set of the legacy ``/rest`` routes."""
+
+    def __init__(self, data_set: str, arguments: Dict[str, Any], preload: bool = False):
+        """
+
+        Parameters
+        ----------
+        data_set : str
+            One of the keys of ``LEGACY_SERVICE_TYPES``.
+        arguments : Dict[str, Any]
+            Arguments of the service class, e.g. {"vector_file": "..."}.
+        preload : bool
+            If True, the service is loaded by ``ServiceCatalog.preload`` rather than on the first request.
+        """
+        data_set = data_set.lower()
+        if data_set not in LEGACY_SERVICE_TYPES:
+            raise ValueError(
+                f"Unknown data set: {data_set}; expected one of {list(LEGACY_SERVICE_TYPES)}."
+            )
+        self.data_set = data_set
+        self.arguments = arguments
+        self.preload = preload
+
+    @property
+    def vector_file(self) -> Union[None, str]:
+        return self.arguments.get("vector_file") or None
+
+    def get_key(self) -> str:
+        return self.data_set
+
+    def create_service(
+        self,
+        vector_store: VectorStore,
+        cache: Union[None, ResultCache] = None,
+        batch_window: Union[None, float] = None,
+    ):
+        service_type = LEGACY_SERVICE_TYPES[self.data_set]
+        parameters = inspect.signature(service_type).parameters
+        arguments = dict(self.arguments)
+        for name, value in (
+            ("vector_store", vector_store),
+            ("cache", cache),
+            ("batch_window", batch_window),
+        ):
+            if name in parameters:
+                arguments.setdefault(name, value)
+        return service_type(**arguments)
+
+
+Configuration = Union[ServiceConfiguration, LegacyServiceConfiguration]
+
+
+class ServiceCatalog:
+    """The services the server can answer requests for, loaded on demand.
+
+    The catalog is created from configurations (see ``load`` for the file format); a service is loaded on its
+    first request (or by ``preload``). Services that have not been requested for ``idle_timeout`` seconds are
+    unloaded, as is the least recently used service when loading a service would exceed
+    ``max_loaded_services``: the service is dropped and its vectors are released from the vector store, so more
+    models can be hosted than fit in memory at once. Idle services are looked for during requests (at most
+    every ``idle_timeout / 4`` seconds), so no background thread is required.
+
+    Loaded generic services are held in a ServiceRegistry, hence a lookup of a loaded service is a single dict
+    access. A generic service can be replaced while the server is running (see ``swap``).
+    """
+
+    def __init__(
+        self,
+        configurations: List[Configuration],
+        vector_store: Union[None, VectorStore] = None,
+        cache: Union[None, ResultCache] = None,
+        batch_window: Union[None, float] = None,
+        idle_timeout: Union[None, float] = None,
+        max_loaded_services: Union[None, int] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        configurations : List[Configuration]
+            The configurations of the services.
+        vector_store : VectorStore
+            Store the vectors are loaded from; default: the store of the process.
+        cache : ResultCache
+            Optional; result cache of the services.
+        batch_window : float
+            Optional; batch window of the closest concept queries (see ``MicroBatchScheduler``).
+        idle_timeout : float
+            Optional; seconds without request after which a service is unloaded.
+        max_loaded_services : int
+            Optional; maximal number of services loaded at once.
+        """
+        self.vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
+        self.cache = cache
+        self.batch_window = batch_window
+        self.idle_timeout = idle_timeout
+        self.max_loaded_services = max_loaded_services
+        self.registry = ServiceRegistry()
+        self._configurations: Dict[Hashable, Configuration] = {}
+        for configuration in configurations:
+            key = configuration.get_key()
+            if key in self._configurations:
+                raise ValueError(f"Duplicate service configuration: {key}")
+            self._configurations[key] = configuration
+        self._load_locks = {key: threading.Lock() for key in self._configurations}
+        self._legacy_services: Dict[str, Any] = {}
+        # keys of the loaded services (replaced, not mutated, under the write lock) and their last request time
+        self._loaded_keys: FrozenSet[Hashable] = frozenset()
+        self._last_access: Dict[Hashable, float] = {}
+        self._write_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._next_idle_check = 0.0
+        self.swap_status: Dict[ServiceKey, str] = {}
+        """State of the latest swap per service key: "loading", "warming up", "done" or "failed: <error>"."""
+
+    @staticmethod
+    def load(path: str, **kwargs) -> ServiceCatalog:
+        """Creates the catalog from a JSON file, e.g.::
+
+            {
+              "batch_window": 0.002,
+              "idle_timeout": 3600,
+              "services": [
+                {"dataset": "DBpedia", "dataset_version": "2021-09", "model": "transe", "model_version": "v1",
+                 "vector_file": "dbpedia/transe.kv", "preload": true}
+              ],
+              "legacy_services": [
+                {"data_set": "alod", "arguments": {"vector_file": "alod/vectors.kv"}}
+              ]
+            }
+
+        Every entry of "services" holds the arguments of a ServiceConfiguration, every entry of
+        "legacy_services" the ones of a LegacyServiceConfiguration. Relative file paths are resolved against the
+        directory of the JSON file.
+
+        Parameters
+        ----------
+        path : str
+            Path to the JSON file.
+        kwargs
+            Further arguments of the catalog; they take precedence over the ones in the file.
+
+        Returns
+        -------
+        ServiceCatalog
+        """
+        with open(path, encoding="utf-8") as file:
+            content = json.load(file)
+        directory = os.path.dirname(os.path.abspath(path))
+
+        def resolve(arguments: Dict[str, Any]) -> Dict[str, Any]:
+            return {
+                name: (
+                    os.path.join(directory, value)
+                    if name.endswith("_file") and isinstance(value, str) and value != ""
+                    else value
+                )
+                for name, value in arguments.items()
+            }
+
+        configurations: List[Configuration] = [
+            ServiceConfiguration(**resolve(entry))
+            for entry in content.get("services", [])
+        ]
+        configurations += [
+            LegacyServiceConfiguration(
+                data_set=entry["data_set"],
+                arguments=resolve(entry.get("arguments", {})),
+                preload=entry.get("preload", False),
+            )
+            for entry in content.get("legacy_services", [])
+        ]
+        for name in ("batch_window", "idle_timeout", "max_loaded_services"):
+            kwargs.setdefault(name, content.get(name))
+        return ServiceCatalog(configurations=configurations, **kwargs)
+
+    def get(
+        self, dataset: str, dataset_version: str, model: str, model_version: str
+    ) -> Union[None, GenericKvQueryService]:
+        """The generic service of the given dataset and model; loaded if required.
+
+        Returns
+        -------
+        None if no such service is configured, else the service.
+        """
+        key = ServiceRegistry.get_key(dataset, dataset_version, model, model_version)
+        return self.__get(key)
+
+    def get_legacy(self, data_set: str) -> Any:
+        """The service of the given data set of the legacy routes (e.g. "wiktionary"); loaded if required.
+
+        Returns
+        -------
+        None if no such service is configured, else the service.
+        """
+        return self.__get(data_set.lower())
+
+    def preload(self) -> None:
+        """Loads all services configured with ``preload``."""
+        for key, configuration in self._configurations.items():
+            if configuration.preload:
+                self.__load(key)
+
+    def is_loaded(self, key: Hashable) -> bool:
+        """Whether the service with the given key (see ``ServiceConfiguration.get_key``) is loaded."""
+        return self.__get_loaded(key) is not None
+
+    def unload(self, key: Hashable) -> bool:
+        """Unloads the service with the given key (see ``ServiceConfiguration.get_key``).
+
+        Returns
+        -------
+        bool
+            False if the service was not loaded.
+        """
+        configuration = self._configurations.get(key)
+        if configuration is None:
+            return False
+        with self._load_locks[key]:
+            with self._write_lock:
+                if isinstance(key, str):
+                    services = dict(self._legacy_services)
+                    service = services.pop(key, None)
+                    self._legacy_services = services
+                else:
+                    service = self.registry.unregister(*key)
+                self._loaded_keys = self._loaded_keys - {key}
+                self._last_access.pop(key, None)
+            if service is None:
+                return False
+            self.__release_if_unused(configuration.vector_file)
+        logging.info(f"Service {key} unloaded.")
+        return True
+
+    def swap(
+        self,
+        configuration: ServiceConfiguration,
+        replaces: Union[None, ServiceKey] = None,
+        warm_up_labels: Union[None, List[str]] = None,
+    ) -> GenericKvQueryService:
+        """Loads a generic service while the current services keep answering requests, warms it up and
+        atomically replaces the service of the same key (if any) in the registry. A service with a new key (e.g.
+        a new model version) can retire the service of another key (``replaces``).
+
+        Requests that are already being answered by a replaced service finish on it; its memory mappings are
+        closed once the last of these requests has dropped the service, and its shared memory segments are removed
+        from the host once no process refers to them anymore (see ``VectorStore.release``). Side files of the new
+        vector file (IVF index, linker index, quantized matrix) that were built for another version of the file are
+        not used: the service falls back to the exact scan and the linear linker (a swap that requires the
+        quantized matrix fails).
+
+        Parameters
+        ----------
+        configuration : ServiceConfiguration
+            Configuration of the new service.
+        replaces : ServiceKey
+            Optional; key of a service that is removed from the catalog once the new service is registered.
+        warm_up_labels : List[str]
+            Concepts queried before the service is registered (see ``warm_up``).
+
+        Returns
+        -------
+        GenericKvQueryService
+            The new service.
+        """
+        key = configuration.get_key()
+        if replaces is not None:
+            replaces = ServiceRegistry.get_key(*replaces)
+        with self._swap_lock:
+            self.swap_status[key] = "loading"
+            try:
+                previous = self._configurations.get(key)
+                if previous is not None and os.path.realpath(
+                    previous.vector_file
+                ) == os.path.realpath(configuration.vector_file):
+                    # the file may have been replaced: map it anew; the current service keeps its mappings
+                    self.vector_store.release(configuration.vector_file)
+                service = configuration.create_service(
+                    vector_store=self.vector_store,
+                    cache=self.cache,
+                    batch_window=self.batch_window,
+                )
+                self.swap_status[key] = "warming up"
+                ServiceCatalog.warm_up(service, labels=warm_up_labels)
+            except Exception as exception:
+                self.swap_status[key] = f"failed: {exception}"
+                raise
+
+            retired: List[Tuple[Hashable, Configuration, GenericKvQueryService]] = []
+            with self._write_lock:
+                configurations = dict(self._configurations)
+                configurations[key] = configuration
+                self._load_locks.setdefault(key, threading.Lock())
+                replaced = self.registry.register(service)
+                if replaced is not None:
+                    retired.append((key, previous, replaced))
+                self._loaded_keys = self._loaded_keys | {key}
+                self._last_access[key] = time.monotonic()
+                if replaces is not None and replaces != key:
+                    replaced_configuration = configurations.pop(replaces, None)
+                    replaced = self.registry.unregister(*replaces)
+                    self._loaded_keys = self._loaded_keys - {replaces}
+                    self._last_access.pop(replaces, None)
+                    if replaced is not None:
+                        retired.append((replaces, replaced_configuration, replaced))
+                self._configurations = configurations
+
+            for retired_key, retired_configuration, retired_service in retired:
+                if os.path.realpath(
+                    retired_configuration.vector_file
+                ) != os.path.realpath(configuration.vector_file):
+                    self.__release_if_unused(retired_configuration.vector_file)
+                weakref.finalize(retired_service, self.__on_drained, retired_key)
+            self.swap_status[key] = "done"
+        logging.info(f"Service {key} swapped in.")
+        return service
+
+    def get_swap_status(self) -> Dict[str, str]:
+        """``swap_status`` by "dataset/dataset_version/model/model_version"."""
+        return {"/".join(key): status for key, status in self.swap_status.items()}
+
+    def swap_in_background(
+        self,
+        configuration: ServiceConfiguration,
+        replaces: Union[None, ServiceKey] = None,
+        warm_up_labels: Union[None, List[str]] = None,
+    ) -> threading.Thread:
+        """Runs ``swap`` in a background thread; its progress is reported in ``swap_status``."""
+
+        def run():
+            try:
+                self.swap(configuration, replaces, warm_up_labels)
+            except Exception:
+                logging.exception(f"Swap of service {configuration.get_key()} failed.")
+
+        self.swap_status[configuration.get_key()] = "loading"
+        thread = threading.Thread(target=run, name="service-swap", daemon=True)
+        thread.start()
+        return thread
+
+    @staticmethod
+    def parse_swap_request(
+        body: Any,
+    ) -> Tuple[ServiceConfiguration, Union[None, ServiceKey], List[str]]:
+        """Reads the arguments of ``swap`` from the JSON body of a swap request, e.g.
+        ``{"service": {<ServiceConfiguration>}, "replaces": [dataset, dataset_version, model, model_version],
+        "warm_up": ["Berlin"]}``; "replaces" and "warm_up" are optional.
+
+        Raises
+        ------
+        ValueError
+            If the body is not a valid swap request.
+        """
+        if not isinstance(body, dict) or not isinstance(body.get("service"), dict):
+            raise ValueError("The request body must contain a service configuration.")
+        try:
+            configuration = ServiceConfiguration(**body["service"])
+        except TypeError as error:
+            raise ValueError(f"Invalid service configuration: {error}")
+        replaces = body.get("replaces")
+        if replaces is not None:
+            if not isinstance(replaces, list) or len(replaces) != 4:
+                raise ValueError(
+                    "replaces must be [dataset, dataset_version, model, model_version]."
+                )
+            replaces = tuple(replaces)
+        warm_up_labels = body.get("warm_up", [])
+        if not isinstance(warm_up_labels, list):
+            raise ValueError("warm_up must be a list of concepts.")
+        return configuration, replaces, warm_up_labels
+
+    @staticmethod
+    def warm_up(
+        service: GenericKvQueryService,
+        labels: Union[None, List[str]] = None,
+        topn: int = 10,
+    ) -> None:
+        """Answers closest concept queries on a service before it receives requests: the scanned matrices are
+        read once (so their pages are in memory) and lazily created structures are built.
+
+        Parameters
+        ----------
+        service : GenericKvQueryService
+            The service.
+        labels : List[str]
+            Concepts that are queried; default: the first concept of the vocabulary.
+        topn : int
+            Number of closest concepts per query.
+        """
+        if not labels:
+            labels = [service.kv.index_to_key[0]]
+        for label in labels:
+            service.get_vector(label=label)
+            service.get_closest_concepts(label=label, topn=topn)
+
+    def __on_drained(self, key: Hashable) -> None:
+        logging.info(f"Replaced service {key} released.")
+        self.vector_store.close_detached_segments()
+
+    def __release_if_unused(self, vector_file: Union[None, str]) -> None:
+        """Releases the vectors of the file unless a loaded service uses them."""
+        if vector_file is not None and not any(
+            other.vector_file is not None
+            and os.path.realpath(other.vector_file) == os.path.realpath(vector_file)
+            for other_key, other in self._configurations.items()
+            if other_key in self._loaded_keys
+        ):
+            self.vector_store.release(vector_file)
+
+    def unload_idle(self, now: Union[None, float] = None) -> int:
+        """Unloads the services that have not been requested for ``idle_timeout`` seconds.
+
+        Returns
+        -------
+        int
+            The number of services that have been unloaded.
+        """
+        if self.idle_timeout is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        idle_keys = [
+            key
+            for key in self._loaded_keys
+            if now - self._last_access.get(key, now) > self.idle_timeout
+        ]
+        return sum(self.unload(key) for key in idle_keys)
+
+    def __len__(self) -> int:
+        """Number of loaded services."""
+        return len(self._loaded_keys)
+
+    def __iter__(self) -> Iterator[GenericKvQueryService]:
+        """The loaded generic services."""
+        return iter(self.registry)
+
+    def __get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        if self.idle_timeout is not None and now >= self._next_idle_check:
+            self._next_idle_check = now + self.idle_timeout / 4
+            self.unload_idle(now)
+        service = self.__get_loaded(key)
+        if service is None:
+            if key not in self._configurations:
+                return None
+            service = self.__load(key)
+        with self._write_lock:
+            # not if the service has been unloaded or replaced in the meantime
+            if self.__get_loaded(key) is service:
+                self._last_access[key] = now
+        return service
+
+    def __get_loaded(self, key: Hashable) -> Any:
+        if isinstance(key, str):
+            return self._legacy_services.get(key)
+        return self.registry.get(*key)
+
+    def __load(self, key: Hashable) -> Any:
+        with self._load_locks[key]:
+            service = self.__get_loaded(key)
+            if service is not None:
+                return service
+            if self.max_loaded_services is not None:
+                self.__unload_least_recently_used(self.max_loaded_services - 1)
+            logging.info(f"Loading service {key}.")
+            service = self._configurations[key].create_service(
+                vector_store=self.vector_store,
+                cache=self.cache,
+                batch_window=self.batch_window,
+            )
+            with self._write_lock:
+                if isinstance(key, str):
+                    self._legacy_services = {**self._legacy_services, key: service}
+                else:
+                    self.registry.register(service)
+                self._loaded_keys = self._loaded_keys | {key}
+                self._last_access[key] = time.monotonic()
+            logging.info(f"Service {key} loaded.")
+            return service
+
+    def __unload_least_recently_used(self, number_of_services: int) -> None:
+        """Unloads services until at most the given number of services is loaded."""
+        last_access = dict(self._last_access)
+        by_last_access = sorted(
+            self._loaded_keys, key=lambda key: last_access.get(key, 0.0)
+        )
+        for key in by_last_access[: max(0, len(by_last_access) - number_of_services)]:
+            self.unload(key)
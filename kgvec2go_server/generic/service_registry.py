@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from functools import lru_cache
+import threading
+from typing import Dict, Tuple, Union, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+
+ServiceKey = Tuple[str, str, str, str]
+
+
+def normalize_name(name: str) -> str:
+    """Normalization of the dataset, model and version names under which a service is found: lower case
+    without hyphens, underscores and spaces (e.g. ``TD-V`` and ``td_v`` address the same service).
+
+    Parameters
+    ----------
+    name : str
+        String to be normalized.
+
+    Returns
+    -------
+    Normalized string.
+    """
+    name = name.lower()
+    name = name.replace("-", "")
+    name = name.replace("_", "")
+    name = name.replace(" ", "")
+    return name
+
+
+class ServiceRegistry:
+    """Registry of the generic services running in the backend, addressed by dataset, dataset version, model
+    and model version.
+
+    Keys are normalized once at registration (see ``normalize_name``) so that a lookup is a single dict access.
+    Writers replace the whole dict (copy-on-write) under a lock; readers never lock, they always see either the
+    old or the new dict.
+    """
+
+    def __init__(self):
+        self._services: Dict[ServiceKey, GenericKvQueryService] = {}
+        self._write_lock = threading.Lock()
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def get_key(
+        dataset: str, dataset_version: str, model: str, model_version: str
+    ) -> ServiceKey:
+        """Normalized registry key.
+
+        Parameters
+        ----------
+        dataset : str
+            The dataset name.
+        dataset_version : str
+            The dataset version.
+        model : str
+            The model name.
+        model_version : str
+            The model version.
+
+        Returns
+        -------
+        ServiceKey
+        """
+        return (
+            normalize_name(dataset),
+            normalize_name(dataset_version),
+            normalize_name(model),
+            normalize_name(model_version),
+        )
+
+    @staticmethod
+    def get_key_of_service(service: GenericKvQueryService) -> ServiceKey:
+        return ServiceRegistry.get_key(
+            service.dataset,
+            service.dataset_version,
+            service.model,
+            service.model_version,
+        )
+
+    def register(
+        self, service: GenericKvQueryService
+    ) -> Union[None, GenericKvQueryService]:
+        """Register (or replace) a service.
+
+        Parameters
+        ----------
+        service : GenericKvQueryService
+            The service to be registered.
+
+        Returns
+        -------
+        The service that has been replaced or None.
+        """
+        key = ServiceRegistry.get_key_of_service(service)
+        with self._write_lock:
+            services = dict(self._services)
+            previous = services.get(key)
+            services[key] = service
+            self._services = services
+        return previous
+
+    def unregister(
+        self, dataset: str, dataset_version: str, model: str, model_version: str
+    ) -> Union[None, GenericKvQueryService]:
+        """Remove a service.
+
+        Returns
+        -------
+        The removed service or None if no such service was registered.
+        """
+        key = ServiceRegistry.get_key(dataset, dataset_version, model, model_version)
+        with self._write_lock:
+            if key not in self._services:
+                return None
+            services = dict(self._services)
+            previous = services.pop(key)
+            self._services = services
+        return previous
+
+    def get(
+        self, dataset: str, dataset_version: str, model: str, model_version: str
+    ) -> Union[None, GenericKvQueryService]:
+        """Retrieves a service given search criteria.
+
+        Returns
+        -------
+        None if no service could be found for the given criteria, else the found service.
+        """
+        return self._services.get(
+            ServiceRegistry.get_key(dataset, dataset_version, model, model_version)
+        )
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def __iter__(self) -> Iterator[GenericKvQueryService]:
+        return iter(list(self._services.values()))
@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+from typing import List, Tuple, Union, Sequence, TYPE_CHECKING
+
+import numpy as np
+from numpy import ndarray
+
+if TYPE_CHECKING:
+    from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+
+
+def normalize_rows(vectors: ndarray) -> ndarray:
+    """Returns a float32 copy of the given matrix in which every row has unit length. Zero rows stay zero.
+
+    Parameters
+    ----------
+    vectors : ndarray
+        Matrix of shape (number of vectors, dimension).
+
+    Returns
+    -------
+    ndarray
+        Row-normalized float32 matrix.
+    """
+    result = np.array(vectors, dtype=np.float32, copy=True)
+    if result.ndim == 1:
+        result = result.reshape(1, -1)
+    norms = np.linalg.norm(result, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    result /= norms
+    return result
+
+
+class BatchSimilarityEngine:
+    """Exact cosine top-k engine that answers many queries with one matrix-matrix product.
+
+    The engine keeps a pre-normalized float32 copy of the vector matrix. A batch of query vectors is normalized,
+    multiplied with the transposed matrix and the top-k entries of every row are selected via ``argpartition``
+    so that only k elements per row need to be sorted. With an executor, the matrix is scanned in row shards on
+    multiple cores (see ``ShardedScanExecutor``).
+    """
+
+    def __init__(
+        self,
+        vectors: ndarray,
+        query_chunk_size: int = 256,
+        is_normalized: bool = False,
+        executor: Union[None, ShardedScanExecutor] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        vectors : ndarray
+            Matrix of shape (number of vectors, dimension), e.g. ``kv.vectors``.
+        query_chunk_size : int
+            Maximal number of queries that are multiplied at once. Bounds the size of the intermediate score
+            matrix to query_chunk_size x number of vectors.
+        is_normalized : bool
+            True if the rows of the given float32 matrix already have unit length; the matrix is then used as is
+            (no copy), e.g. a memory-mapped or shared matrix.
+        executor : ShardedScanExecutor
+            Optional; executor that scans the matrix in parallel shards. If None, scans run in the calling
+            thread.
+        """
+        self.normalized_vectors: ndarray = (
+            vectors if is_normalized else normalize_rows(vectors)
+        )
+        self.query_chunk_size = query_chunk_size
+        self.executor = executor
+
+    def __len__(self):
+        return self.normalized_vectors.shape[0]
+
+    def top_k(
+        self,
+        query_vectors: ndarray,
+        topn: int,
+        exclude_indices: Union[None, Sequence[Union[None, int]]] = None,
+    ) -> Tuple[ndarray, ndarray]:
+        """Determine the topn most similar vectors for each query vector.
+
+        Parameters
+        ----------
+        query_vectors : ndarray
+            Matrix of shape (number of queries, dimension). The vectors do not have to be normalized.
+        topn : int
+            Number of closest vectors that shall be returned per query.
+        exclude_indices : Sequence of int or None
+            Optional; one matrix index per query that shall not appear in the result of that query (typically
+            the query concept itself). None entries exclude nothing.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Indices and scores, each of shape (number of queries, k) with k = min(topn, number of vectors),
+            ordered by descending score.
+        """
+        queries = normalize_rows(query_vectors)
+        number_of_queries = queries.shape[0]
+        k = max(0, min(int(topn), len(self)))
+        result_indices = np.empty((number_of_queries, k), dtype=np.int64)
+        result_scores = np.empty((number_of_queries, k), dtype=np.float32)
+        if k == 0 or number_of_queries == 0:
+            return result_indices, result_scores
+
+        for start in range(0, number_of_queries, self.query_chunk_size):
+            end = min(start + self.query_chunk_size, number_of_queries)
+            chunk = queries[start:end]
+            excluded_chunk = (
+                None if exclude_indices is None else exclude_indices[start:end]
+            )
+            if self.executor is not None:
+
+                def score_shard(shard_start: int, shard_end: int) -> ndarray:
+                    return chunk @ self.normalized_vectors[shard_start:shard_end].T
+
+                indices, top_scores = self.executor.top_k(
+                    score_shard=score_shard,
+                    number_of_rows=len(self),
+                    k=k,
+                    exclude_indices=excluded_chunk,
+                )
+            else:
+                scores = chunk @ self.normalized_vectors.T
+                if excluded_chunk is not None:
+                    for row, excluded in enumerate(excluded_chunk):
+                        if excluded is not None:
+                            scores[row, excluded] = -np.inf
+                indices, top_scores = self.select_top_k(scores=scores, k=k)
+            result_indices[start:end] = indices
+            result_scores[start:end] = top_scores
+        return result_indices, result_scores
+
+    def top_k_for_indices(
+        self, indices: Sequence[int], topn: int, exclude_self: bool = True
+    ) -> Tuple[ndarray, ndarray]:
+        """Determine the topn most similar vectors for vectors that are already part of the matrix.
+
+        Parameters
+        ----------
+        indices : Sequence of int
+            Matrix indices of the query vectors.
+        topn : int
+            Number of closest vectors that shall be returned per query.
+        exclude_self : bool
+            If True, a query vector is not returned as its own neighbour (like gensim's ``most_similar``).
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Indices and scores, see ``top_k``.
+        """
+        indices = list(indices)
+        return self.top_k(
+            query_vectors=self.normalized_vectors[indices],
+            topn=topn,
+            exclude_indices=indices if exclude_self else None,
+        )
+
+    @staticmethod
+    def select_top_k(scores: ndarray, k: int) -> Tuple[ndarray, ndarray]:
+        """Row-wise top-k selection on a score matrix.
+
+        Parameters
+        ----------
+        scores : ndarray
+            Matrix of shape (number of queries, number of candidates).
+        k : int
+            Number of entries to select per row; must not exceed the number of candidates.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Column indices and scores of shape (number of queries, k), ordered by descending score.
+        """
+        if k < scores.shape[1]:
+            partition = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            partition = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        partition_scores = np.take_along_axis(scores, partition, axis=1)
+        order = np.argsort(-partition_scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(partition, order, axis=1),
+            np.take_along_axis(partition_scores, order, axis=1),
+        )
+
+    @staticmethod
+    def to_result_list(
+        keys: List[str], indices: ndarray, scores: ndarray
+    ) -> List[Tuple[str, float]]:
+        """Converts one result row into the (concept, score) list format that gensim's ``most_similar`` uses.
+
+        Parameters
+        ----------
+        keys : List[str]
+            Index to key mapping, e.g. ``kv.index_to_key``.
+        indices : ndarray
+            One row of result indices.
+        scores : ndarray
+            One row of result scores.
+
+        Returns
+        -------
+        List[Tuple[str, float]]
+        """
+        return [
+            (keys[index], float(score))
+            for index, score in zip(indices, scores)
+            if index >= 0 and score != -np.inf
+        ]
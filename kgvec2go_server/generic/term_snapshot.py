@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+from hashlib import blake2b
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, List, Mapping, Tuple, Union
+
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.linker_index import hash_surface_form
+
+SNAPSHOT_VERSION = 1
+
+_checksums: Dict[Tuple[str, int, int], str] = {}
+"""Computed checksums by path, size and modification time of the file."""
+
+
+def compute_checksum(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Checksum (blake2b) of a file's content; used to tie a snapshot to the ``.kv`` file it was derived from.
+    The checksum of a file is computed once per process and version (size and modification time) of the file,
+    as every snapshot of a file is validated against it.
+
+    Parameters
+    ----------
+    path : str
+        Path to the file.
+    chunk_size : int
+        Number of bytes read at once.
+
+    Returns
+    -------
+    str
+        Hex digest.
+    """
+    stat = os.stat(path)
+    key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    checksum = _checksums.get(key)
+    if checksum is None:
+        digest = blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        checksum = _checksums[key] = digest.hexdigest()
+    return checksum
+
+
+class HashedKeys:
+    """Memory-mappable replacement of a ``Dict[str, int]`` from string keys to row numbers.
+
+    The 64 bit hashes (see ``hash_surface_form``) of the keys are stored sorted; a lookup is one binary search.
+    The keys themselves are not stored, hence the keys cannot be iterated and a string that is not a key
+    resolves to a row with a probability of about (number of keys) / 2^64.
+    """
+
+    def __init__(self, hashes: ndarray, rows: ndarray):
+        """
+
+        Parameters
+        ----------
+        hashes : ndarray
+            Sorted uint64 hashes of the keys.
+        rows : ndarray
+            Row of the key of hashes[i].
+        """
+        self.hashes = hashes
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: str, default: Union[None, int] = None) -> Union[None, int]:
+        key_hash = np.uint64(hash_surface_form(key))
+        position = int(np.searchsorted(self.hashes, key_hash))
+        if position < len(self.hashes) and self.hashes[position] == key_hash:
+            return int(self.rows[position])
+        return default
+
+    @staticmethod
+    def build(keys: Iterable[str]) -> HashedKeys:
+        """Build the table; the i-th key is assigned to row i.
+
+        Raises
+        ------
+        ValueError
+            If two distinct keys have the same hash.
+        """
+        hashes = np.array([hash_surface_form(key) for key in keys], dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        hashes = hashes[order]
+        if len(hashes) > 1 and np.any(hashes[1:] == hashes[:-1]):
+            raise ValueError("Hash collision between two keys; cannot build table.")
+        return HashedKeys(hashes=hashes, rows=order.astype(np.int64))
+
+
+class TermTable:
+    """Memory-mappable replacement of a term mapping ``lookup key -> URI`` (or ``lookup key -> list of URIs``).
+
+    The URIs are stored as vocabulary indices: the URIs of the key in row r are
+    ``index_to_key[values[offsets[r]:offsets[r + 1]]]``. The table supports the read access of a dict
+    (``in``, ``[]``, ``get``, ``len``) but not iteration.
+    """
+
+    ARRAY_NAMES = ("hashes", "rows", "offsets", "values")
+
+    def __init__(
+        self,
+        keys: HashedKeys,
+        offsets: ndarray,
+        values: ndarray,
+        index_to_key: List[str],
+        multi_valued: bool = False,
+    ):
+        """
+
+        Parameters
+        ----------
+        keys : HashedKeys
+            Lookup key -> row.
+        offsets : ndarray
+            Array of length number of rows + 1.
+        values : ndarray
+            Vocabulary indices ordered by row.
+        index_to_key : List[str]
+            Vocabulary of the vector file, e.g. ``kv.index_to_key``.
+        multi_valued : bool
+            If True, a lookup returns a list of URIs; else a single URI.
+        """
+        self.keys = keys
+        self.offsets = offsets
+        self.values = values
+        self.index_to_key = index_to_key
+        self.multi_valued = multi_valued
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, lookup_key: str) -> bool:
+        return lookup_key in self.keys
+
+    def __getitem__(self, lookup_key: str) -> Union[str, List[str]]:
+        indices = self.get_indices(lookup_key)
+        if indices is None:
+            raise KeyError(lookup_key)
+        if self.multi_valued:
+            return [self.index_to_key[index] for index in indices]
+        return self.index_to_key[indices[0]]
+
+    def get(self, lookup_key: str, default: Any = None) -> Any:
+        try:
+            return self[lookup_key]
+        except KeyError:
+            return default
+
+    def get_indices(self, lookup_key: str) -> Union[None, ndarray]:
+        """Vocabulary indices of the URIs of the lookup key; None if the key is unknown."""
+        row = self.keys.get(lookup_key)
+        if row is None:
+            return None
+        return self.values[self.offsets[row] : self.offsets[row + 1]]
+
+    @staticmethod
+    def build(
+        term_mapping: Mapping[str, Union[str, Iterable[str]]],
+        key_to_index: Mapping[str, int],
+        index_to_key: List[str],
+        multi_valued: bool = False,
+    ) -> TermTable:
+        """Build the table from a term mapping. URIs that are not in the vocabulary are dropped; so are lookup
+        keys without any URI in the vocabulary. The rows are assigned in the iteration order of the mapping.
+
+        Parameters
+        ----------
+        term_mapping : Mapping[str, Union[str, Iterable[str]]]
+            Lookup key -> URI (or URIs if multi_valued).
+        key_to_index : Mapping[str, int]
+            Vocabulary, e.g. ``kv.key_to_index``.
+        index_to_key : List[str]
+            Vocabulary, e.g. ``kv.index_to_key``.
+        multi_valued : bool
+            True if the mapping has multiple URIs per lookup key.
+
+        Returns
+        -------
+        TermTable
+        """
+        lookup_keys = []
+        offsets = [0]
+        values = []
+        for lookup_key, uris in term_mapping.items():
+            indices = [
+                key_to_index[uri]
+                for uri in (uris if multi_valued else [uris])
+                if uri in key_to_index
+            ]
+            if len(indices) == 0:
+                continue
+            lookup_keys.append(lookup_key)
+            values.extend(indices)
+            offsets.append(len(values))
+        return TermTable(
+            keys=HashedKeys.build(lookup_keys),
+            offsets=np.array(offsets, dtype=np.int64),
+            values=np.array(values, dtype=np.int64),
+            index_to_key=index_to_key,
+            multi_valued=multi_valued,
+        )
+
+    def to_arrays(self, prefix: str) -> Dict[str, ndarray]:
+        """The arrays of the table for a Snapshot; the names are prefixed with ``prefix``."""
+        arrays = {
+            "hashes": self.keys.hashes,
+            "rows": self.keys.rows,
+            "offsets": self.offsets,
+            "values": self.values,
+        }
+        return {f"{prefix}_{name}": array for name, array in arrays.items()}
+
+    @staticmethod
+    def from_arrays(
+        arrays: Mapping[str, ndarray],
+        prefix: str,
+        index_to_key: List[str],
+        multi_valued: bool = False,
+    ) -> TermTable:
+        """Inverse of ``to_arrays``."""
+        return TermTable(
+            keys=HashedKeys(
+                hashes=arrays[f"{prefix}_hashes"], rows=arrays[f"{prefix}_rows"]
+            ),
+            offsets=arrays[f"{prefix}_offsets"],
+            values=arrays[f"{prefix}_values"],
+            index_to_key=index_to_key,
+            multi_valued=multi_valued,
+        )
+
+
+class Snapshot:
+    """Derived startup structures of one query service (term tables, lemma subsets, sense indices) persisted next
+    to the ``.kv`` file the service loads.
+
+    Every array is stored as ``{kv}.snapshot.{name}.{array name}.npy`` (memory-mapped on load); a JSON file
+    ``{kv}.snapshot.{name}.json`` holds the metadata together with the checksum of the ``.kv`` file. A snapshot
+    whose checksum does not match the current ``.kv`` file is rejected. Snapshots are generated offline with
+    ``scripts/build_snapshot.py``.
+    """
+
+    def __init__(
+        self,
+        arrays: Dict[str, ndarray],
+        metadata: Union[None, Dict[str, Any]] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        arrays : Dict[str, ndarray]
+            Array name -> array.
+        metadata : Dict[str, Any]
+            JSON-serializable service-specific metadata.
+        """
+        self.arrays = arrays
+        self.metadata = {} if metadata is None else metadata
+
+    @staticmethod
+    def get_file_path(kv_path: str, name: str, array_name: str) -> str:
+        """Path of one array file of the snapshot ``name`` that belongs to the given ``.kv`` file."""
+        return f"{kv_path}.snapshot.{name}.{array_name}.npy"
+
+    @staticmethod
+    def get_metadata_path(kv_path: str, name: str) -> str:
+        """Path of the metadata file of the snapshot ``name`` that belongs to the given ``.kv`` file."""
+        return f"{kv_path}.snapshot.{name}.json"
+
+    def save(self, kv_path: str, name: str) -> None:
+        """Persist the snapshot next to the given ``.kv`` file.
+
+        Parameters
+        ----------
+        kv_path : str
+            Path to the vector file the snapshot was derived from.
+        name : str
+            Name of the snapshot (typically the data set of the service).
+        """
+        for array_name, array in self.arrays.items():
+            np.save(Snapshot.get_file_path(kv_path, name, array_name), array)
+        # the metadata file is written last: a snapshot without it is incomplete and ignored
+        with open(Snapshot.get_metadata_path(kv_path, name), "w") as metadata_file:
+            json.dump(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "checksum": compute_checksum(kv_path),
+                    "arrays": sorted(self.arrays),
+                    "metadata": self.metadata,
+                },
+                metadata_file,
+            )
+
+    @staticmethod
+    def load(
+        kv_path: str, name: str, mmap_mode: Union[None, str] = "r"
+    ) -> Union[None, Snapshot]:
+        """Load the snapshot ``name`` of the given ``.kv`` file.
+
+        Parameters
+        ----------
+        kv_path : str
+            Path to the vector file.
+        name : str
+            Name of the snapshot.
+        mmap_mode : str or None
+            Memory-map mode passed to ``numpy.load``.
+
+        Returns
+        -------
+        Snapshot
+            None if there is no snapshot or if it does not match the ``.kv`` file.
+        """
+        metadata_path = Snapshot.get_metadata_path(kv_path, name)
+        if not os.path.isfile(metadata_path):
+            return None
+        with open(metadata_path, "r") as metadata_file:
+            content = json.load(metadata_file)
+        if content.get("version") != SNAPSHOT_VERSION:
+            logging.warning(f"Ignoring snapshot {metadata_path}: unsupported version.")
+            return None
+        if content.get("checksum") != compute_checksum(kv_path):
+            logging.warning(
+                f"Ignoring snapshot {metadata_path}: it was built for a different {kv_path}."
+            )
+            return None
+        return Snapshot(
+            arrays={
+                array_name: np.load(
+                    Snapshot.get_file_path(kv_path, name, array_name),
+                    mmap_mode=mmap_mode,
+                )
+                for array_name in content["arrays"]
+            },
+            metadata=content["metadata"],
+        )
@@ -0,0 +1,549 @@
+from __future__ import annotations
+
+import atexit
+from contextlib import contextmanager
+from hashlib import blake2b
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Set, Tuple, Union
+import weakref
+
+from gensim.models import KeyedVectors
+import numpy as np
+from numpy import ndarray
+
+from kgvec2go_server.generic.similarity_engine import (
+    BatchSimilarityEngine,
+    normalize_rows,
+)
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.term_snapshot import Snapshot
+
+try:
+    from multiprocessing import resource_tracker
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # pragma: no cover - platforms without shared memory support
+    resource_tracker = None
+    SharedMemory = None
+
+try:
+    import fcntl
+except (
+    ImportError
+):  # pragma: no cover - Windows removes a segment once no process has it open
+    fcntl = None
+
+# serializes the reference counting of segments across the processes of the host
+_SEGMENT_LOCK_PATH = os.path.join(tempfile.gettempdir(), "kgv_segments.lock")
+
+# where POSIX shared memory segments are listed (Linux)
+_SHARED_MEMORY_DIRECTORY = "/dev/shm"
+
+# Python < 3.13 has no ``track`` parameter: the resource tracker unlinks every segment a process has opened when
+# the process exits, hence segments are unregistered from it manually
+_UNTRACK_MANUALLY = sys.version_info < (3, 13)
+
+
+class VectorStore:
+    """Host-wide store of the vector matrices the query services work on.
+
+    Vector files are loaded memory-mapped (``mmap="r"``), so the page cache holds one copy of every matrix per
+    host no matter how many WSGI worker processes load it. Derived float32 matrices (the row-normalized matrix
+    of a vector file and normalized lemma subsets) are placed in named POSIX shared memory segments: the first
+    process computes the matrix, every other process attaches to the segment. The segment name is derived from
+    the path, size and modification time of the vector file, so a changed file gets a new segment.
+
+    Every segment counts the processes that refer to it. Segments outlive the processes that use them (workers
+    come and go), but the last process that releases a segment (see ``release``) removes it from the host, and
+    so does the last process that exits after the file of the segment has changed. Creating the segment of a
+    new file version removes the segments of former versions of the file (processes that still use them keep
+    their mapping). ``unlink`` removes all segments of a store. If shared memory is not available, matrices are
+    computed per process.
+
+    If the normalized matrix and the norms of a vector file have been persisted offline (see
+    ``write_normalized_vectors``), both are memory-mapped instead: the norms are handed to gensim (no
+    ``fill_norms`` on the first ``most_similar`` call of a process) and the normalized matrix is used by all
+    engines on that file.
+    """
+
+    NORMALIZED_SNAPSHOT_NAME = "vectors"
+
+    SEGMENT_PREFIX = "kgv_"
+    HEADER_BYTES = 64
+    """Segment header: int64 state (0: being written, 1: ready, 2: removed), int64 number of rows, int64 number of
+    columns, int64 number of processes that refer to the segment."""
+
+    __default: Union[None, VectorStore] = None
+    __default_lock = threading.Lock()
+
+    def __init__(self, use_shared_memory: bool = True, wait_timeout: float = 60.0):
+        """
+
+        Parameters
+        ----------
+        use_shared_memory : bool
+            If False, derived matrices are computed per process.
+        wait_timeout : float
+            Seconds a process waits for another process that is copying a matrix into a segment before it computes
+            the matrix itself.
+        """
+        self.use_shared_memory = use_shared_memory and SharedMemory is not None
+        self.wait_timeout = wait_timeout
+        self._lock = threading.RLock()
+        self._vectors: Dict[str, KeyedVectors] = {}
+        self._persisted_normalized: Dict[str, ndarray] = {}
+        self._matrices: Dict[str, ndarray] = {}
+        self._segments: Dict[str, SharedMemory] = {}
+        # segment names of the matrices derived from each file (see release)
+        self._segment_names_of_files: Dict[str, Set[str]] = {}
+        # file and matrix name of each segment name (see detach)
+        self._segment_sources: Dict[str, Tuple[str, str]] = {}
+        # unlinked and released segments stay mapped as long as their matrix is referenced (numpy does not keep
+        # the buffer of the segment exported, hence closing a segment does not fail while a view exists)
+        self._detached_segments: List[Tuple[SharedMemory, weakref.ref]] = []
+        if self.use_shared_memory:
+            atexit.register(_detach_at_exit, weakref.ref(self))
+
+    @staticmethod
+    def get_default() -> VectorStore:
+        """The store shared by all services of this process."""
+        with VectorStore.__default_lock:
+            if VectorStore.__default is None:
+                VectorStore.__default = VectorStore()
+            return VectorStore.__default
+
+    def load_vectors(self, path: str) -> KeyedVectors:
+        """Load a gensim vector file memory-mapped; every path is loaded once per process. Persisted norms and
+        normalized vectors of the file are memory-mapped as well.
+
+        Parameters
+        ----------
+        path : str
+            Path to the ``.kv`` file.
+
+        Returns
+        -------
+        KeyedVectors
+        """
+        key = os.path.realpath(path)
+        with self._lock:
+            if key not in self._vectors:
+                kv = KeyedVectors.load(path, mmap="r")
+                snapshot = Snapshot.load(path, name=self.NORMALIZED_SNAPSHOT_NAME)
+                if (
+                    snapshot is not None
+                    and snapshot.arrays["normalized"].shape == kv.vectors.shape
+                ):
+                    kv.norms = snapshot.arrays["norms"]
+                    self._persisted_normalized[key] = snapshot.arrays["normalized"]
+                    logging.info(f"Persisted normalized vectors of {path} loaded.")
+                self._vectors[key] = kv
+            return self._vectors[key]
+
+    def get_normalized_vectors(
+        self,
+        path: str,
+        vectors: ndarray,
+        indices: Union[None, ndarray] = None,
+    ) -> ndarray:
+        """The row-normalized float32 matrix of the vectors of a file (or of a subset of its rows).
+
+        Parameters
+        ----------
+        path : str
+            Path to the file the vectors have been loaded from; identifies the matrix.
+        vectors : ndarray
+            The vector matrix of that file.
+        indices : ndarray
+            Optional; rows of the subset (e.g. the lemma subset of a service).
+
+        Returns
+        -------
+        ndarray
+            Read-only matrix of shape (number of rows, dimension).
+        """
+        key = os.path.realpath(path)
+        persisted = self._persisted_normalized.get(key)
+        if persisted is not None:
+            if indices is None:
+                return persisted
+            # the subset rows are already normalized
+            vectors, normalize = persisted, np.asarray
+        else:
+            normalize = normalize_rows
+
+        name = "normalized"
+        if indices is not None:
+            indices = np.asarray(indices, dtype=np.int64)
+            name += "." + blake2b(indices.tobytes(), digest_size=8).hexdigest()
+        segment_name = VectorStore.get_segment_name(path, name)
+        with self._lock:
+            self._segment_names_of_files.setdefault(key, set()).add(segment_name)
+            self._segment_sources[segment_name] = (key, name)
+        return self.get_matrix(
+            segment_name=segment_name,
+            build=lambda: normalize(vectors if indices is None else vectors[indices]),
+        )
+
+    def get_engine(
+        self,
+        path: str,
+        vectors: ndarray,
+        indices: Union[None, ndarray] = None,
+        query_chunk_size: int = 256,
+        executor: Union[None, ShardedScanExecutor] = None,
+    ) -> BatchSimilarityEngine:
+        """A BatchSimilarityEngine on the shared normalized matrix (see ``get_normalized_vectors``). Its scans
+        run on the given executor; default: the executor of the process."""
+        return BatchSimilarityEngine(
+            vectors=self.get_normalized_vectors(path, vectors, indices),
+            query_chunk_size=query_chunk_size,
+            is_normalized=True,
+            executor=(
+                ShardedScanExecutor.get_default() if executor is None else executor
+            ),
+        )
+
+    def get_matrix(self, segment_name: str, build: Callable[[], ndarray]) -> ndarray:
+        """The float32 matrix stored in the given segment; ``build`` is only called if no process has created
+        the segment yet (or if shared memory is not available).
+
+        Parameters
+        ----------
+        segment_name : str
+            Name of the shared memory segment.
+        build : Callable[[], ndarray]
+            Computes the matrix.
+
+        Returns
+        -------
+        ndarray
+            Read-only matrix.
+        """
+        with self._lock:
+            matrix = self._matrices.get(segment_name)
+            if matrix is not None:
+                return matrix
+            if self.use_shared_memory:
+                matrix = self.__attach(segment_name)
+            if matrix is None:
+                built = np.ascontiguousarray(build(), dtype=np.float32)
+                if self.use_shared_memory:
+                    matrix = self.__create(segment_name, built)
+                    if matrix is not None and segment_name in self._segment_sources:
+                        self.__unlink_superseded_segments(
+                            segment_name, *self._segment_sources[segment_name]
+                        )
+                if matrix is None:
+                    matrix = built
+                    matrix.flags.writeable = False
+            self._matrices[segment_name] = matrix
+            return matrix
+
+    @staticmethod
+    def write_normalized_vectors(
+        path: str, kv: Union[None, KeyedVectors] = None, chunk_size: int = 65536
+    ) -> Snapshot:
+        """Persists the float32 row-normalized matrix and the norms of a vector file next to the file (as
+        snapshot, i.e. validated against the checksum of the ``.kv`` file when loaded).
+
+        Parameters
+        ----------
+        path : str
+            Path to the ``.kv`` file.
+        kv : KeyedVectors
+            The vectors of that file; loaded memory-mapped if not given.
+        chunk_size : int
+            Number of rows normalized at once.
+
+        Returns
+        -------
+        Snapshot
+            The snapshot that has been written.
+        """
+        if kv is None:
+            kv = KeyedVectors.load(path, mmap="r")
+        normalized = np.empty(kv.vectors.shape, dtype=np.float32)
+        norms = np.empty(kv.vectors.shape[0], dtype=np.float32)
+        for start in range(0, kv.vectors.shape[0], chunk_size):
+            chunk = np.asarray(kv.vectors[start : start + chunk_size], dtype=np.float32)
+            norms[start : start + chunk_size] = np.linalg.norm(chunk, axis=1)
+            normalized[start : start + chunk_size] = normalize_rows(chunk)
+        snapshot = Snapshot(arrays={"normalized": normalized, "norms": norms})
+        snapshot.save(path, name=VectorStore.NORMALIZED_SNAPSHOT_NAME)
+        return snapshot
+
+    @staticmethod
+    def get_file_namespace(
+        path: str, indices: Union[None, ndarray] = None
+    ) -> Tuple[str, ...]:
+        """Identifies results computed on the current version of a vector file (or on a subset of its rows), e.g.
+        as namespace of the entries of a result cache that is shared by services on different files.
+
+        Parameters
+        ----------
+        path : str
+            Path to the vector file.
+        indices : ndarray
+            Optional; rows of the subset the results are computed on.
+
+        Returns
+        -------
+        Tuple[str, ...]
+            The real path and the version of the file (and a digest of the subset).
+        """
+        namespace = (os.path.realpath(path), VectorStore.get_file_version(path))
+        if indices is None:
+            return namespace
+        digest = blake2b(np.asarray(indices, dtype=np.int64).tobytes(), digest_size=8)
+        return namespace + (digest.hexdigest(),)
+
+    @staticmethod
+    def get_segment_name(path: str, name: str) -> str:
+        """Name of the segment of matrix ``name`` derived from the current version of the given file."""
+        digest = blake2b(digest_size=4)
+        digest.update(VectorStore.get_file_version(path).encode("utf-8"))
+        return VectorStore.get_segment_name_prefix(path, name) + digest.hexdigest()
+
+    @staticmethod
+    def get_segment_name_prefix(path: str, name: str) -> str:
+        """Prefix of the segment names of matrix ``name`` derived from any version of the given file."""
+        digest = blake2b(digest_size=8)
+        digest.update(os.path.realpath(path).encode("utf-8"))
+        digest.update(name.encode("utf-8"))
+        return VectorStore.SEGMENT_PREFIX + digest.hexdigest() + "_"
+
+    @staticmethod
+    def get_file_version(path: str) -> str:
+        """Identifier of the current version of a vector file, derived from the path, size and modification
+        time of the file (and of its ``.vectors.npy`` file)."""
+        digest = blake2b(digest_size=8)
+        for file_path in (path, path + ".vectors.npy"):
+            if os.path.isfile(file_path):
+                stat = os.stat(file_path)
+                digest.update(
+                    f"{os.path.realpath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode(
+                        "utf-8"
+                    )
+                )
+        return digest.hexdigest()
+
+    def unlink(self) -> None:
+        """Removes all segments this store is attached to from the host and drops the matrices. Processes that
+        are still attached keep their mapping; new processes create new segments."""
+        with self._lock:
+            for segment in self._segments.values():
+                with VectorStore.__segment_lock():
+                    VectorStore.__unlink_segment(segment)
+            for segment_name, segment in self._segments.items():
+                self.__detach(segment, self._matrices.get(segment_name))
+            self._segments.clear()
+            self._segment_names_of_files.clear()
+            self._segment_sources.clear()
+            self._matrices.clear()
+            self.__close_detached_segments()
+
+    def detach(self) -> None:
+        """Drops the references of this store to its segments, e.g. when the process exits (called at exit).
+        A segment no process refers to anymore is removed from the host if its file has changed since the
+        segment was created; the segment of an unchanged file is kept for the next worker process.
+        """
+        with self._lock:
+            for segment_name, segment in self._segments.items():
+                source = self._segment_sources.get(segment_name)
+                self.__dereference(
+                    segment,
+                    unlink_if_unused=source is not None
+                    and VectorStore.get_segment_name(*source) != segment_name,
+                )
+                self.__detach(segment, self._matrices.get(segment_name))
+            self._segments.clear()
+            self._segment_names_of_files.clear()
+            self._segment_sources.clear()
+            self._matrices.clear()
+            self.__close_detached_segments()
+
+    def release(self, path: str) -> None:
+        """Drops the vectors of a file and the matrices derived from it, e.g. when the service on the file is
+        unloaded: the memory mappings are closed once no service refers to them anymore. A shared memory segment
+        is removed from the host once no process refers to it anymore.
+
+        Parameters
+        ----------
+        path : str
+            Path to the ``.kv`` file.
+        """
+        key = os.path.realpath(path)
+        with self._lock:
+            self._vectors.pop(key, None)
+            self._persisted_normalized.pop(key, None)
+            for segment_name in self._segment_names_of_files.pop(key, ()):
+                self._segment_sources.pop(segment_name, None)
+                segment = self._segments.pop(segment_name, None)
+                if segment is not None:
+                    self.__dereference(segment, unlink_if_unused=True)
+                    self.__detach(segment, self._matrices.get(segment_name))
+                self._matrices.pop(segment_name, None)
+            self.__close_detached_segments()
+
+    def __detach(self, segment: SharedMemory, matrix: Union[None, ndarray]) -> None:
+        self._detached_segments.append(
+            (segment, weakref.ref(matrix) if matrix is not None else lambda: None)
+        )
+
+    def __close_detached_segments(self) -> None:
+        still_referenced = []
+        for segment, matrix_reference in self._detached_segments:
+            if matrix_reference() is None:
+                segment.close()
+            else:
+                still_referenced.append((segment, matrix_reference))
+        self._detached_segments = still_referenced
+
+    def close_detached_segments(self) -> None:
+        """Closes the released and unlinked segments whose matrices are not referenced anymore."""
+        with self._lock:
+            self.__close_detached_segments()
+
+    @staticmethod
+    @contextmanager
+    def __segment_lock() -> Iterator[None]:
+        """Host-wide lock of the headers of all segments (no-op without ``fcntl``)."""
+        if fcntl is None:
+            yield
+            return
+        with open(_SEGMENT_LOCK_PATH, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def __get_header(segment: SharedMemory) -> ndarray:
+        return np.ndarray((4,), dtype=np.int64, buffer=segment.buf)
+
+    @staticmethod
+    def __unlink_segment(segment: SharedMemory) -> None:
+        """Marks the segment as removed and removes it from the host; the caller holds the segment lock."""
+        VectorStore.__get_header(segment)[0] = 2
+        if _UNTRACK_MANUALLY:
+            # unlink() unregisters the segment from the resource tracker
+            resource_tracker.register(segment._name, "shared_memory")
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __dereference(segment: SharedMemory, unlink_if_unused: bool) -> None:
+        with VectorStore.__segment_lock():
+            header = VectorStore.__get_header(segment)
+            if header[0] == 1:
+                header[3] -= 1
+                if header[3] <= 0 and unlink_if_unused:
+                    VectorStore.__unlink_segment(segment)
+                    logging.info(f"Removed shared memory segment {segment.name}.")
+            del header
+
+    def __unlink_superseded_segments(
+        self, segment_name: str, path: str, name: str
+    ) -> None:
+        """Removes the segments of former versions of the file from the host (listed in /dev/shm only)."""
+        if not os.path.isdir(_SHARED_MEMORY_DIRECTORY):
+            return
+        prefix = VectorStore.get_segment_name_prefix(path, name)
+        for other_name in os.listdir(_SHARED_MEMORY_DIRECTORY):
+            if not other_name.startswith(prefix) or other_name == segment_name:
+                continue
+            try:
+                other = self.__open_segment(other_name, create=False)
+            except (FileNotFoundError, ValueError):
+                continue
+            with VectorStore.__segment_lock():
+                VectorStore.__unlink_segment(other)
+            other.close()
+            logging.info(f"Removed superseded shared memory segment {other_name}.")
+
+    @staticmethod
+    def __open_segment(name: str, create: bool, size: int = 0) -> SharedMemory:
+        if not _UNTRACK_MANUALLY:
+            return SharedMemory(name=name, create=create, size=size, track=False)
+        segment = SharedMemory(name=name, create=create, size=size)
+        resource_tracker.unregister(segment._name, "shared_memory")
+        return segment
+
+    def __view(self, segment: SharedMemory) -> ndarray:
+        header = self.__get_header(segment)
+        matrix = np.ndarray(
+            (int(header[1]), int(header[2])),
+            dtype=np.float32,
+            buffer=segment.buf,
+            offset=self.HEADER_BYTES,
+        )
+        matrix.flags.writeable = False
+        return matrix
+
+    def __attach(self, segment_name: str) -> Union[None, ndarray]:
+        try:
+            segment = self.__open_segment(segment_name, create=False)
+        except FileNotFoundError:
+            return None
+        header = self.__get_header(segment)
+        deadline = time.time() + self.wait_timeout
+        while header[0] == 0:
+            if time.time() > deadline:
+                logging.warning(
+                    f"Timeout while waiting for shared memory segment {segment_name}."
+                )
+                del header
+                segment.close()
+                return None
+            time.sleep(0.05)
+        with VectorStore.__segment_lock():
+            if header[0] == 1:
+                header[3] += 1
+            removed = header[0] != 1
+        if removed:
+            # removed by its last process in the meantime
+            del header
+            segment.close()
+            return None
+        self._segments[segment_name] = segment
+        logging.info(f"Attached to shared memory segment {segment_name}.")
+        return self.__view(segment)
+
+    def __create(self, segment_name: str, matrix: ndarray) -> Union[None, ndarray]:
+        try:
+            segment = self.__open_segment(
+                segment_name, create=True, size=self.HEADER_BYTES + matrix.nbytes
+            )
+        except FileExistsError:
+            # another process was faster
+            return self.__attach(segment_name)
+        except OSError as error:
+            logging.warning(f"Shared memory not available ({error}).")
+            return None
+        header = self.__get_header(segment)
+        header[1:3] = matrix.shape
+        header[3] = 1
+        target = np.ndarray(
+            matrix.shape,
+            dtype=np.float32,
+            buffer=segment.buf,
+            offset=self.HEADER_BYTES,
+        )
+        target[:] = matrix
+        header[0] = 1
+        self._segments[segment_name] = segment
+        logging.info(
+            f"Created shared memory segment {segment_name} ({matrix.nbytes} bytes)."
+        )
+        return self.__view(segment)
+
+
+def _detach_at_exit(reference: weakref.ref) -> None:
+    store = reference()
+    if store is not None:
+        store.detach()
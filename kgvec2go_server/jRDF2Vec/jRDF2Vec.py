@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 import os
 import io
@@ -16,6 +17,43 @@ class jRDF2Vec:
         self._jrdf_2_vec_directory = jrdf_2_vec_directory
 
     def train_light(self, entities, number_of_walks, mode, dimension):
+        command, walk_directory_name = self._prepare_light(
+            entities, number_of_walks, mode, dimension
+        )
+        process_result = subprocess.check_output(command)
+        print(process_result)
+        return self._read_model(walk_directory_name)
+
+    async def train_light_async(self, entities, number_of_walks, mode, dimension):
+        """Like train_light, but the jRDF2Vec process is awaited without blocking the event loop.
+
+        Raises
+        ------
+        subprocess.CalledProcessError
+            If the jRDF2Vec process fails.
+        """
+        command, walk_directory_name = self._prepare_light(
+            entities, number_of_walks, mode, dimension
+        )
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE
+        )
+        process_result, _ = await process.communicate()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, command, output=process_result
+            )
+        print(process_result)
+        return self._read_model(walk_directory_name)
+
+    def _prepare_light(self, entities, number_of_walks, mode, dimension):
+        """
+        Creates the working directories and the entity file of a light training request.
+
+        Returns
+        -------
+            The jRDF2Vec command and the walk directory (to which the model is written).
+        """
 
         # increment the port number for the request
         current_port = self._increment_port()
@@ -51,30 +89,29 @@ class jRDF2Vec:
             print("Failed wo write file '" + entity_file_name + "'")
             print("OS error: {0}".format(e))
 
-        process_result = subprocess.check_output(
-            [
-                "java",
-                "-jar",
-                self._jrdf_2_vec_directory + "jRDF2Vec.jar",
-                "-light",
-                entity_file_name,
-                "-graph",
-                self._jrdf_2_vec_directory + "dbpedia_merged.hdt",
-                "-numberOfWalks",
-                str(number_of_walks),
-                "-trainingMode",
-                str(mode),
-                "-dimension",
-                str(dimension),
-                "-walkDir",
-                walk_directory_name,
-                "-serverResourcesDir",
-                self._jrdf_2_vec_directory,
-            ]
-        )
-
-        print(process_result)
+        command = [
+            "java",
+            "-jar",
+            self._jrdf_2_vec_directory + "jRDF2Vec.jar",
+            "-light",
+            entity_file_name,
+            "-graph",
+            self._jrdf_2_vec_directory + "dbpedia_merged.hdt",
+            "-numberOfWalks",
+            str(number_of_walks),
+            "-trainingMode",
+            str(mode),
+            "-dimension",
+            str(dimension),
+            "-walkDir",
+            walk_directory_name,
+            "-serverResourcesDir",
+            self._jrdf_2_vec_directory,
+        ]
+        return command, walk_directory_name
 
+    @staticmethod
+    def _read_model(walk_directory_name):
         result = {}
         with open(walk_directory_name + "model.txt", encoding="utf-8") as f:
             for line in f:
@@ -0,0 +1,709 @@
+"""Benchmark and load generator of the REST API.
+
+``generate`` writes a synthetic ``.kv`` file of configurable size (DBpedia-like keys, like
+``tests/data/dbpedia_sample_vectors.kv``) together with a service catalog serving it on the ``/rest/v2`` routes
+(generic service) and on the legacy ``/rest`` routes (data set "dbpedia")::
+
+    python -m kgvec2go_server.scripts.benchmark generate ./benchmark --size 100000 --dimension 200
+
+``run`` drives every ``/rest`` and ``/rest/v2`` route (except rdf2vec-light, which trains a model with the
+external jRDF2Vec jar) with a configurable concurrency; the concept labels are drawn from a Zipfian or a uniform
+distribution over the keys of the vector file. The requests are sent either to a running server (``--url``,
+e.g. started with ``KGVEC2GO_SERVICES=./benchmark/services.json``) or in-process to the ASGI application
+(``--catalog``). Throughput and latency percentiles are printed per route and written as JSON baseline; with
+``--compare`` the run fails if a route has regressed against an earlier baseline::
+
+    python -m kgvec2go_server.scripts.benchmark run ./benchmark/benchmark.kv --catalog ./benchmark/services.json \\
+        --concurrency 8 --distribution zipf --output baseline.json
+    python -m kgvec2go_server.scripts.benchmark run ./benchmark/benchmark.kv --catalog ./benchmark/services.json \\
+        --compare baseline.json --tolerance 0.2
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Union
+from urllib.parse import quote, unquote, urlsplit
+
+from gensim.models import KeyedVectors
+import numpy as np
+
+from kgvec2go_server.asgi_server import create_application
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.service_catalog import ServiceCatalog
+from kgvec2go_server.generic.vector_store import VectorStore
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+DBPEDIA_RESOURCE = "http://dbpedia.org/resource/"
+
+BENCHMARK_SERVICE = ("Benchmark", "v1", "random", "v1")
+"""Dataset, dataset version, model, and model version of the generic service of a generated catalog."""
+
+LEGACY_DATA_SET = "dbpedia"
+"""Data set of the legacy routes of a generated catalog."""
+
+DISTRIBUTIONS = ("zipf", "uniform")
+
+PERCENTILES = (50, 90, 99)
+
+Request = Tuple[str, str, bytes, Dict[str, str]]
+"""Method, path (URL encoded), body, and headers of one request."""
+
+RequestFactory = Callable[[Callable[[], str]], Request]
+"""Builds a request of a route from a function drawing a concept label."""
+
+
+def generate_vectors(
+    vector_file: str, size: int, dimension: int = 200, seed: int = 0
+) -> KeyedVectors:
+    """Writes a ``.kv`` file of random vectors with the keys ``http://dbpedia.org/resource/Concept_<i>``.
+
+    Parameters
+    ----------
+    vector_file : str
+        Path of the ``.kv`` file to be written.
+    size : int
+        Number of vectors.
+    dimension : int
+        Dimension of the vectors.
+    seed : int
+        Seed of the random vectors.
+
+    Returns
+    -------
+    KeyedVectors
+        The vectors that have been written.
+    """
+    random = np.random.default_rng(seed)
+    kv = KeyedVectors(vector_size=dimension)
+    kv.add_vectors(
+        [f"{DBPEDIA_RESOURCE}Concept_{i}" for i in range(size)],
+        random.standard_normal(size=(size, dimension), dtype=np.float32),
+    )
+    kv.save(vector_file)
+    logging.info(f"{size} vectors of dimension {dimension} written to {vector_file}.")
+    return kv
+
+
+def write_catalog(catalog_file: str, vector_file: str) -> Dict[str, Any]:
+    """Writes a service catalog (see ``ServiceCatalog.load``) serving the vector file as generic service
+    (``BENCHMARK_SERVICE``) and as legacy service (``LEGACY_DATA_SET``).
+
+    Returns
+    -------
+    Dict[str, Any]
+        The content of the catalog.
+    """
+    vector_file = os.path.relpath(
+        os.path.abspath(vector_file), os.path.dirname(os.path.abspath(catalog_file))
+    )
+    dataset, dataset_version, model, model_version = BENCHMARK_SERVICE
+    content = {
+        "services": [
+            {
+                "dataset": dataset,
+                "dataset_version": dataset_version,
+                "model": model,
+                "model_version": model_version,
+                "vector_file": vector_file,
+                "preload": True,
+            }
+        ],
+        "legacy_services": [
+            {
+                "data_set": LEGACY_DATA_SET,
+                "arguments": {"vector_file": vector_file},
+                "preload": True,
+            }
+        ],
+    }
+    with open(catalog_file, "w", encoding="utf-8") as file:
+        json.dump(content, file, indent=2)
+    return content
+
+
+def read_labels(vector_file: str) -> List[str]:
+    """The concept labels of the keys of the vector file (the local names of URIs), most frequent first."""
+    kv = KeyedVectors.load(vector_file, mmap="r")
+    return [key.rsplit("/", 1)[-1] for key in kv.index_to_key]
+
+
+class LabelSampler:
+    """Draws concept labels; "zipf": the i-th label with a probability proportional to ``1 / i^exponent`` (the
+    keys of gensim models are ordered by frequency), "uniform": all labels with the same probability.
+    Thread-safe.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[str],
+        distribution: str = "zipf",
+        exponent: float = 1.1,
+        seed: Union[None, int] = None,
+    ):
+        """
+
+        Parameters
+        ----------
+        labels : Sequence[str]
+            The labels, most frequent first.
+        distribution : str
+            One of ``DISTRIBUTIONS``.
+        exponent : float
+            Exponent of the Zipfian distribution.
+        seed : int
+            Optional; seed of the random draws.
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown distribution: {distribution}; expected one of {DISTRIBUTIONS}."
+            )
+        if len(labels) == 0:
+            raise ValueError("No labels to sample from.")
+        self.labels = labels
+        self.distribution = distribution
+        self._cumulative_probabilities = None
+        if distribution == "zipf":
+            weights = np.arange(1, len(labels) + 1, dtype=np.float64) ** -exponent
+            self._cumulative_probabilities = np.cumsum(weights) / weights.sum()
+        self._random = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> str:
+        with self._lock:
+            value = self._random.random()
+        if self._cumulative_probabilities is None:
+            index = int(value * len(self.labels))
+        else:
+            index = int(
+                np.searchsorted(self._cumulative_probabilities, value, side="right")
+            )
+        return self.labels[min(index, len(self.labels) - 1)]
+
+
+def get_request_factories(
+    service: Tuple[str, str, str, str] = BENCHMARK_SERVICE,
+    legacy_data_set: str = LEGACY_DATA_SET,
+    top_n: int = 10,
+    batch_size: int = 10,
+) -> Dict[str, RequestFactory]:
+    """The request factories of all benchmarked routes, keyed by the rule of the route (as in ``/metrics``).
+
+    Parameters
+    ----------
+    service : Tuple[str, str, str, str]
+        Dataset, dataset version, model, and model version of the ``/rest/v2`` routes.
+    legacy_data_set : str
+        Data set of the legacy ``/rest`` routes.
+    top_n : int
+        Number of closest concepts requested.
+    batch_size : int
+        Number of entries of the bodies of the POST routes.
+
+    Returns
+    -------
+    Dict[str, RequestFactory]
+    """
+    prefix = "/".join(quote(part, safe="") for part in service)
+    json_headers = {"Content-Type": json_serializer.JSON_MIMETYPE}
+
+    def get(path: str) -> Request:
+        return "GET", path, b"", {}
+
+    def post(path: str, body: Any) -> Request:
+        return "POST", path, json_serializer.dumps(body).encode("utf-8"), json_headers
+
+    def path_labels(sample: Callable[[], str], count: int) -> str:
+        return "/".join(quote(sample(), safe="") for _ in range(count))
+
+    v2 = "/rest/v2/{}/<dataset>/<dataset_version>/<model>/<model_version>"
+    return {
+        v2.format("closest-concepts")
+        + "/<int:top_n>/<concept_name>": lambda sample: get(
+            f"/rest/v2/closest-concepts/{prefix}/{top_n}/{path_labels(sample, 1)}"
+        ),
+        v2.format("addition-closest-concepts")
+        + "/<int:top_n>/<concept_name_1>/<concept_name_2>": lambda sample: get(
+            f"/rest/v2/addition-closest-concepts/{prefix}/{top_n}/{path_labels(sample, 2)}"
+        ),
+        v2.format("get-triple-score")
+        + "/<subject>/<predicate>/<object>": lambda sample: get(
+            f"/rest/v2/get-triple-score/{prefix}/{path_labels(sample, 3)}"
+        ),
+        v2.format("get-vector")
+        + "/<concept_name>": lambda sample: get(
+            f"/rest/v2/get-vector/{prefix}/{path_labels(sample, 1)}"
+        ),
+        v2.format("get-vector"): lambda sample: post(
+            f"/rest/v2/get-vector/{prefix}", [sample() for _ in range(batch_size)]
+        ),
+        v2.format("get-similarity"): lambda sample: post(
+            f"/rest/v2/get-similarity/{prefix}",
+            [[sample(), sample()] for _ in range(batch_size)],
+        ),
+        v2.format("get-triple-score"): lambda sample: post(
+            f"/rest/v2/get-triple-score/{prefix}",
+            [[sample(), sample(), sample()] for _ in range(batch_size)],
+        ),
+        v2.format("closest-concepts")
+        + "/<int:top_n>": lambda sample: post(
+            f"/rest/v2/closest-concepts/{prefix}/{top_n}",
+            [sample() for _ in range(batch_size)],
+        ),
+        v2.format("export-vectors"): lambda sample: post(
+            f"/rest/v2/export-vectors/{prefix}", [sample() for _ in range(batch_size)]
+        ),
+        "/rest/closest-concepts/<data_set>/<top_n>/<concept_name>": lambda sample: get(
+            f"/rest/closest-concepts/{legacy_data_set}/{top_n}/{path_labels(sample, 1)}"
+        ),
+        "/rest/get-vector/<data_set>/<concept_name>": lambda sample: get(
+            f"/rest/get-vector/{legacy_data_set}/{path_labels(sample, 1)}"
+        ),
+        "/rest/get-similarity/<data_set>/<concept_name_1>/<concept_name_2>": lambda sample: get(
+            f"/rest/get-similarity/{legacy_data_set}/{path_labels(sample, 2)}"
+        ),
+    }
+
+
+class HttpTransport:
+    """Sends the requests to a running server (one keep-alive connection per thread)."""
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        """
+
+        Parameters
+        ----------
+        url : str
+            Base URL of the server, e.g. "http://localhost:5001".
+        timeout : float
+            Timeout of a request in seconds.
+        """
+        parts = urlsplit(url)
+        self.connection_type = (
+            http.client.HTTPSConnection
+            if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = parts.netloc
+        self.path_prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def send(self, request: Request) -> Tuple[int, int]:
+        """Sends the request and reads the complete response.
+
+        Returns
+        -------
+        Tuple[int, int]
+            HTTP status and size of the body in bytes.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self.connection_type(self.netloc, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        method, path, body, headers = request
+        try:
+            connection.request(
+                method, self.path_prefix + path, body=body or None, headers=headers
+            )
+            response = connection.getresponse()
+            return response.status, len(response.read())
+        except (http.client.HTTPException, OSError):
+            # reconnect on the next request of this thread
+            connection.close()
+            raise
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+class AsgiTransport:
+    """Sends the requests in-process to an ASGI application, on an event loop running in its own thread (no
+    network, so only the time spent in the application is measured).
+    """
+
+    def __init__(self, application: Callable):
+        self.application = application
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    async def __call(self, request: Request) -> Tuple[int, int]:
+        method, path, body, headers = request
+        status = 500
+        size = 0
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            else:
+                size += len(message.get("body", b""))
+
+        scope = {
+            "type": "http",
+            "method": method,
+            "path": unquote(path),
+            "raw_path": path.encode("ascii"),
+            "query_string": b"",
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers.items()
+            ],
+        }
+        await self.application(scope, receive, send)
+        return status, size
+
+    def send(self, request: Request) -> Tuple[int, int]:
+        """Sends the request and reads the complete response.
+
+        Returns
+        -------
+        Tuple[int, int]
+            HTTP status and size of the body in bytes.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.__call(request), self._loop
+        ).result()
+
+    def close(self) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+def summarize(
+    latencies: Sequence[float], errors: int, seconds: float
+) -> Dict[str, Any]:
+    """Throughput and latency statistics of the requests of one route.
+
+    Parameters
+    ----------
+    latencies : Sequence[float]
+        Latency of every request in seconds.
+    errors : int
+        Number of requests that failed or were not answered with status 200.
+    seconds : float
+        Wall-clock time of all requests.
+
+    Returns
+    -------
+    Dict[str, Any]
+        ``requests``, ``errors``, ``throughput`` (requests per second), and ``latency`` (``mean``, ``p50``,
+        ``p90``, ``p99``, ``max``; in milliseconds).
+    """
+    milliseconds = np.asarray(latencies, dtype=np.float64) * 1000
+    latency = {"mean": float(milliseconds.mean())}
+    for percentile, value in zip(PERCENTILES, np.percentile(milliseconds, PERCENTILES)):
+        latency[f"p{percentile}"] = float(value)
+    latency["max"] = float(milliseconds.max())
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / seconds if seconds > 0 else float("inf"),
+        "latency": latency,
+    }
+
+
+def run_route(
+    transport: Union[HttpTransport, AsgiTransport],
+    requests_to_send: Sequence[Request],
+    concurrency: int,
+) -> Dict[str, Any]:
+    """Sends the requests with the given number of concurrent clients; see ``summarize`` for the result."""
+
+    def send(request: Request) -> Tuple[float, bool]:
+        start = time.perf_counter()
+        try:
+            status, _ = transport.send(request)
+            failed = status != 200
+        except Exception as exception:
+            logging.debug("Request %s failed: %s", request[1], exception)
+            failed = True
+        return time.perf_counter() - start, failed
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        outcomes = list(executor.map(send, requests_to_send))
+        seconds = time.perf_counter() - start
+    return summarize(
+        latencies=[latency for latency, _ in outcomes],
+        errors=sum(failed for _, failed in outcomes),
+        seconds=seconds,
+    )
+
+
+def run_benchmark(
+    transport: Union[HttpTransport, AsgiTransport],
+    sampler: LabelSampler,
+    request_factories: Dict[str, RequestFactory],
+    requests_per_route: int = 1000,
+    concurrency: int = 8,
+    warm_up: int = 10,
+) -> Dict[str, Dict[str, Any]]:
+    """Benchmarks the routes one after the other. The requests of a route are built before they are sent, so
+    drawing the labels is not measured; the first ``warm_up`` requests of a route are not measured.
+
+    Parameters
+    ----------
+    transport : Union[HttpTransport, AsgiTransport]
+        Sends the requests.
+    sampler : LabelSampler
+        Draws the concept labels of the requests.
+    request_factories : Dict[str, RequestFactory]
+        The routes, see ``get_request_factories``.
+    requests_per_route : int
+        Number of measured requests per route.
+    concurrency : int
+        Number of concurrent clients.
+    warm_up : int
+        Number of requests per route sent before the measurement.
+
+    Returns
+    -------
+    Dict[str, Dict[str, Any]]
+        Route rule to statistics, see ``summarize``.
+    """
+    results = {}
+    for route, factory in request_factories.items():
+        requests_to_send = [
+            factory(sampler.sample) for _ in range(warm_up + requests_per_route)
+        ]
+        run_route(transport, requests_to_send[:warm_up], concurrency=concurrency)
+        results[route] = run_route(
+            transport, requests_to_send[warm_up:], concurrency=concurrency
+        )
+        logging.info(
+            f"{route}: {results[route]['throughput']:.1f} requests/s, "
+            f"p50 {results[route]['latency']['p50']:.2f} ms, "
+            f"p99 {results[route]['latency']['p99']:.2f} ms, "
+            f"{results[route]['errors']} errors"
+        )
+    return results
+
+
+def create_baseline(
+    results: Dict[str, Dict[str, Any]], parameters: Dict[str, Any]
+) -> Dict[str, Any]:
+    """The machine-readable record of a run: the parameters, the environment, and the results per route."""
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": parameters,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "orjson": json_serializer.orjson is not None,
+        },
+        "routes": results,
+    }
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float = 0.1,
+) -> List[str]:
+    """Compares the results of a run to a baseline (see ``create_baseline``). A route has regressed if its
+    throughput dropped or its p50 or p99 latency rose by more than the tolerance, or if it has more errors.
+
+    Parameters
+    ----------
+    results : Dict[str, Dict[str, Any]]
+        Results of ``run_benchmark``.
+    baseline : Dict[str, Any]
+        The baseline; routes that are missing in the results or the baseline are not compared.
+    tolerance : float
+        Relative change that is tolerated, e.g. 0.1 for 10%.
+
+    Returns
+    -------
+    List[str]
+        One message per regression; empty if nothing has regressed.
+    """
+    regressions = []
+    for route, result in results.items():
+        expected = baseline.get("routes", {}).get(route)
+        if expected is None:
+            continue
+        if result["throughput"] < expected["throughput"] * (1 - tolerance):
+            regressions.append(
+                f"{route}: throughput {result['throughput']:.1f} requests/s "
+                f"(baseline {expected['throughput']:.1f})"
+            )
+        for statistic in ("p50", "p99"):
+            latency = result["latency"][statistic]
+            expected_latency = expected["latency"][statistic]
+            if latency > expected_latency * (1 + tolerance):
+                regressions.append(
+                    f"{route}: {statistic} latency {latency:.2f} ms "
+                    f"(baseline {expected_latency:.2f} ms)"
+                )
+        if result["errors"] > expected["errors"]:
+            regressions.append(
+                f"{route}: {result['errors']} errors (baseline {expected['errors']})"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark and load generator of the REST API."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser(
+        "generate", help="Write a synthetic .kv file and a service catalog serving it."
+    )
+    generate_parser.add_argument("directory", help="Output directory.")
+    generate_parser.add_argument(
+        "--size", type=int, default=100000, help="Number of vectors."
+    )
+    generate_parser.add_argument(
+        "--dimension", type=int, default=200, help="Dimension of the vectors."
+    )
+    generate_parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+
+    run_parser = subparsers.add_parser(
+        "run", help="Benchmark the routes and write the results as JSON baseline."
+    )
+    run_parser.add_argument(
+        "vector_file", help="The .kv file the concept labels are drawn from."
+    )
+    target = run_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server.")
+    target.add_argument(
+        "--catalog", help="Service catalog served in-process by the ASGI application."
+    )
+    run_parser.add_argument(
+        "--service",
+        nargs=4,
+        default=list(BENCHMARK_SERVICE),
+        metavar=("DATASET", "DATASET_VERSION", "MODEL", "MODEL_VERSION"),
+        help="Service of the /rest/v2 routes.",
+    )
+    run_parser.add_argument(
+        "--legacy-data-set",
+        default=LEGACY_DATA_SET,
+        help="Data set of the /rest routes.",
+    )
+    run_parser.add_argument(
+        "--routes",
+        nargs="*",
+        help="Only benchmark the routes whose rule contains one of these strings.",
+    )
+    run_parser.add_argument("--requests", type=int, default=1000)
+    run_parser.add_argument("--warm-up", type=int, default=10)
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--distribution", choices=DISTRIBUTIONS, default="zipf")
+    run_parser.add_argument("--exponent", type=float, default=1.1)
+    run_parser.add_argument("--top-n", type=int, default=10)
+    run_parser.add_argument("--batch-size", type=int, default=10)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="Path of the JSON baseline to write.")
+    run_parser.add_argument(
+        "--compare", help="Baseline to compare to; exits with 1 on a regression."
+    )
+    run_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Tolerated relative change (default: 0.1).",
+    )
+
+    arguments = parser.parse_args()
+    if arguments.command == "generate":
+        os.makedirs(arguments.directory, exist_ok=True)
+        vector_file = os.path.join(arguments.directory, "benchmark.kv")
+        generate_vectors(
+            vector_file=vector_file,
+            size=arguments.size,
+            dimension=arguments.dimension,
+            seed=arguments.seed,
+        )
+        write_catalog(
+            catalog_file=os.path.join(arguments.directory, "services.json"),
+            vector_file=vector_file,
+        )
+        return
+
+    request_factories = get_request_factories(
+        service=tuple(arguments.service),
+        legacy_data_set=arguments.legacy_data_set,
+        top_n=arguments.top_n,
+        batch_size=arguments.batch_size,
+    )
+    if arguments.routes:
+        request_factories = {
+            route: factory
+            for route, factory in request_factories.items()
+            if any(part in route for part in arguments.routes)
+        }
+    sampler = LabelSampler(
+        labels=read_labels(arguments.vector_file),
+        distribution=arguments.distribution,
+        exponent=arguments.exponent,
+        seed=arguments.seed,
+    )
+    if arguments.url is not None:
+        transport = HttpTransport(url=arguments.url)
+    else:
+        # private vector store: no shared memory segments are left behind
+        service_catalog = ServiceCatalog.load(
+            arguments.catalog, vector_store=VectorStore(use_shared_memory=False)
+        )
+        transport = AsgiTransport(create_application(service_catalog=service_catalog))
+    try:
+        results = run_benchmark(
+            transport=transport,
+            sampler=sampler,
+            request_factories=request_factories,
+            requests_per_route=arguments.requests,
+            concurrency=arguments.concurrency,
+            warm_up=arguments.warm_up,
+        )
+    finally:
+        transport.close()
+    parameters = {
+        name: value
+        for name, value in vars(arguments).items()
+        if name not in ("command", "output", "compare", "tolerance")
+    }
+    baseline = create_baseline(results=results, parameters=parameters)
+    print(json.dumps(baseline, indent=2))
+    if arguments.output is not None:
+        with open(arguments.output, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2)
+    if arguments.compare is not None:
+        with open(arguments.compare, encoding="utf-8") as file:
+            regressions = compare_to_baseline(
+                results=results, baseline=json.load(file), tolerance=arguments.tolerance
+            )
+        for regression in regressions:
+            logging.error(f"Regression: {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
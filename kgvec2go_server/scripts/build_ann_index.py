@@ -0,0 +1,68 @@
+import argparse
+import logging
+import sys
+
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.ann_index import IvfIndex
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+
+def build_ann_index(
+    vector_file: str,
+    number_of_lists: int = None,
+    iterations: int = 10,
+    sample_size: int = 100000,
+) -> IvfIndex:
+    """Builds an IVF index for the given vector file and writes it next to the vector file.
+
+    Parameters
+    ----------
+    vector_file : str
+        Path to the gensim ``.kv`` file.
+    number_of_lists : int
+        Number of inverted lists. Default: square root of the vocabulary size.
+    iterations : int
+        Number of k-means iterations.
+    sample_size : int
+        Number of vectors used to train the centroids.
+
+    Returns
+    -------
+    IvfIndex
+        The index that has been written.
+    """
+    kv = KeyedVectors.load(vector_file, mmap="r")
+    logging.info(f"Loaded {len(kv.index_to_key)} vectors from {vector_file}.")
+    index = IvfIndex.build(
+        engine=BatchSimilarityEngine(vectors=kv.vectors),
+        number_of_lists=number_of_lists,
+        iterations=iterations,
+        sample_size=sample_size,
+    )
+    index.save(vector_file)
+    logging.info(f"Index with {index.number_of_lists} lists written.")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build an approximate nearest neighbour (IVF) index for a .kv file."
+    )
+    parser.add_argument("vector_file", help="Path to the gensim .kv file.")
+    parser.add_argument("--lists", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--sample-size", type=int, default=100000)
+    arguments = parser.parse_args()
+    build_ann_index(
+        vector_file=arguments.vector_file,
+        number_of_lists=arguments.lists,
+        iterations=arguments.iterations,
+        sample_size=arguments.sample_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import logging
+import sys
+from typing import Dict
+
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.linker_index import LinkerIndex
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+
+def read_redirects(path_to_redirects: str) -> Dict[str, str]:
+    """Reads an N-Triples redirect file (e.g. DBpedia's redirects_en.ttl).
+
+    Parameters
+    ----------
+    path_to_redirects : str
+        Path to the redirect file.
+
+    Returns
+    -------
+    A map from redirect source URI -> redirect target URI.
+    """
+    result = {}
+    with open(path_to_redirects, "r", encoding="utf-8") as redirects_file:
+        for line in redirects_file:
+            if line.startswith("#") or line.strip() == "":
+                continue
+            token = line.split(sep=" ")
+            result[token[0].strip("<>")] = token[2].strip("<>")
+    return result
+
+
+def build_linker_index(vector_file: str, redirect_file: str = "") -> LinkerIndex:
+    """Builds the linker index for the given vector file and writes it next to the vector file.
+
+    Parameters
+    ----------
+    vector_file : str
+        Path to the gensim ``.kv`` file.
+    redirect_file : str
+        Optional path to a redirect file.
+
+    Returns
+    -------
+    LinkerIndex
+        The index that has been written.
+    """
+    kv = KeyedVectors.load(vector_file, mmap="r")
+    redirects = None if redirect_file == "" else read_redirects(redirect_file)
+    index = LinkerIndex.build(keys=kv.index_to_key, redirects=redirects)
+    index.save(vector_file)
+    logging.info(f"Linker index with {len(index)} surface forms written.")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the linker index (surface form -> vocabulary index) for a .kv file."
+    )
+    parser.add_argument("vector_file", help="Path to the gensim .kv file.")
+    parser.add_argument("--redirects", default="", help="Optional redirect file.")
+    arguments = parser.parse_args()
+    build_linker_index(
+        vector_file=arguments.vector_file, redirect_file=arguments.redirects
+    )
+
+
+if __name__ == "__main__":
+    main()
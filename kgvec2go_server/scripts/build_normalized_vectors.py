@@ -0,0 +1,49 @@
+import argparse
+import logging
+import sys
+
+from kgvec2go_server.generic.term_snapshot import Snapshot
+from kgvec2go_server.generic.vector_store import VectorStore
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+
+def build_normalized_vectors(vector_file: str, chunk_size: int = 65536) -> Snapshot:
+    """Writes the float32 row-normalized matrix and the norms of the given vector file next to the file. The query
+    services memory-map both at startup (see ``VectorStore.load_vectors``).
+
+    Parameters
+    ----------
+    vector_file : str
+        Path to the gensim ``.kv`` file.
+    chunk_size : int
+        Number of rows normalized at once.
+
+    Returns
+    -------
+    Snapshot
+        The snapshot that has been written.
+    """
+    snapshot = VectorStore.write_normalized_vectors(vector_file, chunk_size=chunk_size)
+    logging.info(
+        f"Normalized vectors of shape {snapshot.arrays['normalized'].shape} written."
+    )
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Persist the L2-normalized vectors and the norms of a gensim vector file."
+    )
+    parser.add_argument("vector_file", help="Path to the gensim .kv file.")
+    parser.add_argument(
+        "--chunk-size", type=int, default=65536, help="Rows normalized at once."
+    )
+    arguments = parser.parse_args()
+    build_normalized_vectors(
+        vector_file=arguments.vector_file, chunk_size=arguments.chunk_size
+    )
+
+
+if __name__ == "__main__":
+    main()
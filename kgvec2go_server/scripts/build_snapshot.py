@@ -0,0 +1,86 @@
+import argparse
+import logging
+import sys
+
+from kgvec2go_server.alod.alod_query_service import AlodQueryService
+from kgvec2go_server.babelnet.babelnet_query_service import BabelNetQueryService
+from kgvec2go_server.dbnary.dbnary_query_service import DbnaryQueryService
+from kgvec2go_server.dbpedia.dbpedia_query_service import DBpediaQueryService
+from kgvec2go_server.generic.term_snapshot import Snapshot
+from kgvec2go_server.wordnet.wordnet_query_service import WordnetQueryService
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+SERVICES = ("alod", "babelnet", "dbnary", "dbpedia", "wordnet")
+
+
+def build_snapshot(
+    service: str, vector_file: str, entity_file: str = "", redirect_file: str = ""
+) -> Snapshot:
+    """Builds the startup snapshot of a query service from its text files and writes it next to the vector file.
+
+    Parameters
+    ----------
+    service : str
+        One of ``SERVICES``.
+    vector_file : str
+        Path to the gensim ``.kv`` file the service loads.
+    entity_file : str
+        Entity (lemma) file; required for babelnet, dbnary and wordnet.
+    redirect_file : str
+        Optional redirect file (dbpedia only).
+
+    Returns
+    -------
+    Snapshot
+        The snapshot that has been written.
+    """
+    if service == "alod":
+        query_service = AlodQueryService(vector_file=vector_file, use_snapshot=False)
+    elif service == "babelnet":
+        query_service = BabelNetQueryService(
+            entity_file=entity_file, vector_file=vector_file, use_snapshot=False
+        )
+    elif service == "dbnary":
+        query_service = DbnaryQueryService(
+            entity_file=entity_file, vector_file=vector_file, use_snapshot=False
+        )
+    elif service == "dbpedia":
+        query_service = DBpediaQueryService(
+            vector_file=vector_file, redirect_file=redirect_file, use_snapshot=False
+        )
+    elif service == "wordnet":
+        query_service = WordnetQueryService(
+            entity_file=entity_file, vector_file=vector_file, use_snapshot=False
+        )
+    else:
+        raise ValueError(f"Unknown service: {service}; expected one of {SERVICES}.")
+    snapshot = query_service.to_snapshot()
+    snapshot.save(vector_file, name=query_service.SNAPSHOT_NAME)
+    logging.info(
+        f"Snapshot '{query_service.SNAPSHOT_NAME}' with {len(snapshot.arrays)} arrays written."
+    )
+    return snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the startup snapshot (term mappings, lemma subsets, sense indices) of a query service."
+    )
+    parser.add_argument("service", choices=SERVICES, help="The query service.")
+    parser.add_argument("vector_file", help="Path to the gensim .kv file.")
+    parser.add_argument("--entities", default="", help="Entity (lemma) file.")
+    parser.add_argument(
+        "--redirects", default="", help="Optional redirect file (dbpedia)."
+    )
+    arguments = parser.parse_args()
+    build_snapshot(
+        service=arguments.service,
+        vector_file=arguments.vector_file,
+        entity_file=arguments.entities,
+        redirect_file=arguments.redirects,
+    )
+
+
+if __name__ == "__main__":
+    main()
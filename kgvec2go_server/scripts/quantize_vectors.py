@@ -0,0 +1,66 @@
+import argparse
+import logging
+import sys
+
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.quantized_vectors import (
+    QUANTIZATION_DTYPES,
+    QuantizedMatrix,
+)
+
+logging.basicConfig(stream=sys.stderr, level=logging.INFO)
+
+
+def quantize_vectors(
+    vector_file: str, dtype: str = "int8", chunk_size: int = 65536
+) -> QuantizedMatrix:
+    """Writes a float16 or int8 (per-row scale) copy of the normalized vectors of the given vector file next to
+    the file. Services that find it scan it for closest concept candidates and rescore them on the float32
+    vectors.
+
+    Parameters
+    ----------
+    vector_file : str
+        Path to the gensim ``.kv`` file.
+    dtype : str
+        One of ``QUANTIZATION_DTYPES``.
+    chunk_size : int
+        Number of rows quantized at once.
+
+    Returns
+    -------
+    QuantizedMatrix
+        The matrix that has been written.
+    """
+    kv = KeyedVectors.load(vector_file, mmap="r")
+    logging.info(f"Loaded {len(kv.index_to_key)} vectors from {vector_file}.")
+    quantized = QuantizedMatrix.quantize(
+        vectors=kv.vectors, dtype=dtype, chunk_size=chunk_size
+    )
+    quantized.save(vector_file)
+    logging.info(
+        f"{dtype} matrix written ({quantized.codes.nbytes} bytes instead of {kv.vectors.nbytes} bytes)."
+    )
+    return quantized
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a quantized (float16 or int8) copy of the normalized vectors of a .kv file."
+    )
+    parser.add_argument("vector_file", help="Path to the gensim .kv file.")
+    parser.add_argument("--dtype", choices=QUANTIZATION_DTYPES, default="int8")
+    parser.add_argument(
+        "--chunk-size", type=int, default=65536, help="Rows quantized at once."
+    )
+    arguments = parser.parse_args()
+    quantize_vectors(
+        vector_file=arguments.vector_file,
+        dtype=arguments.dtype,
+        chunk_size=arguments.chunk_size,
+    )
+
+
+if __name__ == "__main__":
+    main()
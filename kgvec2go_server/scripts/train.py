@@ -6,6 +6,8 @@ import gzip
 import numpy as np
 from gensim.models import KeyedVectors
 
+from kgvec2go_server.generic.vector_store import VectorStore
+
 logging.basicConfig(
     format="%(asctime)s : %(levelname)s : %(message)s",
     filename="word2vec_log.out",
@@ -18,7 +20,9 @@ def save_vector_file(path_to_model, path_to_vector_file):
     model = gensim.models.Word2Vec.load(path_to_model)
     print("Model parsed. Writing vector file: " + path_to_vector_file)
     model.wv.save(path_to_vector_file)
-    print("Vector file written.")
+    print("Vector file written. Writing normalized vectors.")
+    VectorStore.write_normalized_vectors(path_to_vector_file, kv=model.wv)
+    print("Normalized vectors written.")
 
 
 def shrink_vectors(vectors, path_to_concept_file, file_to_write):
@@ -2,6 +2,8 @@ import gensim
 import numpy as np
 from gensim.models import KeyedVectors
 
+from kgvec2go_server.generic.vector_store import VectorStore
+
 
 def shrink_vectors_new(vectors, path_to_concept_file, file_to_write):
     concepts_to_be_kept = read_concept_file(path_to_concept_file)
@@ -33,6 +35,7 @@ def shrink_vectors_new(vectors, path_to_concept_file, file_to_write):
     vectors.index2word = np.array(new_index2entity)
     vectors.vectors_norm = np.array(new_vectors_norm)
     vectors.save(file_to_write)
+    VectorStore.write_normalized_vectors(file_to_write, kv=vectors)
     return vectors
 
 
@@ -107,7 +110,9 @@ def save_vector_file(path_to_model, path_to_vector_file):
     model = gensim.models.Word2Vec.load(path_to_model)
     print("Model parsed. Writing vector file: " + path_to_vector_file)
     model.wv.save(path_to_vector_file)
-    print("Vector file written.")
+    print("Vector file written. Writing normalized vectors.")
+    VectorStore.write_normalized_vectors(path_to_vector_file, kv=model.wv)
+    print("Normalized vectors written.")
 
 
 def main():
@@ -1,22 +1,112 @@
 import gensim
+import logging
 import re
-from collections import namedtuple
 from gensim.models import KeyedVectors
+import numpy as np
+from numpy import ndarray
+from typing import List, Union, Tuple
+
+from kgvec2go_server.generic import json_serializer
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.result_cache import ResultCache, RankedResultMemo
+from kgvec2go_server.generic.sense_index import SenseIndex
+from kgvec2go_server.generic.similarity_engine import normalize_rows
+from kgvec2go_server.generic.term_snapshot import Snapshot, TermTable
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class WordnetQueryService:
+    POS_TAGS = ("j", "v", "n", "r", "a")
+    SNAPSHOT_NAME = "wordnet"
+
     def __init__(
-        self, entity_file, model_file="", vector_file="", is_reduced_vector_file=False
+        self,
+        entity_file,
+        model_file="",
+        vector_file="",
+        is_reduced_vector_file=False,
+        cache: Union[None, ResultCache] = None,
+        use_snapshot: bool = True,
+        vector_store: Union[None, VectorStore] = None,
+        batch_window: Union[None, float] = None,
     ):
+        """
+
+        Parameters
+        ----------
+        entity_file
+            File to the lemmas. Not read if a snapshot is loaded.
+        model_file
+            The model file. If used, the vector_file is not required.
+        vector_file
+            The vector file. If used, the model_file is not required.
+        is_reduced_vector_file
+            True if unnecessary have already been removed from the vector space (using vector_shrinker.py).
+        cache
+            Optional result cache (may be shared with other services). Default: a new in-process cache.
+        use_snapshot
+            If True and a valid snapshot of the vector file exists (see scripts/build_snapshot.py), the term
+            mapping, the sense index and the lemma subset are loaded from the snapshot.
+        vector_store
+            Store through which the vectors are loaded and the normalized matrices are shared between the
+            processes of the host. Default: the store of the process.
+        batch_window
+            If given, concurrent closest lemma queries are gathered for up to batch_window seconds and answered
+            with one search (see ``MicroBatchScheduler``).
+        """
+        vector_store = (
+            VectorStore.get_default() if vector_store is None else vector_store
+        )
         if vector_file == "":
             self.model = gensim.models.Word2Vec.load(model_file)
             self.vectors = self.model.wv
         else:
-            self.vectors = KeyedVectors.load(vector_file, mmap="r")
-        self.all_lemmas = self.__read_lemmas(entity_file)
-        self.term_mapping = self.__map_terms(self.all_lemmas)
+            self.vectors = vector_store.load_vectors(vector_file)
+
+        snapshot = None
+        if use_snapshot and vector_file != "":
+            snapshot = Snapshot.load(vector_file, name=self.SNAPSHOT_NAME)
+        if snapshot is None:
+            self.all_lemmas = self.__read_lemmas(entity_file)
+            self.term_mapping = self.__map_terms(self.all_lemmas)
+            self.sense_index = SenseIndex.build(
+                term_mapping=self.term_mapping,
+                key_to_index=self.vectors.key_to_index,
+                pos_tags=self.POS_TAGS,
+                get_pos=self.__get_pos,
+            )
+            # row i of the lemma matrix belongs to all_lemmas[i]
+            self.lemma_indices = np.array(
+                [self.vectors.key_to_index[lemma] for lemma in self.all_lemmas],
+                dtype=np.int64,
+            )
+        else:
+            self.__load_snapshot(snapshot)
+
+        # normalized matrix of the lemma subset
+        self.lemma_engine = vector_store.get_engine(
+            path=model_file if vector_file == "" else vector_file,
+            vectors=self.vectors.vectors,
+            indices=self.lemma_indices,
+        )
         self.is_reduced_vector_file = is_reduced_vector_file
-        self.closest_concepts_cache = {}
+        # the cache may be shared with other services: the namespace includes the file, its version and the
+        # lemma subset
+        self.closest_concepts_memo = RankedResultMemo(
+            cache=ResultCache() if cache is None else cache,
+            namespace=(
+                str(self),
+                *VectorStore.get_file_namespace(
+                    model_file if vector_file == "" else vector_file,
+                    indices=self.lemma_indices,
+                ),
+            ),
+        )
+        self.batch_scheduler: Union[None, MicroBatchScheduler] = None
+        if batch_window is not None:
+            self.batch_scheduler = MicroBatchScheduler(
+                search=self.__search_closest_lemmas, window=batch_window
+            )
 
     @staticmethod
     def transform_string(string_to_be_transformed):
@@ -51,6 +141,50 @@ class WordnetQueryService:
                 result[lookup_key] = [uri]
         return result
 
+    def to_snapshot(self) -> Snapshot:
+        """Snapshot of the structures derived from the entity file (see ``Snapshot``)."""
+        term_table = TermTable.build(
+            term_mapping=self.term_mapping,
+            key_to_index=self.vectors.key_to_index,
+            index_to_key=self.vectors.index_to_key,
+            multi_valued=True,
+        )
+        # the rows of the sense index are the rows of the term table
+        sense_index = SenseIndex.build(
+            term_mapping={
+                lookup_key: uris
+                for lookup_key, uris in self.term_mapping.items()
+                if lookup_key in term_table
+            },
+            key_to_index=self.vectors.key_to_index,
+            pos_tags=self.POS_TAGS,
+            get_pos=self.__get_pos,
+        )
+        return Snapshot(
+            arrays={
+                **term_table.to_arrays("term_mapping"),
+                "senses": sense_index.senses,
+                "lemma_indices": self.lemma_indices,
+            },
+            metadata={"pos_tags": list(self.POS_TAGS)},
+        )
+
+    def __load_snapshot(self, snapshot: Snapshot):
+        self.term_mapping = TermTable.from_arrays(
+            snapshot.arrays,
+            prefix="term_mapping",
+            index_to_key=self.vectors.index_to_key,
+            multi_valued=True,
+        )
+        self.sense_index = SenseIndex(
+            row_of_key=self.term_mapping.keys,
+            pos_tags=tuple(snapshot.metadata["pos_tags"]),
+            senses=snapshot.arrays["senses"],
+        )
+        self.lemma_indices = snapshot.arrays["lemma_indices"]
+        self.all_lemmas = [self.vectors.index_to_key[i] for i in self.lemma_indices]
+        logging.info("WordNet snapshot loaded.")
+
     def __read_lemmas(self, path_to_lemma_file):
         result = []
         number_of_vocab_errors = 0
@@ -67,42 +201,71 @@ class WordnetQueryService:
         return result
 
     def find_closest_lemmas_given_key(self, key, top):
-        if key not in self.model.wv.key_to_index:
+        if key not in self.vectors.key_to_index:
             return None
-        result = '{\n"result": [\n'
         if self.is_reduced_vector_file:
             result_list = self.vectors.most_similar(positive=key, topn=top)
-        else:
-            ResultEntry = namedtuple("ResultEntry", "concept similarity")
-            result_list = []
-            for concept in self.all_lemmas:
-                result_list.append(
-                    ResultEntry(concept, self.vectors.similarity(key, concept))
-                )
-            result_list.sort(key=self.__take_second, reverse=True)
-            result_list = result_list[: int(top)]
-
-        is_first = True
-        for entry in result_list:
-            if is_first:
-                is_first = False
-                result += (
-                    '{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-            else:
-                result += (
-                    ',\n{ "concept":"'
-                    + str(entry[0])
-                    + '", "score":'
-                    + str(entry[1])
-                    + "}"
-                )
-        result += "\n]\n}"
-        return result
+            return self.__closest_concepts_to_json(
+                indices=np.array(
+                    [self.vectors.key_to_index[entry[0]] for entry in result_list],
+                    dtype=np.int64,
+                ),
+                scores=np.array([entry[1] for entry in result_list], dtype=np.float32),
+            )
+
+        positions, scores = self.lemma_engine.top_k(
+            query_vectors=self.vectors.get_vector(key), topn=int(top)
+        )
+        return self.__closest_concepts_to_json(
+            indices=self.lemma_indices[positions[0]], scores=scores[0]
+        )
+
+    def __closest_concepts_to_json(self, indices: ndarray, scores: ndarray) -> str:
+        return json_serializer.closest_concepts_to_json(
+            keys=self.vectors.index_to_key, indices=indices, scores=scores
+        )
+
+    def __rank_closest_lemmas(
+        self, lookup_key: str, topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        """Rank all lemmas by their mean similarity to the senses of the lookup key.
+
+        Parameters
+        ----------
+        lookup_key : str
+            Transformed lemma (key of the term mapping).
+        topn : int
+            Number of lemmas to be returned.
+
+        Returns
+        -------
+        Tuple[ndarray, ndarray]
+            Vocabulary indices and scores, ordered by descending score.
+        """
+        if self.batch_scheduler is not None:
+            # coalesced with the concurrent requests of other threads
+            return self.batch_scheduler.submit(concept=lookup_key, topn=topn)
+        indices, scores = self.__search_closest_lemmas([lookup_key], topn)
+        return indices[0], scores[0]
+
+    def __search_closest_lemmas(
+        self, lookup_keys: List[str], topn: int
+    ) -> Tuple[ndarray, ndarray]:
+        # mean over senses of cos(sense, lemma) == (mean of the unit sense vectors) . unit lemma vector
+        queries = np.empty(
+            (len(lookup_keys), self.vectors.vector_size), dtype=np.float32
+        )
+        for row, lookup_key in enumerate(lookup_keys):
+            sense_indices = [
+                self.vectors.key_to_index[uri] for uri in self.term_mapping[lookup_key]
+            ]
+            queries[row] = normalize_rows(self.vectors.vectors[sense_indices]).mean(
+                axis=0
+            )
+        positions, scores = self.lemma_engine.top_k(query_vectors=queries, topn=topn)
+        # top_k normalizes the queries; the norm of a mean restores the mean similarity over the senses
+        scores *= np.linalg.norm(queries, axis=1, keepdims=True)
+        return self.lemma_indices[positions], scores
 
     def find_closest_lemmas(self, lemma, top):
         """The wordnet data set is structured according to word function (noun, verb etc.). Here, the results are
@@ -121,108 +284,33 @@ class WordnetQueryService:
         str
             Result list in JSON."""
 
-        print("Query for " + lemma + " received.")
+        logging.debug("Query for %s received.", lemma)
         lookup_key = self.transform_string(lemma)
 
-        if lookup_key in self.closest_concepts_cache:
-            print("Serve answer from cache.")
-            return self.closest_concepts_cache[lookup_key]
+        if lookup_key not in self.term_mapping:
+            return json_serializer.EMPTY_RESULT
 
-        if lookup_key in self.term_mapping:
-            result_list = []
-            for concept in self.all_lemmas:
-                # old
-                # temp_result_list = []
-                # for uri in self.term_mapping[lookup_key]:
-                #    temp_result_list.append((concept, self.vectors.similarity(uri, concept)))
-                ## only add the top value
-                # temp_result_list.sort(key=self.__take_second, reverse=True)
-                # result_list.append(temp_result_list[0])
-
-                # new
-                similarity = 0
-                for uri in self.term_mapping[lookup_key]:
-                    similarity += self.vectors.similarity(uri, concept)
-                result_list.append(
-                    (concept, similarity / len(self.term_mapping[lookup_key]))
-                )
-
-            result_list.sort(key=self.__take_second, reverse=True)
-
-            # output
-            result_list = result_list[: int(top)]
-            result = '{\n"result": [\n'
-            is_first = True
-            for entry in result_list:
-                if is_first:
-                    is_first = False
-                    result += (
-                        '{ "concept":"'
-                        + str(entry[0])
-                        + '", "score":'
-                        + str(entry[1])
-                        + "}"
-                    )
-                else:
-                    result += (
-                        ',\n{ "concept":"'
-                        + str(entry[0])
-                        + '", "score":'
-                        + str(entry[1])
-                        + "}"
-                    )
-            result += "\n]\n}"
-            self.closest_concepts_cache[lookup_key] = result
-            return result
-        else:
-            result = "{}"
-            self.closest_concepts_cache[lookup_key] = result
-            return result
-
-    def __take_second(self, element):
-        """For sorting."""
-        return element[1]
+        indices, scores = self.closest_concepts_memo.get_or_compute(
+            concept=lookup_key,
+            topn=int(top),
+            compute=lambda topn: self.__rank_closest_lemmas(
+                lookup_key=lookup_key, topn=topn
+            ),
+        )
+        return self.__closest_concepts_to_json(indices=indices, scores=scores)
 
     def get_vector(self, lemma: str) -> str:
         lookup_key = self.transform_string(lemma)
-        result = '{ "result": ['
-        is_first = True
         if lookup_key in self.term_mapping:
-            for key in self.term_mapping[lookup_key]:
-                vector = self.vectors.get_vector(key)
-                if is_first:
-                    is_first = False
-                    result += (
-                        '{"uri": '
-                        + '"'
-                        + key
-                        + '",\n"vector": '
-                        + self.__to_json_arry(vector)
-                        + "}"
-                    )
-                else:
-                    result += (
-                        ',\n{"uri": '
-                        + '"'
-                        + key
-                        + '",\n"vector": '
-                        + self.__to_json_arry(vector)
-                        + "}"
-                    )
-            return result + "] }"
+            uris = self.term_mapping[lookup_key]
+            return json_serializer.vectors_to_json(
+                uris=uris,
+                matrix=self.vectors.vectors[
+                    [self.vectors.key_to_index[uri] for uri in uris]
+                ],
+            )
         else:
-            return "{}"
-
-    def __to_json_arry(self, vector):
-        result = ""
-        is_first = True
-        for element in vector:
-            if is_first:
-                is_first = False
-                result += "[" + str(element)
-            else:
-                result += "," + str(element)
-        return result + "]"
+            return json_serializer.EMPTY_RESULT
 
     def get_similarity(self, concept_1, concept_2, pos_1="N", pos_2="N"):
         """Calculate the similarity between the two given concepts.
@@ -244,40 +332,44 @@ class WordnetQueryService:
         lookup_key_2 = self.transform_string(concept_2)
         if lookup_key_1 in self.term_mapping and lookup_key_2 in self.term_mapping:
             # always pick the noun if there are multiple matches
-            vector_1 = self.__pick_pos_vector(
-                self.term_mapping[lookup_key_1], pos=pos_1
-            )
-            vector_2 = self.__pick_pos_vector(
-                self.term_mapping[lookup_key_2], pos=pos_2
+            index_1 = self.__pick_pos_index(lookup_key_1, pos=pos_1)
+            index_2 = self.__pick_pos_index(lookup_key_2, pos=pos_2)
+            return self.vectors.similarity(
+                self.vectors.index_to_key[index_1], self.vectors.index_to_key[index_2]
             )
-            return self.vectors.similarity(vector_1, vector_2)
         else:
             return None
 
-    def __pick_pos_vector(self, vectors, pos="n"):
-        """Pick the vector out of the set of given vectors. If no vector from the given POS can be found, the first
-        vector of the given set of vectors is returned.
+    def __pick_pos_index(self, lookup_key: str, pos="n") -> int:
+        """Pick the vocabulary index of the sense of the given POS. If no sense of the given POS can be found, the
+        first sense of the lookup key is returned.
 
          Parameters
          ----------
-         vectors : list
-             The set of vectors.
+         lookup_key : str
+             Transformed lemma (key of the term mapping).
          pos : basestring
-             Default: Noun (n). The vector to be preferred.
+             Default: Noun (n). The POS to be preferred.
 
           Returns
           -------
-          list
-             The resulting vector.
+          int
+             The vocabulary index of the sense.
         """
         pos = pos.lower()
-        if pos not in ["j", "v", "n", "r", "a"]:
-            print("POS not in [j,v,n,r,a] (given: " + pos + "). Using fall-back: n.")
+        if pos not in self.sense_index.column_of_pos:
+            logging.debug(
+                "POS not in [j,v,n,r,a] (given: %s). Using fall-back: n.", pos
+            )
             pos = "n"
-        for vector in vectors:
-            if vector.endswith("-" + pos):
-                return vector
-        return vectors[0]
+        return self.sense_index.lookup(lookup_key, pos=pos)
+
+    @staticmethod
+    def __get_pos(sense: str) -> Union[None, str]:
+        """POS of a sense URI, e.g. 'n' for 'wn-lemma:sleep#sleep-n'."""
+        if len(sense) > 1 and sense[-2] == "-":
+            return sense[-1]
+        return None
 
     def get_similarity_json(self, concept_1, concept_2):
         """Calculate the similarity between the two given concepts.
@@ -295,11 +387,7 @@ class WordnetQueryService:
         float
             Similarity as JSON.
         """
-        similarity = self.get_similarity(concept_1, concept_2)
-        if similarity is None:
-            return "{}"
-        else:
-            return '{ "result" : ' + str(similarity) + " }"
+        return json_serializer.result_to_json(self.get_similarity(concept_1, concept_2))
 
     def __str__(self):
         return "WordNet Query Service"
@@ -0,0 +1,10 @@
+import pytest
+
+from kgvec2go_server.generic.vector_store import VectorStore
+
+
+@pytest.fixture(autouse=True, scope="session")
+def unlink_shared_memory():
+    """Removes the shared memory segments the services of the test session have created."""
+    yield
+    VectorStore.get_default().unlink()
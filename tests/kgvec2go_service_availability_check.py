@@ -90,8 +90,8 @@ class ServiceAvailabilityCheck:
         print("\n")
 
     def _check_single_cosest_concepts_request(self, url):
-        result = requests.get(url)
-        if '"result": [' in result.text and '"concept":' in result.text:
+        result = self._get_json(url)
+        if isinstance(result, dict) and "concept" in (result.get("result") or [{}])[0]:
             print(self.success_sign + url)
         else:
             print(self.failure_sign + url)
@@ -104,8 +104,8 @@ class ServiceAvailabilityCheck:
         url : str
             URL to be checked.
         """
-        result = requests.get(url)
-        if '"result" :' in result.text:
+        result = self._get_json(url)
+        if isinstance(result, dict) and "result" in result:
             print(self.success_sign + url)
         else:
             print(self.failure_sign + url)
@@ -119,12 +119,20 @@ class ServiceAvailabilityCheck:
             URL to be checked.
         """
 
-        result = requests.get(url)
-        if '"vector": [' in str(result.content):
+        result = self._get_json(url)
+        if isinstance(result, dict) and "vector" in result:
             print(self.success_sign + url)
         else:
             print(self.failure_sign + url)
 
+    @staticmethod
+    def _get_json(url):
+        """Parsed JSON response of the given URL; None if the response is not valid JSON."""
+        try:
+            return requests.get(url).json()
+        except ValueError:
+            return None
+
     def _check_single_page(self, url):
         """Checks the HTTP status code of the given URL. Prints a success or error message to the console.
 
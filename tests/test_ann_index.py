@@ -0,0 +1,75 @@
+import numpy as np
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.ann_index import ExactIndex, IvfIndex
+from kgvec2go_server.generic.service_catalog import ServiceConfiguration
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+from kgvec2go_server.generic.vector_store import VectorStore
+
+
+def test_ivf_index_full_probe_is_exact():
+    random = np.random.default_rng(1)
+    engine = BatchSimilarityEngine(vectors=random.normal(size=(200, 16)))
+    ivf = IvfIndex.build(engine=engine, number_of_lists=10, iterations=3)
+    assert ivf.offsets[-1] == 200
+
+    queries = random.normal(size=(5, 16))
+    expected_indices, _ = ExactIndex(engine=engine).search(queries, topn=7)
+    indices, _ = ivf.search(queries, topn=7, n_probe=10)
+    assert indices.tolist() == expected_indices.tolist()
+
+    # a single probe still returns topn results (falls back to an exact scan if required)
+    indices, _ = ivf.search(queries, topn=7, n_probe=1)
+    assert indices.shape == (5, 7)
+    assert (indices >= 0).all()
+
+
+def test_ivf_index_exclude_and_exact():
+    random = np.random.default_rng(2)
+    engine = BatchSimilarityEngine(vectors=random.normal(size=(50, 8)))
+    ivf = IvfIndex.build(engine=engine, number_of_lists=5, n_probe=5)
+    indices, _ = ivf.search(engine.normalized_vectors[[3]], topn=3, exclude_indices=[3])
+    assert 3 not in indices[0]
+    exact_indices, _ = ivf.search(
+        engine.normalized_vectors[[3]], topn=3, exclude_indices=[3], exact=True
+    )
+    assert indices.tolist() == exact_indices.tolist()
+
+
+def test_save_and_load(tmp_path):
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv", mmap="r")
+    kv_path = str(tmp_path / "vectors.kv")
+    kv.save(kv_path)
+    engine = BatchSimilarityEngine(vectors=kv.vectors)
+    IvfIndex.build(engine=engine, number_of_lists=4).save(kv_path)
+    loaded = IvfIndex.load(kv_path, engine=engine, n_probe=4)
+    assert isinstance(loaded.members, np.memmap)
+    assert loaded.number_of_lists == 4
+    indices, _ = loaded.search(engine.normalized_vectors[[0]], topn=5)
+    expected, _ = engine.top_k(engine.normalized_vectors[[0]], topn=5)
+    assert indices.tolist() == expected.tolist()
+
+
+def test_stale_index_is_rejected(tmp_path):
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv")
+    kv_path = str(tmp_path / "vectors.kv")
+    kv.save(kv_path)
+    engine = BatchSimilarityEngine(vectors=kv.vectors)
+    IvfIndex.build(engine=engine, number_of_lists=4).save(kv_path)
+
+    # the .kv file is replaced (e.g. by a retrained model) but the index is not rebuilt
+    kv.add_vectors(["http://dbpedia.org/resource/New"], np.ones((1, kv.vector_size)))
+    kv.save(kv_path)
+    assert IvfIndex.load(kv_path, engine=engine) is None
+    configuration = ServiceConfiguration(
+        dataset="TD",
+        dataset_version="TDV",
+        model="TM",
+        model_version="TMV",
+        vector_file=kv_path,
+        index="ivf",
+    )
+    service = configuration.create_service(
+        vector_store=VectorStore(use_shared_memory=False)
+    )
+    assert isinstance(service.index, ExactIndex)
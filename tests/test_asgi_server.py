@@ -0,0 +1,253 @@
+import asyncio
+import io
+import json
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from kgvec2go_server.asgi_server import create_application
+from kgvec2go_server.generic import binary_vectors, json_serializer
+from kgvec2go_server.generic.request_validation import (
+    ADMIN_TOKEN_HEADER,
+    ADMIN_TOKEN_VARIABLE,
+)
+from kgvec2go_server.generic.service_catalog import (
+    ServiceCatalog,
+    ServiceConfiguration,
+)
+from kgvec2go_server.generic.vector_store import VectorStore
+from kgvec2go_server.jRDF2Vec.jRDF2Vec import jRDF2Vec
+
+V2 = "/rest/v2/{}/TD/TDV/TM/TMV"
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    configuration = ServiceConfiguration(
+        dataset="TD",
+        dataset_version="TDV",
+        model="TM",
+        model_version="TMV",
+        vector_file="./tests/data/dbpedia_sample_vectors.kv",
+        index="exact",
+    )
+    return ServiceCatalog(
+        configurations=[configuration],
+        vector_store=VectorStore(use_shared_memory=False),
+    )
+
+
+@pytest.fixture(scope="module")
+def service(catalog):
+    return catalog.get("TD", "TDV", "TM", "TMV")
+
+
+@pytest.fixture(scope="module")
+def app(catalog):
+    return create_application(service_catalog=catalog, heavy_workers=2)
+
+
+def call(app, method, path, body=b"", headers=()):
+    """Sends one request through the ASGI interface; returns status, headers, and (joined) body."""
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+    asyncio.run(app(scope, receive, send))
+    return (
+        messages[0]["status"],
+        {name.decode(): value.decode() for name, value in messages[0]["headers"]},
+        b"".join(message["body"] for message in messages[1:]),
+    )
+
+
+def test_closest_concepts(app, service):
+    status, headers, body = call(app, "GET", V2.format("closest-concepts") + "/5/Hotel")
+    assert status == 200
+    assert headers["content-type"] == "application/json"
+    assert body.decode() == service.get_closest_concepts_json(label="Hotel", topn=5)
+
+
+def test_closest_concepts_streaming(app, service, monkeypatch):
+    path = V2.format("closest-concepts") + "/5/Hotel"
+    expected = json.loads(service.get_closest_concepts_json(label="Hotel", topn=5))
+    status, headers, body = call(
+        app, "GET", path, headers=[("Accept", json_serializer.NDJSON_MIMETYPE)]
+    )
+    assert status == 200
+    assert headers["content-type"] == json_serializer.NDJSON_MIMETYPE
+    assert "content-length" not in headers
+    lines = body.decode().splitlines()
+    assert [json.loads(line) for line in lines] == expected["result"]
+
+    # a large top_n is streamed as the regular JSON payload
+    monkeypatch.setattr(json_serializer, "STREAMING_TOP_N", 2)
+    _, headers, body = call(app, "GET", path)
+    assert "content-length" not in headers
+    assert json.loads(body) == expected
+
+
+def test_export_vectors(app, service):
+    path = V2.format("export-vectors")
+    status, headers, body = call(
+        app,
+        "POST",
+        path,
+        body="Hotel\n\nNope\n".encode(),
+        headers=[("Content-Type", "text/plain")],
+    )
+    assert status == 200
+    assert headers["content-type"] == json_serializer.NDJSON_MIMETYPE
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["concept"] for line in lines] == ["Hotel", "Nope"]
+    assert lines[0]["vector"] == pytest.approx(
+        service.get_vector(label="Hotel")[1].tolist()
+    )
+    assert lines[1]["uri"] is None
+    _, _, body = call(app, "POST", path, body=json.dumps(["Hotel"]).encode())
+    assert json.loads(body)["uri"] == lines[0]["uri"]
+    _, _, body = call(app, "POST", path, body=b'{"a": 1}')
+    assert "error" in json.loads(body)
+
+
+def test_closest_concepts_batch(app, service):
+    status, _, body = call(
+        app,
+        "POST",
+        V2.format("closest-concepts") + "/3",
+        body=json.dumps(["Hotel", "Bed"]).encode(),
+    )
+    assert status == 200
+    assert body.decode() == service.get_closest_concepts_batch_json(
+        labels=["Hotel", "Bed"], topn=3
+    )
+    status, _, body = call(
+        app, "POST", V2.format("closest-concepts") + "/3", body=b'{"a": 1}'
+    )
+    assert status == 400
+    assert "error" in json.loads(body)
+    status, _, _ = call(
+        app, "POST", V2.format("get-similarity"), body=json.dumps([[1, 2]]).encode()
+    )
+    assert status == 400
+
+
+def test_get_vector(app, service):
+    _, _, body = call(app, "GET", V2.format("get-vector") + "/Hotel")
+    assert body.decode() == service.get_vector_json(label="Hotel")
+    status, headers, body = call(
+        app,
+        "GET",
+        V2.format("get-vector") + "/Hotel",
+        headers=[("Accept", binary_vectors.RAW_MIMETYPE)],
+    )
+    assert status == 200
+    assert headers["content-type"] == binary_vectors.RAW_MIMETYPE
+    vector = np.frombuffer(body, dtype=binary_vectors.VECTOR_DTYPE)
+    assert np.allclose(vector, service.get_vector(label="Hotel")[1])
+
+
+def test_get_vector_batch_binary(app, service, monkeypatch):
+    labels = json.dumps(["Hotel", "Nope"]).encode()
+    path = V2.format("get-vector")
+    status, headers, body = call(
+        app,
+        "POST",
+        path,
+        body=labels,
+        headers=[("Accept", binary_vectors.NPZ_MIMETYPE)],
+    )
+    assert status == 200
+    assert "x-vector-uris" not in headers
+    arrays = np.load(io.BytesIO(body))
+    assert arrays["uris"].tolist() == [service.get_vector(label="Hotel")[0], ""]
+    # the URIs of raw responses must fit into the X-Vector-URIs header
+    monkeypatch.setattr(binary_vectors, "MAX_URI_HEADER_BYTES", 10)
+    headers = [("Accept", binary_vectors.RAW_MIMETYPE)]
+    assert call(app, "POST", path, body=labels, headers=headers)[0] == 413
+
+
+def test_legacy_closest_concepts_top_n_is_capped(app, monkeypatch):
+    monkeypatch.setattr(json_serializer, "STREAMING_TOP_N", 5)
+    status, _, body = call(app, "GET", "/rest/closest-concepts/dbpedia/6/Hotel")
+    assert status == 400
+    assert "error" in json.loads(body)
+    assert call(app, "GET", "/rest/closest-concepts/dbpedia/x/Hotel")[0] == 400
+
+
+def test_unknown_routes(app):
+    assert call(app, "GET", "/rest/v2/unknown")[0] == 404
+    assert call(app, "DELETE", V2.format("get-vector") + "/Hotel")[0] == 405
+    assert call(app, "GET", "/rest/get-vector/wordnet/Hotel")[0] == 404
+    _, _, body = call(app, "GET", "/rest/v2/get-vector/X/Y/Z/W/Hotel")
+    assert "error" in json.loads(body)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="requires a POSIX shell")
+def test_train_light_async(tmp_path):
+    class FakeJRDF2Vec(jRDF2Vec):
+        def _prepare_light(self, entities, number_of_walks, mode, dimension):
+            command, walk_directory_name = super()._prepare_light(
+                entities, number_of_walks, mode, dimension
+            )
+            script = f"echo 'Hotel 1.0 2.0' > {walk_directory_name}model.txt"
+            return ["sh", "-c", script], walk_directory_name
+
+    rdf_2_vec = FakeJRDF2Vec(jrdf_2_vec_directory=str(tmp_path) + "/")
+    result = asyncio.run(
+        rdf_2_vec.train_light_async(
+            entities=["Hotel"], number_of_walks=1, mode="sg", dimension=2
+        )
+    )
+    assert result == {"Hotel": [1.0, 2.0]}
+
+
+def test_swap_service(app, catalog, monkeypatch):
+    body = json.dumps(
+        {
+            "service": {
+                "dataset": "TD",
+                "dataset_version": "TDV",
+                "model": "TM",
+                "model_version": "TMV2",
+                "vector_file": "./tests/data/dbpedia_sample_vectors.kv",
+                "index": "exact",
+            }
+        }
+    ).encode()
+    path = "/admin/swap-service"
+    assert call(app, "POST", path, body=body)[0] == 403
+    monkeypatch.setenv(ADMIN_TOKEN_VARIABLE, "secret")
+    headers = [(ADMIN_TOKEN_HEADER, "secret")]
+    assert call(app, "POST", path, body=b"[]", headers=headers)[0] == 400
+    assert call(app, "POST", path, body=body, headers=headers)[0] == 202
+    for _ in range(100):
+        _, _, status = call(app, "GET", path, headers=headers)
+        if json.loads(status).get("td/tdv/tm/tmv2") == "done":
+            break
+        time.sleep(0.05)
+    assert call(app, "GET", "/rest/v2/get-vector/TD/TDV/TM/TMV2/Hotel")[0] == 200
+    assert catalog.get("TD", "TDV", "TM", "TMV2") is not None
+
+
+def test_metrics(app):
+    call(app, "GET", V2.format("get-vector") + "/Hotel")
+    status, headers, body = call(app, "GET", "/metrics")
+    assert status == 200
+    assert headers["content-type"].startswith("text/plain")
+    assert (
+        'route="/rest/v2/get-vector/<dataset>/<dataset_version>/<model>/<model_version>/<concept_name>"'
+        in body.decode()
+    )
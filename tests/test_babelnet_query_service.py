@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.babelnet.babelnet_query_service import BabelNetQueryService
+
+
+class TestBabelNetQueryService:
+    @pytest.fixture
+    def service_and_vectors(self, tmp_path):
+        lemmas = [
+            "bn:sleep_n_EN",
+            "bn:sleep_v_EN",
+            "bn:bed_n_EN",
+            "bn:dream_n_EN",
+            "bn:dream_v_EN",
+            "bn:run_v_EN",
+            "bn:quiet_a_EN",
+            "bn:quietly_r_EN",
+        ]
+        kv = KeyedVectors(vector_size=16)
+        kv.add_vectors(lemmas, np.random.default_rng(11).normal(size=(len(lemmas), 16)))
+        kv_path = str(tmp_path / "babelnet.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "babelnet_entities.txt"
+        entity_file.write_text("\n".join(lemmas + ["bn:missing_n_EN"]) + "\n")
+        service = BabelNetQueryService(
+            entity_file=str(entity_file), vector_file=kv_path
+        )
+        return service, kv, lemmas
+
+    def test_pos_ranges(self, service_and_vectors):
+        service, _, _ = service_and_vectors
+        assert {
+            pos: end - start for pos, (start, end) in service.pos_ranges.items()
+        } == {"a": 1, "n": 3, "r": 1, "v": 3}
+
+    @pytest.mark.parametrize("pos", [None, "v", "N"])
+    def test_find_closest_lemmas(self, service_and_vectors, pos):
+        service, kv, lemmas = service_and_vectors
+        result = json.loads(service.find_closest_lemmas("sleep", 3, pos=pos))["result"]
+
+        query = "bn:sleep_n_EN" if pos is None else f"bn:sleep_{pos.lower()}_EN"
+        candidates = [
+            lemma
+            for lemma in lemmas
+            if pos is None or lemma.endswith(f"_{pos.lower()}_EN")
+        ]
+        expected = sorted(
+            ((lemma, kv.similarity(query, lemma)) for lemma in candidates),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:3]
+        assert [entry["concept"] for entry in result] == [
+            lemma for lemma, _ in expected
+        ]
+        for entry, (_, score) in zip(result, expected):
+            assert entry["score"] == pytest.approx(score, abs=1e-5)
+
+    def test_find_closest_lemmas_unknown(self, service_and_vectors):
+        service, _, _ = service_and_vectors
+        assert service.find_closest_lemmas("missing", 3) == "{}"
+        assert service.find_closest_lemmas("unknown", 3) == "{}"
+        assert service.find_closest_lemmas_given_key("bn:unknown_n_EN", 3) is None
+
+    def test_get_lookup_key(self, service_and_vectors):
+        service, _, _ = service_and_vectors
+        assert service.get_lookup_key("sleep", pos="n") == "bn:sleep_n_EN"
+        assert service.get_lookup_key("sleep", pos="V") == "bn:sleep_v_EN"
+        # no adjective sense: noun
+        assert service.get_lookup_key("sleep", pos="a") == "bn:sleep_n_EN"
+        # no noun sense: any
+        assert service.get_lookup_key("run", pos="n") == "bn:run_v_EN"
+        assert service.get_lookup_key("unknown") is None
+
+    def test_find_closest_lemmas_with_batch_window(self, service_and_vectors, tmp_path):
+        service, _, _ = service_and_vectors
+        batched_service = BabelNetQueryService(
+            entity_file=str(tmp_path / "babelnet_entities.txt"),
+            vector_file=str(tmp_path / "babelnet.kv"),
+            batch_window=0.05,
+        )
+
+        requests = [("sleep", None), ("dream", None), ("sleep", "v"), ("run", "V")]
+        with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+            results = list(
+                pool.map(
+                    lambda request: batched_service.find_closest_lemmas(
+                        request[0], 3, pos=request[1]
+                    ),
+                    requests,
+                )
+            )
+        for (lemma, pos), result in zip(requests, results):
+            expected = json.loads(service.find_closest_lemmas(lemma, 3, pos=pos))
+            assert [entry["concept"] for entry in json.loads(result)["result"]] == [
+                entry["concept"] for entry in expected["result"]
+            ]
+        assert batched_service.batch_schedulers[None].batches == 1
+        assert batched_service.batch_schedulers["v"].requests == 2
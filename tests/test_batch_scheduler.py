@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.batch_scheduler import MicroBatchScheduler
+from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+
+
+class RecordingSearch:
+    """Returns the concept and its successors; records the batches."""
+
+    def __init__(self):
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, concepts, topn):
+        with self.lock:
+            self.batches.append((sorted(concepts), topn))
+        indices = np.array([np.arange(topn) + concept for concept in concepts])
+        return indices, -indices.astype(np.float32)
+
+
+def submit_concurrently(scheduler, requests):
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        return list(pool.map(lambda request: scheduler.submit(*request), requests))
+
+
+class TestMicroBatchScheduler:
+    def test_requests_are_coalesced(self):
+        search = RecordingSearch()
+        scheduler = MicroBatchScheduler(search=search, window=0.2)
+        results = submit_concurrently(scheduler, [(1, 2), (5, 3), (1, 4), (1, 2)])
+        assert search.batches == [([1, 5], 4)]
+        assert scheduler.batches == 1
+        assert scheduler.deduplicated_requests == 2
+        assert [indices.tolist() for indices, _ in results] == [
+            [1, 2],
+            [5, 6, 7],
+            [1, 2, 3, 4],
+            [1, 2],
+        ]
+
+    def test_max_batch_size(self):
+        search = RecordingSearch()
+        scheduler = MicroBatchScheduler(search=search, window=30, max_batch_size=3)
+        submit_concurrently(scheduler, [(1, 1), (2, 1), (3, 1)])
+        assert search.batches == [([1, 2, 3], 1)]
+
+    def test_exception_is_propagated(self):
+        def failing_search(concepts, topn):
+            raise ValueError("search failed")
+
+        scheduler = MicroBatchScheduler(search=failing_search, window=0)
+        with pytest.raises(ValueError):
+            scheduler.submit(1, 1)
+        # the scheduler is still usable
+        with pytest.raises(ValueError):
+            scheduler.submit(1, 1)
+
+
+def test_generic_service_with_batch_window():
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv", mmap="r")
+    arguments = dict(
+        kv=kv,
+        linker=GenericDBpediaLinker(kv=kv),
+        dataset="TD",
+        dataset_version="TDV",
+        model="TM",
+        model_version="TMV",
+    )
+    service = GenericKvQueryService(**arguments)
+    batched_service = GenericKvQueryService(batch_window=0.05, **arguments)
+    labels = ["Hotel", "Lake", "Hotel", "Aero East Europe"]
+    with ThreadPoolExecutor(max_workers=len(labels)) as pool:
+        results = list(
+            pool.map(
+                lambda label: batched_service.get_closest_concepts(label, topn=5),
+                labels,
+            )
+        )
+    for label, result in zip(labels, results):
+        expected = service.get_closest_concepts(label, topn=5)
+        assert [concept for concept, _ in result] == [
+            concept for concept, _ in expected
+        ]
+        assert [score for _, score in result] == pytest.approx(
+            [score for _, score in expected]
+        )
+    assert batched_service.batch_scheduler.requests >= 3
@@ -0,0 +1,80 @@
+import json
+
+import numpy as np
+import pytest
+
+from kgvec2go_server.asgi_server import create_application
+from kgvec2go_server.generic.service_catalog import ServiceCatalog
+from kgvec2go_server.generic.vector_store import VectorStore
+from kgvec2go_server.scripts.benchmark import (
+    AsgiTransport,
+    LabelSampler,
+    compare_to_baseline,
+    create_baseline,
+    generate_vectors,
+    get_request_factories,
+    read_labels,
+    run_benchmark,
+    summarize,
+    write_catalog,
+)
+
+
+def test_label_sampler():
+    labels = [f"Concept_{i}" for i in range(100)]
+    zipf = LabelSampler(labels, distribution="zipf", exponent=1.5, seed=1)
+    counts = {}
+    for _ in range(2000):
+        label = zipf.sample()
+        counts[label] = counts.get(label, 0) + 1
+    assert counts["Concept_0"] > counts.get("Concept_10", 0) > 0
+    uniform = LabelSampler(labels, distribution="uniform", seed=1)
+    assert len({uniform.sample() for _ in range(2000)}) > 90
+    with pytest.raises(ValueError):
+        LabelSampler(labels, distribution="normal")
+
+
+def test_summarize_and_compare():
+    result = summarize(latencies=np.arange(1, 101) / 1000, errors=1, seconds=2.0)
+    assert result["requests"] == 100
+    assert result["throughput"] == pytest.approx(50.0)
+    assert result["latency"]["p50"] == pytest.approx(50.5)
+    assert result["latency"]["max"] == pytest.approx(100.0)
+    baseline = json.loads(json.dumps(create_baseline({"r": result}, parameters={})))
+    assert compare_to_baseline({"r": result}, baseline) == []
+    slower = {
+        "requests": 100,
+        "errors": 1,
+        "throughput": 40.0,
+        "latency": dict(result["latency"], p99=result["latency"]["p99"] * 1.5),
+    }
+    regressions = compare_to_baseline({"r": slower, "new": slower}, baseline, 0.1)
+    assert len(regressions) == 2
+    assert compare_to_baseline({"r": slower}, baseline, tolerance=0.6) == []
+
+
+def test_run_benchmark(tmp_path):
+    vector_file = str(tmp_path / "benchmark.kv")
+    generate_vectors(vector_file, size=50, dimension=8)
+    write_catalog(str(tmp_path / "services.json"), vector_file=vector_file)
+    catalog = ServiceCatalog.load(
+        str(tmp_path / "services.json"),
+        vector_store=VectorStore(use_shared_memory=False),
+    )
+    transport = AsgiTransport(create_application(service_catalog=catalog))
+    request_factories = get_request_factories(top_n=3, batch_size=2)
+    try:
+        results = run_benchmark(
+            transport=transport,
+            sampler=LabelSampler(read_labels(vector_file), seed=0),
+            request_factories=request_factories,
+            requests_per_route=5,
+            concurrency=2,
+            warm_up=1,
+        )
+    finally:
+        transport.close()
+    assert set(results) == set(request_factories)
+    for result in results.values():
+        assert result["requests"] == 5
+        assert result["errors"] == 0
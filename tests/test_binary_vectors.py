@@ -0,0 +1,55 @@
+import io
+import json
+
+import numpy as np
+
+from kgvec2go_server.generic import binary_vectors
+
+
+def test_to_npy_bytes():
+    matrix = np.arange(6, dtype=np.float64).reshape(2, 3)
+    result = np.load(io.BytesIO(binary_vectors.to_npy_bytes(matrix)))
+    assert result.dtype == np.float32
+    assert result.tolist() == matrix.tolist()
+
+
+def test_to_raw_bytes():
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    result = np.frombuffer(
+        binary_vectors.encode(matrix, binary_vectors.RAW_MIMETYPE), dtype="<f4"
+    )
+    assert result.reshape(2, 3).tolist() == matrix.tolist()
+
+
+def test_get_headers():
+    headers = binary_vectors.get_headers(
+        uris=["http://dbpedia.org/resource/Köln", None],
+        matrix=np.zeros((2, 3), dtype=np.float32),
+    )
+    assert headers["X-Vector-Shape"] == "2,3"
+    headers["X-Vector-URIs"].encode("ascii")
+    assert json.loads(headers["X-Vector-URIs"])[1] is None
+
+
+def test_to_npz_bytes():
+    matrix = np.arange(6, dtype=np.float64).reshape(3, 2)[::-1]
+    result = np.load(
+        io.BytesIO(
+            binary_vectors.encode(
+                matrix, binary_vectors.NPZ_MIMETYPE, uris=["dbr:Köln", None, "b"]
+            )
+        )
+    )
+    assert result["vectors"].dtype == np.float32
+    assert result["vectors"].tolist() == matrix.tolist()
+    assert result["uris"].tolist() == ["dbr:Köln", "", "b"]
+
+
+def test_uri_header_is_limited():
+    uris = [f"http://dbpedia.org/resource/Concept_{i}" for i in range(1000)]
+    matrix = np.zeros((1000, 2), dtype=np.float32)
+    assert binary_vectors.get_headers(uris=uris, matrix=matrix) is None
+    headers = binary_vectors.get_headers(
+        uris=uris, matrix=matrix, mimetype=binary_vectors.NPZ_MIMETYPE
+    )
+    assert "X-Vector-URIs" not in headers
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.dbnary.dbnary_query_service import DbnaryQueryService
+
+
+class TestDbnaryQueryService:
+    def test_find_closest_lemmas(self, tmp_path):
+        prefix = "http://kaiko.getalp.org/dbnary/eng/"
+        lemmas = [prefix + word for word in ["dog", "cat", "house", "tree", "car"]]
+        kv = KeyedVectors(vector_size=16)
+        kv.add_vectors(
+            lemmas + [prefix + "__ws_1_dog__Noun__1"],
+            np.random.default_rng(3).normal(size=(len(lemmas) + 1, 16)),
+        )
+        kv_path = str(tmp_path / "dbnary.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "dbnary_entities.txt"
+        entity_file.write_text("\n".join(lemmas + [prefix + "missing"]) + "\n")
+
+        service = DbnaryQueryService(entity_file=str(entity_file), vector_file=kv_path)
+        result = json.loads(service.find_closest_lemmas("dog", 3))["result"]
+
+        expected = sorted(
+            ((lemma, kv.similarity(prefix + "dog", lemma)) for lemma in lemmas),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:3]
+        assert [entry["concept"] for entry in result] == [
+            lemma for lemma, _ in expected
+        ]
+        for entry, (_, score) in zip(result, expected):
+            assert entry["score"] == pytest.approx(score, abs=1e-5)
+        assert service.find_closest_lemmas("missing", 3) == "{}"
+
+    def test_find_closest_lemmas_with_batch_window(self, tmp_path):
+        prefix = "http://kaiko.getalp.org/dbnary/eng/"
+        lemmas = [prefix + word for word in ["dog", "cat", "house", "tree", "car"]]
+        kv = KeyedVectors(vector_size=8)
+        kv.add_vectors(lemmas, np.random.default_rng(4).normal(size=(len(lemmas), 8)))
+        kv_path = str(tmp_path / "dbnary.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "dbnary_entities.txt"
+        entity_file.write_text("\n".join(lemmas) + "\n")
+        service = DbnaryQueryService(entity_file=str(entity_file), vector_file=kv_path)
+        batched_service = DbnaryQueryService(
+            entity_file=str(entity_file), vector_file=kv_path, batch_window=0.05
+        )
+
+        words = ["dog", "tree", "dog", "car"]
+        with ThreadPoolExecutor(max_workers=len(words)) as pool:
+            results = list(
+                pool.map(
+                    lambda word: batched_service.find_closest_lemmas(word, 3), words
+                )
+            )
+        for word, result in zip(words, results):
+            expected = json.loads(service.find_closest_lemmas(word, 3))["result"]
+            result = json.loads(result)["result"]
+            assert [entry["concept"] for entry in result] == [
+                entry["concept"] for entry in expected
+            ]
+            assert [entry["score"] for entry in result] == pytest.approx(
+                [entry["score"] for entry in expected], abs=1e-5
+            )
+        assert batched_service.batch_scheduler.batches < len(words)
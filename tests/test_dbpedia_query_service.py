@@ -1,6 +1,15 @@
+import json
+import logging
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
 from kgvec2go_server.dbpedia.dbpedia_query_service import (
     DBpediaQueryService as DBPService,
 )
+from kgvec2go_server.generic.result_cache import ResultCache
+from kgvec2go_server.generic.vector_store import VectorStore
 
 
 class TestDBpediaQueryService:
@@ -9,3 +18,89 @@ class TestDBpediaQueryService:
             "http://dbpedia.org/resource/European_Union"
         )
         assert "European_Union" == DBPService.transform_string("dbr:European_Union")
+
+    def test_find_closest_lemmas(self):
+        service = DBPService(vector_file="./tests/data/dbpedia_sample_vectors.kv")
+        top_5 = json.loads(service.find_closest_lemmas("Hotel", "5"))["result"]
+        assert len(top_5) == 5
+
+        # answered from the memoized top 5
+        top_2 = json.loads(service.find_closest_lemmas("Hotel", "2"))["result"]
+        assert top_2 == top_5[:2]
+
+        # a larger top_n is not truncated to the first request
+        top_10 = json.loads(service.find_closest_lemmas("Hotel", "10"))["result"]
+        assert len(top_10) == 10
+        assert top_10[:5] == top_5
+
+        assert service.find_closest_lemmas("Does Not Exist", "5") == "{}"
+
+    def test_shared_cache_separates_files(self, tmp_path):
+        kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv")
+        kv.save(str(tmp_path / "a.kv"))
+        # a retrained model with the same vocabulary
+        kv.vectors = np.random.default_rng(0).normal(size=kv.vectors.shape)
+        kv.save(str(tmp_path / "b.kv"))
+
+        cache = ResultCache()
+        vector_store = VectorStore(use_shared_memory=False)
+        results = {}
+        for name in ("a.kv", "b.kv"):
+            vector_file = str(tmp_path / name)
+            shared = DBPService(
+                vector_file=vector_file, cache=cache, vector_store=vector_store
+            )
+            own = DBPService(vector_file=vector_file, vector_store=vector_store)
+            results[name] = shared.find_closest_lemmas("Hotel", "5")
+            assert results[name] == own.find_closest_lemmas("Hotel", "5")
+        assert results["a.kv"] != results["b.kv"]
+
+    def test_redirects_with_and_without_snapshot(self, tmp_path):
+        vector_file = str(tmp_path / "vectors.kv")
+        kv = KeyedVectors(vector_size=4)
+        kv.add_vectors(
+            ["dbr:Hotel", "dbr:Lake", "dbr:Chef", "dbr:Inn"],
+            np.random.default_rng(0).normal(size=(4, 4)),
+        )
+        kv.save(vector_file)
+        redirect_file = tmp_path / "redirects.ttl"
+        redirect_file.write_text(
+            "# redirects\n"
+            "<http://dbpedia.org/resource/Motel> <http://dbpedia.org/ontology/wikiPageRedirects> "
+            "<http://dbpedia.org/resource/Hotel> .\n"
+            "<http://dbpedia.org/resource/Pond> <http://dbpedia.org/ontology/wikiPageRedirects> "
+            "<http://dbpedia.org/resource/Unknown> .\n",
+            encoding="utf-8",
+        )
+        parsed = DBPService(
+            vector_file=vector_file,
+            redirect_file=str(redirect_file),
+            use_snapshot=False,
+            vector_store=VectorStore(use_shared_memory=False),
+        )
+        parsed.to_snapshot().save(vector_file, name=DBPService.SNAPSHOT_NAME)
+        loaded = DBPService(
+            vector_file=vector_file, vector_store=VectorStore(use_shared_memory=False)
+        )
+        assert len(loaded.term_mapping) == len(parsed.term_mapping)
+        for lookup_key, uri in parsed.term_mapping.items():
+            assert loaded.term_mapping[lookup_key] == uri
+        for service in (parsed, loaded):
+            closest = json.loads(service.find_closest_lemmas("Motel", "2"))["result"]
+            assert len(closest) == 2
+            assert service.find_closest_lemmas("Motel", "2") == (
+                service.find_closest_lemmas("Hotel", "2")
+            )
+            assert service.get_similarity("Motel", "Lake") == pytest.approx(
+                service.get_similarity("Hotel", "Lake")
+            )
+            assert json.loads(service.get_vector("Motel"))["uri"] == "dbr:Hotel"
+            assert service.find_closest_lemmas("Pond", "2") == "{}"
+
+    def test_unknown_concepts_are_not_errors(self, caplog):
+        service = DBPService(vector_file="./tests/data/dbpedia_sample_vectors.kv")
+        with caplog.at_level(logging.INFO):
+            assert service.get_similarity("Hotel", "Does_Not_Exist") is None
+            assert service.get_similarity("does_not_exist", "Hotel") is None
+            assert service.find_closest_lemmas("Does_Not_Exist", "3") == "{}"
+        assert caplog.records == []
@@ -1,4 +1,42 @@
 from ast import literal_eval
+import importlib
+import json
+import os
+
+import pytest
+
+V2 = "/rest/v2/{}/TD/TDV/TM/TMV"
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """Test client of the Flask server serving the sample vectors (the server reads its catalog on import)."""
+    catalog_file = tmp_path_factory.mktemp("flask") / "services.json"
+    catalog_file.write_text(
+        json.dumps(
+            {
+                "services": [
+                    {
+                        "dataset": "TD",
+                        "dataset_version": "TDV",
+                        "model": "TM",
+                        "model_version": "TMV",
+                        "vector_file": os.path.abspath(
+                            "./tests/data/dbpedia_sample_vectors.kv"
+                        ),
+                        "index": "exact",
+                    }
+                ]
+            }
+        ),
+        encoding="utf-8",
+    )
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("KGVEC2GO_SERVICES", str(catalog_file))
+        flask_server = importlib.import_module("kgvec2go_server.flask_server")
+    if flask_server.services_file != str(catalog_file):
+        pytest.skip("the Flask server has been imported with another catalog")
+    return flask_server.app.test_client()
 
 
 class Test:
@@ -10,3 +48,53 @@ class Test:
         my_array_string = str(my_array)
         my_array_back = literal_eval(my_array_string)
         assert my_array_back[0] == "hello" and my_array_back[1] == "world"
+
+
+def test_batch_routes(client):
+    response = client.post(V2.format("get-vector"), json=["Hotel", "Nope"])
+    assert response.status_code == 200
+    result = json.loads(response.data)["result"]
+    assert [entry["concept"] for entry in result] == ["Hotel", "Nope"]
+    assert result[1]["uri"] is None
+
+    response = client.post(V2.format("get-similarity"), json=[["Hotel", "Chef"]])
+    assert response.status_code == 200
+    assert isinstance(json.loads(response.data)["result"][0]["result"], float)
+
+    response = client.post(
+        V2.format("get-triple-score"), json=[["Hotel", "Chef", "Lake"]]
+    )
+    assert response.status_code == 200
+    assert len(json.loads(response.data)["result"]) == 1
+
+    response = client.post(V2.format("closest-concepts") + "/3", json=["Hotel"])
+    assert response.status_code == 200
+    assert len(json.loads(response.data)["result"][0]["result"]) == 3
+
+
+@pytest.mark.parametrize(
+    "route, body",
+    [
+        ("get-vector", {"a": 1}),
+        ("get-vector", ["Hotel", 1]),
+        ("get-similarity", [[1, 2]]),
+        ("get-similarity", [["Hotel"]]),
+        ("get-triple-score", [["a", None, 3]]),
+        ("closest-concepts", [None]),
+        ("export-vectors", "Hotel"),
+    ],
+)
+def test_batch_routes_reject_malformed_bodies(client, route, body):
+    path = V2.format(route) + ("/3" if route == "closest-concepts" else "")
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+    response = client.post(path, data=b"not json", content_type="application/json")
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("top_n", ["many", "-1", "10001"])
+def test_legacy_closest_concepts_top_n_is_capped(client, top_n):
+    response = client.get(f"/rest/closest-concepts/dbpedia/{top_n}/Hotel")
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
@@ -1,8 +1,13 @@
+import json
+
+import numpy as np
 import pytest
 from gensim.models import KeyedVectors
 
+from kgvec2go_server.generic.ann_index import IvfIndex
 from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
 from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
 
 kv: KeyedVectors
 linker: GenericDBpediaLinker
@@ -68,3 +73,114 @@ def get_triple_score():
         subject_label="Hotel", predicate_label="Aero East Europe", object_label="Lake"
     )
     assert result is not None
+
+
+def test_get_closest_concepts():
+    result = qs.get_closest_concepts(label="Hotel", topn=5)
+    expected = kv.most_similar("http://dbpedia.org/ontology/Hotel", topn=5)
+    assert [concept for concept, _ in result] == [concept for concept, _ in expected]
+    for (_, score), (_, expected_score) in zip(result, expected):
+        assert score == pytest.approx(expected_score, abs=1e-5)
+
+    assert qs.get_closest_concepts(label="Does Not Exist", topn=5) is None
+
+
+def test_get_closest_concepts_batch():
+    result = qs.get_closest_concepts_batch(
+        labels=["Hotel", "Does Not Exist", "Lake"], topn=3
+    )
+    assert len(result) == 3
+    single = qs.get_closest_concepts(label="Hotel", topn=3)
+    assert [c for c, _ in result[0]] == [c for c, _ in single]
+    assert [s for _, s in result[0]] == pytest.approx([s for _, s in single])
+    assert result[1] is None
+    assert len(result[2]) == 3
+    assert "http://dbpedia.org/ontology/Lake" not in [c for c, _ in result[2]]
+
+
+def test_ivf_index_backend():
+    ivf = IvfIndex.build(
+        engine=BatchSimilarityEngine(vectors=kv.vectors), number_of_lists=4, n_probe=4
+    )
+    ivf_qs = GenericKvQueryService(
+        kv=kv,
+        linker=linker,
+        dataset="TD",
+        dataset_version="TDV",
+        model="TM",
+        model_version="TMV",
+        index=ivf,
+    )
+    assert ivf_qs.similarity_engine is ivf.engine
+    assert [c for c, _ in ivf_qs.get_closest_concepts(label="Hotel", topn=5)] == [
+        c for c, _ in qs.get_closest_concepts(label="Hotel", topn=5)
+    ]
+
+
+def test_get_vectors():
+    result = qs.get_vectors(labels=["Hotel", "Does Not Exist"])
+    assert result[0][0] == "http://dbpedia.org/ontology/Hotel"
+    assert result[0][1] == pytest.approx(qs.get_vector(label="Hotel")[1])
+    assert result[1] is None
+
+    result = json.loads(qs.get_vectors_json(labels=["Hotel", "Does Not Exist"]))
+    assert len(result["result"][0]["vector"]) == 200
+    assert result["result"][1]["uri"] is None
+
+
+def test_get_similarities():
+    result = qs.get_similarities(
+        label_pairs=[["Hotel", "Aero East Europe"], ["Hotel", "Does Not Exist"]]
+    )
+    assert result[0] == pytest.approx(
+        qs.get_similarity(label_1="Hotel", label_2="Aero East Europe"), abs=1e-5
+    )
+    assert result[1] is None
+    assert json.loads(qs.get_similarities_json(label_pairs=[["Hotel", "Lake"]]))
+
+
+def test_get_triple_scores():
+    result = qs.get_triple_scores(
+        triples=[["Hotel", "Aero East Europe", "Lake"], ["Hotel", "Lake", "Nope"]]
+    )
+    assert result[0] == pytest.approx(
+        qs.get_triple_score(
+            subject_label="Hotel",
+            predicate_label="Aero East Europe",
+            object_label="Lake",
+        ),
+        abs=1e-5,
+    )
+    assert result[1] is None
+
+
+def test_get_closest_concepts_batch_json():
+    result = json.loads(
+        qs.get_closest_concepts_batch_json(labels=["Hotel", "Nope"], topn=2)
+    )
+    assert len(result["result"][0]["result"]) == 2
+    assert result["result"][1]["result"] is None
+
+
+def test_get_vector_matrix():
+    uris, matrix = qs.get_vector_matrix(labels=["Hotel"])
+    assert uris == ["http://dbpedia.org/ontology/Hotel"]
+    assert matrix.shape == (1, 200)
+    assert np.shares_memory(matrix, kv.vectors)
+
+    uris, matrix = qs.get_vector_matrix(labels=["Hotel", "Does Not Exist"])
+    assert uris[1] is None
+    assert not matrix[1].any()
+
+
+def test_closest_concepts_json_matches_result_list():
+    expected = qs.get_closest_concepts(label="Hotel", topn=5)
+    result = json.loads(qs.get_closest_concepts_json(label="Hotel", topn=5))
+    assert [entry["concept"] for entry in result["result"]] == [
+        concept for concept, _ in expected
+    ]
+    assert [entry["score"] for entry in result["result"]] == pytest.approx(
+        [score for _, score in expected], abs=1e-6
+    )
+    vector = json.loads(qs.get_vector_json(label="Hotel"))["vector"]
+    assert vector == pytest.approx(qs.get_vector(label="Hotel")[1].tolist())
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pytest
+
+from kgvec2go_server.generic import json_serializer
+
+
+@pytest.fixture(params=["orjson", "json"])
+def serializer(request, monkeypatch):
+    """The serializer with and without the optional orjson dependency."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        monkeypatch.setattr(json_serializer, "orjson", None)
+    return json_serializer
+
+
+def test_closest_concepts_to_json(serializer):
+    keys = ['dbr:"Quoted"', "dbr:Back\\slash", "dbr:Ünïcode", "dbr:Unused"]
+    result = json.loads(
+        serializer.closest_concepts_to_json(
+            keys=keys,
+            indices=np.array([0, 1, 2, -1], dtype=np.int64),
+            scores=np.array([0.9, 0.5, 0.25, -np.inf], dtype=np.float32),
+        )
+    )
+    assert [entry["concept"] for entry in result["result"]] == keys[:3]
+    assert [entry["score"] for entry in result["result"]] == pytest.approx(
+        [0.9, 0.5, 0.25]
+    )
+
+
+def test_vectors_to_json(serializer, tmp_path):
+    matrix = np.memmap(
+        tmp_path / "vectors.dat", dtype=np.float32, mode="w+", shape=(3, 4)
+    )
+    matrix[:] = np.arange(12, dtype=np.float32).reshape(3, 4) / 7
+    result = json.loads(serializer.vector_to_json(uri='a"b', vector=matrix[1]))
+    assert result["uri"] == 'a"b'
+    assert result["vector"] == pytest.approx(matrix[1].tolist())
+    # a column is not contiguous
+    result = json.loads(serializer.vector_to_json(uri="c", vector=matrix[:, 1]))
+    assert result["vector"] == pytest.approx(matrix[:, 1].tolist())
+    result = json.loads(serializer.vectors_to_json(uris=["x", "y"], matrix=matrix[:2]))
+    assert [entry["uri"] for entry in result["result"]] == ["x", "y"]
+    assert result["result"][1]["vector"] == pytest.approx(matrix[1].tolist())
+
+
+def test_result_to_json(serializer):
+    assert serializer.result_to_json(None) == serializer.EMPTY_RESULT
+    assert json.loads(serializer.result_to_json(np.float32(0.5))) == {"result": 0.5}
+    assert json.loads(serializer.error_to_json('"x"')) == {"error": '"x"'}
+
+
+def test_iter_closest_concepts_json(serializer):
+    keys = ["a", "b", "c", "d", "e"]
+    indices = np.array([4, 3, 2, 1, -1], dtype=np.int64)
+    scores = np.array([0.9, 0.8, 0.7, 0.6, -np.inf], dtype=np.float32)
+    chunks = list(
+        serializer.iter_closest_concepts_json(
+            keys=keys, indices=indices, scores=scores, chunk_size=2
+        )
+    )
+    assert len(chunks) > 2
+    assert "".join(chunks) == serializer.closest_concepts_to_json(
+        keys=keys, indices=indices, scores=scores
+    )
+    lines = "".join(
+        serializer.iter_closest_concepts_json(
+            keys=keys, indices=indices, scores=scores, ndjson=True, chunk_size=2
+        )
+    ).splitlines()
+    assert [json.loads(line)["concept"] for line in lines] == ["e", "d", "c", "b"]
+
+
+def test_vectors_to_ndjson(serializer):
+    matrix = np.array([[1.5, 2.0], [0.0, 0.0]], dtype=np.float32)
+    lines = serializer.vectors_to_ndjson(
+        labels=["x", "y"], uris=["dbr:X", None], matrix=matrix
+    ).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"concept": "x", "uri": "dbr:X", "vector": [1.5, 2.0]},
+        {"concept": "y", "uri": None, "vector": None},
+    ]
+
+
+def test_negotiate_mimetype():
+    assert json_serializer.negotiate_mimetype(None) == json_serializer.JSON_MIMETYPE
+    assert json_serializer.negotiate_mimetype("*/*") == json_serializer.JSON_MIMETYPE
+    assert (
+        json_serializer.negotiate_mimetype("application/x-ndjson")
+        == json_serializer.NDJSON_MIMETYPE
+    )
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic.linker_index import LinkerIndex, normalize_surface_form
+
+keys = [
+    "http://dbpedia.org/resource/Hotel",
+    "http://dbpedia.org/ontology/Hotel",
+    "http://dbpedia.org/resource/hotel_(band)",
+    "http://dbpedia.org/resource/United_States",
+    "http://dbpedia.org/resource/Paris",
+    "http://dbpedia.org/resource/PARIS",
+    "http://www.ontologydesignpatterns.org/ont/d0.owl#Activity",
+]
+
+
+def test_normalize_surface_form():
+    assert normalize_surface_form("dbo:Hotel") == ("Hotel", 1)
+    assert normalize_surface_form(" European Union ") == ("European_Union", 2)
+    with pytest.raises(TypeError):
+        normalize_surface_form(1)
+
+
+def test_lookup():
+    index = LinkerIndex.build(
+        keys=keys,
+        redirects={
+            "http://dbpedia.org/resource/USA": "http://dbpedia.org/resource/United_States",
+            "http://dbpedia.org/resource/Unknown": "http://dbpedia.org/resource/Nope",
+        },
+    )
+    assert index.lookup("Hotel") == 0
+    assert index.lookup("dbo:Hotel") == 1
+    assert index.lookup("http://dbpedia.org/resource/hotel") == 0
+    assert index.lookup("hotel") == 0
+    assert index.lookup("united states") == 3
+    assert index.lookup("USA") == 3
+    assert index.lookup("Paris") == 4
+    assert index.lookup("PARIS") == 5
+    assert index.lookup("paris") in (4, 5)
+    assert index.lookup("Unknown") == -1
+    assert index.lookup("Does not exist") == -1
+
+
+def test_linker_with_index(tmp_path):
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv", mmap="r")
+    kv_path = str(tmp_path / "vectors.kv")
+    kv.save(kv_path)
+    LinkerIndex.build(keys=kv.index_to_key).save(kv_path)
+    linker = GenericDBpediaLinker(kv=kv, index=LinkerIndex.load(kv_path))
+    plain_linker = GenericDBpediaLinker(kv=kv)
+    for label in ["Hotel", "Aero East Europe", "European_Montenegro", "Lake"]:
+        assert linker.link(label) == plain_linker.link(label)
+    assert (
+        linker.link("aero east europe")
+        == "http://dbpedia.org/resource/Aero_East_Europe"
+    )
+    assert (
+        linker.link("http://dbpedia.org/ontology/Hotel")
+        == "http://dbpedia.org/ontology/Hotel"
+    )
+    assert linker.link_index("Does Not Exist") == -1
+    assert linker.link_all_indices(["Lake", "Nope"]).tolist() == [
+        kv.key_to_index["http://dbpedia.org/ontology/Lake"],
+        -1,
+    ]
+
+
+def test_stale_index_is_rejected(tmp_path):
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv")
+    kv_path = str(tmp_path / "vectors.kv")
+    assert LinkerIndex.load(kv_path) is None
+    kv.save(kv_path)
+    LinkerIndex.build(keys=kv.index_to_key).save(kv_path)
+    assert LinkerIndex.load(kv_path) is not None
+    kv.add_vectors(["http://dbpedia.org/resource/Added"], np.ones((1, kv.vector_size)))
+    kv.save(kv_path)
+    assert LinkerIndex.load(kv_path) is None
@@ -0,0 +1,53 @@
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.metrics import Histogram, Metrics
+from kgvec2go_server.generic.result_cache import ResultCache
+
+
+def test_histogram():
+    histogram = Histogram(buckets=[0.1, 1.0])
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+    assert histogram.get_cumulative_counts() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.sum == 2.65
+
+
+def test_render():
+    metrics = Metrics()
+    metrics.observe_request(route="/rest/<x>", seconds=0.002, payload_size=100)
+    metrics.observe_request(route="/rest/<x>", seconds=0.2, status=404)
+    cache = ResultCache()
+    cache.put("a", 1)
+    cache.get("a")
+    cache.get("b")
+    metrics.register_cache("results", cache)
+    lines = metrics.render().splitlines()
+    assert (
+        'kgvec2go_request_duration_seconds_bucket{route="/rest/<x>",le="0.0025"} 1'
+        in lines
+    )
+    assert 'kgvec2go_request_duration_seconds_count{route="/rest/<x>"} 2' in lines
+    assert 'kgvec2go_response_size_bytes_count{route="/rest/<x>"} 1' in lines
+    assert 'kgvec2go_responses_total{route="/rest/<x>",status="404"} 1' in lines
+    assert 'kgvec2go_cache_hit_ratio{cache="results"} 0.5' in lines
+
+
+def test_stage_timings():
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv", mmap="r")
+    metrics = Metrics()
+    service = GenericKvQueryService(
+        kv=kv,
+        linker=GenericDBpediaLinker(kv=kv),
+        dataset="TD",
+        dataset_version="TDV",
+        model="TM",
+        model_version="TMV",
+        metrics=metrics,
+    )
+    service.get_closest_concepts_json(label="Hotel", topn=3)
+    rendered = metrics.render()
+    for stage in ("link", "scan", "serialize"):
+        assert f'kgvec2go_stage_duration_seconds_count{{stage="{stage}"}} 1' in rendered
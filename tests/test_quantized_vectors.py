@@ -0,0 +1,62 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from kgvec2go_server.dbpedia.dbpedia_query_service import DBpediaQueryService
+from kgvec2go_server.generic.ann_index import ExactIndex, QuantizedIndex
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.similarity_engine import (
+    BatchSimilarityEngine,
+    normalize_rows,
+)
+from kgvec2go_server.scripts.quantize_vectors import quantize_vectors
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantize(dtype):
+    vectors = np.random.default_rng(1).normal(size=(100, 32))
+    quantized = QuantizedMatrix.quantize(vectors, dtype=dtype, chunk_size=30)
+    assert quantized.dtype == dtype
+    queries = normalize_rows(vectors[:3])
+    assert np.allclose(
+        quantized.scores(queries), queries @ normalize_rows(vectors).T, atol=0.02
+    )
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_index_is_rescored(dtype):
+    random = np.random.default_rng(2)
+    vectors = random.normal(size=(300, 16)).astype(np.float32)
+    index = QuantizedIndex(
+        quantized=QuantizedMatrix.quantize(vectors, dtype=dtype), vectors=vectors
+    )
+    assert index.engine is None
+    queries = random.normal(size=(4, 16))
+    expected_indices, expected_scores = ExactIndex(
+        engine=BatchSimilarityEngine(vectors=vectors)
+    ).search(queries, topn=5, exclude_indices=[0, None, 2, None])
+    indices, scores = index.search(queries, topn=5, exclude_indices=[0, None, 2, None])
+    assert indices.tolist() == expected_indices.tolist()
+    # exact float32 scores
+    assert np.allclose(scores, expected_scores, atol=1e-6)
+
+
+def test_dbpedia_quantized(tmp_path):
+    kv_path = str(tmp_path / "dbpedia.kv")
+    shutil.copy("./tests/data/dbpedia_sample_vectors.kv", kv_path)
+    quantize_vectors(kv_path, dtype="int8")
+    assert isinstance(QuantizedMatrix.load(kv_path).codes, np.memmap)
+
+    quantized_service = DBpediaQueryService(vector_file=kv_path)
+    assert isinstance(quantized_service.closest_concepts_index, QuantizedIndex)
+    service = DBpediaQueryService(vector_file=kv_path, use_quantized=False)
+    expected = json.loads(service.find_closest_lemmas("Hotel", "5"))["result"]
+    actual = json.loads(quantized_service.find_closest_lemmas("Hotel", "5"))["result"]
+    assert [entry["concept"] for entry in actual] == [
+        entry["concept"] for entry in expected
+    ]
+    assert [entry["score"] for entry in actual] == pytest.approx(
+        [entry["score"] for entry in expected], abs=1e-5
+    )
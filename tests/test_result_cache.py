@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+
+from kgvec2go_server.generic.result_cache import (
+    ResultCache,
+    InProcessCacheBackend,
+    DiskCacheBackend,
+    estimate_size,
+    RankedResultMemo,
+)
+
+
+def test_estimate_size():
+    assert estimate_size(np.zeros(100, dtype=np.float32)) >= 400
+    assert estimate_size(("a" * 1000, 1)) > 1000
+
+
+def test_in_process_lru_eviction():
+    cache = ResultCache(backend=InProcessCacheBackend(max_bytes=3000))
+    cache.put("a", "x" * 900)
+    cache.put("b", "x" * 900)
+    assert cache.get("a") is not None  # a is now most recently used
+    cache.put("c", "x" * 900)
+    cache.put("d", "x" * 900)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    statistics = cache.get_statistics()
+    assert statistics["bytes"] <= 3000
+    assert statistics["evictions"] >= 1
+    assert statistics["hits"] == 2
+    assert statistics["misses"] == 1
+
+    # values larger than the budget are not stored
+    cache.put("e", "x" * 5000)
+    assert "e" not in cache
+
+
+def test_ttl():
+    cache = ResultCache(ttl=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get_statistics()["entries"] == 0
+
+
+def test_get_or_compute():
+    cache = ResultCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute(("k", 10), lambda: calls.append(1) or "v") == "v"
+    assert len(calls) == 1
+
+
+def test_disk_backend(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(backend=DiskCacheBackend(path=path, max_bytes=2000))
+    cache.put(("DBpedia", "Berlin"), "x" * 700)
+    cache.put(("DBpedia", "Paris"), "x" * 700)
+
+    # a second cache on the same file (e.g. another worker) sees the entries
+    other_cache = ResultCache(backend=DiskCacheBackend(path=path, max_bytes=2000))
+    assert other_cache.get(("DBpedia", "Berlin")) == "x" * 700
+
+    cache.put(("DBpedia", "Rome"), "x" * 700)
+    assert other_cache.get(("DBpedia", "Paris")) is None
+    assert cache.get_statistics()["bytes"] <= 2000
+
+
+def test_ranked_result_memo():
+    memo = RankedResultMemo(cache=ResultCache(), namespace="test")
+    calls = []
+
+    def compute(topn):
+        calls.append(topn)
+        return np.arange(min(topn, 8)), np.linspace(1, 0, 8)[: min(topn, 8)]
+
+    indices, _ = memo.get_or_compute("Berlin", 5, compute)
+    assert indices.tolist() == [0, 1, 2, 3, 4]
+
+    # smaller top_n: sliced from the stored result
+    indices, _ = memo.get_or_compute("Berlin", 2, compute)
+    assert indices.tolist() == [0, 1]
+    assert calls == [5]
+
+    # larger top_n: recomputed
+    indices, _ = memo.get_or_compute("Berlin", 7, compute)
+    assert len(indices) == 7
+    assert calls == [5, 7]
+
+    # all candidates already known
+    memo.get_or_compute("Paris", 20, compute)
+    memo.get_or_compute("Paris", 50, compute)
+    assert calls == [5, 7, 20]
+    # an entry for a smaller top_n is a miss
+    assert memo.cache.get_statistics()["hits"] == 2
+    assert memo.cache.get_statistics()["misses"] == 3
+
+
+def test_ranked_result_memo_keeps_the_larger_result():
+    memo = RankedResultMemo(cache=ResultCache(), namespace="test")
+    memo.put("Berlin", 100, np.arange(100), np.linspace(1, 0, 100))
+    # a concurrent request for a smaller top_n finishes later
+    memo.put("Berlin", 5, np.arange(5), np.linspace(1, 0, 5))
+    indices, _ = memo.get("Berlin", 50)
+    assert indices.tolist() == list(range(50))
+    memo.put("Berlin", 200, np.arange(200), np.linspace(1, 0, 200))
+    assert len(memo.get("Berlin", 200)[0]) == 200
@@ -0,0 +1,80 @@
+import numpy as np
+
+from kgvec2go_server.generic import scan_executor
+from kgvec2go_server.generic.ann_index import QuantizedIndex
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.scan_executor import ShardedScanExecutor
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+
+
+class TestShardedScanExecutor:
+    def test_get_shards(self):
+        executor = ShardedScanExecutor(number_of_workers=4, min_shard_rows=10)
+        assert executor.get_shards(100) == [(0, 25), (25, 50), (50, 75), (75, 100)]
+        assert executor.get_shards(25) == [(0, 12), (12, 25)]
+        assert executor.get_shards(5) == [(0, 5)]
+        executor.shutdown()
+
+    def test_sharded_engine_is_exact(self):
+        random = np.random.default_rng(1)
+        vectors = random.normal(size=(500, 16))
+        executor = ShardedScanExecutor(number_of_workers=4, min_shard_rows=30)
+        sharded = BatchSimilarityEngine(vectors=vectors, executor=executor)
+        sequential = BatchSimilarityEngine(vectors=vectors)
+
+        queries = random.normal(size=(6, 16))
+        excluded = [0, None, 499, 3, None, 250]
+        indices, scores = sharded.top_k(queries, topn=8, exclude_indices=excluded)
+        expected_indices, expected_scores = sequential.top_k(
+            queries, topn=8, exclude_indices=excluded
+        )
+        assert indices.tolist() == expected_indices.tolist()
+        assert np.allclose(scores, expected_scores)
+
+        # more results than rows in one shard
+        indices, _ = sharded.top_k_for_indices([7], topn=200)
+        expected_indices, _ = sequential.top_k_for_indices([7], topn=200)
+        assert indices.tolist() == expected_indices.tolist()
+        executor.shutdown()
+
+    def test_sharded_quantized_index(self):
+        random = np.random.default_rng(2)
+        vectors = random.normal(size=(400, 16)).astype(np.float32)
+        quantized = QuantizedMatrix.quantize(vectors, dtype="float16")
+        executor = ShardedScanExecutor(number_of_workers=3, min_shard_rows=50)
+        queries = random.normal(size=(3, 16))
+        indices, scores = QuantizedIndex(
+            quantized=quantized, vectors=vectors, executor=executor
+        ).search(queries, topn=5, exclude_indices=[1, None, 2])
+        expected_indices, expected_scores = QuantizedIndex(
+            quantized=quantized, vectors=vectors
+        ).search(queries, topn=5, exclude_indices=[1, None, 2])
+        assert indices.tolist() == expected_indices.tolist()
+        assert np.allclose(scores, expected_scores)
+        executor.shutdown()
+
+    def test_blas_threads_are_limited_during_scans(self, monkeypatch):
+        calls, active_limits = [], []
+
+        class FakeLimits:
+            def __init__(self, limits, user_api):
+                calls.append((limits, user_api))
+                active_limits.append(limits)
+
+            def restore_original_limits(self):
+                active_limits.pop()
+
+        monkeypatch.setattr(scan_executor, "threadpool_limits", FakeLimits)
+        executor = ShardedScanExecutor(number_of_workers=2, min_shard_rows=10)
+        assert active_limits == []
+
+        def score_shard(start, end):
+            # the limit is set while the shards are scanned
+            assert active_limits == [1]
+            return np.arange(start, end, dtype=np.float32)[None, :]
+
+        indices, _ = executor.top_k(score_shard, number_of_rows=40, k=3)
+        assert indices.tolist() == [[39, 38, 37]]
+        assert calls == [(1, "blas")]
+        assert active_limits == []
+        executor.shutdown()
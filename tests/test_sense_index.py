@@ -0,0 +1,46 @@
+from kgvec2go_server.generic.sense_index import SenseIndex
+
+
+class TestSenseIndex:
+    key_to_index = {"sleep-n": 0, "sleep-v": 1, "run-v": 2, "walk-x": 3}
+    term_mapping = {
+        "sleep": ["sleep-n", "sleep-v"],
+        "run": ["run-v", "run-n"],
+        "walk": ["walk-x"],
+        "missing": ["missing-n"],
+    }
+
+    @staticmethod
+    def get_pos(sense):
+        return sense[-1]
+
+    def test_lookup(self):
+        index = SenseIndex.build(
+            term_mapping=self.term_mapping,
+            key_to_index=self.key_to_index,
+            pos_tags=("n", "v", "a"),
+            get_pos=self.get_pos,
+        )
+        assert len(index) == 4
+        assert "sleep" in index
+        assert index.lookup("sleep", "n") == 0
+        assert index.lookup("sleep", "V") == 1
+        # no adjective: first sense
+        assert index.lookup("sleep", "a") == 0
+        # unknown POS: default POS
+        assert index.lookup("sleep", "q") == 0
+        # run-n is not in the vocabulary
+        assert index.lookup("run", "n") == 2
+        assert index.lookup("missing", "n") == -1
+        assert index.lookup("unknown", "n") == -1
+
+    def test_fallback_pos(self):
+        index = SenseIndex.build(
+            term_mapping={"sleep": ["sleep-v", "sleep-n"]},
+            key_to_index=self.key_to_index,
+            pos_tags=("n", "v", "a"),
+            get_pos=self.get_pos,
+            fallback_pos="n",
+        )
+        assert index.lookup("sleep", "a") == 0
+        assert index.lookup("sleep", "v") == 1
@@ -0,0 +1,240 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.ann_index import ExactIndex, IvfIndex
+from kgvec2go_server.generic.linker_index import LinkerIndex
+from kgvec2go_server.generic.quantized_vectors import QuantizedMatrix
+from kgvec2go_server.generic.service_catalog import (
+    LegacyServiceConfiguration,
+    ServiceCatalog,
+    ServiceConfiguration,
+)
+from kgvec2go_server.generic.similarity_engine import BatchSimilarityEngine
+from kgvec2go_server.generic.vector_store import VectorStore
+
+KV_PATH = "./tests/data/dbpedia_sample_vectors.kv"
+
+
+def write_catalog_file(tmp_path, **settings):
+    shutil.copy(KV_PATH, tmp_path / "vectors.kv")
+    content = {
+        "services": [
+            {
+                "dataset": "TD",
+                "dataset_version": "TDV",
+                "model": model,
+                "model_version": "TMV",
+                "vector_file": "vectors.kv",
+                "index": "exact",
+                "preload": model == "TM1",
+            }
+            for model in ("TM1", "TM2")
+        ],
+        "legacy_services": [
+            {"data_set": "dbpedia", "arguments": {"vector_file": "vectors.kv"}}
+        ],
+        **settings,
+    }
+    path = tmp_path / "services.json"
+    path.write_text(json.dumps(content), encoding="utf-8")
+    return str(path)
+
+
+def test_lazy_loading(tmp_path):
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path), vector_store=VectorStore(use_shared_memory=False)
+    )
+    assert len(catalog) == 0
+    catalog.preload()
+    assert len(catalog) == 1
+    assert catalog.get("TD", "TDV", "TM2", "TMV") is not None
+    service = catalog.get("td", "T-D-V", "tm_2", "tmv")
+    assert len(catalog) == 2
+    assert isinstance(service.index, ExactIndex)
+    assert service.get_closest_concepts(label="Hotel", topn=3) is not None
+    assert catalog.get("TD", "TDV", "unknown", "TMV") is None
+    legacy = catalog.get_legacy("DBpedia")
+    assert legacy is catalog.get_legacy("dbpedia")
+    assert legacy.get_vector("Hotel") is not None
+    assert catalog.get_legacy("wordnet") is None
+
+
+def test_idle_and_capacity_unloading(tmp_path):
+    vector_store = VectorStore(use_shared_memory=False)
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path, idle_timeout=60, max_loaded_services=2),
+        vector_store=vector_store,
+    )
+    first = catalog.get("TD", "TDV", "TM1", "TMV")
+    catalog.get("TD", "TDV", "TM2", "TMV")
+    catalog.get_legacy("dbpedia")
+    # the least recently used service has been unloaded
+    key = ServiceConfiguration("TD", "TDV", "TM1", "TMV", "vectors.kv").get_key()
+    assert not catalog.is_loaded(key)
+    assert len(catalog) == 2
+    assert catalog.get("TD", "TDV", "TM1", "TMV") is not first
+
+    assert catalog.unload_idle() == 0
+    assert len(vector_store._vectors) == 1
+    assert catalog.unload_idle(now=float("inf")) == 2
+    assert len(catalog) == 0
+    # the vectors are released once no service on the file is loaded
+    assert len(vector_store._vectors) == 0
+
+
+def test_request_racing_an_unload(tmp_path, monkeypatch):
+    vector_store = VectorStore(use_shared_memory=False)
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path), vector_store=vector_store
+    )
+    service = catalog.get("TD", "TDV", "TM1", "TMV")
+    key = ServiceConfiguration("TD", "TDV", "TM1", "TMV", "vectors.kv").get_key()
+    get = catalog.registry.get
+
+    def get_and_unload(*arguments):
+        # the service is unloaded right after the request has looked it up
+        result = get(*arguments)
+        monkeypatch.setattr(catalog.registry, "get", get)
+        catalog.unload(key)
+        return result
+
+    monkeypatch.setattr(catalog.registry, "get", get_and_unload)
+    assert catalog.get("TD", "TDV", "TM1", "TMV") is service
+    assert not catalog.is_loaded(key)
+    assert len(catalog) == 0
+    assert key not in catalog._last_access
+    assert len(vector_store._vectors) == 0
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        ServiceConfiguration("TD", "TDV", "TM", "TMV", KV_PATH, index="unknown")
+    with pytest.raises(ValueError):
+        LegacyServiceConfiguration(data_set="unknown", arguments={})
+    configuration = ServiceConfiguration("TD", "TDV", "TM", "TMV", KV_PATH)
+    with pytest.raises(ValueError):
+        ServiceCatalog(configurations=[configuration, configuration])
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="segments not listed")
+def test_swap_removes_superseded_segments(tmp_path):
+    vector_store = VectorStore()
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path), vector_store=vector_store
+    )
+    configuration = ServiceConfiguration(
+        "TD", "TDV", "TM1", "TMV", str(tmp_path / "vectors.kv"), index="exact"
+    )
+
+    def get_segments():
+        return {
+            name
+            for name in os.listdir("/dev/shm")
+            if name.startswith(VectorStore.SEGMENT_PREFIX)
+        }
+
+    try:
+        catalog.get("TD", "TDV", "TM1", "TMV")
+        segments = get_segments()
+        for version in range(2):
+            os.utime(tmp_path / "vectors.kv", (version, version))
+            catalog.swap(configuration)
+            assert len(get_segments()) == len(segments)
+        assert get_segments() != segments
+    finally:
+        vector_store.unlink()
+
+
+def test_swap_ignores_stale_side_files(tmp_path):
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path), vector_store=VectorStore(use_shared_memory=False)
+    )
+    kv_path = str(tmp_path / "vectors.kv")
+    kv = KeyedVectors.load(kv_path)
+    IvfIndex.build(BatchSimilarityEngine(vectors=kv.vectors), number_of_lists=4).save(
+        kv_path
+    )
+    LinkerIndex.build(keys=kv.index_to_key).save(kv_path)
+    QuantizedMatrix.quantize(kv.vectors).save(kv_path)
+    old = catalog.swap(
+        ServiceConfiguration("TD", "TDV", "TM1", "TMV", kv_path, index="auto")
+    )
+    assert isinstance(old.index, IvfIndex)
+    assert old.linker.index is not None
+
+    # the model is retrained, the side files are not rebuilt
+    kv.add_vectors(["http://dbpedia.org/resource/New"], np.ones((1, kv.vector_size)))
+    kv.save(kv_path)
+    with pytest.raises(ValueError):
+        catalog.swap(
+            ServiceConfiguration("TD", "TDV", "TM1", "TMV", kv_path, index="quantized")
+        )
+    assert catalog.get("TD", "TDV", "TM1", "TMV") is old
+    for index in ("auto", "ivf"):
+        new = catalog.swap(
+            ServiceConfiguration("TD", "TDV", "TM1", "TMV", kv_path, index=index)
+        )
+        assert isinstance(new.index, ExactIndex)
+        assert new.linker.index is None
+        assert new.get_vector(label="http://dbpedia.org/resource/New") is not None
+
+
+def test_swap(tmp_path):
+    vector_store = VectorStore(use_shared_memory=False)
+    catalog = ServiceCatalog.load(
+        write_catalog_file(tmp_path), vector_store=vector_store
+    )
+    old = catalog.get("TD", "TDV", "TM1", "TMV")
+    old_result = old.get_closest_concepts(label="Hotel", topn=3)
+
+    # same key, replaced file: the new service is registered, the old one keeps answering in-flight requests
+    os.utime(tmp_path / "vectors.kv", (0, 0))
+    configuration = ServiceConfiguration(
+        "TD", "TDV", "TM1", "TMV", str(tmp_path / "vectors.kv"), index="exact"
+    )
+    new = catalog.swap(configuration, warm_up_labels=["Hotel"])
+    assert catalog.get("TD", "TDV", "TM1", "TMV") is new
+    assert catalog.swap_status[configuration.get_key()] == "done"
+    assert new.kv is not old.kv
+    assert new.closest_concepts_memo.namespace != old.closest_concepts_memo.namespace
+    assert old.get_closest_concepts(label="Hotel", topn=3) == old_result
+
+    # new model version retiring the old one
+    shutil.copy(KV_PATH, tmp_path / "vectors_v2.kv")
+    configuration = ServiceConfiguration(
+        "TD", "TDV", "TM1", "TMV2", str(tmp_path / "vectors_v2.kv"), index="exact"
+    )
+    catalog.get_legacy("dbpedia")
+    catalog.swap_in_background(
+        configuration, replaces=new.closest_concepts_memo.namespace[:4]
+    ).join()
+    assert catalog.get("TD", "TDV", "TM1", "TMV2") is not None
+    assert catalog.get("TD", "TDV", "TM1", "TMV") is None
+    # vectors.kv is still used by the legacy service
+    assert len(vector_store._vectors) == 2
+
+
+def test_parse_swap_request():
+    configuration, replaces, labels = ServiceCatalog.parse_swap_request(
+        {
+            "service": {
+                "dataset": "TD",
+                "dataset_version": "TDV",
+                "model": "TM",
+                "model_version": "TMV2",
+                "vector_file": KV_PATH,
+            },
+            "replaces": ["TD", "TDV", "TM", "TMV"],
+        }
+    )
+    assert configuration.get_key() == ("td", "tdv", "tm", "tmv2")
+    assert replaces == ("TD", "TDV", "TM", "TMV")
+    assert labels == []
+    for body in (None, {"service": {"dataset": "TD"}}, {"service": {}, "replaces": 1}):
+        with pytest.raises(ValueError):
+            ServiceCatalog.parse_swap_request(body)
@@ -0,0 +1,56 @@
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.generic_linker import GenericDBpediaLinker
+from kgvec2go_server.generic.generic_query_service import GenericKvQueryService
+from kgvec2go_server.generic.service_registry import ServiceRegistry
+
+
+def get_service(model_version: str) -> GenericKvQueryService:
+    kv = KeyedVectors.load("./tests/data/dbpedia_sample_vectors.kv", mmap="r")
+    return GenericKvQueryService(
+        kv=kv,
+        linker=GenericDBpediaLinker(kv=kv),
+        dataset="DBpedia",
+        dataset_version="2021-09",
+        model="TransE",
+        model_version=model_version,
+    )
+
+
+def test_register_and_get():
+    registry = ServiceRegistry()
+    service = get_service("v1")
+    assert registry.register(service) is None
+    assert len(registry) == 1
+    assert registry.get("dbpedia", "2021_09", "trans-e", "V1") is service
+    assert registry.get("dbpedia", "2021_09", "transe", "v2") is None
+
+    replacement = get_service("v_1")
+    assert registry.register(replacement) is service
+    assert registry.get("DBpedia", "2021-09", "TransE", "v1") is replacement
+    assert list(registry) == [replacement]
+
+
+def test_unregister():
+    registry = ServiceRegistry()
+    service = get_service("v1")
+    registry.register(service)
+    assert registry.unregister("DBpedia", "2021-09", "TransE", "v2") is None
+    assert registry.unregister("DBpedia", "2021-09", "TransE", "v1") is service
+    assert len(registry) == 0
+
+
+def test_get_service_from_list_returns_the_first_match():
+    first, second = get_service("v1"), get_service("v_1")
+    assert (
+        GenericKvQueryService.get_service_from_list(
+            [first, second], "dbpedia", "2021-09", "transe", "V-1"
+        )
+        is first
+    )
+    assert (
+        GenericKvQueryService.get_service_from_list(
+            [first, second], "dbpedia", "2021-09", "transe", "v2"
+        )
+        is None
+    )
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from kgvec2go_server.generic.similarity_engine import (
+    BatchSimilarityEngine,
+    normalize_rows,
+)
+
+
+def test_normalize_rows():
+    result = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+    assert result.dtype == np.float32
+    assert result[0] == pytest.approx([0.6, 0.8])
+    assert result[1] == pytest.approx([0.0, 0.0])
+
+
+def test_top_k():
+    vectors = np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [-1.0, 0.0]])
+    engine = BatchSimilarityEngine(vectors=vectors, query_chunk_size=1)
+    indices, scores = engine.top_k(
+        query_vectors=np.array([[1.0, 0.0], [0.0, 2.0]]), topn=2
+    )
+    assert indices.tolist() == [[0, 1], [2, 1]]
+    assert scores[0][0] == pytest.approx(1.0)
+
+    # topn larger than the vocabulary
+    indices, _ = engine.top_k(query_vectors=np.array([[1.0, 0.0]]), topn=10)
+    assert indices.tolist() == [[0, 1, 2, 3]]
+
+
+def test_top_k_for_indices():
+    vectors = np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0], [-1.0, 0.0]])
+    engine = BatchSimilarityEngine(vectors=vectors)
+    indices, _ = engine.top_k_for_indices(indices=[0, 2], topn=2)
+    assert indices.tolist() == [[1, 2], [1, 0]]
+
+    indices, _ = engine.top_k_for_indices(indices=[0], topn=1, exclude_self=False)
+    assert indices.tolist() == [[0]]
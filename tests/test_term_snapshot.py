@@ -0,0 +1,108 @@
+import json
+import shutil
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.dbpedia.dbpedia_query_service import DBpediaQueryService
+from kgvec2go_server.generic.term_snapshot import HashedKeys, Snapshot, TermTable
+from kgvec2go_server.scripts.build_snapshot import build_snapshot
+from kgvec2go_server.wordnet.wordnet_query_service import WordnetQueryService
+
+
+class TestTermSnapshot:
+    def test_hashed_keys(self):
+        keys = HashedKeys.build(["a", "b", "c"])
+        assert len(keys) == 3
+        assert [keys.get(key) for key in ["a", "b", "c"]] == [0, 1, 2]
+        assert "d" not in keys
+        assert keys.get("d", -1) == -1
+
+    def test_term_table(self):
+        index_to_key = ["x", "y", "z"]
+        key_to_index = {key: index for index, key in enumerate(index_to_key)}
+        table = TermTable.build(
+            term_mapping={"one": ["x", "z"], "two": ["missing"], "three": ["y"]},
+            key_to_index=key_to_index,
+            index_to_key=index_to_key,
+            multi_valued=True,
+        )
+        assert len(table) == 2
+        assert table["one"] == ["x", "z"]
+        assert table["three"] == ["y"]
+        assert "two" not in table
+        assert table.get("two") is None
+        with pytest.raises(KeyError):
+            table["two"]
+
+        single = TermTable.build(
+            term_mapping={"one": "x", "two": "z"},
+            key_to_index=key_to_index,
+            index_to_key=index_to_key,
+        )
+        assert single["two"] == "z"
+
+    def test_save_load(self, tmp_path):
+        kv_path = str(tmp_path / "vectors.kv")
+        shutil.copy("./tests/data/dbpedia_sample_vectors.kv", kv_path)
+        Snapshot(arrays={"values": np.arange(4)}, metadata={"a": 1}).save(
+            kv_path, name="test"
+        )
+
+        snapshot = Snapshot.load(kv_path, name="test")
+        assert snapshot.metadata == {"a": 1}
+        assert isinstance(snapshot.arrays["values"], np.memmap)
+        assert snapshot.arrays["values"].tolist() == [0, 1, 2, 3]
+        assert Snapshot.load(kv_path, name="other") is None
+
+        # a changed vector file invalidates the snapshot
+        with open(kv_path, "ab") as kv_file:
+            kv_file.write(b"\0")
+        assert Snapshot.load(kv_path, name="test") is None
+
+    def test_dbpedia_snapshot(self, tmp_path):
+        kv_path = str(tmp_path / "dbpedia.kv")
+        shutil.copy("./tests/data/dbpedia_sample_vectors.kv", kv_path)
+        build_snapshot(service="dbpedia", vector_file=kv_path)
+
+        from_text = DBpediaQueryService(vector_file=kv_path, use_snapshot=False)
+        from_snapshot = DBpediaQueryService(vector_file=kv_path)
+        assert isinstance(from_snapshot.term_mapping, TermTable)
+        for concept in ["Hotel", "Aero East Europe", "Lake", "unknown"]:
+            assert from_snapshot.get_similarity_json(
+                concept, "Lake"
+            ) == from_text.get_similarity_json(concept, "Lake")
+            assert from_snapshot.get_vector(concept) == from_text.get_vector(concept)
+
+    def test_wordnet_snapshot(self, tmp_path):
+        keys = [
+            "wn-lemma:sleep#sleep-n",
+            "wn-lemma:sleep#sleep-v",
+            "wn-lemma:dog#dog-n",
+            "wn-lemma:run#run-v",
+        ]
+        kv = KeyedVectors(vector_size=8)
+        kv.add_vectors(keys, np.random.default_rng(1).normal(size=(len(keys), 8)))
+        kv_path = str(tmp_path / "wordnet.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "wordnet_entities.txt"
+        entity_file.write_text("\n".join(keys) + "\n")
+        build_snapshot(
+            service="wordnet", vector_file=kv_path, entity_file=str(entity_file)
+        )
+
+        from_text = WordnetQueryService(
+            entity_file=str(entity_file), vector_file=kv_path, use_snapshot=False
+        )
+        # the entity file is not read if a snapshot exists
+        from_snapshot = WordnetQueryService(entity_file="", vector_file=kv_path)
+        assert from_snapshot.all_lemmas == from_text.all_lemmas
+        assert json.loads(from_snapshot.find_closest_lemmas("sleep", 3)) == json.loads(
+            from_text.find_closest_lemmas("sleep", 3)
+        )
+        assert from_snapshot.get_vector("sleep") == from_text.get_vector("sleep")
+        for pos in ["n", "v", "x"]:
+            assert from_snapshot.get_similarity(
+                "sleep", "run", pos_1=pos
+            ) == from_text.get_similarity("sleep", "run", pos_1=pos)
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
+from kgvec2go_server.generic.similarity_engine import normalize_rows
+from kgvec2go_server.generic.vector_store import VectorStore
+from kgvec2go_server.scripts.build_normalized_vectors import build_normalized_vectors
+
+KV_PATH = "./tests/data/dbpedia_sample_vectors.kv"
+
+
+def get_first_row(queue):
+    store = VectorStore()
+    kv = store.load_vectors(KV_PATH)
+    matrix = store.get_normalized_vectors(KV_PATH, kv.vectors, indices=np.arange(5))
+    queue.put(matrix[0].tolist())
+
+
+class TestVectorStore:
+    @pytest.fixture
+    def store(self):
+        store = VectorStore()
+        yield store
+        store.unlink()
+
+    def test_load_vectors(self, store):
+        kv = store.load_vectors(KV_PATH)
+        assert isinstance(kv, KeyedVectors)
+        assert store.load_vectors(KV_PATH) is kv
+
+    def test_normalized_vectors_are_shared(self, store):
+        kv = store.load_vectors(KV_PATH)
+        matrix = store.get_normalized_vectors(KV_PATH, kv.vectors)
+        assert matrix.dtype == np.float32
+        assert not matrix.flags.writeable
+        assert np.allclose(matrix, normalize_rows(kv.vectors))
+        assert store.get_normalized_vectors(KV_PATH, kv.vectors) is matrix
+
+        # a second store (as in another worker process) attaches to the segment instead of computing it
+        other_store = VectorStore()
+        attached = other_store.get_matrix(
+            segment_name=VectorStore.get_segment_name(KV_PATH, "normalized"),
+            build=lambda: pytest.fail("matrix must not be computed again"),
+        )
+        assert np.array_equal(attached, matrix)
+
+        subset = store.get_normalized_vectors(
+            KV_PATH, kv.vectors, indices=np.array([3, 1])
+        )
+        assert np.allclose(subset, normalize_rows(kv.vectors[[3, 1]]))
+
+    def test_shared_across_processes(self, store):
+        kv = store.load_vectors(KV_PATH)
+        matrix = store.get_normalized_vectors(KV_PATH, kv.vectors, indices=np.arange(5))
+        queue = multiprocessing.get_context("spawn").Queue()
+        process = multiprocessing.get_context("spawn").Process(
+            target=get_first_row, args=(queue,)
+        )
+        process.start()
+        process.join(timeout=60)
+        assert queue.get(timeout=5) == pytest.approx(matrix[0].tolist())
+
+    def test_engine(self, store):
+        kv = store.load_vectors(KV_PATH)
+        engine = store.get_engine(KV_PATH, kv.vectors)
+        indices, _ = engine.top_k_for_indices([0], topn=3)
+        expected = [key for key, _ in kv.most_similar(kv.index_to_key[0], topn=3)]
+        assert [kv.index_to_key[i] for i in indices[0]] == expected
+
+    def test_without_shared_memory(self):
+        store = VectorStore(use_shared_memory=False)
+        kv = store.load_vectors(KV_PATH)
+        matrix = store.get_normalized_vectors(KV_PATH, kv.vectors)
+        assert np.allclose(matrix, normalize_rows(kv.vectors))
+
+    def test_persisted_normalized_vectors(self, store, tmp_path):
+        kv_path = str(tmp_path / "vectors.kv")
+        shutil.copy(KV_PATH, kv_path)
+        build_normalized_vectors(kv_path, chunk_size=7)
+
+        kv = store.load_vectors(kv_path)
+        assert isinstance(kv.norms, np.memmap)
+        assert np.allclose(kv.norms, np.linalg.norm(kv.vectors, axis=1))
+        matrix = store.get_normalized_vectors(kv_path, kv.vectors)
+        assert isinstance(matrix, np.memmap)
+        assert np.allclose(matrix, normalize_rows(kv.vectors))
+        subset = store.get_normalized_vectors(
+            kv_path, kv.vectors, indices=np.array([3, 1])
+        )
+        assert np.allclose(subset, normalize_rows(kv.vectors[[3, 1]]))
+
+        # gensim uses the persisted norms
+        expected = KeyedVectors.load(KV_PATH).most_similar(kv.index_to_key[0], topn=3)
+        actual = kv.most_similar(kv.index_to_key[0], topn=3)
+        assert [key for key, _ in actual] == [key for key, _ in expected]
+        assert [score for _, score in actual] == pytest.approx(
+            [score for _, score in expected]
+        )
+
+    @pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="segments not listed")
+    def test_release(self, store):
+        kv = store.load_vectors(KV_PATH)
+        matrix = store.get_normalized_vectors(KV_PATH, kv.vectors)
+        segment_path = os.path.join(
+            "/dev/shm", VectorStore.get_segment_name(KV_PATH, "normalized")
+        )
+        # a second store (as in another worker process) refers to the segment as well
+        other_store = VectorStore()
+        other_store.get_normalized_vectors(
+            KV_PATH, other_store.load_vectors(KV_PATH).vectors
+        )
+        store.release(KV_PATH)
+        assert store.load_vectors(KV_PATH) is not kv
+        # the segment stays mapped while the matrix is referenced
+        assert np.allclose(matrix, normalize_rows(kv.vectors))
+        assert len(store._detached_segments) == 1
+        del matrix
+        store.release(KV_PATH)
+        assert len(store._detached_segments) == 0
+        assert os.path.exists(segment_path)
+        # the last store that releases the segment removes it from the host
+        other_store.release(KV_PATH)
+        assert not os.path.exists(segment_path)
+        assert store.get_normalized_vectors(KV_PATH, kv.vectors) is not None
+        assert os.path.exists(segment_path)
+
+    @pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="segments not listed")
+    def test_superseded_segments_are_removed(self, store, tmp_path):
+        kv_path = str(tmp_path / "vectors.kv")
+        shutil.copy(KV_PATH, kv_path)
+        kv = store.load_vectors(kv_path)
+        store.get_normalized_vectors(kv_path, kv.vectors)
+        first_path = os.path.join(
+            "/dev/shm", VectorStore.get_segment_name(kv_path, "normalized")
+        )
+        # the segment of an unchanged file is kept when its last process exits
+        store.detach()
+        assert os.path.exists(first_path)
+
+        # the segment of a new version of the file replaces the former one
+        os.utime(kv_path, (0, 0))
+        store.get_normalized_vectors(kv_path, kv.vectors)
+        second_path = os.path.join(
+            "/dev/shm", VectorStore.get_segment_name(kv_path, "normalized")
+        )
+        assert os.path.exists(second_path)
+        assert not os.path.exists(first_path)
+
+        # the segment of a changed file is removed when its last process exits
+        os.utime(kv_path, (1, 1))
+        store.detach()
+        assert not os.path.exists(second_path)
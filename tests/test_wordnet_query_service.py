@@ -1,3 +1,10 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+
+import numpy as np
+import pytest
+from gensim.models import KeyedVectors
+
 from kgvec2go_server.wordnet.wordnet_query_service import (
     WordnetQueryService as WQService,
 )
@@ -8,3 +15,109 @@ class TestWordnetQueryService:
         assert "stabilizer" == WQService.transform_string(
             "wn-lemma:stabilizer#stabilizer-n"
         )
+
+    def test_find_closest_lemmas(self, tmp_path):
+        keys = [
+            "wn-lemma:sleep#sleep-n",
+            "wn-lemma:sleep#sleep-v",
+            "wn-lemma:dog#dog-n",
+            "wn-lemma:cat#cat-n",
+            "wn-lemma:run#run-v",
+            "wn-lemma:bed#bed-n",
+            "not-a-lemma",
+        ]
+        kv = KeyedVectors(vector_size=16)
+        kv.add_vectors(keys, np.random.default_rng(7).normal(size=(len(keys), 16)))
+        kv_path = str(tmp_path / "wordnet.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "wordnet_entities.txt"
+        entity_file.write_text("\n".join(keys[:6]) + "\n")
+
+        service = WQService(entity_file=str(entity_file), vector_file=kv_path)
+        result = json.loads(service.find_closest_lemmas("sleep", 3))["result"]
+
+        # mean similarity over the senses of "sleep" (the former per-lemma loop)
+        expected = sorted(
+            (
+                (
+                    lemma,
+                    np.mean([kv.similarity(sense, lemma) for sense in keys[:2]]),
+                )
+                for lemma in keys[:6]
+            ),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )[:3]
+        # both senses of "sleep" have the same mean similarity; their order is arbitrary
+        assert {entry["concept"] for entry in result} == {
+            lemma for lemma, _ in expected
+        }
+        for entry, (_, score) in zip(result, expected):
+            assert entry["score"] == pytest.approx(score, abs=1e-5)
+        assert service.find_closest_lemmas("unknown", 3) == "{}"
+
+        given_key = json.loads(
+            service.find_closest_lemmas_given_key("wn-lemma:dog#dog-n", 2)
+        )["result"]
+        assert given_key[0]["concept"] == "wn-lemma:dog#dog-n"
+        assert "not-a-lemma" not in [entry["concept"] for entry in given_key]
+
+    def test_get_similarity_pos(self, tmp_path):
+        keys = [
+            "wn-lemma:sleep#sleep-n",
+            "wn-lemma:sleep#sleep-v",
+            "wn-lemma:run#run-v",
+        ]
+        kv = KeyedVectors(vector_size=8)
+        kv.add_vectors(keys, np.random.default_rng(5).normal(size=(len(keys), 8)))
+        kv_path = str(tmp_path / "wordnet.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "wordnet_entities.txt"
+        entity_file.write_text("\n".join(keys) + "\n")
+        service = WQService(entity_file=str(entity_file), vector_file=kv_path)
+
+        assert service.get_similarity("sleep", "run", pos_1="v", pos_2="v") == (
+            pytest.approx(kv.similarity(keys[1], keys[2]))
+        )
+        assert service.get_similarity("sleep", "run") == pytest.approx(
+            kv.similarity(keys[0], keys[2])
+        )
+        # unknown POS: noun
+        assert service.get_similarity("sleep", "run", pos_1="x") == pytest.approx(
+            kv.similarity(keys[0], keys[2])
+        )
+        assert service.get_similarity("sleep", "unknown") is None
+
+    def test_find_closest_lemmas_with_batch_window(self, tmp_path):
+        keys = [
+            "wn-lemma:sleep#sleep-n",
+            "wn-lemma:sleep#sleep-v",
+            "wn-lemma:dog#dog-n",
+            "wn-lemma:cat#cat-n",
+            "wn-lemma:run#run-v",
+        ]
+        kv = KeyedVectors(vector_size=8)
+        kv.add_vectors(keys, np.random.default_rng(9).normal(size=(len(keys), 8)))
+        kv_path = str(tmp_path / "wordnet.kv")
+        kv.save(kv_path)
+        entity_file = tmp_path / "wordnet_entities.txt"
+        entity_file.write_text("\n".join(keys) + "\n")
+        service = WQService(entity_file=str(entity_file), vector_file=kv_path)
+        batched_service = WQService(
+            entity_file=str(entity_file), vector_file=kv_path, batch_window=0.05
+        )
+
+        lemmas = ["sleep", "dog", "sleep", "run"]
+        with ThreadPoolExecutor(max_workers=len(lemmas)) as pool:
+            results = list(
+                pool.map(
+                    lambda lemma: batched_service.find_closest_lemmas(lemma, 3), lemmas
+                )
+            )
+        for lemma, result in zip(lemmas, results):
+            expected = json.loads(service.find_closest_lemmas(lemma, 3))["result"]
+            result = json.loads(result)["result"]
+            assert [entry["score"] for entry in result] == pytest.approx(
+                [entry["score"] for entry in expected], abs=1e-5
+            )
+        assert batched_service.batch_scheduler.batches < len(lemmas)